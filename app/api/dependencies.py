@@ -4,9 +4,9 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from app.infra.db.postgres.postgres_config import get_db
 from app.utils.auth_utils import AuthUtils
-from app.infra.db.postgres.models.user import User
 from app.infra.db.postgres.models.refresh_token import RefreshToken
 from app.utils.enums import UserStatus
+from app.services.principal_cache_service import Principal, principal_cache_service
 
 # Security scheme
 security = HTTPBearer()
@@ -14,8 +14,23 @@ security = HTTPBearer()
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
+) -> Principal:
+    """
+    Get current authenticated user from JWT token.
+
+    The user is resolved through the principal cache, so most requests
+    authenticate without a database query. The returned Principal is not a
+    mapped User: user_id, role, status, email, phone, first_name and
+    last_name come from the cache, and these load the User row from the
+    request's session:
+    - reading any other attribute (relationships, timestamps, ...)
+    - assigning an attribute, which is passed through to the User row
+    - `.user`, which session operations need: db.add(principal.user),
+      db.refresh(principal.user), db.delete(principal.user)
+
+    Returns:
+        Principal: The authenticated, active user
+    """
     token = credentials.credentials
     
     # Verify JWT token
@@ -27,8 +42,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = AuthUtils.get_user_by_id(db, payload.get("user_id"))
+    # Resolve the user through the principal cache
+    user = principal_cache_service.resolve(db, payload.get("user_id"))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -47,8 +62,8 @@ async def get_current_user(
     return user
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Get current active user (additional check for active status)"""
     if current_user.status != UserStatus.ACTIVE:
         raise HTTPException(
@@ -60,7 +75,7 @@ async def get_current_active_user(
 async def get_optional_current_user(
     request: Request,
     db: Session = Depends(get_db)
-) -> Optional[User]:
+) -> Optional[Principal]:
     """Get current user if authenticated, otherwise return None"""
     try:
         # Try to get authorization header
@@ -73,7 +88,7 @@ async def get_optional_current_user(
         if not payload:
             return None
         
-        user = AuthUtils.get_user_by_id(db, payload.get("user_id"))
+        user = principal_cache_service.resolve(db, payload.get("user_id"))
         if not user or user.status != UserStatus.ACTIVE:
             return None
         
@@ -134,7 +149,7 @@ def get_device_info(request: Request) -> dict:
 
 def require_roles(*allowed_roles):
     """Dependency factory for role-based access control"""
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -16,6 +16,7 @@ from app.api.schemas.admin_delivery_partner_schemas import (
 )
 from app.api.schemas.common_schemas import CommonResponse
 from app.utils.enums import UserRole
+from app.services.principal_cache_service import principal_cache_service
 
 router = APIRouter()
 
@@ -193,6 +194,7 @@ def update_delivery_partner(
     # Only commit to database if something actually changed
     if is_modified:
         db.commit()
+        principal_cache_service.invalidate(user.user_id)
         db.refresh(partner)
         db.refresh(user)
 
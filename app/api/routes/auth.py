@@ -15,13 +15,14 @@ from app.api.schemas.auth_schemas import (
 from app.api.schemas.common_schemas import CommonResponse
 from app.api.dependencies import get_current_user, get_device_info
 from app.utils.auth_utils import AuthUtils
+from app.services.principal_cache_service import principal_cache_service
+from app.services.password_hash_service import password_hash_service
+from app.services.session_store_service import session_store_service
 from app.infra.db.postgres.models.user import User
-from app.infra.db.postgres.models.refresh_token import RefreshToken
 from app.infra.db.postgres.models.oauth_provider import OAuthProvider
 from app.infra.db.postgres.models.pending_user import PendingUser
-from app.infra.db.postgres.models.user_session import UserSession
 from app.utils.enums import UserRole, UserStatus
-from app.config.config import JWT_EXPIRATION_HOURS
+from app.config.config import JWT_EXPIRATION_HOURS, APP_ENV
 from app.utils.rate_limiter import rate_limit, rate_limit_auth, RATE_LIMIT_CONFIG
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -64,7 +65,7 @@ async def login(
             )
 
         # Verify password
-        if not AuthUtils.verify_password(request.password, user.password_hash):
+        if not await password_hash_service.verify(request.password, user.password_hash):
             # Increment failed attempts
             user.failed_login_attempts = (user.failed_login_attempts or 0) + 1
             MAX_ATTEMPTS = 5
@@ -103,16 +104,12 @@ async def login(
         if user.failed_login_attempts or user.locked_until:
             user.failed_login_attempts = 0
             user.locked_until = None
+            db.commit()
         access_token = AuthUtils.generate_jwt_token(str(user.user_id), user.role)
-        refresh_token_obj = AuthUtils.create_refresh_token(
-            db, str(user.user_id), get_device_info(http_request),
-            http_request.client.host if http_request.client else None,
-            http_request.headers.get("user-agent")
-        )
         
-        # Create user session
-        AuthUtils.create_user_session(
-            db, str(user.user_id), get_device_info(http_request),
+        # Create user session and its refresh token
+        refresh_token = session_store_service.create_session(
+            db, user.user_id, get_device_info(http_request),
             http_request.client.host if http_request.client else None,
             http_request.headers.get("user-agent")
         )
@@ -125,7 +122,7 @@ async def login(
                 user=user,
                 tokens={
                     "access_token": access_token,
-                    "refresh_token": refresh_token_obj.token_hash,  # Return the hash for client
+                    "refresh_token": refresh_token,
                     "token_type": "bearer",
                     "expires_in": JWT_EXPIRATION_HOURS * 3600
                 },
@@ -194,12 +191,11 @@ async def signup(
                 existing_pending_user.first_name = request.first_name
                 existing_pending_user.last_name = request.last_name
                 existing_pending_user.phone = request.phone
-                existing_pending_user.password_hash = AuthUtils.hash_password(request.password)
+                existing_pending_user.password_hash = await password_hash_service.hash(request.password)
                 existing_pending_user.verification_token = PendingUserUtils.generate_verification_token()
                 existing_pending_user.expires_at = PendingUserUtils.get_verification_expiry()
-                existing_pending_user.otp_attempts = 0  # Reset OTP attempts
-                existing_pending_user.otp_locked_until = None  # Clear any lockout
                 db.commit()
+                PendingUserUtils.reset_otp_attempts(existing_pending_user)  # Reset OTP attempts
                 
                 # Use existing pending user for OTP creation
                 pending_user = existing_pending_user
@@ -248,7 +244,7 @@ async def signup(
             )
 
         # Hash password
-        hashed_password = AuthUtils.hash_password(request.password)
+        hashed_password = await password_hash_service.hash(request.password)
         
         # Extract partner-specific data from additional_data
         restaurant_name = None
@@ -294,7 +290,7 @@ async def signup(
         
         logger.info(f"Creating OTP for pending user {pending_user.pending_user_id}, email: {request.email}")
         
-        otp_record = OTPUtils.create_otp_record(
+        otp_code = OTPUtils.create_otp_record(
             db=db,
             user_id=str(pending_user.pending_user_id),  # Use pending user ID
             email=request.email,
@@ -302,7 +298,7 @@ async def signup(
             is_pending_user=True  # Mark as pending user
         )
         
-        if not otp_record:
+        if not otp_code:
             logger.error(f"Failed to create OTP record for pending user {pending_user.pending_user_id}")
             # Clean up pending user if OTP creation fails
             PendingUserUtils.delete_pending_user(db, str(pending_user.pending_user_id))
@@ -311,14 +307,14 @@ async def signup(
                 detail="Failed to generate verification code. Please try again."
             )
         
-        logger.info(f"OTP record created successfully: {otp_record.otp_code}")
+        logger.info("OTP record created successfully")
         
         # Send OTP email
         try:
             logger.info(f"Attempting to send OTP email to {request.email}")
             email_sent = await email_service.send_otp_email(
                 to_email=request.email,
-                otp_code=otp_record.otp_code,
+                otp_code=otp_code,
                 user_name=f"{pending_user.first_name} {pending_user.last_name}".strip(),
                 otp_type="email_verification"
             )
@@ -328,7 +324,7 @@ async def signup(
                 # Count the signup OTP as the first attempt for lockout logic
                 try:
                     from app.utils.pending_user_utils import PendingUserUtils as _PU
-                    _PU.update_pending_user_otp_status(db, pending_user, increment_attempts=True)
+                    _PU.update_pending_user_otp_status(pending_user, increment_attempts=True)
                     logger.info(
                         f"Initialized OTP attempts for pending user {pending_user.pending_user_id}"
                     )
@@ -395,14 +391,16 @@ async def google_signin(
         
         if not user:
             # Create new user
+            random_password = AuthUtils.generate_refresh_token()
             user = AuthUtils.create_user(
                 db=db,
                 first_name=google_user_info.get("given_name", ""),
                 last_name=google_user_info.get("family_name", ""),
                 email=google_user_info["email"],
                 phone="",  # Google doesn't provide phone
-                password=AuthUtils.generate_refresh_token(),  # Random password
-                role=UserRole.CUSTOMER.value
+                password=random_password,
+                role=UserRole.CUSTOMER.value,
+                password_hash=await password_hash_service.hash(random_password)
             )
             user.email_verified = google_user_info.get("email_verified", False)
             db.commit()
@@ -440,15 +438,10 @@ async def google_signin(
         
         # Generate tokens
         access_token = AuthUtils.generate_jwt_token(str(user.user_id), user.role)
-        refresh_token_obj = AuthUtils.create_refresh_token(
-            db, str(user.user_id), request.device_info,
-            http_request.client.host if http_request.client else None,
-            http_request.headers.get("user-agent")
-        )
         
-        # Create user session
-        AuthUtils.create_user_session(
-            db, str(user.user_id), request.device_info,
+        # Create user session and its refresh token
+        refresh_token = session_store_service.create_session(
+            db, user.user_id, request.device_info,
             http_request.client.host if http_request.client else None,
             http_request.headers.get("user-agent")
         )
@@ -461,7 +454,7 @@ async def google_signin(
                 user=user,
                 tokens={
                     "access_token": access_token,
-                    "refresh_token": refresh_token_obj.token_hash,
+                    "refresh_token": refresh_token,
                     "token_type": "bearer",
                     "expires_in": JWT_EXPIRATION_HOURS * 3600
                 },
@@ -565,47 +558,19 @@ async def refresh_token(
 ):
     """Refresh access token using refresh token"""
     try:
-        # Find refresh token
-        refresh_tokens = db.query(RefreshToken).filter(
-            RefreshToken.is_revoked == False
-        ).all()
-        
-        refresh_token_obj = None
-        for rt in refresh_tokens:
-            if AuthUtils.verify_password(request.refresh_token, rt.token_hash):
-                refresh_token_obj = rt
-                break
-        
-        if not refresh_token_obj:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid refresh token"
-            )
-        
-        # Check if token is expired
-        if refresh_token_obj.expires_at < datetime.now(timezone.utc):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Refresh token expired"
-            )
+        refresh_token_record = session_store_service.get_refresh_token(db, request.refresh_token)
         
         # Get user
-        user = AuthUtils.get_user_by_id(db, str(refresh_token_obj.user_id))
+        user = AuthUtils.get_user_by_id(db, refresh_token_record["user_id"])
         if not user or user.status != UserStatus.ACTIVE:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found or inactive"
             )
         
-        # Generate new tokens
+        # Generate new tokens; the presented refresh token can't be used again
         access_token = AuthUtils.generate_jwt_token(str(user.user_id), user.role)
-        new_refresh_token = AuthUtils.generate_refresh_token()
-        new_refresh_token_hash = AuthUtils.hash_password(new_refresh_token)
-        
-        # Update refresh token
-        refresh_token_obj.token_hash = new_refresh_token_hash
-        refresh_token_obj.expires_at = datetime.now(timezone.utc) + timedelta(days=30)
-        db.commit()
+        new_refresh_token = session_store_service.rotate_refresh_token(db, request.refresh_token)
         
         return CommonResponse(
             code=200,
@@ -638,53 +603,16 @@ async def logout(
         logged_out_count = 0
         
         if request.logout_all_devices:
-            # Revoke all refresh tokens for user
-            refresh_tokens = db.query(RefreshToken).filter(
-                RefreshToken.user_id == current_user.user_id,
-                RefreshToken.is_revoked == False
-            ).all()
-            
-            for rt in refresh_tokens:
-                rt.is_revoked = True
-                logged_out_count += 1
-            
-            # Deactivate all sessions
-            sessions = db.query(UserSession).filter(
-                UserSession.user_id == current_user.user_id,
-                UserSession.is_active == True
-            ).all()
-            
-            for session in sessions:
-                session.is_active = False
-                logged_out_count += 1
+            # Revoke all refresh tokens and end all sessions
+            logged_out_count = session_store_service.revoke_all(db, current_user.user_id)
         
-        else:
-            # Revoke specific refresh token and deactivate corresponding session
-            if request.refresh_token:
-                refresh_tokens = db.query(RefreshToken).filter(
-                    RefreshToken.user_id == current_user.user_id,
-                    RefreshToken.is_revoked == False
-                ).all()
-                
-                for rt in refresh_tokens:
-                    if AuthUtils.verify_password(request.refresh_token, rt.token_hash):
-                        rt.is_revoked = True
-                        logged_out_count = 1
-                        
-                        # Also deactivate the corresponding session for this device
-                        device_info = rt.device_info
-                        if device_info and 'device_id' in device_info:
-                            session = db.query(UserSession).filter(
-                                UserSession.user_id == current_user.user_id,
-                                UserSession.device_id == device_info['device_id']
-                            ).first()
-                            
-                            if session:
-                                session.is_active = False
-                                logged_out_count += 1
-                        break
+        elif request.refresh_token:
+            # Revoke this refresh token and end the session of its device
+            logged_out_count = session_store_service.revoke_refresh_token(
+                db, current_user.user_id, request.refresh_token
+            )
         
-        db.commit()
+        principal_cache_service.invalidate(current_user.user_id)
         
         return CommonResponse(
             code=200,
@@ -696,6 +624,8 @@ async def logout(
             )
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -709,20 +639,17 @@ async def get_user_sessions(
 ):
     """Get user's active sessions"""
     try:
-        sessions = db.query(UserSession).filter(
-            UserSession.user_id == current_user.user_id,
-            UserSession.is_active == True
-        ).order_by(UserSession.last_activity.desc()).all()
+        sessions = session_store_service.list_sessions(db, current_user.user_id)
         
         session_responses = []
         for session in sessions:
             session_responses.append(UserSessionResponse(
-                session_id=session.session_id,
-                device_name=session.device_name,
-                device_type=session.device_type,
-                platform=session.platform,
-                app_version=session.app_version,
-                last_activity=session.last_activity,
+                session_id=session["session_id"],
+                device_name=session["device_name"],
+                device_type=session["device_type"],
+                platform=session["platform"],
+                app_version=session["app_version"],
+                last_activity=session["last_activity"],
                 is_current=False  # You can implement logic to identify current session
             ))
         
@@ -783,14 +710,14 @@ async def forgot_password(
             )
         
         # Create OTP record for password reset
-        otp_record = OTPUtils.create_otp_record(
+        otp_code = OTPUtils.create_otp_record(
             db=db,
             user_id=str(user.user_id),
             email=request.email,
             otp_type="password_reset"
         )
         
-        if not otp_record:
+        if not otp_code:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate OTP"
@@ -799,7 +726,7 @@ async def forgot_password(
         # Send OTP email
         email_sent = await email_service.send_otp_email(
             to_email=request.email,
-            otp_code=otp_record.otp_code,
+            otp_code=otp_code,
             user_name=f"{user.first_name} {user.last_name}".strip(),
             otp_type="password_reset"
         )
@@ -846,14 +773,7 @@ async def verify_reset_otp(
         )
         
         if not result["success"]:
-            # Increment attempts for failed verification
-            OTPUtils.increment_otp_attempts(
-                db=db,
-                otp_code=request.otp_code,
-                email=request.email,
-                otp_type="password_reset"
-            )
-            
+            # Failed attempts are counted by verify_otp
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=result["message"]
@@ -893,7 +813,7 @@ async def reset_password(
         # Find the verified OTP record
         otp_record = db.query(OTPVerification).filter(
             and_(
-                OTPVerification.otp_code == request.otp_code,
+                OTPVerification.otp_code == OTPUtils.hash_otp(request.otp_code),
                 OTPVerification.email == request.email,
                 OTPVerification.otp_type == "password_reset",
                 OTPVerification.is_verified == True
@@ -922,7 +842,7 @@ async def reset_password(
             )
         
         # Update password
-        new_password_hash = AuthUtils.hash_password(request.new_password)
+        new_password_hash = await password_hash_service.hash(request.new_password)
         user.password_hash = new_password_hash
         user.updated_at = datetime.now(timezone.utc)
         
@@ -932,25 +852,9 @@ async def reset_password(
         
         db.commit()
         
-        # Revoke all existing refresh tokens for security
-        refresh_tokens = db.query(RefreshToken).filter(
-            RefreshToken.user_id == user.user_id,
-            RefreshToken.is_revoked == False
-        ).all()
-        
-        for rt in refresh_tokens:
-            rt.is_revoked = True
-        
-        # Deactivate all user sessions
-        sessions = db.query(UserSession).filter(
-            UserSession.user_id == user.user_id,
-            UserSession.is_active == True
-        ).all()
-        
-        for session in sessions:
-            session.is_active = False
-        
-        db.commit()
+        # Revoke all existing refresh tokens and sessions for security
+        session_store_service.revoke_all(db, user.user_id)
+        principal_cache_service.invalidate(user.user_id)
         
         logger.info(f"Password reset successfully for user {user.user_id}")
         
@@ -1018,14 +922,14 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
                 detail="User not found"
             ) 
         
-        # Check rate limiting based on user type
+        # Check and count this request against the rate limit for the user type
         if is_pending_user and pending_user:
             # For pending users, use the new lockout system
-            lockout_status = PendingUserUtils.check_otp_lockout_status(pending_user)
+            otp_status = PendingUserUtils.update_pending_user_otp_status(pending_user, increment_attempts=True)
             
-            if lockout_status["is_locked"]:
-                remaining_minutes = lockout_status["remaining_seconds"] // 60
-                remaining_seconds = lockout_status["remaining_seconds"] % 60
+            if not otp_status["allowed"]:
+                remaining_minutes = otp_status["remaining_seconds"] // 60
+                remaining_seconds = otp_status["remaining_seconds"] % 60
                 
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -1034,7 +938,6 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
         else:
             # For regular users, use the old rate limiting system
             rate_limit_info = OTPUtils.check_send_rate_limit(
-                db=db,
                 email=request.email,
                 phone=request.phone,
                 otp_type=request.otp_type
@@ -1058,7 +961,7 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
         # Create OTP record
         logger.info(f"Creating OTP for {'pending' if is_pending_user else 'regular'} user {user_id}, email: {request.email}, type: {request.otp_type}")
         
-        otp_record = OTPUtils.create_otp_record(
+        otp_code = OTPUtils.create_otp_record(
             db=db,
             user_id=user_id,
             email=request.email,
@@ -1067,21 +970,21 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
             is_pending_user=is_pending_user
         )
         
-        if not otp_record:
+        if not otp_code:
             logger.error(f"Failed to create OTP record for user {user_id}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to generate OTP"
             )
         
-        logger.info(f"OTP record created successfully: {otp_record.otp_code}")
+        logger.info("OTP record created successfully")
         
         # Send OTP based on type
         if request.email and request.otp_type in ["email_verification", "password_reset"]:
             logger.info(f"Attempting to send OTP email to {request.email}")
             email_sent = await email_service.send_otp_email(
                 to_email=request.email,
-                otp_code=otp_record.otp_code,
+                otp_code=otp_code,
                 user_name=user_name,  # Use the determined user name
                 otp_type=request.otp_type
             )
@@ -1096,16 +999,15 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
                 )
         
         elif request.phone and request.otp_type == "phone_verification":
-            # Log OTP for development/testing purposes
+            # Log OTP for development/testing purposes (never in production)
             # In production, integrate with SMS service like Twilio or MSG91
-            logger.info(f"Phone OTP: {otp_record.otp_code} for {request.phone}")
+            if APP_ENV != "production":
+                logger.info(f"Phone OTP: {otp_code} for {request.phone}")
             # TODO: Implement actual SMS sending service integration
         
-        # Update OTP attempts and get lockout info
+        # Report remaining attempts and lockout info
         if is_pending_user and pending_user:
             # Use pending user lockout system
-            otp_status = PendingUserUtils.update_pending_user_otp_status(db, pending_user, increment_attempts=True)
-            
             return CommonResponse(
                 code=200,
                 message="OTP sent successfully",
@@ -1122,13 +1024,6 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
             )
         else:
             # Use regular rate limiting system
-            updated_rate_limit_info = OTPUtils.check_send_rate_limit(
-                db=db,
-                email=request.email,
-                phone=request.phone,
-                otp_type=request.otp_type
-            )
-            
             return CommonResponse(
                 code=200,
                 message="OTP sent successfully",
@@ -1138,8 +1033,8 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
                     expires_in=600,  # 10 minutes
                     phone=request.phone,
                     email=request.email,
-                    remaining_attempts=updated_rate_limit_info["remaining_attempts"],
-                    max_attempts=updated_rate_limit_info["max_attempts"],
+                    remaining_attempts=rate_limit_info["remaining_attempts"],
+                    max_attempts=rate_limit_info["max_attempts"],
                     rate_limited=False
                 )
             )
@@ -1169,15 +1064,7 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
         )
         
         if not result["success"]:
-            # Increment attempts for failed verification
-            OTPUtils.increment_otp_attempts(
-                db=db,
-                otp_code=request.otp_code,
-                email=request.email,
-                phone=request.phone,
-                otp_type=request.otp_type
-            )
-            
+            # Failed attempts are counted by verify_otp
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=result["message"]
@@ -1195,7 +1082,7 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
                 pending_user = db.query(PendingUser).filter(PendingUser.pending_user_id == user_id).first()
                 if pending_user:
                     # Reset OTP attempts on successful verification
-                    PendingUserUtils.reset_otp_attempts(db, pending_user)
+                    PendingUserUtils.reset_otp_attempts(pending_user)
                     
                     # Move pending user to main users table using verification token
                     user = PendingUserUtils.verify_pending_user(db, pending_user.verification_token)
@@ -12,6 +12,7 @@ from app.infra.db.postgres.postgres_config import get_db
 from app.api.dependencies import get_current_user, require_admin
 from app.infra.db.postgres.models.user import User
 from app.services.notification_service import NotificationService
+from app.services.broadcast_job_service import broadcast_job_service
 from app.api.schemas.notification_schemas import (
     NotificationResponse,
     NotificationListResponse,
@@ -19,7 +20,7 @@ from app.api.schemas.notification_schemas import (
     CreateNotificationRequest,
     BroadcastNotificationRequest,
     RegisterPushTokenRequest,
-    BroadcastResponse,
+    BroadcastJobResponse,
     NotificationStatsResponse
 )
 from app.api.schemas.common_schemas import CommonResponse
@@ -41,39 +42,40 @@ async def get_notifications(
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
     unread_only: bool = Query(False, description="Show only unread notifications"),
     notification_type: Optional[NotificationType] = Query(None, description="Filter by notification type"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get paginated notifications for the current user.
+    Get paginated notifications for the current user, newest first.
     
     **Authentication:** Required
     
     **Query Parameters:**
-    - `page`: Page number (default: 1)
+    - `page`: Page number (default: 1), ignored when `cursor` is given
     - `page_size`: Items per page (default: 20, max: 100)
     - `unread_only`: If true, only return unread notifications
     - `notification_type`: Filter by specific notification type
+    - `cursor`: Continue after a previous page (`next_cursor`). Cursor pages
+      stay fast at any depth and do not include `total`/`total_pages`/`page`.
     
     **Returns:**
     - List of notifications with pagination metadata
     """
     try:
-        notifications, total = NotificationService.get_user_notifications(
+        notifications, total, next_cursor = NotificationService.get_user_notifications(
             db=db,
             user_id=current_user.user_id,
             page=page,
             page_size=page_size,
             unread_only=unread_only,
-            notification_type=notification_type
+            notification_type=notification_type,
+            cursor=cursor
         )
         
         # Get unread count
         unread_count = NotificationService.get_unread_count(db, current_user.user_id)
         
-        # Calculate total pages
-        total_pages = math.ceil(total / page_size) if total > 0 else 0
-        
         # Convert to response schema
         notification_responses = [
             NotificationResponse.model_validate(notification)
@@ -83,10 +85,11 @@ async def get_notifications(
         response_data = NotificationListResponse(
             notifications=notification_responses,
             total=total,
-            page=page,
+            page=None if cursor else page,
             page_size=page_size,
-            total_pages=total_pages,
-            unread_count=unread_count
+            total_pages=(math.ceil(total / page_size) if total else 0) if total is not None else None,
+            unread_count=unread_count,
+            next_cursor=next_cursor
         )
         
         return CommonResponse(
@@ -96,6 +99,11 @@ async def get_notifications(
             data=response_data
         )
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error fetching notifications: {e}")
         logger.error(f"Exception type: {type(e).__name__}")
@@ -356,17 +364,23 @@ async def create_notification(
         )
 
 
-@router.post("/admin/broadcast", response_model=CommonResponse[BroadcastResponse])
+@router.post(
+    "/admin/broadcast",
+    response_model=CommonResponse[BroadcastJobResponse],
+    status_code=status.HTTP_202_ACCEPTED
+)
 async def broadcast_notification(
     request: BroadcastNotificationRequest,
-    current_admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_admin: User = Depends(require_admin)
 ):
     """
     Broadcast notification to multiple users (admin only).
-    
+
+    The broadcast runs in the background; poll
+    `GET /notifications/admin/broadcast/{job_id}` for progress.
+
     **Authentication:** Admin only
-    
+
     **Request Body:**
     - `title`: Notification title
     - `message`: Notification message
@@ -374,13 +388,13 @@ async def broadcast_notification(
     - `user_ids`: Specific user IDs (optional, if None sends to all users)
     - `role_filter`: Filter by user role (optional)
     - `data_json`: Additional data (optional)
-    
+
     **Returns:**
-    - Count of notifications sent and list of user IDs
+    - The queued broadcast job
     """
     try:
-        count, user_ids = NotificationService.broadcast_notification(
-            db=db,
+        job = broadcast_job_service.submit(
+            created_by=current_admin.user_id,
             title=request.title,
             message=request.message,
             notification_type=request.notification_type,
@@ -388,26 +402,50 @@ async def broadcast_notification(
             role_filter=request.role_filter,
             data_json=request.data_json
         )
-        
+
         return CommonResponse(
-            code=status.HTTP_201_CREATED,
-            message=f"Broadcast sent to {count} users",
-            message_id="BROADCAST_SENT",
-            data=BroadcastResponse(
-                message=f"Successfully sent notification to {count} users",
-                notifications_sent=count,
-                user_ids=user_ids
-            )
+            code=status.HTTP_202_ACCEPTED,
+            message="Broadcast queued",
+            message_id="BROADCAST_QUEUED",
+            data=BroadcastJobResponse(**job)
         )
-        
+
     except Exception as e:
-        logger.error(f"Error broadcasting notification: {e}")
+        logger.error(f"Error queueing broadcast notification: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to broadcast notification"
         )
 
 
+@router.get("/admin/broadcast/{job_id}", response_model=CommonResponse[BroadcastJobResponse])
+async def get_broadcast_job(
+    job_id: str,
+    current_admin: User = Depends(require_admin)
+):
+    """
+    Get the progress of a broadcast job (admin only).
+
+    **Authentication:** Admin only
+
+    **Returns:**
+    - Job status and the number of notifications written so far
+    """
+    job = broadcast_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Broadcast job not found"
+        )
+
+    return CommonResponse(
+        code=200,
+        message="Broadcast job retrieved successfully",
+        message_id="BROADCAST_JOB_SUCCESS",
+        data=BroadcastJobResponse(**job)
+    )
+
+
 @router.get("/admin/stats", response_model=CommonResponse[NotificationStatsResponse])
 async def get_notification_stats(
     current_admin: User = Depends(require_admin),
@@ -435,7 +473,7 @@ async def get_notification_stats(
                 total_unread=stats["total_unread"],
                 read_rate=stats["read_rate"],
                 notifications_by_type=stats["notifications_by_type"],
-                recent_broadcasts=[]  # TODO: Implement recent broadcasts tracking
+                recent_broadcasts=broadcast_job_service.recent_jobs(limit=10)
             )
         )
         
@@ -23,6 +23,7 @@ from app.infra.db.postgres.models.restaurant import Restaurant
 from app.services.onboarding_service import OnboardingService
 from app.services.csv_menu_service import CSVMenuService
 from app.utils.auth_utils import AuthUtils
+from app.services.password_hash_service import password_hash_service
 from app.utils.enums import UserRole
 from app.config.logger import get_logger
 
@@ -63,7 +64,8 @@ async def register_restaurant_owner(
             email=request.email,
             phone=request.phone,
             password=request.password,
-            role=UserRole.RESTAURANT_OWNER.value
+            role=UserRole.RESTAURANT_OWNER.value,
+            password_hash=await password_hash_service.hash(request.password)
         )
         
         # Create onboarding record
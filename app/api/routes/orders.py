@@ -34,6 +34,12 @@ from app.utils.order_utils import (
     is_order_ratable,
     calculate_delivery_partner_earnings
 )
+from app.services.ready_order_index import ready_order_index
+from app.services import order_events
+from app.services.order_tracking_service import order_tracking_service
+from app.services.dispatch_service import dispatch_service
+from app.services.location_ingest_service import location_ingest_service
+from app.config.config import DELIVERY_GEO_CONFIG
 from app.config.logger import get_logger
 
 router = APIRouter(prefix="/orders", tags=["orders"])
@@ -1066,108 +1072,20 @@ async def track_order(
     - Delivery partner location (if assigned)
     - Tracking history
     - Estimated delivery time
+    
+    The response is served from a cached snapshot. Clients that need live
+    updates should subscribe to /ws/orders/{order_id} instead of polling.
     """
     try:
-        # Get order
-        order = db.query(Order).filter(
-            Order.order_id == order_id,
-            Order.customer_id == current_user.user_id
-        ).first()
+        snapshot = order_tracking_service.get_snapshot(db, order_id)
         
-        if not order:
+        if not snapshot or snapshot["access"]["customer_id"] != str(current_user.user_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Order not found"
             )
         
-        # Get tracking history
-        tracking_history = db.query(OrderTracking).filter(
-            OrderTracking.order_id == order_id
-        ).order_by(OrderTracking.created_at).all()
-        
-        # Get restaurant
-        restaurant = db.query(Restaurant).filter(
-            Restaurant.restaurant_id == order.restaurant_id
-        ).first()
-        
-        # Get address
-        address = db.query(Address).filter(
-            Address.address_id == order.delivery_address_id
-        ).first()
-        
-        # Get delivery partner location if assigned
-        current_location = None
-        delivery_partner_response = None
-        
-        if order.delivery_partner_id:
-            delivery_partner_user = db.query(User).filter(
-                User.user_id == order.delivery_partner_id
-            ).first()
-            
-            delivery_partner = db.query(DeliveryPartner).filter(
-                DeliveryPartner.user_id == order.delivery_partner_id
-            ).first()
-            
-            if delivery_partner_user and delivery_partner:
-                delivery_partner_response = DeliveryPartnerResponse(
-                    user_id=delivery_partner_user.user_id,
-                    first_name=delivery_partner_user.first_name,
-                    last_name=delivery_partner_user.last_name,
-                    phone=delivery_partner_user.phone,
-                    profile_image=delivery_partner_user.profile_image,
-                    vehicle_type=delivery_partner.vehicle_type.value if delivery_partner.vehicle_type else None,
-                    vehicle_number=delivery_partner.vehicle_number,
-                    rating=delivery_partner.rating
-                )
-                
-                # Get current location
-                if delivery_partner.current_latitude and delivery_partner.current_longitude:
-                    current_location = {
-                        "latitude": float(delivery_partner.current_latitude),
-                        "longitude": float(delivery_partner.current_longitude)
-                    }
-        
-        # Build tracking responses
-        tracking_responses = [
-            OrderTrackingResponse(
-                order_tracking_id=t.order_tracking_id,
-                status=t.status,
-                latitude=t.latitude,
-                longitude=t.longitude,
-                notes=t.notes,
-                created_at=t.created_at
-            ) for t in tracking_history
-        ]
-        
-        # Build tracking detail response
-        tracking_detail = OrderTrackingDetailResponse(
-            order_id=order.order_id,
-            order_number=order.order_number,
-            order_status=order.order_status,
-            estimated_delivery_time=order.estimated_delivery_time,
-            restaurant=RestaurantBasicResponse(
-                restaurant_id=restaurant.restaurant_id,
-                name=restaurant.name,
-                phone=restaurant.phone,
-                image=restaurant.image,
-                address_line1=restaurant.address_line1,
-                city=restaurant.city
-            ),
-            delivery_address=AddressResponse(
-                address_id=address.address_id,
-                title=address.title,
-                address_line1=address.address_line1,
-                address_line2=address.address_line2,
-                city=address.city,
-                state=address.state,
-                postal_code=address.postal_code,
-                latitude=address.latitude,
-                longitude=address.longitude
-            ),
-            delivery_partner=delivery_partner_response,
-            current_location=current_location,
-            tracking_history=tracking_responses
-        )
+        tracking_detail = OrderTrackingDetailResponse(**snapshot["tracking"])
         
         return CommonResponse(
             code=200,
@@ -1370,6 +1288,7 @@ async def accept_order(
         db.add(tracking)
         
         db.commit()
+        order_events.order_changed(db, order, notes=f"Estimated prep time: {request.estimated_prep_time} minutes")
         
         logger.info(f"Order {order.order_number} accepted by restaurant")
         
@@ -1454,6 +1373,7 @@ async def reject_order(
         db.add(tracking)
         
         db.commit()
+        order_events.order_changed(db, order, notes=order.cancellation_reason)
         
         logger.info(f"Order {order.order_number} rejected by restaurant")
         
@@ -1711,41 +1631,71 @@ async def get_restaurant_analytics(
 # DELIVERY PARTNER APIS
 # ============================================
 
+def _build_delivery_order_response(
+    order: Order,
+    restaurant: Restaurant,
+    address: Address,
+    customer: Optional[User],
+    distance_km: Optional[float]
+) -> DeliveryOrderResponse:
+    """Build the delivery partner view of an order from already loaded rows."""
+    return DeliveryOrderResponse(
+        order_id=order.order_id, order_number=order.order_number,
+        restaurant=RestaurantBasicResponse(restaurant_id=restaurant.restaurant_id, name=restaurant.name,
+            phone=restaurant.phone, image=restaurant.image, address_line1=restaurant.address_line1, city=restaurant.city),
+        delivery_address=AddressResponse(address_id=address.address_id, title=address.title,
+            address_line1=address.address_line1, address_line2=address.address_line2,
+            city=address.city, state=address.state, postal_code=address.postal_code,
+            latitude=address.latitude, longitude=address.longitude),
+        customer_name=f"{customer.first_name} {customer.last_name}" if customer else "Unknown",
+        customer_phone=customer.phone if customer else "", total_amount=order.total_amount,
+        payment_method=order.payment_method, order_status=order.order_status,
+        estimated_delivery_time=order.estimated_delivery_time, distance_km=distance_km,
+        delivery_fee=order.delivery_fee, created_at=order.created_at
+    )
+
+
 @router.get("/delivery/available", response_model=CommonResponse[AvailableDeliveriesResponse])
 async def get_available_deliveries(
     latitude: float = Query(..., ge=-90, le=90), longitude: float = Query(..., ge=-180, le=180),
     radius_km: float = Query(10.0, ge=1, le=50),
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    """Get available orders for delivery nearby."""
+    """
+    Get available orders for delivery nearby.
+    
+    Candidates come from the ready order spatial index, so only orders near the
+    partner are touched; their details are then loaded in a single query that
+    also re-checks the order is still ready and unassigned.
+    """
     try:
         if current_user.role != UserRole.DELIVERY_PARTNER:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can access this endpoint")
         
-        orders = db.query(Order).filter(Order.order_status == OrderStatus.READY_FOR_PICKUP, Order.delivery_partner_id == None).all()
+        dispatch_service.update_partner_location(current_user.user_id, latitude, longitude)
+        
+        nearby = ready_order_index.nearby(db, latitude, longitude, radius_km, limit=DELIVERY_GEO_CONFIG["max_results"])
+        distances = {order_id: distance_km for order_id, distance_km in nearby}
         
         available_deliveries = []
-        for order in orders:
-            restaurant = db.query(Restaurant).filter(Restaurant.restaurant_id == order.restaurant_id).first()
-            address = db.query(Address).filter(Address.address_id == order.delivery_address_id).first()
-            customer = db.query(User).filter(User.user_id == order.customer_id).first()
+        if distances:
+            rows = db.query(Order, Restaurant, Address, User).join(
+                Restaurant, Restaurant.restaurant_id == Order.restaurant_id
+            ).join(
+                Address, Address.address_id == Order.delivery_address_id
+            ).outerjoin(
+                User, User.user_id == Order.customer_id
+            ).filter(
+                Order.order_id.in_(list(distances.keys())),
+                Order.order_status == OrderStatus.READY_FOR_PICKUP,
+                Order.delivery_partner_id == None
+            ).all()
             
-            distance_km = calculate_distance(latitude, longitude, float(restaurant.latitude), float(restaurant.longitude))
-            if distance_km <= radius_km:
-                available_deliveries.append(DeliveryOrderResponse(
-                    order_id=order.order_id, order_number=order.order_number,
-                    restaurant=RestaurantBasicResponse(restaurant_id=restaurant.restaurant_id, name=restaurant.name,
-                        phone=restaurant.phone, image=restaurant.image, address_line1=restaurant.address_line1, city=restaurant.city),
-                    delivery_address=AddressResponse(address_id=address.address_id, title=address.title,
-                        address_line1=address.address_line1, address_line2=address.address_line2,
-                        city=address.city, state=address.state, postal_code=address.postal_code,
-                        latitude=address.latitude, longitude=address.longitude),
-                    customer_name=f"{customer.first_name} {customer.last_name}" if customer else "Unknown",
-                    customer_phone=customer.phone if customer else "", total_amount=order.total_amount,
-                    payment_method=order.payment_method, order_status=order.order_status,
-                    estimated_delivery_time=order.estimated_delivery_time, distance_km=distance_km,
-                    delivery_fee=order.delivery_fee, created_at=order.created_at
+            for order, restaurant, address, customer in rows:
+                available_deliveries.append(_build_delivery_order_response(
+                    order, restaurant, address, customer, distances[order.order_id]
                 ))
+            available_deliveries.sort(key=lambda delivery: delivery.distance_km)
         
         return CommonResponse(code=200, message=f"Found {len(available_deliveries)} available deliveries",
             message_id="AVAILABLE_DELIVERIES", data=AvailableDeliveriesResponse(deliveries=available_deliveries, total_count=len(available_deliveries)))
@@ -1759,7 +1709,13 @@ async def get_available_deliveries(
 async def accept_delivery(
     order_id: UUID, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    """Accept delivery assignment."""
+    """
+    Accept delivery assignment.
+    
+    Orders currently offered to another partner by dispatch cannot be taken.
+    The assignment is a conditional update, so two partners accepting the same
+    order at once cannot both succeed.
+    """
     try:
         if current_user.role != UserRole.DELIVERY_PARTNER:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can accept deliveries")
@@ -1768,13 +1724,31 @@ async def accept_delivery(
         if not order:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found or not ready for pickup")
         
-        order.delivery_partner_id = current_user.user_id
-        order.order_status = OrderStatus.PICKED_UP
-        order.updated_at = datetime.now(timezone.utc)
+        offered_to = dispatch_service.get_offer(order_id)
+        if offered_to and offered_to != str(current_user.user_id):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order is currently offered to another delivery partner")
+        
+        assigned = db.query(Order).filter(
+            Order.order_id == order_id,
+            Order.order_status == OrderStatus.READY_FOR_PICKUP,
+            Order.delivery_partner_id == None
+        ).update({
+            Order.delivery_partner_id: current_user.user_id,
+            Order.order_status: OrderStatus.PICKED_UP,
+            Order.updated_at: datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        if not assigned:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order has already been accepted by another delivery partner")
         
         tracking = OrderTracking(order_id=order_id, status=OrderStatus.PICKED_UP, notes="Delivery partner assigned and order picked up")
         db.add(tracking)
         db.commit()
+        db.refresh(order)
+        
+        order_events.order_changed(db, order, notes="Delivery partner assigned and order picked up")
+        dispatch_service.clear_offer(order_id)
+        dispatch_service.remove_partner(current_user.user_id)
         
         logger.info(f"Order {order.order_number} accepted by delivery partner {current_user.user_id}")
         return CommonResponse(code=200, message="Delivery accepted successfully", message_id="DELIVERY_ACCEPTED",
@@ -1785,6 +1759,48 @@ async def accept_delivery(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to accept delivery: {str(e)}")
 
 
+@router.post("/{order_id}/decline-delivery", response_model=CommonResponse[dict])
+async def decline_delivery(
+    order_id: UUID, current_user: User = Depends(get_current_user)
+):
+    """Decline a dispatch offer so the order is offered to another partner."""
+    if current_user.role != UserRole.DELIVERY_PARTNER:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can decline deliveries")
+    
+    if not dispatch_service.decline_offer(order_id, current_user.user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No active offer for this order")
+    
+    logger.info(f"Delivery partner {current_user.user_id} declined offer for order {order_id}")
+    return CommonResponse(code=200, message="Delivery offer declined", message_id="DELIVERY_DECLINED",
+        data={"order_id": str(order_id)})
+
+
+@router.get("/delivery/offer", response_model=CommonResponse[dict])
+async def get_delivery_offer(
+    current_user: User = Depends(get_current_user)
+):
+    """Get the dispatch offer currently held by the delivery partner, if any (e.g. after reconnecting)."""
+    if current_user.role != UserRole.DELIVERY_PARTNER:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can access this endpoint")
+    
+    order_id = dispatch_service.get_partner_offer(current_user.user_id)
+    return CommonResponse(code=200, message="Active offer retrieved" if order_id else "No active offer",
+        message_id="DELIVERY_OFFER", data={"order_id": order_id})
+
+
+@router.post("/delivery/heartbeat", response_model=CommonResponse[dict])
+async def delivery_partner_heartbeat(
+    request: DeliveryLocationUpdateRequest, current_user: User = Depends(get_current_user)
+):
+    """Report an idle delivery partner's position to dispatch without writing to the database."""
+    if current_user.role != UserRole.DELIVERY_PARTNER:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can send heartbeats")
+    
+    dispatch_service.update_partner_location(current_user.user_id, request.latitude, request.longitude)
+    return CommonResponse(code=200, message="Heartbeat received", message_id="DELIVERY_HEARTBEAT",
+        data={"latitude": request.latitude, "longitude": request.longitude})
+
+
 @router.get("/delivery/active", response_model=CommonResponse[AvailableDeliveriesResponse])
 async def get_active_deliveries(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
@@ -1845,6 +1861,7 @@ async def mark_pickup_complete(
         tracking = OrderTracking(order_id=order_id, status=OrderStatus.PICKED_UP, notes="Order picked up from restaurant")
         db.add(tracking)
         db.commit()
+        order_events.order_changed(db, order, notes="Order picked up from restaurant")
         
         return CommonResponse(code=200, message="Pickup marked complete", message_id="PICKUP_COMPLETE", data={"order_id": str(order_id)})
     except HTTPException:
@@ -1880,6 +1897,7 @@ async def mark_delivered(
             delivery_partner.total_deliveries = (delivery_partner.total_deliveries or 0) + 1
         
         db.commit()
+        order_events.order_changed(db, order, notes="Order delivered to customer")
         
         logger.info(f"Order {order.order_number} marked as delivered")
         return CommonResponse(code=200, message="Order marked as delivered", message_id="ORDER_DELIVERED", data={"order_id": str(order_id)})
@@ -1894,29 +1912,25 @@ async def update_delivery_location(
     order_id: UUID, request: DeliveryLocationUpdateRequest,
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    """Update delivery partner location during delivery."""
+    """
+    Update delivery partner location during delivery.
+    
+    The latest position is stored in Redis right away; the path history and the
+    partner's stored position are written to Postgres in bulk by the location
+    flush worker.
+    """
     try:
         if current_user.role != UserRole.DELIVERY_PARTNER:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only delivery partners can update location")
         
-        order = db.query(Order).filter(Order.order_id == order_id, Order.delivery_partner_id == current_user.user_id).first()
-        if not order:
+        order_status = db.query(Order.order_status).filter(Order.order_id == order_id, Order.delivery_partner_id == current_user.user_id).scalar()
+        if order_status is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
         
-        # Update delivery partner location
-        delivery_partner = db.query(DeliveryPartner).filter(DeliveryPartner.user_id == current_user.user_id).first()
-        if delivery_partner:
-            delivery_partner.current_latitude = Decimal(str(request.latitude))
-            delivery_partner.current_longitude = Decimal(str(request.longitude))
-        
-        # Create tracking record with location
-        tracking = OrderTracking(
-            order_id=order_id, status=order.order_status,
-            latitude=Decimal(str(request.latitude)), longitude=Decimal(str(request.longitude)),
-            notes="Location updated"
+        latest = location_ingest_service.record(
+            current_user.user_id, order_id, order_status, request.latitude, request.longitude
         )
-        db.add(tracking)
-        db.commit()
+        order_events.rider_location_updated(order_id, latest)
         
         return CommonResponse(code=200, message="Location updated", message_id="LOCATION_UPDATED",
             data={"order_id": str(order_id), "latitude": request.latitude, "longitude": request.longitude})
@@ -2172,6 +2186,7 @@ async def admin_intervene_order(
         
         order.updated_at = datetime.now(timezone.utc)
         db.commit()
+        order_events.order_changed(db, order)
         
         logger.info(f"Admin intervention on order {order.order_number}: {request.action}")
         return CommonResponse(code=200, message=f"Admin intervention completed: {request.action}",
@@ -27,6 +27,7 @@ from app.infra.db.postgres.models.restaurant import Restaurant
 from app.infra.db.postgres.models.category import Category
 from app.infra.db.postgres.models.address import Address
 from app.utils.enums import OrderStatus
+from app.services import order_events
 from app.config.logger import get_logger
 
 router = APIRouter(prefix="/partner/restaurant", tags=["Partner - Restaurant"])
@@ -656,6 +657,7 @@ async def update_order_status(
         
         db.commit()
         db.refresh(order)
+        order_events.order_changed(db, order)
         
         logger.info(f"Order {order_id} status updated to {new_status}")
         
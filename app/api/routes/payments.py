@@ -14,6 +14,7 @@ from app.infra.db.postgres.postgres_config import get_db
 from app.api.dependencies import get_current_user
 from app.infra.db.postgres.models import Payment, Order, User
 from app.services.razorpay_service import razorpay_service
+from app.services import order_events
 from app.utils.enums import PaymentStatus, PaymentMethod, OrderStatus
 
 logger = logging.getLogger(__name__)
@@ -219,6 +220,7 @@ async def verify_payment(
         order.order_status = OrderStatus.CONFIRMED
         
         db.commit()
+        order_events.order_changed(db, order, notes="Payment received")
         
         logger.info(f"Payment verified for order {request.order_id}: {request.razorpay_payment_id}")
         
@@ -306,6 +308,8 @@ async def razorpay_webhook(
                         order.order_status = OrderStatus.CONFIRMED
                     
                     db.commit()
+                    if order:
+                        order_events.order_changed(db, order, notes="Payment received")
                     logger.info(f"Payment captured via webhook: {payment_id}")
         
         elif event == "payment.failed":
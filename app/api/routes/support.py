@@ -19,7 +19,7 @@ from app.api.schemas.support_schemas import (
 from app.api.schemas.common_schemas import CommonResponse
 from app.utils.enums import TicketStatus, SupportSenderType
 from app.config.logger import get_logger
-from app.api.routes.websocket import manager
+from app.services.websocket_manager import manager
 
 router = APIRouter(prefix="/support", tags=["support"])
 logger = get_logger(__name__)
@@ -15,9 +15,11 @@ from app.api.schemas.user_schemas import (
 from app.api.schemas.common_schemas import CommonResponse
 from app.infra.db.postgres.models.user import User
 from app.infra.db.postgres.models.address import Address
-from app.infra.db.postgres.models.user_session import UserSession
 from app.infra.db.postgres.models.order import Order
 from app.utils.auth_utils import AuthUtils
+from app.services.principal_cache_service import principal_cache_service
+from app.services.password_hash_service import password_hash_service
+from app.services.session_store_service import session_store_service
 from app.utils.enums import UserRole, UserStatus, Gender
 from app.config.logger import get_logger
 
@@ -51,7 +53,7 @@ async def get_user_profile(
         }
         
         profile_data = UserProfileResponse(
-            user=current_user,
+            user=current_user.user,
             addresses=addresses,
             preferences=preferences
         )
@@ -118,13 +120,14 @@ async def update_user_profile(
         
         current_user.updated_at = datetime.now(timezone.utc)
         db.commit()
-        db.refresh(current_user)
+        principal_cache_service.invalidate(current_user.user_id)
+        db.refresh(current_user.user)
         
         return CommonResponse(
             code=200,
             message="Profile updated successfully",
             message_id="PROFILE_UPDATE_SUCCESS",
-            data=current_user
+            data=current_user.user
         )
     
     except HTTPException:
@@ -145,14 +148,14 @@ async def change_password(
     """Change user password"""
     try:
         # Verify current password
-        if not AuthUtils.verify_password(password_data.current_password, current_user.password_hash):
+        if not await password_hash_service.verify(password_data.current_password, current_user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect"
             )
         
         # Update password
-        current_user.password_hash = AuthUtils.hash_password(password_data.new_password)
+        current_user.password_hash = await password_hash_service.hash(password_data.new_password)
         current_user.updated_at = datetime.now(timezone.utc)
         db.commit()
         
@@ -405,9 +408,7 @@ async def get_user_sessions(
 ):
     """Get all active sessions for the current user"""
     try:
-        sessions = db.query(UserSession).filter(
-            UserSession.user_id == current_user.user_id
-        ).order_by(UserSession.last_activity.desc()).all()
+        sessions = session_store_service.list_sessions(db, current_user.user_id, active_only=False)
         
         return CommonResponse(
             code=200,
@@ -434,20 +435,13 @@ async def revoke_session(
 ):
     """Revoke a specific session"""
     try:
-        session = db.query(UserSession).filter(
-            UserSession.session_id == session_id,
-            UserSession.user_id == current_user.user_id
-        ).first()
-        
-        if not session:
+        if not session_store_service.revoke_session(db, current_user.user_id, session_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found"
             )
         
-        session.is_active = False
-        session.updated_at = datetime.now(timezone.utc)
-        db.commit()
+        principal_cache_service.invalidate(current_user.user_id)
         
         return CommonResponse(
             code=200,
@@ -647,6 +641,7 @@ async def update_user_status(
         user.status = status_data.status.value
         user.updated_at = datetime.now(timezone.utc)
         db.commit()
+        principal_cache_service.invalidate(user.user_id)
         db.refresh(user)
         
         return CommonResponse(
@@ -684,6 +679,7 @@ async def update_user_role(
         user.role = role_data.role.value
         user.updated_at = datetime.now(timezone.utc)
         db.commit()
+        principal_cache_service.invalidate(user.user_id)
         db.refresh(user)
         
         return CommonResponse(
@@ -1,101 +1,53 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
-from typing import Dict
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from typing import Optional
+from uuid import UUID
+import asyncio
 import logging
 from app.utils.auth_utils import AuthUtils
-from app.infra.db.postgres.models.user import User
-from app.infra.db.postgres.postgres_config import get_db
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.db.postgres.models.restaurant import Restaurant
+from app.services.order_tracking_service import order_tracking_service
+from app.services.restaurant_feed_service import restaurant_feed_service
+from app.services.websocket_manager import manager
+from app.services.principal_cache_service import principal_cache_service
+from app.utils.enums import UserRole, UserStatus
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-class ConnectionManager:
-    """Manages WebSocket connections for users"""
-    
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-    
-    async def connect(self, user_id: str, websocket: WebSocket):
-        """Accept and store WebSocket connection"""
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        logger.info(f"✅ User {user_id} connected to WebSocket. Total connections: {len(self.active_connections)}")
-    
-    def disconnect(self, user_id: str):
-        """Remove WebSocket connection"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            logger.info(f"❌ User {user_id} disconnected from WebSocket. Total connections: {len(self.active_connections)}")
-    
-    async def send_notification(self, user_id: str, notification: dict):
-        """Send notification to specific user if connected"""
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(notification)
-                logger.info(f"📬 Sent notification to user {user_id}: {notification.get('title')}")
-                return True
-            except Exception as e:
-                logger.error(f"❌ Error sending notification to {user_id}: {e}")
-                self.disconnect(user_id)
-                return False
-        else:
-            logger.debug(f"User {user_id} not connected to WebSocket")
-            return False
-    
-    async def broadcast(self, message: dict, exclude_user: str = None):
-        """Broadcast message to all connected users"""
-        disconnected_users = []
-        
-        for user_id, connection in self.active_connections.items():
-            if exclude_user and user_id == exclude_user:
-                continue
-                
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"❌ Error broadcasting to {user_id}: {e}")
-                disconnected_users.append(user_id)
-        
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            self.disconnect(user_id)
+class WebSocketPrincipal:
+    """Identity of an authenticated WebSocket client, taken from its access token"""
     
-    def get_connection_count(self) -> int:
-        """Get total number of active connections"""
-        return len(self.active_connections)
-    
-    def is_user_connected(self, user_id: str) -> bool:
-        """Check if user is connected"""
-        return user_id in self.active_connections
-
+    def __init__(self, user_id: str, role: str):
+        self.user_id = user_id
+        self.role = role
 
-# Global connection manager instance
-manager = ConnectionManager()
 
-
-async def authenticate_websocket(token: str) -> User:
-    """Authenticate user for WebSocket connection"""
-    try:
-        # Decode JWT token
-        payload = AuthUtils.decode_access_token(token)
-        user_id = payload.get("user_id")
-        
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Get user from database
-        db = next(get_db())
-        user = db.query(User).filter(User.user_id == user_id).first()
-        
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return user
-        
-    except Exception as e:
-        logger.error(f"WebSocket authentication failed: {e}")
-        raise HTTPException(status_code=401, detail="Authentication failed")
+async def authenticate_websocket(token: str) -> Optional[WebSocketPrincipal]:
+    """
+    Authenticate a WebSocket client.
+    
+    Identity and role come from the verified JWT claims; only the user's
+    status is checked, through the principal cache shared with API auth.
+    
+    Returns:
+        The principal, or None if the token is invalid or the user is not active
+    """
+    payload = AuthUtils.verify_jwt_token(token)
+    if not payload or not payload.get("user_id"):
+        return None
+    
+    user_id = str(payload["user_id"])
+    principal = principal_cache_service.get_cached(user_id)
+    if principal is None:
+        principal = await asyncio.to_thread(principal_cache_service.load, user_id)
+        if principal is None:
+            return None
+    
+    if principal["status"] != UserStatus.ACTIVE.value:
+        return None
+    return WebSocketPrincipal(user_id, payload.get("role"))
 
 
 @router.websocket("/ws/notifications")
@@ -103,59 +55,32 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
     """
     WebSocket endpoint for real-time notifications
     
+    A user may be connected from several devices at once; each gets every
+    notification.
+    
     Usage:
     ws://localhost:8000/api/v1/ws/notifications?token=YOUR_ACCESS_TOKEN
     """
-    user_id = None
+    # Accept WebSocket connection first, then authenticate
+    await websocket.accept()
+    
+    try:
+        principal = await authenticate_websocket(token)
+    except Exception as e:
+        logger.error(f"❌ WebSocket authentication failed: {e}")
+        principal = None
+    
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication failed")
+        return
+    
+    user_id = principal.user_id
+    connection = manager.open(websocket)
+    await manager.add_connection(user_id, connection)
     
     try:
-        # Accept WebSocket connection first
-        await websocket.accept()
-        
-        # Then authenticate
-        try:
-            payload = AuthUtils.verify_jwt_token(token)
-            
-            if not payload:
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or expired token")
-                return
-                
-            user_id_from_token = payload.get("user_id")
-            
-            if not user_id_from_token:
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
-                return
-            
-            # Get user from database
-            db = next(get_db())
-            user = db.query(User).filter(User.user_id == user_id_from_token).first()
-            
-            if not user:
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
-                return
-                
-            user_id = str(user.user_id)
-            
-        except Exception as e:
-            logger.error(f"❌ WebSocket authentication failed: {e}")
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication failed")
-            return
-        
-        # Close any existing connection for this user before adding new one
-        if user_id in manager.active_connections:
-            try:
-                old_websocket = manager.active_connections[user_id]
-                logger.info(f"🔄 Closing old WebSocket connection for user {user_id}")
-                await old_websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="New connection established")
-            except Exception as e:
-                logger.debug(f"Error closing old connection: {e}")
-        
-        # Add to connection manager
-        manager.active_connections[user_id] = websocket
-        logger.info(f"✅ User {user_id} connected to WebSocket. Total connections: {len(manager.active_connections)}")
-        
         # Send welcome message
-        await websocket.send_json({
+        connection.send_json({
             "type": "connection",
             "message": "Connected to notification service",
             "user_id": user_id
@@ -168,36 +93,152 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
             
             # Handle heartbeat
             if data == "ping":
-                await websocket.send_text("pong")
+                connection.send_text("pong")
                 logger.debug(f"💓 Heartbeat from user {user_id}")
             else:
                 logger.debug(f"Received message from {user_id}: {data}")
                 
     except WebSocketDisconnect:
-        # Only disconnect if this is still the active connection
-        if user_id and manager.active_connections.get(user_id) == websocket:
-            manager.disconnect(user_id)
-            logger.info(f"🔌 WebSocket disconnected for user {user_id}")
-        else:
-            logger.debug(f"🔌 Old WebSocket connection closed for user {user_id} (replaced by new connection)")
+        logger.info(f"🔌 WebSocket disconnected for user {user_id}")
         
     except Exception as e:
-        # Only disconnect if this is still the active connection
-        if user_id and manager.active_connections.get(user_id) == websocket:
-            manager.disconnect(user_id)
-            logger.error(f"❌ WebSocket error for user {user_id}: {e}")
-        else:
-            logger.debug(f"❌ Old WebSocket connection error for user {user_id}: {e}")
+        logger.error(f"❌ WebSocket error for user {user_id}: {e}")
+        
+    finally:
+        await manager.disconnect(user_id, connection)
+        await connection.close()
+
+
+@router.websocket("/ws/orders/{order_id}")
+async def order_tracking_websocket(websocket: WebSocket, order_id: UUID, token: str):
+    """
+    WebSocket endpoint for live tracking of a single order
+    
+    Sends the current tracking snapshot on connect, then pushes
+    "order_status" and "rider_location" events as they happen.
+    
+    Usage:
+    ws://localhost:8000/api/v1/ws/orders/ORDER_ID?token=YOUR_ACCESS_TOKEN
+    """
+    await websocket.accept()
+    
+    def load_snapshot() -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            return order_tracking_service.get_snapshot(db, order_id)
+        finally:
+            db.close()
+    
+    try:
+        principal = await authenticate_websocket(token)
+        snapshot = await asyncio.to_thread(load_snapshot) if principal else None
+        allowed = snapshot is not None and order_tracking_service.can_view(snapshot, principal)
+    except Exception as e:
+        logger.error(f"❌ Order tracking WebSocket setup failed for order {order_id}: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Internal server error")
+        return
+    
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Order not found")
+        return
+    
+    topic = f"order:{order_id}"
+    connection = manager.open(websocket)
+    connection.send_json({"type": "snapshot", "order_id": str(order_id), "data": snapshot["tracking"]})
+    await manager.subscribe(topic, connection)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                connection.send_text("pong")
+    except WebSocketDisconnect:
+        logger.debug(f"🔌 Order tracking WebSocket closed for order {order_id}")
+    except Exception as e:
+        logger.error(f"❌ Order tracking WebSocket error for order {order_id}: {e}")
+    finally:
+        await manager.unsubscribe(topic, connection)
+        await connection.close()
+
+
+@router.websocket("/ws/restaurants/{restaurant_id}/orders")
+async def restaurant_orders_websocket(
+    websocket: WebSocket, restaurant_id: UUID, token: str, last_seq: Optional[int] = None
+):
+    """
+    WebSocket endpoint for a restaurant's live order feed
+    
+    Pushes "order_created", "order_cancelled" and "order_status" events, each
+    with a per-restaurant "seq". On connect the server sends a "feed_start"
+    message with the current sequence. A client reconnecting with last_seq
+    also receives the events it missed; if they are no longer retained,
+    "complete" is false and the client should reload its order lists first.
+    Live and replayed events can overlap, so clients ignore any seq they
+    have already applied.
+    
+    Usage:
+    ws://localhost:8000/api/v1/ws/restaurants/RESTAURANT_ID/orders?token=YOUR_ACCESS_TOKEN&last_seq=42
+    """
+    await websocket.accept()
+    
+    def owns_restaurant(user_id: str) -> bool:
+        db = SessionLocal()
         try:
-            await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Internal server error")
-        except:
-            pass
+            return db.query(Restaurant.restaurant_id).filter(
+                Restaurant.restaurant_id == restaurant_id,
+                Restaurant.owner_id == user_id
+            ).first() is not None
+        finally:
+            db.close()
+    
+    try:
+        principal = await authenticate_websocket(token)
+        allowed = principal is not None and (
+            principal.role == UserRole.ADMIN
+            or await asyncio.to_thread(owns_restaurant, principal.user_id)
+        )
+    except Exception as e:
+        logger.error(f"❌ Restaurant feed WebSocket setup failed for restaurant {restaurant_id}: {e}")
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Internal server error")
+        return
+    
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Restaurant not found")
+        return
+    
+    # Subscribe before reading the backlog so no event falls between the two
+    topic = f"restaurant:{restaurant_id}"
+    connection = manager.open(websocket)
+    await manager.subscribe(topic, connection)
+    
+    def load_backlog():
+        current_seq = restaurant_feed_service.current_sequence(restaurant_id)
+        if last_seq is None:
+            return current_seq, [], True
+        return (current_seq, *restaurant_feed_service.events_since(restaurant_id, last_seq))
+    
+    try:
+        current_seq, missed, complete = await asyncio.to_thread(load_backlog)
+        connection.send_json({"type": "feed_start", "seq": current_seq, "complete": complete})
+        for event in missed:
+            connection.send_json(event)
+        
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                connection.send_text("pong")
+    except WebSocketDisconnect:
+        logger.debug(f"🔌 Restaurant feed WebSocket closed for restaurant {restaurant_id}")
+    except Exception as e:
+        logger.error(f"❌ Restaurant feed WebSocket error for restaurant {restaurant_id}: {e}")
+    finally:
+        await manager.unsubscribe(topic, connection)
+        await connection.close()
 
 
 @router.get("/ws/stats")
 async def get_websocket_stats():
     """Get WebSocket connection statistics (admin only)"""
     return {
-        "active_connections": manager.get_connection_count(),
+        **await manager.get_stats(),
         "status": "operational"
     }
@@ -60,11 +60,12 @@ class NotificationResponse(BaseModel):
 class NotificationListResponse(BaseModel):
     """Response schema for paginated notification list."""
     notifications: List[NotificationResponse]
-    total: int
-    page: int
+    total: Optional[int] = Field(None, description="Total matching notifications (page mode only)")
+    page: Optional[int] = Field(None, description="Page number (page mode only)")
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = Field(None, description="Total pages (page mode only)")
     unread_count: int
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
 
 
 class UnreadCountResponse(BaseModel):
@@ -83,8 +84,17 @@ class NotificationStatsResponse(BaseModel):
     recent_broadcasts: List[dict]
 
 
-class BroadcastResponse(BaseModel):
-    """Response schema for broadcast notification."""
-    message: str
+class BroadcastJobResponse(BaseModel):
+    """Response schema for a background broadcast job."""
+    job_id: str
+    status: str = Field(..., description="queued, running, completed or failed")
+    title: str
+    notification_type: NotificationType
+    role_filter: Optional[str] = None
+    target_user_count: Optional[int] = Field(None, description="Number of user IDs requested, if specific users were targeted")
     notifications_sent: int
-    user_ids: List[UUID4]
+    created_by: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -81,7 +81,18 @@ GOOGLE_OAUTH_CONFIG = {
     "redirect_uris": [
         "oneqlick://auth/callback",  # Mobile app redirect
         "http://localhost:8081",      # Development
-    ]
+    ],
+
+    # ID token verification: signatures are checked locally against Google's JWKS,
+    # refreshed in the background as its Cache-Control allows. tokeninfo is only
+    # called for tokens signed with a key not in the cached set.
+    "jwks_uri": os.getenv("GOOGLE_JWKS_URI", "https://www.googleapis.com/oauth2/v3/certs"),
+    "tokeninfo_uri": os.getenv("GOOGLE_TOKENINFO_URI", "https://oauth2.googleapis.com/tokeninfo"),
+    "issuers": ["accounts.google.com", "https://accounts.google.com"],
+    "jwks_default_max_age_seconds": int(os.getenv("GOOGLE_JWKS_DEFAULT_MAX_AGE_SECONDS", "3600")),
+    "jwks_min_refresh_seconds": int(os.getenv("GOOGLE_JWKS_MIN_REFRESH_SECONDS", "60")),
+    "clock_skew_seconds": int(os.getenv("GOOGLE_TOKEN_CLOCK_SKEW_SECONDS", "60")),
+    "http_timeout_seconds": float(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", "5")),
 }
 
 # Security Configuration
@@ -136,6 +147,229 @@ RATE_LIMIT_CONFIG = {
     
     # Whitelist IPs (comma-separated, e.g., monitoring tools, health checks)
     "whitelist": os.getenv("RATE_LIMIT_WHITELIST", "127.0.0.1,::1").split(","),
+
+    # What to do when Redis is slow or unreachable: "open" admits the request, "closed" rejects it
+    "failure_mode": os.getenv("RATE_LIMIT_FAILURE_MODE", "open"),
+
+    # Budget for one Redis check on the request path (waiting for a connection, connecting, the command)
+    "redis_timeout_ms": int(os.getenv("RATE_LIMIT_REDIS_TIMEOUT_MS", "200")),
+
+    # Redis checks in flight at once per worker; further checks wait for a slot within the budget
+    "redis_max_connections": int(os.getenv("RATE_LIMIT_REDIS_MAX_CONNECTIONS", "50")),
+
+    # After this many failed checks in a row, Redis is skipped for redis_retry_seconds
+    # so requests don't each wait out the timeout during an outage
+    "redis_failure_threshold": int(os.getenv("RATE_LIMIT_REDIS_FAILURE_THRESHOLD", "3")),
+    "redis_retry_seconds": float(os.getenv("RATE_LIMIT_REDIS_RETRY_SECONDS", "5")),
+
+    # Local tier (Redis storage only): lease part of each limit's quota and admit
+    # those requests in process; leases of idle keys are returned every local_sync_ms
+    "local_enabled": os.getenv("RATE_LIMIT_LOCAL_ENABLED", "true").lower() == "true",
+    "local_sync_ms": int(os.getenv("RATE_LIMIT_LOCAL_SYNC_MS", "250")),
+
+    # Share of each limit never leased, so requests near the limit are checked in Redis
+    "local_reserve_ratio": float(os.getenv("RATE_LIMIT_LOCAL_RESERVE_RATIO", "0.5")),
+
+    # Worker processes sharing Redis (gunicorn.conf.py's default unless WORKERS is set);
+    # each worker leases only its share of the remaining quota
+    "local_workers": int(os.getenv(
+        "RATE_LIMIT_LOCAL_WORKERS", os.getenv("WORKERS", str((os.cpu_count() or 1) * 2 + 1))
+    )),
+
+    # Keys held by the in-memory storage; the least recently used are evicted beyond this
+    "memory_max_keys": int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000")),
+}
+
+# Delivery Geo Index Configuration (ready-for-pickup order feed)
+DELIVERY_GEO_CONFIG = {
+    # Grid cell size for the in-memory index
+    "cell_size_km": float(os.getenv("DELIVERY_GEO_CELL_SIZE_KM", "2.0")),
+
+    # How often the index is rebuilt from Postgres to correct drift
+    "reconcile_seconds": int(os.getenv("DELIVERY_GEO_RECONCILE_SECONDS", "30")),
+
+    # Maximum orders returned by the available deliveries feed
+    "max_results": int(os.getenv("DELIVERY_GEO_MAX_RESULTS", "50")),
+
+    # After a Redis error the in-memory index is used for this long before Redis is tried again
+    "redis_retry_seconds": float(os.getenv("DELIVERY_GEO_REDIS_RETRY_SECONDS", "30")),
+}
+
+# Dispatch Configuration (server-side matching of ready orders to partners)
+DISPATCH_CONFIG = {
+    "enabled": os.getenv("DISPATCH_ENABLED", "true").lower() == "true",
+
+    # Seconds between matching rounds
+    "interval_seconds": float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5")),
+
+    # How long a partner has to accept an offer before it is re-dispatched
+    "offer_ttl_seconds": int(os.getenv("DISPATCH_OFFER_TTL_SECONDS", "30")),
+
+    # Only partners within this distance of the restaurant are considered
+    "max_radius_km": float(os.getenv("DISPATCH_MAX_RADIUS_KM", "8")),
+
+    # Nearest partners considered per order in each round
+    "candidates_per_order": int(os.getenv("DISPATCH_CANDIDATES_PER_ORDER", "5")),
+
+    # How often the partner index is rebuilt from Postgres
+    "partner_reconcile_seconds": int(os.getenv("DISPATCH_PARTNER_RECONCILE_SECONDS", "30")),
+}
+
+# Delivery Location Ingestion Configuration (rider GPS pings)
+LOCATION_INGEST_CONFIG = {
+    # Seconds between bulk writes of buffered path points to Postgres
+    "flush_interval_seconds": float(os.getenv("LOCATION_FLUSH_INTERVAL_SECONDS", "5")),
+
+    # Buffered points that trigger an early flush; beyond this the oldest points are dropped
+    "max_buffer_size": int(os.getenv("LOCATION_MAX_BUFFER_SIZE", "5000")),
+
+    # Failed flushes are retried after 1s, 2s, 4s, ... up to this long
+    "max_retry_backoff_seconds": float(os.getenv("LOCATION_MAX_RETRY_BACKOFF_SECONDS", "60")),
+
+    # Points closer than this to the previous point of the same order are not stored in the path
+    "min_distance_m": float(os.getenv("LOCATION_MIN_DISTANCE_M", "10")),
+
+    # How long a partner's latest position is kept in Redis without updates
+    "latest_ttl_seconds": int(os.getenv("LOCATION_LATEST_TTL_SECONDS", "3600")),
+}
+
+# Restaurant order feed configuration (live incoming-order events for partner apps)
+RESTAURANT_FEED_CONFIG = {
+    # Events kept per restaurant for resume-from-sequence after a reconnect
+    "max_events": int(os.getenv("RESTAURANT_FEED_MAX_EVENTS", "500")),
+
+    # Idle restaurant feeds expire from Redis after this long
+    "ttl_seconds": int(os.getenv("RESTAURANT_FEED_TTL_SECONDS", "86400")),
+}
+
+# WebSocket configuration
+WEBSOCKET_CONFIG = {
+    # Seconds between presence heartbeats; a worker missing 3 heartbeats is considered gone
+    "presence_interval_seconds": float(os.getenv("WS_PRESENCE_INTERVAL_SECONDS", "15")),
+
+    # Outbound messages queued per connection before the slow-consumer policy applies
+    "send_queue_size": int(os.getenv("WS_SEND_QUEUE_SIZE", "100")),
+
+    # A single send taking longer than this closes the connection
+    "send_timeout_seconds": float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10")),
+
+    # "disconnect" closes a client whose queue is full, "drop" discards its oldest queued message
+    "slow_consumer_policy": os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect"),
+}
+
+# bcrypt password hashing pool (per application worker)
+PASSWORD_HASH_CONFIG = {
+    # bcrypt calls running at once; each keeps a CPU core busy
+    "max_workers": int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+
+    # Calls queued or running before new ones get 503 + Retry-After
+    "max_pending": int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")),
+    "retry_after_seconds": int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "1")),
+}
+
+# Login sessions and refresh tokens
+SESSION_STORE_CONFIG = {
+    # "redis": sessions and refresh tokens live in Redis and expire by TTL; Postgres
+    # rows are written in the background as an audit log.
+    # "postgres": Postgres tables are the store (also used when Redis is unreachable).
+    "backend": os.getenv("SESSION_STORE_BACKEND", "postgres").lower(),
+
+    # Refresh token lifetime; each refresh issues a new token with the full lifetime
+    "refresh_token_ttl_days": int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30")),
+}
+
+# Authenticated principal cache (API and WebSocket auth)
+PRINCIPAL_CACHE_CONFIG = {
+    "enabled": os.getenv("PRINCIPAL_CACHE_ENABLED", "true").lower() == "true",
+
+    # In-process entries; also how long other workers may serve a principal after it changed
+    "local_ttl_seconds": float(os.getenv("PRINCIPAL_CACHE_LOCAL_TTL_SECONDS", "10")),
+    "max_entries": int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "50000")),
+
+    # Shared Redis entries, dropped explicitly when the user changes
+    "redis_ttl_seconds": int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL_SECONDS", "300")),
+}
+
+# Admin notification broadcast configuration
+BROADCAST_CONFIG = {
+    # Users written per INSERT ... SELECT batch (one transaction each)
+    "chunk_size": int(os.getenv("BROADCAST_CHUNK_SIZE", "5000")),
+
+    # Broadcast jobs run at the same time per worker; extra jobs wait in line
+    "max_concurrent_jobs": int(os.getenv("BROADCAST_MAX_CONCURRENT_JOBS", "2")),
+
+    # How long finished job status is kept for the admin dashboard
+    "job_ttl_seconds": int(os.getenv("BROADCAST_JOB_TTL_SECONDS", "604800")),
+}
+
+# Unread notification counter configuration
+UNREAD_COUNTER_CONFIG = {
+    # Counters expire after this long, so each is recounted from Postgres at least this often
+    "reconcile_seconds": int(os.getenv("UNREAD_COUNTER_RECONCILE_SECONDS", "900")),
+}
+
+# Notification table partitioning and retention (monthly range partitions on created_at)
+NOTIFICATION_RETENTION_CONFIG = {
+    # Expiry of old partitions; upcoming partitions are always created
+    "enabled": os.getenv("NOTIFICATION_RETENTION_ENABLED", "true").lower() == "true",
+
+    # Hours between maintenance runs (one worker runs it at a time)
+    "interval_hours": float(os.getenv("NOTIFICATION_RETENTION_INTERVAL_HOURS", "24")),
+
+    # Monthly partitions created ahead of the current month
+    "premake_months": int(os.getenv("NOTIFICATION_PREMAKE_MONTHS", "3")),
+
+    # Full months kept before the current one; older partitions expire
+    "retention_months": int(os.getenv("NOTIFICATION_RETENTION_MONTHS", "6")),
+
+    # "drop" deletes expired partitions, "archive" detaches them into the archive schema
+    "expire_action": os.getenv("NOTIFICATION_EXPIRE_ACTION", "drop"),
+    "archive_schema": os.getenv("NOTIFICATION_ARCHIVE_SCHEMA", "archive"),
+}
+
+# Expo push notification configuration
+PUSH_CONFIG = {
+    "expo_push_url": os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send"),
+
+    # Optional Expo access token (required when enhanced push security is enabled)
+    "expo_access_token": os.getenv("EXPO_ACCESS_TOKEN", ""),
+
+    # Expo accepts at most 100 messages per request
+    "batch_size": int(os.getenv("PUSH_BATCH_SIZE", "100")),
+
+    # Batch requests in flight at once, and pooled connections to Expo
+    "max_concurrency": int(os.getenv("PUSH_MAX_CONCURRENCY", "6")),
+
+    # Per-request timeout
+    "timeout_seconds": float(os.getenv("PUSH_TIMEOUT_SECONDS", "10")),
+
+    # Retries for timeouts, connection errors, 429 and 5xx; delay doubles each attempt
+    "max_retries": int(os.getenv("PUSH_MAX_RETRIES", "3")),
+    "retry_backoff_seconds": float(os.getenv("PUSH_RETRY_BACKOFF_SECONDS", "0.5")),
+
+    "expo_receipts_url": os.getenv("EXPO_RECEIPTS_URL", "https://exp.host/--/api/v2/push/getReceipts"),
+
+    # Outbox consumers per application worker; each claims its own rows
+    "outbox_consumers": int(os.getenv("PUSH_OUTBOX_CONSUMERS", "2")),
+
+    # Seconds between outbox polls when no enqueue wakes the consumers
+    "outbox_poll_interval_seconds": float(os.getenv("PUSH_OUTBOX_POLL_INTERVAL_SECONDS", "2")),
+
+    # Rows claimed per consumer round
+    "outbox_claim_batch_size": int(os.getenv("PUSH_OUTBOX_CLAIM_BATCH_SIZE", "500")),
+
+    # Claimed rows not finished within this long are picked up again
+    "outbox_claim_lease_seconds": int(os.getenv("PUSH_OUTBOX_CLAIM_LEASE_SECONDS", "300")),
+
+    # Send attempts before a push is marked failed; retry delay doubles from the base
+    "outbox_max_attempts": int(os.getenv("PUSH_OUTBOX_MAX_ATTEMPTS", "5")),
+    "outbox_retry_base_seconds": int(os.getenv("PUSH_OUTBOX_RETRY_BASE_SECONDS", "30")),
+
+    # Expo suggests checking receipts about 15 minutes after sending
+    "receipt_delay_seconds": int(os.getenv("PUSH_RECEIPT_DELAY_SECONDS", "900")),
+
+    # Finished outbox rows are deleted after this many days
+    "outbox_retention_days": int(os.getenv("PUSH_OUTBOX_RETENTION_DAYS", "7")),
 }
 
 # Email Configuration
@@ -146,6 +380,28 @@ EMAIL_CONFIG = {
     "smtp_username": os.getenv("SMTP_USERNAME", ""),
     "smtp_password": os.getenv("SMTP_PASSWORD", ""),
     "smtp_use_tls": os.getenv("SMTP_USE_TLS", "true").lower() == "true",
+    # "starttls", "ssl" (implicit TLS) or "none" (local relay); defaults from SMTP_USE_TLS
+    "smtp_security": os.getenv(
+        "SMTP_SECURITY",
+        "starttls" if os.getenv("SMTP_USE_TLS", "true").lower() == "true" else "ssl"
+    ),
+    # Sender address; defaults to the SMTP username
+    "from_address": os.getenv("EMAIL_FROM_ADDRESS", ""),
+    "smtp_timeout_seconds": float(os.getenv("SMTP_TIMEOUT_SECONDS", "10")),
+
+    # Persistent SMTP connections shared by the email worker threads (one thread per connection)
+    "pool_size": int(os.getenv("SMTP_POOL_SIZE", "2")),
+    # Connections idle longer than this are checked with NOOP before reuse
+    "connection_max_idle_seconds": float(os.getenv("SMTP_CONNECTION_MAX_IDLE_SECONDS", "60")),
+    # Messages sent on one connection before it is replaced
+    "connection_max_messages": int(os.getenv("SMTP_CONNECTION_MAX_MESSAGES", "100")),
+
+    # Emails waiting for the worker; sends are rejected when full
+    "queue_max_size": int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "1000")),
+    # Delivery attempts per email, with exponential backoff between them
+    "send_attempts": int(os.getenv("EMAIL_SEND_ATTEMPTS", "3")),
+    # Welcome emails are only logged unless enabled; OTP emails are always sent
+    "send_welcome_emails": os.getenv("SEND_WELCOME_EMAILS", "false").lower() == "true",
 }
 
 # Monitoring Configuration
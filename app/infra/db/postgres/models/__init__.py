@@ -34,6 +34,7 @@ from .pricing_config import PricingConfig
 from .review_form import ReviewForm
 from .review_response import ReviewResponse
 from .user_favorite import UserFavorite
+from .push_outbox import PushOutbox
 
 __all__ = [
     # Core models
@@ -73,4 +74,5 @@ __all__ = [
     'ReviewForm',
     'ReviewResponse',
     'UserFavorite',
+    'PushOutbox',
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, TIMESTAMP, ForeignKey, Enum
+from sqlalchemy import Column, String, Boolean, TIMESTAMP, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -9,6 +9,12 @@ from app.utils.enums import NotificationType
 class Notification(Base):
     """Notifications model."""
     __tablename__ = 'core_mstr_one_qlick_notifications_tbl'
+    # Range-partitioned by month on created_at (see partition_maintenance_service),
+    # so the partition key is part of the primary key
+    __table_args__ = (
+        # Inbox keyset pagination: WHERE user_id = ? AND (created_at, notification_id) < (?, ?)
+        Index('idx_notifications_user_created', 'user_id', 'created_at', 'notification_id'),
+    )
 
     notification_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('core_mstr_one_qlick_users_tbl.user_id'))
@@ -17,4 +23,4 @@ class Notification(Base):
     notification_type = Column(Enum(NotificationType, values_callable=lambda x: [e.value for e in x]), default=NotificationType.SYSTEM_ANNOUNCEMENT)
     is_read = Column(Boolean, default=False)
     data_json = Column(JSONB)  # Additional data
-    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False, primary_key=True)
@@ -14,7 +14,7 @@ class OTPVerification(Base):
     pending_user_id = Column(UUID(as_uuid=True), ForeignKey('core_mstr_one_qlick_pending_users_tbl.pending_user_id', ondelete='CASCADE'), nullable=True)
     phone = Column(String(20))
     email = Column(String(255))
-    otp_code = Column(String(10), nullable=False)
+    otp_code = Column(String(64), nullable=False)  # HMAC-SHA256 of the code, see OTPUtils.hash_otp
     otp_type = Column(String(20), nullable=False)  # 'phone_verification', 'email_verification', 'password_reset'
     expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
     is_verified = Column(Boolean, default=False)
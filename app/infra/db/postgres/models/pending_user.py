@@ -30,9 +30,9 @@ class PendingUser(Base):
     is_verified = Column(Boolean, default=False)
     
     # OTP Lockout System
-    otp_attempts = Column(Integer, default=0)  # Number of OTP attempts made
+    otp_attempts = Column(Integer, default=0)  # Unused: OTP request counts live in the OTP limiter
     max_otp_attempts = Column(Integer, default=3)  # Maximum OTP attempts allowed
-    otp_locked_until = Column(TIMESTAMP(timezone=True), nullable=True)  # Lockout expiry time
+    otp_locked_until = Column(TIMESTAMP(timezone=True), nullable=True)  # Unused: lockouts live in the OTP limiter
     lockout_duration_minutes = Column(Integer, default=10)  # Lockout duration in minutes
     
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
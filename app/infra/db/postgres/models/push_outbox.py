@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Integer, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from ..base import Base
+from app.utils.enums import PushOutboxStatus
+
+
+class PushOutbox(Base):
+    """Push notifications waiting to be sent or confirmed, one row per device token."""
+    __tablename__ = 'core_mstr_one_qlick_push_outbox_tbl'
+
+    outbox_id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.gen_random_uuid())
+    user_id = Column(UUID(as_uuid=True), ForeignKey('core_mstr_one_qlick_users_tbl.user_id', ondelete='CASCADE'))
+    push_token = Column(String, nullable=False)
+    title = Column(String(255), nullable=False)
+    body = Column(String, nullable=False)
+    data_json = Column(JSONB)
+    status = Column(String(20), nullable=False, server_default=PushOutboxStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    # When the row is next due: send/retry time, claim lease expiry, or receipt check time
+    next_attempt_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    ticket_id = Column(String)
+    last_error = Column(String)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('idx_push_outbox_due', 'status', 'next_attempt_at'),
+    )
@@ -11,7 +11,7 @@ class RefreshToken(Base):
 
     refresh_token_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('core_mstr_one_qlick_users_tbl.user_id', ondelete='CASCADE'))
-    token_hash = Column(String(255), nullable=False)
+    token_hash = Column(String(255), nullable=False, unique=True)  # SHA-256 of the token
     expires_at = Column(TIMESTAMP, nullable=False)
     is_revoked = Column(Boolean, default=False)
     device_info = Column(JSONB)  # Store device fingerprint for security
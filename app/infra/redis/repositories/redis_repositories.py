@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio as redis_async
 from typing import Any, Optional, Dict, List
 import json
 from app.config.config import REDIS_CONFIG
@@ -7,6 +8,29 @@ import traceback
 
 logger = get_logger(__name__)
 
+
+def _connection_params() -> Dict[str, Any]:
+    """Connection parameters shared by the sync and asyncio Redis clients"""
+    connection_params = {
+        "host": REDIS_CONFIG["host"],
+        "port": REDIS_CONFIG["port"],
+        "password": REDIS_CONFIG["password"] if REDIS_CONFIG["password"] else None,
+        "socket_timeout": REDIS_CONFIG["timeout"] / 1000,  # Convert ms to seconds
+        "socket_connect_timeout": 5,  # 5 second connection timeout
+        "decode_responses": True,
+        "retry_on_timeout": True,
+        "health_check_interval": 30,  # Health check every 30 seconds
+    }
+    
+    # Add TLS/SSL parameters if enabled (for Upstash, Redis Cloud, etc.)
+    if REDIS_CONFIG.get("use_tls", False):
+        connection_params["ssl"] = True
+        connection_params["ssl_cert_reqs"] = None  # Don't verify SSL certificates
+        # Alternative: Use ssl_cert_reqs="required" with ssl_ca_certs for production
+    
+    return connection_params
+
+
 class RedisRepository:
     """
     Repository class for Redis operations
@@ -29,26 +53,10 @@ class RedisRepository:
             # Check if TLS is enabled (for Upstash and other cloud Redis services)
             use_tls = REDIS_CONFIG.get("use_tls", False)
             
-            # Prepare connection parameters
-            connection_params = {
-                "host": REDIS_CONFIG["host"],
-                "port": REDIS_CONFIG["port"],
-                "password": REDIS_CONFIG["password"] if REDIS_CONFIG["password"] else None,
-                "socket_timeout": REDIS_CONFIG["timeout"] / 1000,  # Convert ms to seconds
-                "socket_connect_timeout": 5,  # 5 second connection timeout
-                "decode_responses": True,
-                "retry_on_timeout": True,
-                "health_check_interval": 30,  # Health check every 30 seconds
-            }
-            
-            # Add TLS/SSL parameters if enabled (for Upstash, Redis Cloud, etc.)
             if use_tls:
                 logger.info("Enabling TLS/SSL for Redis connection (Upstash/Cloud Redis)")
-                connection_params["ssl"] = True
-                connection_params["ssl_cert_reqs"] = None  # Don't verify SSL certificates
-                # Alternative: Use ssl_cert_reqs="required" with ssl_ca_certs for production
             
-            self._redis_client = redis.Redis(**connection_params)
+            self._redis_client = redis.Redis(**_connection_params())
             
             # Test the connection with retry logic
             max_retries = 3
@@ -97,3 +105,32 @@ class RedisRepository:
         except Exception as e:
             logger.error(f"Error deleting Redis keys with pattern {pattern}: {str(e)}\n{traceback.format_exc()}")
             return 0
+
+
+def get_redis_client() -> Optional[redis.Redis]:
+    """
+    Return the shared Redis client, or None when Redis is not reachable.
+
+    Callers use this to pick between a Redis-backed implementation and an
+    in-process fallback without having to handle connection errors themselves.
+    """
+    try:
+        return RedisRepository()._redis_client
+    except Exception:
+        return None
+
+
+def redis_key(*parts: Any) -> str:
+    """Build a namespaced Redis key, e.g. redis_key("geo", "ready_orders") -> "oneqlick:geo:ready_orders"."""
+    return ":".join([REDIS_CONFIG["namespace"], *[str(part) for part in parts]])
+
+
+def create_async_redis_client(**overrides: Any) -> redis_async.Redis:
+    """
+    Create an asyncio Redis client with the application's connection settings.
+
+    Used by code running on the event loop (e.g. long-lived pub/sub
+    listeners) that must not block it. The caller owns the client and
+    should close it with close().
+    """
+    return redis_async.Redis(**{**_connection_params(), **overrides})
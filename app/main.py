@@ -14,8 +14,19 @@ from app.config.config import CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
 from app.infra.db.postgres.models import user as user_model, address, otp_verification, pending_user, restaurant as restaurant_model, restaurant_offer, search as search_model, support as support_model
 # Import batch cleanup worker
 from app.workers.batch_cleanup_worker import start_batch_cleanup_worker, stop_batch_cleanup_worker, get_worker_status
+from app.workers.dispatch_worker import start_dispatch_worker, stop_dispatch_worker, get_dispatch_worker_status
+from app.workers.location_flush_worker import start_location_flush_worker, stop_location_flush_worker
+from app.workers.push_outbox_worker import start_push_outbox_worker, stop_push_outbox_worker
+from app.workers.email_worker import start_email_worker, stop_email_worker
+from app.workers.partition_maintenance_worker import start_partition_maintenance_worker, stop_partition_maintenance_worker
 from app.utils.rate_limiter import rate_limiter
-from app.config.config import RATE_LIMIT_CONFIG
+from app.services.broadcast_job_service import broadcast_job_service
+from app.services.push_notification_service import expo_push_client
+from app.services.password_hash_service import password_hash_service
+from app.services.session_store_service import session_store_service
+from app.services.google_token_verifier import google_token_verifier
+from app.services.websocket_manager import manager as websocket_manager
+from app.config.config import RATE_LIMIT_CONFIG, DISPATCH_CONFIG
 import logging
 
 APP_TITLE = "OneQlick Backend"
@@ -46,39 +57,27 @@ app.add_middleware(
 async def rate_limit_middleware(request: Request, call_next):
     """
     Global rate limiting middleware for all requests.
-    Applies a global rate limit per IP address to prevent DDoS attacks.
+    Applies a global rate limit per IP address to prevent DDoS attacks,
+    together with the limits of the route being called.
     Also adds rate limit headers to all responses.
     """
     # Skip rate limiting for health check and root endpoints
     if request.url.path in ["/", "/health", "/docs", "/openapi.json", "/redoc"]:
         return await call_next(request)
     
-    # Apply global rate limit (1000 requests per hour per IP)
+    # Apply the global limit (per IP address) and the route's own @rate_limit
+    # limits, in one storage round trip
     if RATE_LIMIT_CONFIG["enabled"]:
-        allowed, current_count, limit, reset_time = rate_limiter.check_rate_limit(
-            request,
-            limit=RATE_LIMIT_CONFIG["global_per_hour"],
-            window=3600  # 1 hour
-        )
+        scope, route_limits = rate_limiter.route_limits(request)
+        result = await rate_limiter.check_rate_limit(request, route_limits, scope=scope)
+        request.state.rate_limit_checked = True
         
-        # Store rate limit info in request state for endpoint decorators to use
-        request.state.rate_limit_headers = rate_limiter.get_rate_limit_headers(current_count, limit, reset_time)
-        
-        if not allowed:
-            return JSONResponse(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={
-                    "code": 429,
-                    "message": "Global rate limit exceeded. Please try again later.",
-                    "message_id": "GLOBAL_RATE_LIMIT_EXCEEDED",
-                    "data": {
-                        "limit": limit,
-                        "window": "1 hour",
-                        "reset_time": reset_time
-                    }
-                },
-                headers=request.state.rate_limit_headers
-            )
+        if result is not None:
+            # Store rate limit info in request state so the headers go on the response
+            request.state.rate_limit_headers = rate_limiter.get_rate_limit_headers(result)
+            
+            if not result["allowed"]:
+                return rate_limiter.exceeded_response(result)
     
     # Process request
     response = await call_next(request)
@@ -132,12 +131,61 @@ except Exception as e:
 async def startup_event():
     """Initialize services on application startup."""
     logger = get_logger(__name__)
+    try:
+        # Connect this worker to the WebSocket backplane
+        await websocket_manager.start_backplane()
+        logger.info(f"WebSocket backplane started ({websocket_manager.backplane.name})")
+    except Exception as e:
+        logger.error(f"Failed to start WebSocket backplane: {e}")
+    
+    try:
+        await google_token_verifier.start()
+        logger.info("Google signing key refresh started")
+    except Exception as e:
+        logger.error(f"Failed to start Google signing key refresh: {e}")
+    
+    try:
+        await rate_limiter.start()
+    except Exception as e:
+        logger.error(f"Failed to start rate limit sync: {e}")
+    
     try:
         # Start batch cleanup worker
         start_batch_cleanup_worker()
         logger.info("Batch cleanup service started successfully")
     except Exception as e:
         logger.error(f"Failed to start batch cleanup service: {e}")
+    
+    try:
+        start_location_flush_worker()
+        logger.info("Location flush worker started successfully")
+    except Exception as e:
+        logger.error(f"Failed to start location flush worker: {e}")
+    
+    try:
+        start_push_outbox_worker()
+        logger.info("Push outbox worker started successfully")
+    except Exception as e:
+        logger.error(f"Failed to start push outbox worker: {e}")
+    
+    try:
+        start_email_worker()
+        logger.info("Email worker started successfully")
+    except Exception as e:
+        logger.error(f"Failed to start email worker: {e}")
+    
+    try:
+        start_partition_maintenance_worker()
+        logger.info("Partition maintenance worker started successfully")
+    except Exception as e:
+        logger.error(f"Failed to start partition maintenance worker: {e}")
+    
+    if DISPATCH_CONFIG["enabled"]:
+        try:
+            start_dispatch_worker()
+            logger.info("Dispatch worker started successfully")
+        except Exception as e:
+            logger.error(f"Failed to start dispatch worker: {e}")
 
 # Shutdown event - Clean up services
 @app.on_event("shutdown")
@@ -150,6 +198,74 @@ async def shutdown_event():
         logger.info("Batch cleanup service stopped successfully")
     except Exception as e:
         logger.error(f"Error stopping batch cleanup service: {e}")
+    
+    try:
+        stop_location_flush_worker()
+        logger.info("Location flush worker stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping location flush worker: {e}")
+    
+    if DISPATCH_CONFIG["enabled"]:
+        try:
+            stop_dispatch_worker()
+            logger.info("Dispatch worker stopped successfully")
+        except Exception as e:
+            logger.error(f"Error stopping dispatch worker: {e}")
+    
+    try:
+        await websocket_manager.stop_backplane()
+        logger.info("WebSocket backplane stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping WebSocket backplane: {e}")
+
+    try:
+        broadcast_job_service.shutdown()
+        logger.info("Broadcast job service stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping broadcast job service: {e}")
+
+    try:
+        stop_push_outbox_worker()
+        logger.info("Push outbox worker stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping push outbox worker: {e}")
+
+    try:
+        stop_email_worker()
+        logger.info("Email worker stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping email worker: {e}")
+
+    try:
+        stop_partition_maintenance_worker()
+        logger.info("Partition maintenance worker stopped successfully")
+    except Exception as e:
+        logger.error(f"Error stopping partition maintenance worker: {e}")
+
+    try:
+        password_hash_service.shutdown()
+    except Exception as e:
+        logger.error(f"Error stopping password hash pool: {e}")
+
+    try:
+        await google_token_verifier.stop()
+    except Exception as e:
+        logger.error(f"Error stopping Google signing key refresh: {e}")
+
+    try:
+        session_store_service.shutdown()
+    except Exception as e:
+        logger.error(f"Error flushing session audit log: {e}")
+
+    try:
+        await expo_push_client.close()
+    except Exception as e:
+        logger.error(f"Error closing push notification client: {e}")
+
+    try:
+        await rate_limiter.close()
+    except Exception as e:
+        logger.error(f"Error closing rate limiter: {e}")
 
 @app.get("/")
 async def root():
@@ -254,6 +370,33 @@ async def run_batch_cleanup():
             "message": f"Failed to run batch cleanup: {str(e)}"
         }
 
+@app.get("/api/v1/dispatch/status")
+async def dispatch_status():
+    """Get the status of the delivery dispatch worker."""
+    try:
+        return {
+            "status": "success",
+            "data": {
+                "enabled": DISPATCH_CONFIG["enabled"],
+                **get_dispatch_worker_status()
+            }
+        }
+    except Exception as e:
+        logger = get_logger(__name__)
+        logger.error(f"Error getting dispatch status: {e}")
+        return {
+            "status": "error",
+            "message": f"Failed to get dispatch status: {str(e)}"
+        }
+
+@app.get("/api/v1/password-hash/status")
+async def password_hash_status():
+    """Get queue depth and admission metrics of the password hashing pool."""
+    return {
+        "status": "success",
+        "data": password_hash_service.get_status()
+    }
+
 @app.get("/api/v1/rate-limit/status")
 async def rate_limit_status():
     """Get the current rate limiting configuration and status."""
@@ -274,6 +417,7 @@ async def rate_limit_status():
                 "partner_per_minute": RATE_LIMIT_CONFIG["partner_per_minute"]
             },
             "whitelist_count": len(RATE_LIMIT_CONFIG["whitelist"]),
+            "storage": rate_limiter.get_status(),
             "message": "Rate limiting is active and protecting the API"
         }
     }
@@ -0,0 +1,200 @@
+"""
+Broadcast Job Service
+
+Runs admin notification broadcasts in the background. The admin endpoint
+submits a job and returns its id straight away; a small thread pool writes
+the notifications in chunks (see NotificationService.broadcast_notification)
+and records progress after every chunk.
+
+Job status is kept in Redis when available, so any worker can answer a
+progress request and the admin dashboard can list recent broadcasts, and in
+process memory otherwise. A job runs on the worker that accepted it; if that
+worker stops mid-job the job stays "running" with the count reached so far.
+"""
+
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import UUID
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.services.notification_service import NotificationService
+from app.utils.enums import NotificationType
+from app.config.config import BROADCAST_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BroadcastJobService:
+    """Background execution and progress tracking for notification broadcasts"""
+
+    def __init__(
+        self,
+        chunk_size: int = 5000,
+        max_concurrent_jobs: int = 2,
+        job_ttl_seconds: int = 604800,
+        max_local_jobs: int = 100,
+        use_redis: bool = True
+    ):
+        self.chunk_size = chunk_size
+        self.job_ttl_seconds = job_ttl_seconds
+        self.max_local_jobs = max_local_jobs
+        self.use_redis = use_redis
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="broadcast")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._index_key = redis_key("broadcast", "jobs")
+
+    def _get_redis(self):
+        return get_redis_client() if self.use_redis else None
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return redis_key("broadcast", "job", job_id)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def submit(
+        self,
+        created_by: UUID,
+        title: str,
+        message: str,
+        notification_type: NotificationType,
+        user_ids: Optional[List[UUID]] = None,
+        role_filter: Optional[str] = None,
+        data_json: Optional[dict] = None
+    ) -> dict:
+        """
+        Queue a broadcast.
+
+        Returns:
+            The new job's status record
+        """
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "status": "queued",
+            "title": title,
+            "notification_type": notification_type.value,
+            "role_filter": role_filter,
+            "target_user_count": len(user_ids) if user_ids else None,
+            "notifications_sent": 0,
+            "created_by": str(created_by),
+            "created_at": self._now(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+        self._save(job)
+        queued = dict(job)
+        self._executor.submit(
+            self._run, job, title, message, notification_type, user_ids, role_filter, data_json
+        )
+        logger.info(f"Queued broadcast job {job['job_id']} by admin {created_by}")
+        return queued
+
+    def _run(
+        self,
+        job: dict,
+        title: str,
+        message: str,
+        notification_type: NotificationType,
+        user_ids: Optional[List[UUID]],
+        role_filter: Optional[str],
+        data_json: Optional[dict]
+    ):
+        job.update(status="running", started_at=self._now())
+        self._save(job)
+
+        def on_progress(sent: int):
+            job["notifications_sent"] = sent
+            self._save(job)
+
+        db = SessionLocal()
+        try:
+            sent = NotificationService.broadcast_notification(
+                db=db,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                user_ids=user_ids,
+                role_filter=role_filter,
+                data_json=data_json,
+                chunk_size=self.chunk_size,
+                on_progress=on_progress
+            )
+            job.update(status="completed", notifications_sent=sent)
+        except Exception as e:
+            logger.error(f"Broadcast job {job['job_id']} failed: {e}")
+            job.update(status="failed", error=str(e))
+        finally:
+            db.close()
+            job["finished_at"] = self._now()
+            self._save(job)
+
+    def _save(self, job: dict):
+        """Record a job's current state"""
+        snapshot = dict(job)
+        with self._lock:
+            self._jobs[snapshot["job_id"]] = snapshot
+            while len(self._jobs) > self.max_local_jobs:
+                self._jobs.popitem(last=False)
+
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            pipe = redis_client.pipeline()
+            pipe.set(self._job_key(snapshot["job_id"]), json.dumps(snapshot), ex=self.job_ttl_seconds)
+            pipe.zadd(self._index_key, {snapshot["job_id"]: datetime.fromisoformat(snapshot["created_at"]).timestamp()})
+            pipe.zremrangebyrank(self._index_key, 0, -self.max_local_jobs - 1)
+            pipe.expire(self._index_key, self.job_ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store broadcast job {snapshot['job_id']} in Redis: {e}")
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job's status record, or None if unknown or expired"""
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                raw = redis_client.get(self._job_key(job_id))
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logger.warning(f"Failed to read broadcast job {job_id} from Redis: {e}")
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def recent_jobs(self, limit: int = 10) -> List[dict]:
+        """Most recently created jobs, newest first"""
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                job_ids = redis_client.zrevrange(self._index_key, 0, limit - 1)
+                if job_ids:
+                    raw_jobs = redis_client.mget([self._job_key(job_id) for job_id in job_ids])
+                    return [json.loads(raw) for raw in raw_jobs if raw]
+            except Exception as e:
+                logger.warning(f"Failed to list broadcast jobs from Redis: {e}")
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())][:limit]
+
+    def shutdown(self):
+        """Cancel queued jobs; jobs already running are left to finish"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance for the application
+broadcast_job_service = BroadcastJobService(
+    chunk_size=BROADCAST_CONFIG["chunk_size"],
+    max_concurrent_jobs=BROADCAST_CONFIG["max_concurrent_jobs"],
+    job_ttl_seconds=BROADCAST_CONFIG["job_ttl_seconds"]
+)
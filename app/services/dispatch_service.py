@@ -0,0 +1,548 @@
+"""
+Dispatch Service
+
+Server-side assignment of ready orders to delivery partners. Each round:
+1. Takes the ready orders from the ready order index
+2. Looks up the nearest available partners from a live partner position index
+3. Solves a batched greedy nearest assignment over those candidate pairs
+4. Records time-limited offers that the worker pushes to the chosen partners
+
+An offer reserves the order for one partner until it is accepted, declined or
+expires, so partners no longer race each other on accept-delivery.
+"""
+
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.postgres_config import engine
+from app.infra.db.postgres.models.order import Order
+from app.infra.db.postgres.models.restaurant import Restaurant
+from app.infra.db.postgres.models.delivery_partner import DeliveryPartner
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.services.ready_order_index import ready_order_index
+from app.utils.enums import OrderStatus, AvailabilityStatus
+from app.utils.geo_index import GeoIndex, RedisGeoIndex
+from app.config.config import DISPATCH_CONFIG, DELIVERY_GEO_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Orders a partner is still working on; such partners are not offered new work
+ACTIVE_DELIVERY_STATUSES = [OrderStatus.PICKED_UP, OrderStatus.OUT_FOR_DELIVERY]
+
+# How long a partner's decline keeps them out of the candidates for that order
+DECLINE_TTL_SECONDS = 600
+
+# Extends the leader lease only while this worker still holds it
+_RENEW_LEADERSHIP_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Session-level advisory lock that elects the leader when Redis is unavailable
+_LEADER_LOCK = "dispatch:leader"
+
+
+class MemoryOfferStore:
+    """In-memory offer storage for development / single-node deployments"""
+
+    def __init__(self):
+        self._offers: Dict[str, Tuple[str, float]] = {}
+        self._partner_offers: Dict[str, Tuple[str, float]] = {}
+        self._declined: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _live(entry: Optional[Tuple[str, float]]) -> Optional[str]:
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def create(self, order_id: str, partner_id: str, ttl: int):
+        expires_at = time.time() + ttl
+        self._offers[order_id] = (partner_id, expires_at)
+        self._partner_offers[partner_id] = (order_id, expires_at)
+
+    def get_partner(self, order_id: str) -> Optional[str]:
+        return self._live(self._offers.get(order_id))
+
+    def get_order(self, partner_id: str) -> Optional[str]:
+        return self._live(self._partner_offers.get(partner_id))
+
+    def clear(self, order_id: str):
+        entry = self._offers.pop(order_id, None)
+        if entry and self._live(self._partner_offers.get(entry[0])) == order_id:
+            del self._partner_offers[entry[0]]
+
+    def add_declined(self, order_id: str, partner_id: str):
+        self._declined.setdefault(order_id, {})[partner_id] = time.time() + DECLINE_TTL_SECONDS
+
+    def get_declined(self, order_id: str) -> Set[str]:
+        now = time.time()
+        return {partner for partner, expires_at in self._declined.get(order_id, {}).items() if expires_at > now}
+
+    def busy_partners(self) -> Set[str]:
+        now = time.time()
+        return {partner for partner, (_, expires_at) in self._partner_offers.items() if expires_at > now}
+
+    def offered_orders(self) -> Set[str]:
+        now = time.time()
+        return {order for order, (_, expires_at) in self._offers.items() if expires_at > now}
+
+    def purge_expired(self):
+        now = time.time()
+        self._offers = {k: v for k, v in self._offers.items() if v[1] > now}
+        self._partner_offers = {k: v for k, v in self._partner_offers.items() if v[1] > now}
+        for order_id in list(self._declined):
+            self._declined[order_id] = {p: e for p, e in self._declined[order_id].items() if e > now}
+            if not self._declined[order_id]:
+                del self._declined[order_id]
+
+
+class RedisOfferStore:
+    """Redis offer storage shared by all workers; expiry is handled by key TTLs"""
+
+    def __init__(self, redis_client):
+        self._redis = redis_client
+
+    @staticmethod
+    def _order_key(order_id: str) -> str:
+        return redis_key("dispatch", "offer", order_id)
+
+    @staticmethod
+    def _partner_key(partner_id: str) -> str:
+        return redis_key("dispatch", "partner_offer", partner_id)
+
+    @staticmethod
+    def _declined_key(order_id: str) -> str:
+        return redis_key("dispatch", "declined", order_id)
+
+    def create(self, order_id: str, partner_id: str, ttl: int):
+        pipe = self._redis.pipeline()
+        pipe.set(self._order_key(order_id), partner_id, ex=ttl)
+        pipe.set(self._partner_key(partner_id), order_id, ex=ttl)
+        pipe.execute()
+
+    def get_partner(self, order_id: str) -> Optional[str]:
+        return self._redis.get(self._order_key(order_id))
+
+    def get_order(self, partner_id: str) -> Optional[str]:
+        return self._redis.get(self._partner_key(partner_id))
+
+    def clear(self, order_id: str):
+        partner_id = self._redis.get(self._order_key(order_id))
+        pipe = self._redis.pipeline()
+        pipe.delete(self._order_key(order_id))
+        if partner_id:
+            pipe.delete(self._partner_key(partner_id))
+        pipe.execute()
+
+    def add_declined(self, order_id: str, partner_id: str):
+        pipe = self._redis.pipeline()
+        pipe.sadd(self._declined_key(order_id), partner_id)
+        pipe.expire(self._declined_key(order_id), DECLINE_TTL_SECONDS)
+        pipe.execute()
+
+    def get_declined(self, order_id: str) -> Set[str]:
+        return set(self._redis.smembers(self._declined_key(order_id)))
+
+    def offers_for(self, order_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Batch lookup of the partner holding each order's offer"""
+        if not order_ids:
+            return {}
+        values = self._redis.mget([self._order_key(order_id) for order_id in order_ids])
+        return dict(zip(order_ids, values))
+
+    def offers_held_by(self, partner_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Batch lookup of the order offered to each partner"""
+        if not partner_ids:
+            return {}
+        values = self._redis.mget([self._partner_key(partner_id) for partner_id in partner_ids])
+        return dict(zip(partner_ids, values))
+
+    def purge_expired(self):
+        pass
+
+
+class DispatchService:
+    """Batch matching of ready orders to the nearest available partners"""
+
+    def __init__(
+        self,
+        offer_ttl_seconds: int = 30,
+        max_radius_km: float = 8.0,
+        candidates_per_order: int = 5,
+        partner_reconcile_seconds: int = 30,
+        use_redis: bool = True
+    ):
+        self.offer_ttl_seconds = offer_ttl_seconds
+        self.max_radius_km = max_radius_km
+        self.candidates_per_order = candidates_per_order
+        self.partner_reconcile_seconds = partner_reconcile_seconds
+        self.use_redis = use_redis
+        self.worker_id = uuid.uuid4().hex
+        self._redis = None
+        self._renew_leadership = None
+        self._partner_index = None
+        self._offers = None
+        self._leader_conn = None
+        self._leader_lock = threading.Lock()
+        self._last_partner_reconcile = 0.0
+        self._stats = {"rounds": 0, "offers_sent": 0, "last_round_ms": 0.0}
+
+    # ------------------------------------------------------------------
+    # Backends
+    # ------------------------------------------------------------------
+
+    def _init_backends(self):
+        if self._partner_index is not None:
+            return
+        self._redis = get_redis_client() if self.use_redis else None
+        if self._redis is not None:
+            self._partner_index = RedisGeoIndex(self._redis, redis_key("geo", "partners"))
+            self._offers = RedisOfferStore(self._redis)
+            self._renew_leadership = self._redis.register_script(_RENEW_LEADERSHIP_SCRIPT)
+            logger.info("Dispatch service using Redis storage")
+        else:
+            self._partner_index = GeoIndex(cell_size_km=DELIVERY_GEO_CONFIG["cell_size_km"])
+            self._offers = MemoryOfferStore()
+            logger.info("Dispatch service using in-memory storage")
+
+    @property
+    def partner_index(self):
+        self._init_backends()
+        return self._partner_index
+
+    @property
+    def offers(self):
+        self._init_backends()
+        return self._offers
+
+    # ------------------------------------------------------------------
+    # Partner positions
+    # ------------------------------------------------------------------
+
+    def update_partner_location(self, partner_id: UUID, latitude: float, longitude: float):
+        """
+        Move an available partner in the position index.
+
+        Partners not currently in the index (offline, busy) are ignored; they
+        are added by the next reconciliation once they become available.
+        """
+        try:
+            member = str(partner_id)
+            if member in self.partner_index:
+                self.partner_index.add(member, float(latitude), float(longitude))
+        except Exception as e:
+            logger.warning(f"Failed to update partner {partner_id} position: {e}")
+
+    def remove_partner(self, partner_id: UUID):
+        """Take a partner out of dispatch (went busy or offline)"""
+        try:
+            self.partner_index.remove(str(partner_id))
+        except Exception as e:
+            logger.warning(f"Failed to remove partner {partner_id} from dispatch index: {e}")
+
+    def refresh_partners(self, db: Session) -> int:
+        """
+        Rebuild the partner index from available partners with a known position.
+
+        Returns:
+            Number of indexed partners
+        """
+        busy_partner_ids = db.query(Order.delivery_partner_id).filter(
+            Order.delivery_partner_id != None,
+            Order.order_status.in_(ACTIVE_DELIVERY_STATUSES)
+        )
+        rows = db.query(
+            DeliveryPartner.user_id, DeliveryPartner.current_latitude, DeliveryPartner.current_longitude
+        ).filter(
+            DeliveryPartner.availability_status == AvailabilityStatus.AVAILABLE,
+            DeliveryPartner.current_latitude != None,
+            DeliveryPartner.current_longitude != None,
+            ~DeliveryPartner.user_id.in_(busy_partner_ids)
+        ).all()
+
+        # Keep fresher positions reported since the last rebuild
+        current = self.partner_index.positions()
+        entries = {}
+        for row in rows:
+            member = str(row.user_id)
+            entries[member] = current.get(member) or (float(row.current_latitude), float(row.current_longitude))
+
+        self.partner_index.replace_all(entries)
+        self._last_partner_reconcile = time.monotonic()
+        return len(entries)
+
+    # ------------------------------------------------------------------
+    # Offers
+    # ------------------------------------------------------------------
+
+    def get_offer(self, order_id: UUID) -> Optional[str]:
+        """Get the partner currently holding the offer for an order"""
+        try:
+            return self.offers.get_partner(str(order_id))
+        except Exception as e:
+            logger.warning(f"Failed to read dispatch offer for order {order_id}: {e}")
+            return None
+
+    def get_partner_offer(self, partner_id: UUID) -> Optional[str]:
+        """Get the order currently offered to a partner"""
+        try:
+            return self.offers.get_order(str(partner_id))
+        except Exception as e:
+            logger.warning(f"Failed to read dispatch offer for partner {partner_id}: {e}")
+            return None
+
+    def clear_offer(self, order_id: UUID):
+        """Release an order's offer (accepted, cancelled, ...)"""
+        try:
+            self.offers.clear(str(order_id))
+        except Exception as e:
+            logger.warning(f"Failed to clear dispatch offer for order {order_id}: {e}")
+
+    def decline_offer(self, order_id: UUID, partner_id: UUID) -> bool:
+        """
+        Decline an offer so the order is re-dispatched to someone else.
+
+        Returns:
+            True if the partner held the offer
+        """
+        if self.get_offer(order_id) != str(partner_id):
+            return False
+        self.offers.add_declined(str(order_id), str(partner_id))
+        self.offers.clear(str(order_id))
+        return True
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def match(candidates: Dict[str, List[Tuple[str, float]]]) -> List[Tuple[str, str, float]]:
+        """
+        Greedy nearest assignment over candidate (order, partner) pairs.
+
+        Pairs are taken shortest distance first, skipping orders and partners
+        already matched in this round. On the small per-order candidate sets
+        used here this is close to optimal and runs in O(P log P) for P pairs.
+
+        Args:
+            candidates: order_id -> [(partner_id, distance_km), ...]
+
+        Returns:
+            List of (order_id, partner_id, distance_km)
+        """
+        pairs = [
+            (distance_km, order_id, partner_id)
+            for order_id, partners in candidates.items()
+            for partner_id, distance_km in partners
+        ]
+        pairs.sort()
+
+        matched_orders, matched_partners, assignments = set(), set(), []
+        for distance_km, order_id, partner_id in pairs:
+            if order_id in matched_orders or partner_id in matched_partners:
+                continue
+            matched_orders.add(order_id)
+            matched_partners.add(partner_id)
+            assignments.append((order_id, partner_id, distance_km))
+        return assignments
+
+    def _offer_state(self, order_ids: List[str], partner_ids: List[str]) -> Tuple[Set[str], Set[str]]:
+        """Orders that already have a live offer and partners already holding one"""
+        offers = self.offers
+        if isinstance(offers, RedisOfferStore):
+            offered = {order for order, partner in offers.offers_for(order_ids).items() if partner}
+            busy = {partner for partner, order in offers.offers_held_by(partner_ids).items() if order}
+            return offered, busy
+        offers.purge_expired()
+        return offers.offered_orders(), offers.busy_partners()
+
+    def run_dispatch_cycle(self, db: Session) -> List[dict]:
+        """
+        Run one matching round and record the resulting offers.
+
+        Returns:
+            Offer payloads to push to the matched partners
+        """
+        started = time.monotonic()
+        self._init_backends()
+
+        if time.monotonic() - self._last_partner_reconcile >= self.partner_reconcile_seconds:
+            self.refresh_partners(db)
+
+        ready_orders = {str(order_id): position for order_id, position in ready_order_index.positions(db).items()}
+        if not ready_orders or len(self.partner_index) == 0:
+            return []
+
+        partner_ids = self.partner_index.members()
+        offered_orders, busy_partners = self._offer_state(list(ready_orders), partner_ids)
+
+        candidates = {}
+        for order_id, (latitude, longitude) in ready_orders.items():
+            if order_id in offered_orders:
+                continue
+            declined = self.offers.get_declined(order_id)
+            nearby = self.partner_index.search(
+                latitude, longitude, self.max_radius_km,
+                limit=self.candidates_per_order + len(busy_partners) + len(declined)
+            )
+            partners = [(p, d) for p, d in nearby if p not in busy_partners and p not in declined]
+            if partners:
+                candidates[order_id] = partners[:self.candidates_per_order]
+
+        assignments = self.match(candidates)
+        if not assignments:
+            self._record_round(started, 0)
+            return []
+
+        # Hydrate offer details in one query; drop orders that changed meanwhile
+        rows = db.query(
+            Order.order_id, Order.order_number, Order.delivery_fee, Order.total_amount,
+            Restaurant.restaurant_id, Restaurant.name, Restaurant.address_line1
+        ).join(
+            Restaurant, Restaurant.restaurant_id == Order.restaurant_id
+        ).filter(
+            Order.order_id.in_([UUID(order_id) for order_id, _, _ in assignments]),
+            Order.order_status == OrderStatus.READY_FOR_PICKUP,
+            Order.delivery_partner_id == None
+        ).all()
+        details = {str(row.order_id): row for row in rows}
+
+        offers = []
+        for order_id, partner_id, distance_km in assignments:
+            row = details.get(order_id)
+            if row is None:
+                ready_order_index.remove_order(UUID(order_id))
+                continue
+            self.offers.create(order_id, partner_id, self.offer_ttl_seconds)
+            offers.append({
+                "partner_id": partner_id,
+                "order_id": order_id,
+                "order_number": row.order_number,
+                "restaurant_id": str(row.restaurant_id),
+                "restaurant_name": row.name,
+                "restaurant_address": row.address_line1,
+                "distance_km": distance_km,
+                "delivery_fee": float(row.delivery_fee or 0),
+                "total_amount": float(row.total_amount),
+                "expires_in": self.offer_ttl_seconds
+            })
+
+        self._record_round(started, len(offers))
+        logger.info(f"Dispatch round matched {len(offers)} of {len(ready_orders)} ready orders")
+        return offers
+
+    def _record_round(self, started: float, offers_sent: int):
+        self._stats["rounds"] += 1
+        self._stats["offers_sent"] += offers_sent
+        self._stats["last_round_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+    # ------------------------------------------------------------------
+    # Leadership
+    # ------------------------------------------------------------------
+
+    def acquire_leadership(self, ttl_seconds: float) -> bool:
+        """
+        Make sure only one worker process runs matching rounds.
+
+        Uses a Redis lease that the current leader keeps renewing. Without
+        Redis the leader is whichever process holds a Postgres advisory lock.
+
+        Args:
+            ttl_seconds (float): Lifetime of the Redis lease
+
+        Returns:
+            bool: True if this process should run the next round
+        """
+        self._init_backends()
+        if self._redis is None:
+            return self._acquire_postgres_leadership()
+        try:
+            key = redis_key("dispatch", "leader")
+            ttl_ms = int(ttl_seconds * 1000)
+            if self._redis.set(key, self.worker_id, nx=True, px=ttl_ms):
+                return True
+            # Renew only if the lease did not pass to another worker in between
+            return bool(self._renew_leadership(keys=[key], args=[self.worker_id, ttl_ms]))
+        except Exception as e:
+            logger.warning(f"Dispatch leadership check failed: {e}")
+            return False
+
+    def _acquire_postgres_leadership(self) -> bool:
+        """
+        Hold a session-level advisory lock on a dedicated connection.
+
+        The lock lives as long as the connection, so the leader keeps it
+        between rounds and Postgres hands it to another worker as soon as the
+        leader's connection goes away. Each check ends its transaction so the
+        connection never sits idle in a transaction.
+        """
+        with self._leader_lock:
+            try:
+                if self._leader_conn is not None:
+                    # Already the leader: make sure the connection, and so the lock, is still alive
+                    self._leader_conn.execute(text("SELECT 1"))
+                    self._leader_conn.commit()
+                    return True
+                connection = engine.connect()
+                try:
+                    locked = connection.execute(
+                        text("SELECT pg_try_advisory_lock(hashtext(:lock))"),
+                        {"lock": _LEADER_LOCK}
+                    ).scalar()
+                    connection.commit()
+                except Exception:
+                    connection.invalidate()
+                    raise
+                if not locked:
+                    connection.close()
+                    return False
+                self._leader_conn = connection
+                logger.info("Redis unavailable: this worker holds the Postgres dispatch leader lock")
+                return True
+            except Exception as e:
+                logger.warning(f"Dispatch leadership check failed: {e}")
+                self._close_leader_connection()
+                return False
+
+    def _close_leader_connection(self):
+        if self._leader_conn is None:
+            return
+        try:
+            # Discard the connection rather than pool it, which ends the session and its lock
+            self._leader_conn.invalidate()
+            self._leader_conn.close()
+        except Exception:
+            pass
+        self._leader_conn = None
+
+    def release_leadership(self):
+        """Give up the Postgres leader lock so another worker takes over right away"""
+        with self._leader_lock:
+            self._close_leader_connection()
+
+    def get_status(self) -> dict:
+        """Get dispatch statistics"""
+        self._init_backends()
+        return {
+            "backend": "redis" if self._redis is not None else "memory",
+            "postgres_leader": self._leader_conn is not None,
+            "available_partners": len(self.partner_index),
+            **self._stats
+        }
+
+
+# Global instance for the application
+dispatch_service = DispatchService(
+    offer_ttl_seconds=DISPATCH_CONFIG["offer_ttl_seconds"],
+    max_radius_km=DISPATCH_CONFIG["max_radius_km"],
+    candidates_per_order=DISPATCH_CONFIG["candidates_per_order"],
+    partner_reconcile_seconds=DISPATCH_CONFIG["partner_reconcile_seconds"]
+)
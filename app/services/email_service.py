@@ -1,24 +1,44 @@
 import logging
+import queue
+import time
 from typing import Optional, Dict, Any
-from app.config.config import EMAIL_CONFIG
+from app.config.config import EMAIL_CONFIG, APP_ENV
+from app.services.email_templates import email_templates, build_message
+from app.services.smtp_pool import SMTPConnectionPool
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
-import os
 
 logger = logging.getLogger(__name__)
 
 class EmailService:
-    """Email service for sending OTP and other emails using SMTP"""
+    """Email service for sending OTP and other emails using SMTP.
+
+    Sends are queued and delivered by the email worker over pooled SMTP
+    connections, so callers never wait on the mail server.
+    """
     
-    def __init__(self):
-        self.config = EMAIL_CONFIG
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or EMAIL_CONFIG
         self._validate_smtp_config()
+        self._queue = queue.Queue(maxsize=self.config["queue_max_size"])
+        self.pool = None
+        if self.config.get("smtp_host") and (self.config.get("smtp_username") or self.config.get("from_address")):
+            self.pool = SMTPConnectionPool(
+                host=self.config["smtp_host"],
+                port=self.config["smtp_port"],
+                username=self.config["smtp_username"],
+                password=self.config["smtp_password"],
+                security=self.config["smtp_security"],
+                size=self.config["pool_size"],
+                timeout_seconds=self.config["smtp_timeout_seconds"],
+                max_idle_seconds=self.config["connection_max_idle_seconds"],
+                max_messages=self.config["connection_max_messages"]
+            )
+        self.sent_count = 0
+        self.failed_count = 0
     
     def _validate_smtp_config(self):
         """Validate SMTP configuration"""
-        if self.config.get("smtp_host") and self.config.get("smtp_username"):
+        if self.config.get("smtp_host") and (self.config.get("smtp_username") or self.config.get("from_address")):
             logger.info("SMTP configuration loaded successfully")
         else:
             logger.warning("SMTP configuration incomplete - emails will be logged instead")
@@ -30,231 +50,119 @@ class EmailService:
         user_name: str = "User",
         otp_type: str = "email_verification"
     ) -> bool:
-        """Send OTP email to user"""
+        """Queue OTP email to user; the email worker sends it"""
         try:
-            # Generate email content
-            subject, html_content, text_content = self._generate_otp_email_content(
+            subject, html_content, text_content = email_templates.render_otp(
                 otp_code, user_name, otp_type
             )
             
-            # Use SMTP directly
-            return self._send_with_smtp(to_email, subject, html_content)
+            return self._enqueue(to_email, subject, html_content, text_content, otp_code=otp_code)
                 
         except Exception as e:
-            logger.error(f"Failed to send OTP email: {e}")
+            logger.error(f"Failed to queue OTP email: {e}")
             return False
     
-    def _generate_otp_email_content(
-        self, 
-        otp_code: str, 
-        user_name: str, 
-        otp_type: str
-    ) -> tuple[str, str, str]:
-        """Generate email content for OTP"""
-        
-        # Determine email type and content
-        if otp_type == "email_verification":
-            subject = "Verify Your Email - oneQlick"
-            purpose = "email verification"
-            action = "verify your email address"
-        elif otp_type == "phone_verification":
-            subject = "Verify Your Phone - oneQlick"
-            purpose = "phone verification"
-            action = "verify your phone number"
-        elif otp_type == "password_reset":
-            subject = "Reset Your Password - oneQlick"
-            purpose = "password reset"
-            action = "reset your password"
-        else:
-            subject = "Your Verification Code - oneQlick"
-            purpose = "verification"
-            action = "complete your verification"
-        
-        # HTML Template
-        html_template = Template("""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{{ subject }}</title>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background: linear-gradient(135deg, #FF6B35, #F7931E); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
-                .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
-                .otp-code { background: #fff; border: 2px dashed #FF6B35; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; }
-                .otp-number { font-size: 32px; font-weight: bold; color: #FF6B35; letter-spacing: 5px; }
-                .footer { text-align: center; margin-top: 30px; color: #666; font-size: 14px; }
-                .button { display: inline-block; background: #FF6B35; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; margin: 10px 0; }
-                .warning { background: #fff3cd; border: 1px solid #ffeaa7; color: #856404; padding: 15px; border-radius: 5px; margin: 20px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>oneQlick</h1>
-                    <h2>{{ subject }}</h2>
-                </div>
-                <div class="content">
-                    <p>Hello <strong>{{ user_name }}</strong>,</p>
-                    
-                    <p>You requested a verification code for {{ purpose }}. Use the code below to {{ action }}:</p>
-                    
-                    <div class="otp-code">
-                        <div class="otp-number">{{ otp_code }}</div>
-                        <p style="margin: 10px 0 0 0; color: #666;">Your verification code</p>
-                    </div>
-                    
-                    <p><strong>Important:</strong></p>
-                    <ul>
-                        <li>This code will expire in <strong>10 minutes</strong></li>
-                        <li>Do not share this code with anyone</li>
-                        <li>If you didn't request this code, please ignore this email</li>
-                    </ul>
-                    
-                    <div class="warning">
-                        <strong>Security Notice:</strong> oneQlick will never ask for your verification code via phone, email, or any other method. Keep this code confidential.
-                    </div>
-                    
-                    <p>If you're having trouble, please contact our support team.</p>
-                    
-                    <p>Best regards,<br>The oneQlick Team</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 oneQlick. All rights reserved.</p>
-                    <p>This is an automated message, please do not reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """)
-        
-        # Text Template
-        text_template = Template("""
-        oneQlick - {{ subject }}
-        
-        Hello {{ user_name }},
-        
-        You requested a verification code for {{ purpose }}. Use the code below to {{ action }}:
-        
-        Verification Code: {{ otp_code }}
-        
-        Important:
-        - This code will expire in 10 minutes
-        - Do not share this code with anyone
-        - If you didn't request this code, please ignore this email
-        
-        Security Notice: oneQlick will never ask for your verification code via phone, email, or any other method. Keep this code confidential.
-        
-        If you're having trouble, please contact our support team.
-        
-        Best regards,
-        The oneQlick Team
-        
-        © 2024 oneQlick. All rights reserved.
-        This is an automated message, please do not reply to this email.
-        """)
-        
-        html_content = html_template.render(
-            subject=subject,
-            user_name=user_name,
-            otp_code=otp_code,
-            purpose=purpose,
-            action=action
-        )
-        
-        text_content = text_template.render(
-            subject=subject,
-            user_name=user_name,
-            otp_code=otp_code,
-            purpose=purpose,
-            action=action
-        )
-        
-        return subject, html_content, text_content
-    
-    def _send_with_smtp(
-        self, 
-        to_email: str, 
-        subject: str, 
-        html_content: str
+    def _enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: str,
+        otp_code: Optional[str] = None
     ) -> bool:
-        """Send email using SMTP - DISABLED: Only logs to console"""
-        
-        # ============================================================
-        # EMAIL SENDING DISABLED - ONLY LOGGING TO CONSOLE
-        # ============================================================
-        
-        logger.info("=" * 80)
-        logger.info("📧 EMAIL NOTIFICATION (NOT SENT - LOGGED ONLY)")
-        logger.info("=" * 80)
-        logger.info(f"To: {to_email}")
-        logger.info(f"Subject: {subject}")
-        logger.info("-" * 80)
-        
-        # Extract OTP from HTML if present
-        import re
-        otp_match = re.search(r'<div class="otp-number">(\d{6})</div>', html_content)
-        if otp_match:
-            logger.info(f"🔐 OTP CODE: {otp_match.group(1)}")
-            logger.info("-" * 80)
-        # logger.info("=" * 80)
-        # logger.info("📧 EMAIL NOTIFICATION (NOT SENT - LOGGED ONLY)")
-        # logger.info("=" * 80)
-        # logger.info(f"To: {to_email}")
-        # logger.info(f"Subject: {subject}")
-        # logger.info("-" * 80)
-        
-        # # Extract OTP from HTML if present
-        # import re
-        # otp_match = re.search(r'<div class="otp-number">(\d{6})</div>', html_content)
-        # if otp_match:
-        #     logger.info(f"🔐 OTP CODE: {otp_match.group(1)}")
-        #     logger.info("-" * 80)
-        
-        # logger.info("✅ Email logged successfully (SMTP disabled)")
-        # logger.info("=" * 80)
-        
-        # # Always return True so signup/login continues
-        # return True
-        
-        # ===========================================================
-        # SMTP CODE COMMENTED OUT - NOT WORKING ON RAILWAY
-        # ===========================================================
+        """
+        Queue an email for the email worker.
+
+        Args:
+            otp_code: OTP carried alongside the email, so it can be logged without parsing the HTML
+
+        Returns:
+            True if queued, False if the queue is full
+        """
         try:
-            # Check if SMTP is configured
-            if not self.config.get("smtp_host") or not self.config.get("smtp_username"):
-                logger.warning("⚠️  SMTP not configured ")
-                return True
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.config["smtp_username"]
-            msg['To'] = to_email
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
-            
-            # Connect to SMTP server and send
-            if self.config["smtp_use_tls"]:
-                server = smtplib.SMTP(self.config["smtp_host"], self.config["smtp_port"])
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(self.config["smtp_host"], self.config["smtp_port"])
-        
-            server.login(self.config["smtp_username"], self.config["smtp_password"])
-            server.send_message(msg)
-            server.quit()
-            
-            logger.info(f"✅ Email sent successfully via SMTP to {to_email}")
+            self._queue.put_nowait({
+                "to_email": to_email,
+                "subject": subject,
+                "html_content": html_content,
+                "text_content": text_content,
+                "otp_code": otp_code,
+                "queued_at": time.monotonic()
+            })
             return True
-            
-        except Exception as e:
-            logger.error(f"❌ SMTP send failed: {e}")
+        except queue.Full:
+            logger.error(f"Email queue full, dropping email to {to_email}: {subject}")
+            return False
+
+    def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next queued email, or None if none arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def deliver(self, email: Dict[str, Any]) -> bool:
+        """
+        Send a queued email through the SMTP pool, retrying with backoff.
+        Called from the email worker threads.
+
+        Returns:
+            True if sent (or only logged because SMTP is not configured)
+        """
+        to_email, subject = email["to_email"], email["subject"]
+        logger.info(f"📧 Email to {to_email}: {subject}")
+
+        if self.pool is None:
+            logger.warning("⚠️  SMTP not configured, email logged only")
+            # Lets developers sign up without SMTP; never logged in production
+            if email.get("otp_code") and APP_ENV != "production":
+                logger.info(f"🔐 OTP CODE: {email['otp_code']}")
             return True
+
+        msg = build_message(
+            self.config["from_address"] or self.config["smtp_username"],
+            to_email,
+            subject,
+            email["html_content"],
+            email["text_content"]
+        )
+
+        attempts = self.config["send_attempts"]
+        for attempt in range(1, attempts + 1):
+            try:
+                self.pool.send(msg)
+                self.sent_count += 1
+                logger.info(
+                    f"✅ Email sent via SMTP to {to_email} "
+                    f"({time.monotonic() - email['queued_at']:.2f}s after queueing)"
+                )
+                return True
+            except smtplib.SMTPRecipientsRefused as e:
+                # Retrying will not help a refused address
+                logger.error(f"❌ SMTP refused recipient {to_email}: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"SMTP send to {to_email} failed (attempt {attempt}/{attempts}): {e}")
+                if attempt < attempts:
+                    time.sleep(min(2 ** attempt, 30))
+
+        self.failed_count += 1
+        logger.error(f"❌ Giving up on email to {to_email}: {subject}")
+        return False
+
+    def close(self):
+        """Close pooled SMTP connections"""
+        if self.pool is not None:
+            self.pool.close()
+
+    def get_status(self) -> dict:
+        """Queue and delivery statistics"""
+        return {
+            "smtp_configured": self.pool is not None,
+            "queued": self._queue.qsize(),
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "pool": self.pool.get_status() if self.pool is not None else None
+        }
     
     async def send_welcome_email(
         self, 
@@ -262,240 +170,26 @@ class EmailService:
         user_name: str,
         first_name: str = "User"
     ) -> bool:
-        """Send welcome email to new users"""
+        """
+        Queue welcome email to new users.
+
+        Returns:
+            True if queued, or only logged because SEND_WELCOME_EMAILS is off
+        """
         try:
-            # Generate email content
-            subject, html_content, text_content = self._generate_welcome_email_content(
-                user_name, first_name
+            subject, html_content, text_content = email_templates.render_welcome(
+                first_name, user_name
             )
             
-            # Use SMTP directly
-            return self._send_welcome_with_smtp(to_email, subject, html_content)
-                
-        except Exception as e:
-            logger.error(f"Failed to send welcome email: {e}")
-            return False
-    
-    async def send_welcome_email(
-        self, 
-        to_email: str, 
-        user_name: str,
-        first_name: str = "User"
-    ) -> bool:
-        """Send welcome email to new users"""
-        try:
-            # Generate email content
-            subject, html_content, text_content = self._generate_welcome_email_content(
-                user_name, first_name
-            )
+            if not self.config.get("send_welcome_emails"):
+                logger.info(f"📧 Welcome email to {to_email} logged only (SEND_WELCOME_EMAILS is off): {subject}")
+                return True
             
-            # Use SMTP directly
-            return self._send_welcome_with_smtp(to_email, subject, html_content)
+            return self._enqueue(to_email, subject, html_content, text_content)
                 
         except Exception as e:
-            logger.error(f"Failed to send welcome email: {e}")
+            logger.error(f"Failed to queue welcome email: {e}")
             return False
-    
-    def _generate_welcome_email_content(
-        self, 
-        user_name: str, 
-        first_name: str
-    ) -> tuple[str, str, str]:
-        """Generate welcome email content"""
-        
-        subject = "Welcome to oneQlick! 🎉 Your Food Journey Starts Here"
-        
-        # HTML Template
-        html_template = Template("""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Welcome to oneQlick</title>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background: linear-gradient(135deg, #FF6B35, #F7931E); color: white; padding: 40px; text-align: center; border-radius: 15px 15px 0 0; }
-                .content { background: #f9f9f9; padding: 40px; border-radius: 0 0 15px 15px; }
-                .feature { background: #fff; padding: 20px; margin: 15px 0; border-radius: 10px; border-left: 4px solid #FF6B35; }
-                .cta-button { display: inline-block; background: #FF6B35; color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; margin: 20px 0; font-weight: bold; }
-                .footer { text-align: center; margin-top: 30px; color: #666; font-size: 14px; }
-                .emoji { font-size: 24px; margin-right: 10px; }
-                .highlight { background: #fff3cd; border: 1px solid #ffeaa7; color: #856404; padding: 15px; border-radius: 8px; margin: 20px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Welcome to oneQlick!</h1>
-                    <h2>Your Food Journey Starts Here</h2>
-                </div>
-                <div class="content">
-                    <p>Hello <strong>{{ first_name }}</strong>,</p>
-                    
-                    <p>🎉 <strong>Congratulations!</strong> Your account has been successfully created and verified. We're thrilled to have you join the oneQlick family!</p>
-                    
-                    <div class="highlight">
-                        <strong>🎁 Special Welcome Offer:</strong> Get 20% off your first order! Use code <strong>WELCOME20</strong> at checkout.
-                    </div>
-                    
-                    <h3>What you can do now:</h3>
-                    
-                    <div class="feature">
-                        <span class="emoji">🍕</span>
-                        <strong>Explore Restaurants</strong><br>
-                        Browse thousands of restaurants and cuisines in your area
-                    </div>
-                    
-                    <div class="feature">
-                        <span class="emoji">📱</span>
-                        <strong>Easy Ordering</strong><br>
-                        Order your favorite food with just a few taps
-                    </div>
-                    
-                    <div class="feature">
-                        <span class="emoji">🚚</span>
-                        <strong>Real-time Tracking</strong><br>
-                        Track your orders from kitchen to your doorstep
-                    </div>
-                    
-                    <div class="feature">
-                        <span class="emoji">⭐</span>
-                        <strong>Loyalty Rewards</strong><br>
-                        Earn points with every order and unlock exclusive benefits
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="#" class="cta-button">Start Ordering Now</a>
-                    </div>
-                    
-                    <h3>Need Help?</h3>
-                    <p>Our support team is here to help you 24/7. If you have any questions or need assistance, don't hesitate to reach out!</p>
-                    
-                    <p>Happy ordering and welcome to the oneQlick family! 🎉</p>
-                    
-                    <p>Best regards,<br><strong>The oneQlick Team</strong></p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 oneQlick. All rights reserved.</p>
-                    <p>This is an automated message, please do not reply to this email.</p>
-                    <p>Follow us on social media for the latest updates and offers!</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """)
-        
-        # Text Template
-        text_template = Template("""
-        Welcome to oneQlick! 🎉 Your Food Journey Starts Here
-        
-        Hello {{ first_name }},
-        
-        🎉 Congratulations! Your account has been successfully created and verified. We're thrilled to have you join the oneQlick family!
-        
-        🎁 Special Welcome Offer: Get 20% off your first order! Use code WELCOME20 at checkout.
-        
-        What you can do now:
-        
-        🍕 Explore Restaurants
-           Browse thousands of restaurants and cuisines in your area
-        
-        📱 Easy Ordering
-           Order your favorite food with just a few taps
-        
-        🚚 Real-time Tracking
-           Track your orders from kitchen to your doorstep
-        
-        ⭐ Loyalty Rewards
-           Earn points with every order and unlock exclusive benefits
-        
-        Need Help?
-        Our support team is here to help you 24/7. If you have any questions or need assistance, don't hesitate to reach out!
-        
-        Happy ordering and welcome to the oneQlick family! 🎉
-        
-        Best regards,
-        The oneQlick Team
-        
-        © 2024 oneQlick. All rights reserved.
-        This is an automated message, please do not reply to this email.
-        Follow us on social media for the latest updates and offers!
-        """)
-        
-        html_content = html_template.render(
-            first_name=first_name,
-            user_name=user_name
-        )
-        
-        text_content = text_template.render(
-            first_name=first_name,
-            user_name=user_name
-        )
-        
-        return subject, html_content, text_content
-    
-    def _send_welcome_with_smtp(
-        self, 
-        to_email: str, 
-        subject: str, 
-        html_content: str
-    ) -> bool:
-        """Send welcome email using SMTP - DISABLED: Only logs to console"""
-        
-        # ============================================================
-        # EMAIL SENDING DISABLED - ONLY LOGGING TO CONSOLE
-        # ============================================================
-        
-        logger.info("=" * 80)
-        logger.info("📧 WELCOME EMAIL (NOT SENT - LOGGED ONLY)")
-        logger.info("=" * 80)
-        logger.info(f"To: {to_email}")
-        logger.info(f"Subject: {subject}")
-        logger.info("-" * 80)
-        logger.info("✅ Welcome email logged successfully (SMTP disabled)")
-        logger.info("=" * 80)
-        
-        # Always return True so signup continues
-        return True
-        
-        # ============================================================
-        # SMTP CODE COMMENTED OUT - NOT WORKING ON RAILWAY
-        # ============================================================
-        # try:
-        #     # Check if SMTP is configured
-        #     if not self.config.get("smtp_host") or not self.config.get("smtp_username"):
-        #         logger.warning("⚠️  SMTP not configured")
-        #         return True
-        #     
-        #     # Create message
-        #     msg = MIMEMultipart('alternative')
-        #     msg['Subject'] = subject
-        #     msg['From'] = self.config["smtp_username"]
-        #     msg['To'] = to_email
-        #     
-        #     # Add HTML content
-        #     html_part = MIMEText(html_content, 'html', 'utf-8')
-        #     msg.attach(html_part)
-        #     
-        #     # Connect to SMTP server and send
-        #     if self.config["smtp_use_tls"]:
-        #         server = smtplib.SMTP(self.config["smtp_host"], self.config["smtp_port"])
-        #         server.starttls()
-        #     else:
-        #         server = smtplib.SMTP_SSL(self.config["smtp_host"], self.config["smtp_port"])
-        #     
-        #     server.login(self.config["smtp_username"], self.config["smtp_password"])
-        #     server.send_message(msg)
-        #     server.quit()
-        #     
-        #     logger.info(f"✅ Welcome email sent successfully via SMTP to {to_email}")
-        #     return True
-        #     
-        # except Exception as e:
-        #     logger.error(f"❌ SMTP welcome email send failed: {e}")
-        #     return True
 
 # Global email service instance
 email_service = EmailService()
\ No newline at end of file
@@ -0,0 +1,352 @@
+"""
+Email Templates
+
+The OTP and welcome emails are compiled once, at import. Everything that is
+the same for every recipient (layout, styles, the subject and wording for
+each OTP type) is rendered ahead of time, leaving each template as a list
+of static fragments around a few variable slots. Rendering an email is then
+a single join of those fragments with the per-recipient values, which are
+HTML-escaped in the HTML part.
+"""
+
+import html
+import re
+from email.charset import Charset, QP
+from email.mime.multipart import MIMEMultipart
+from email.mime.nonmultipart import MIMENonMultipart
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from jinja2 import Environment
+
+_env = Environment()
+
+# Quoted-printable keeps the mostly-ASCII bodies readable and smaller than base64
+_UTF8_QP = Charset("utf-8")
+_UTF8_QP.body_encoding = QP
+
+_SLOT_PATTERN = re.compile("\x00(\\d+)\x00")
+
+# otp_type -> (subject, purpose, action)
+OTP_PURPOSES = {
+    "email_verification": ("Verify Your Email - oneQlick", "email verification", "verify your email address"),
+    "phone_verification": ("Verify Your Phone - oneQlick", "phone verification", "verify your phone number"),
+    "password_reset": ("Reset Your Password - oneQlick", "password reset", "reset your password"),
+}
+DEFAULT_OTP_PURPOSE = ("Your Verification Code - oneQlick", "verification", "complete your verification")
+
+WELCOME_SUBJECT = "Welcome to oneQlick! 🎉 Your Food Journey Starts Here"
+
+OTP_HTML = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ subject }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #FF6B35, #F7931E); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .otp-code { background: #fff; border: 2px dashed #FF6B35; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; }
+        .otp-number { font-size: 32px; font-weight: bold; color: #FF6B35; letter-spacing: 5px; }
+        .footer { text-align: center; margin-top: 30px; color: #666; font-size: 14px; }
+        .button { display: inline-block; background: #FF6B35; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; margin: 10px 0; }
+        .warning { background: #fff3cd; border: 1px solid #ffeaa7; color: #856404; padding: 15px; border-radius: 5px; margin: 20px 0; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>oneQlick</h1>
+            <h2>{{ subject }}</h2>
+        </div>
+        <div class="content">
+            <p>Hello <strong>{{ user_name }}</strong>,</p>
+
+            <p>You requested a verification code for {{ purpose }}. Use the code below to {{ action }}:</p>
+
+            <div class="otp-code">
+                <div class="otp-number">{{ otp_code }}</div>
+                <p style="margin: 10px 0 0 0; color: #666;">Your verification code</p>
+            </div>
+
+            <p><strong>Important:</strong></p>
+            <ul>
+                <li>This code will expire in <strong>10 minutes</strong></li>
+                <li>Do not share this code with anyone</li>
+                <li>If you didn't request this code, please ignore this email</li>
+            </ul>
+
+            <div class="warning">
+                <strong>Security Notice:</strong> oneQlick will never ask for your verification code via phone, email, or any other method. Keep this code confidential.
+            </div>
+
+            <p>If you're having trouble, please contact our support team.</p>
+
+            <p>Best regards,<br>The oneQlick Team</p>
+        </div>
+        <div class="footer">
+            <p>© 2024 oneQlick. All rights reserved.</p>
+            <p>This is an automated message, please do not reply to this email.</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+OTP_TEXT = """\
+oneQlick - {{ subject }}
+
+Hello {{ user_name }},
+
+You requested a verification code for {{ purpose }}. Use the code below to {{ action }}:
+
+Verification Code: {{ otp_code }}
+
+Important:
+- This code will expire in 10 minutes
+- Do not share this code with anyone
+- If you didn't request this code, please ignore this email
+
+Security Notice: oneQlick will never ask for your verification code via phone, email, or any other method. Keep this code confidential.
+
+If you're having trouble, please contact our support team.
+
+Best regards,
+The oneQlick Team
+
+© 2024 oneQlick. All rights reserved.
+This is an automated message, please do not reply to this email.
+"""
+
+WELCOME_HTML = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Welcome to oneQlick</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #FF6B35, #F7931E); color: white; padding: 40px; text-align: center; border-radius: 15px 15px 0 0; }
+        .content { background: #f9f9f9; padding: 40px; border-radius: 0 0 15px 15px; }
+        .feature { background: #fff; padding: 20px; margin: 15px 0; border-radius: 10px; border-left: 4px solid #FF6B35; }
+        .cta-button { display: inline-block; background: #FF6B35; color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; margin: 20px 0; font-weight: bold; }
+        .footer { text-align: center; margin-top: 30px; color: #666; font-size: 14px; }
+        .emoji { font-size: 24px; margin-right: 10px; }
+        .highlight { background: #fff3cd; border: 1px solid #ffeaa7; color: #856404; padding: 15px; border-radius: 8px; margin: 20px 0; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Welcome to oneQlick!</h1>
+            <h2>Your Food Journey Starts Here</h2>
+        </div>
+        <div class="content">
+            <p>Hello <strong>{{ first_name }}</strong>,</p>
+
+            <p>🎉 <strong>Congratulations!</strong> Your account has been successfully created and verified. We're thrilled to have you join the oneQlick family!</p>
+
+            <div class="highlight">
+                <strong>🎁 Special Welcome Offer:</strong> Get 20% off your first order! Use code <strong>WELCOME20</strong> at checkout.
+            </div>
+
+            <h3>What you can do now:</h3>
+
+            <div class="feature">
+                <span class="emoji">🍕</span>
+                <strong>Explore Restaurants</strong><br>
+                Browse thousands of restaurants and cuisines in your area
+            </div>
+
+            <div class="feature">
+                <span class="emoji">📱</span>
+                <strong>Easy Ordering</strong><br>
+                Order your favorite food with just a few taps
+            </div>
+
+            <div class="feature">
+                <span class="emoji">🚚</span>
+                <strong>Real-time Tracking</strong><br>
+                Track your orders from kitchen to your doorstep
+            </div>
+
+            <div class="feature">
+                <span class="emoji">⭐</span>
+                <strong>Loyalty Rewards</strong><br>
+                Earn points with every order and unlock exclusive benefits
+            </div>
+
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="#" class="cta-button">Start Ordering Now</a>
+            </div>
+
+            <h3>Need Help?</h3>
+            <p>Our support team is here to help you 24/7. If you have any questions or need assistance, don't hesitate to reach out!</p>
+
+            <p>Happy ordering and welcome to the oneQlick family! 🎉</p>
+
+            <p>Best regards,<br><strong>The oneQlick Team</strong></p>
+        </div>
+        <div class="footer">
+            <p>© 2024 oneQlick. All rights reserved.</p>
+            <p>This is an automated message, please do not reply to this email.</p>
+            <p>Follow us on social media for the latest updates and offers!</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+WELCOME_TEXT = """\
+Welcome to oneQlick! 🎉 Your Food Journey Starts Here
+
+Hello {{ first_name }},
+
+🎉 Congratulations! Your account has been successfully created and verified. We're thrilled to have you join the oneQlick family!
+
+🎁 Special Welcome Offer: Get 20% off your first order! Use code WELCOME20 at checkout.
+
+What you can do now:
+
+🍕 Explore Restaurants
+   Browse thousands of restaurants and cuisines in your area
+
+📱 Easy Ordering
+   Order your favorite food with just a few taps
+
+🚚 Real-time Tracking
+   Track your orders from kitchen to your doorstep
+
+⭐ Loyalty Rewards
+   Earn points with every order and unlock exclusive benefits
+
+Need Help?
+Our support team is here to help you 24/7. If you have any questions or need assistance, don't hesitate to reach out!
+
+Happy ordering and welcome to the oneQlick family! 🎉
+
+Best regards,
+The oneQlick Team
+
+© 2024 oneQlick. All rights reserved.
+This is an automated message, please do not reply to this email.
+Follow us on social media for the latest updates and offers!
+"""
+
+
+class FragmentTemplate:
+    """A template pre-rendered down to static fragments and variable slots"""
+
+    def __init__(
+        self,
+        source: str,
+        fields: Sequence[str],
+        static: Optional[Dict[str, str]] = None,
+        escape: Optional[Callable[[str], str]] = None
+    ):
+        """
+        Args:
+            source: Jinja2 template source
+            fields: Variables that change per email; rendered later
+            static: Variables fixed for this template; rendered now
+            escape: Applied to field values (html.escape for HTML bodies)
+        """
+        markers = {field: f"\x00{index}\x00" for index, field in enumerate(fields)}
+        rendered = _env.from_string(source).render(**(static or {}), **markers)
+        parts = _SLOT_PATTERN.split(rendered)
+        self._fragments = parts[0::2]
+        self._slots = [fields[int(index)] for index in parts[1::2]]
+        self._escape = escape
+
+    def render(self, **values: str) -> str:
+        out = [self._fragments[0]]
+        for field, fragment in zip(self._slots, self._fragments[1:]):
+            value = str(values[field])
+            out.append(self._escape(value) if self._escape else value)
+            out.append(fragment)
+        return "".join(out)
+
+
+class EmailTemplates:
+    """Compiled OTP and welcome emails"""
+
+    def __init__(self):
+        self._otp = {
+            otp_type: self._compile_otp(*purpose)
+            for otp_type, purpose in OTP_PURPOSES.items()
+        }
+        self._otp_default = self._compile_otp(*DEFAULT_OTP_PURPOSE)
+        self._welcome = (
+            WELCOME_SUBJECT,
+            FragmentTemplate(WELCOME_HTML, ("first_name", "user_name"), escape=html.escape),
+            FragmentTemplate(WELCOME_TEXT, ("first_name", "user_name"))
+        )
+
+    @staticmethod
+    def _compile_otp(subject: str, purpose: str, action: str):
+        static = {"subject": subject, "purpose": purpose, "action": action}
+        fields = ("user_name", "otp_code")
+        return (
+            subject,
+            FragmentTemplate(OTP_HTML, fields, static, escape=html.escape),
+            FragmentTemplate(OTP_TEXT, fields, static)
+        )
+
+    def render_otp(self, otp_code: str, user_name: str, otp_type: str) -> Tuple[str, str, str]:
+        """
+        Render an OTP email.
+
+        Returns:
+            (subject, html_content, text_content)
+        """
+        subject, html_template, text_template = self._otp.get(otp_type, self._otp_default)
+        return (
+            subject,
+            html_template.render(user_name=user_name, otp_code=otp_code),
+            text_template.render(user_name=user_name, otp_code=otp_code)
+        )
+
+    def render_welcome(self, first_name: str, user_name: str) -> Tuple[str, str, str]:
+        """
+        Render a welcome email.
+
+        Returns:
+            (subject, html_content, text_content)
+        """
+        subject, html_template, text_template = self._welcome
+        return (
+            subject,
+            html_template.render(first_name=first_name, user_name=user_name),
+            text_template.render(first_name=first_name, user_name=user_name)
+        )
+
+
+def _text_part(body: str, subtype: str) -> MIMENonMultipart:
+    part = MIMENonMultipart("text", subtype, charset="utf-8")
+    part.set_payload(body, _UTF8_QP)
+    return part
+
+
+def build_message(
+    from_address: str,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None
+) -> MIMEMultipart:
+    """multipart/alternative message with a plain-text part (if given) and an HTML part"""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_address
+    msg["To"] = to_email
+    if text_content:
+        msg.attach(_text_part(text_content, "plain"))
+    msg.attach(_text_part(html_content, "html"))
+    return msg
+
+
+# Global instance, compiled once at startup
+email_templates = EmailTemplates()
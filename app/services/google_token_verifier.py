@@ -0,0 +1,248 @@
+"""
+Google Token Verifier
+
+Verifies Google ID tokens locally instead of calling Google's tokeninfo
+endpoint on every sign-in.
+
+- Google's signing keys (JWKS) are cached in process. A background task
+  fetches them again shortly before the Cache-Control max-age runs out;
+  if a fetch fails the cached keys are kept and the fetch is retried.
+- A token is checked against the cached key named by its `kid`: RS256
+  signature, audience (our client ID), issuer and expiry.
+- A `kid` that is not in the cache means Google rotated keys since the
+  last fetch. That token is verified remotely through tokeninfo, and a
+  key refresh is started so later tokens are verified locally again.
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional
+import httpx
+from jose import jwt, JWTError
+from app.config.config import GOOGLE_OAUTH_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def parse_max_age(cache_control: Optional[str], default: int) -> int:
+    """Seconds a response may be cached according to its Cache-Control header"""
+    if cache_control:
+        if "no-store" in cache_control.lower() or "no-cache" in cache_control.lower():
+            return 0
+        match = _MAX_AGE_RE.search(cache_control)
+        if match:
+            return int(match.group(1))
+    return default
+
+
+class GoogleTokenVerifier:
+    """Local Google ID token verification against a cached JWKS"""
+
+    def __init__(
+        self,
+        client_id: str,
+        jwks_uri: str,
+        tokeninfo_uri: str,
+        issuers: List[str],
+        default_max_age_seconds: int = 3600,
+        min_refresh_seconds: float = 60,
+        clock_skew_seconds: int = 60,
+        http_timeout_seconds: float = 5.0
+    ):
+        """
+        Args:
+            client_id: Expected audience of the tokens
+            jwks_uri: Google's JWKS endpoint
+            tokeninfo_uri: Remote verification endpoint for unknown keys
+            issuers: Accepted `iss` values
+            default_max_age_seconds: Key cache lifetime when the JWKS response has no max-age
+            min_refresh_seconds: Least time between two key fetches; also the retry delay
+            clock_skew_seconds: Leeway for `exp`/`iat` checks
+            http_timeout_seconds: Timeout of calls to Google
+        """
+        self.client_id = client_id
+        self.jwks_uri = jwks_uri
+        self.tokeninfo_uri = tokeninfo_uri
+        self.issuers = issuers
+        self.default_max_age_seconds = default_max_age_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.clock_skew_seconds = clock_skew_seconds
+        self.http_timeout_seconds = http_timeout_seconds
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._last_fetch = float("-inf")
+        self._fetch_lock = None
+        self._refresher = None
+        self._pending_refresh = None
+        self._stats = {"local": 0, "remote": 0, "rejected": 0, "key_fetches": 0, "key_fetch_failures": 0}
+
+    # ------------------------------------------------------------------
+    # Signing keys
+    # ------------------------------------------------------------------
+
+    async def refresh_keys(self) -> bool:
+        """
+        Fetch the JWKS and replace the cached keys.
+
+        Returns:
+            True if the keys were fetched; on failure the cached keys are kept
+        """
+        if self._fetch_lock is None:
+            self._fetch_lock = asyncio.Lock()
+        async with self._fetch_lock:
+            self._last_fetch = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=self.http_timeout_seconds) as client:
+                    response = await client.get(self.jwks_uri)
+                response.raise_for_status()
+                keys = {key["kid"]: key for key in response.json()["keys"] if "kid" in key}
+            except Exception as e:
+                self._stats["key_fetch_failures"] += 1
+                logger.warning(f"Failed to fetch Google signing keys: {e}")
+                return False
+
+            max_age = parse_max_age(response.headers.get("cache-control"), self.default_max_age_seconds)
+            self._keys = keys
+            self._expires_at = time.monotonic() + max_age
+            self._stats["key_fetches"] += 1
+            logger.info(f"Fetched {len(keys)} Google signing keys, cached for {max_age}s")
+            return True
+
+    def _keys_fresh(self) -> bool:
+        return bool(self._keys) and time.monotonic() < self._expires_at
+
+    def _start_refresh(self):
+        """Refresh the keys in the background unless one ran too recently"""
+        if self._pending_refresh is not None and not self._pending_refresh.done():
+            return
+        if time.monotonic() - self._last_fetch < self.min_refresh_seconds:
+            return
+        self._pending_refresh = asyncio.create_task(self.refresh_keys())
+
+    async def _refresh_loop(self):
+        while True:
+            if self._keys_fresh():
+                # Refresh shortly before expiry so tokens never wait on a fetch
+                delay = max(self._expires_at - time.monotonic() - self.min_refresh_seconds, self.min_refresh_seconds)
+            elif time.monotonic() - self._last_fetch >= self.min_refresh_seconds:
+                delay = 0
+            else:
+                delay = self.min_refresh_seconds
+            await asyncio.sleep(delay)
+            await self.refresh_keys()
+
+    async def start(self):
+        """Start refreshing the keys in the background. Call on startup."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop the background refresh on shutdown"""
+        for task in (self._refresher, self._pending_refresh):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresher = None
+        self._pending_refresh = None
+
+    # ------------------------------------------------------------------
+    # Verification
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _user_info(claims: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "google_id": claims.get("sub"),
+            "email": claims.get("email"),
+            "name": claims.get("name"),
+            "given_name": claims.get("given_name"),
+            "family_name": claims.get("family_name"),
+            "picture": claims.get("picture"),
+            # tokeninfo returns "true"/"false" strings, the JWT has booleans
+            "email_verified": claims.get("email_verified") in (True, "true")
+        }
+
+    async def _verify_remote(self, id_token: str) -> Optional[Dict[str, Any]]:
+        async with httpx.AsyncClient(timeout=self.http_timeout_seconds) as client:
+            response = await client.get(self.tokeninfo_uri, params={"id_token": id_token})
+        if response.status_code != 200:
+            return None
+        claims = response.json()
+        if claims.get("aud") != self.client_id or claims.get("iss") not in self.issuers:
+            return None
+        self._stats["remote"] += 1
+        return self._user_info(claims)
+
+    async def verify(self, id_token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify a Google ID token.
+
+        Returns:
+            The user's Google profile, or None if the token is not valid for this app
+        """
+        try:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+        except JWTError:
+            self._stats["rejected"] += 1
+            return None
+
+        if not self._keys_fresh() and time.monotonic() - self._last_fetch >= self.min_refresh_seconds:
+            # Only when the background refresh isn't keeping up (not started, or failing)
+            await self.refresh_keys()
+
+        key = self._keys.get(kid)
+        if key is None:
+            logger.info(f"Google token signed with unknown key {kid}, verifying remotely")
+            self._start_refresh()
+            user_info = await self._verify_remote(id_token)
+            if user_info is None:
+                self._stats["rejected"] += 1
+            return user_info
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                audience=self.client_id,
+                issuer=self.issuers,
+                options={"verify_at_hash": False, "leeway": self.clock_skew_seconds}
+            )
+        except JWTError as e:
+            logger.info(f"Rejected Google token: {e}")
+            self._stats["rejected"] += 1
+            return None
+
+        self._stats["local"] += 1
+        return self._user_info(claims)
+
+    def get_status(self) -> dict:
+        return {
+            "cached_keys": len(self._keys),
+            "keys_expire_in_seconds": max(0, int(self._expires_at - time.monotonic())),
+            "local_verifications": self._stats["local"],
+            "remote_verifications": self._stats["remote"],
+            "rejected": self._stats["rejected"],
+            "key_fetches": self._stats["key_fetches"],
+            "key_fetch_failures": self._stats["key_fetch_failures"]
+        }
+
+
+# Global instance for the application
+google_token_verifier = GoogleTokenVerifier(
+    client_id=GOOGLE_OAUTH_CONFIG["client_id"],
+    jwks_uri=GOOGLE_OAUTH_CONFIG["jwks_uri"],
+    tokeninfo_uri=GOOGLE_OAUTH_CONFIG["tokeninfo_uri"],
+    issuers=GOOGLE_OAUTH_CONFIG["issuers"],
+    default_max_age_seconds=GOOGLE_OAUTH_CONFIG["jwks_default_max_age_seconds"],
+    min_refresh_seconds=GOOGLE_OAUTH_CONFIG["jwks_min_refresh_seconds"],
+    clock_skew_seconds=GOOGLE_OAUTH_CONFIG["clock_skew_seconds"],
+    http_timeout_seconds=GOOGLE_OAUTH_CONFIG["http_timeout_seconds"]
+)
@@ -0,0 +1,289 @@
+"""
+Location Ingestion Service
+
+Absorbs high-frequency delivery partner GPS pings without a Postgres write
+per ping:
+- The latest position per partner goes to a Redis hash (in-process dict when
+  Redis is unavailable) and is what order tracking reads as current location
+- Path points are buffered in memory and bulk-inserted into the order
+  tracking table by the location flush worker, together with one
+  DeliveryPartner position update per partner per flush
+
+A crashed worker loses at most one flush interval of path history; the
+latest position is unaffected when Redis is used. While Postgres is down,
+failed flushes are retried with exponential backoff and the buffer keeps
+only the newest max_buffer_size points.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+from uuid import UUID
+from sqlalchemy import insert, update, bindparam
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.db.postgres.models.order_tracking import OrderTracking
+from app.infra.db.postgres.models.delivery_partner import DeliveryPartner
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.utils.enums import OrderStatus
+from app.utils.order_utils import haversine_distance
+from app.config.config import LOCATION_INGEST_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Orders that will not be delivered any further
+FINISHED_ORDER_STATUSES = {OrderStatus.DELIVERED, OrderStatus.CANCELLED, OrderStatus.REFUNDED}
+
+
+class LocationIngestService:
+    """Buffered ingestion of delivery partner location updates"""
+
+    def __init__(
+        self,
+        max_buffer_size: int = 5000,
+        min_distance_m: float = 10,
+        latest_ttl_seconds: int = 3600,
+        max_retry_backoff_seconds: float = 60,
+        use_redis: bool = True
+    ):
+        self.max_buffer_size = max_buffer_size
+        self.min_distance_m = min_distance_m
+        self.latest_ttl_seconds = latest_ttl_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.use_redis = use_redis
+        self._redis = None
+        self._redis_checked = False
+        self._lock = threading.Lock()
+        self._path_buffer: deque = deque()
+        self._partner_buffer: Dict[str, dict] = {}
+        # order_id -> (partner_id, latitude, longitude), least recently pinged first
+        self._last_point: "OrderedDict[str, tuple]" = OrderedDict()
+        self._latest: Dict[str, dict] = {}
+        self.flush_requested = threading.Event()
+        self._flush_listeners: List[Callable[[Set[UUID]], None]] = []
+        self._failed_flushes = 0
+        self._retry_at = 0.0
+        self._stats = {"received": 0, "skipped": 0, "dropped": 0, "flushed_points": 0, "flushes": 0, "failed_flushes": 0}
+
+    def _get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client() if self.use_redis else None
+            self._redis_checked = True
+        return self._redis
+
+    @staticmethod
+    def _latest_key(partner_id: str) -> str:
+        return redis_key("loc", "partner", partner_id)
+
+    def record(
+        self,
+        partner_id: UUID,
+        order_id: UUID,
+        order_status: OrderStatus,
+        latitude: float,
+        longitude: float
+    ) -> dict:
+        """
+        Record a location ping.
+
+        Returns:
+            The stored latest-position entry
+        """
+        partner_key, order_key = str(partner_id), str(order_id)
+        recorded_at = datetime.utcnow()
+        latest = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "order_id": order_key,
+            "recorded_at": recorded_at.isoformat()
+        }
+        self._store_latest(partner_key, latest)
+
+        status_value = order_status.value if hasattr(order_status, "value") else order_status
+        with self._lock:
+            self._stats["received"] += 1
+            self._partner_buffer[partner_key] = {
+                "b_user_id": partner_id,
+                "b_latitude": latitude,
+                "b_longitude": longitude
+            }
+
+            # A parked rider keeps pinging the same spot; don't grow the path for it
+            previous = self._last_point.get(order_key)
+            if (
+                previous and previous[0] == partner_key
+                and haversine_distance(previous[1], previous[2], latitude, longitude) * 1000 < self.min_distance_m
+            ):
+                self._stats["skipped"] += 1
+            else:
+                self._last_point[order_key] = (partner_key, latitude, longitude)
+                self._last_point.move_to_end(order_key)
+                # Orders that stop pinging without finishing must not pile up
+                while len(self._last_point) > self.max_buffer_size:
+                    self._last_point.popitem(last=False)
+                self._path_buffer.append({
+                    "order_id": order_id,
+                    "status": status_value,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "notes": "Location updated",
+                    "created_at": recorded_at
+                })
+
+            self._trim_buffer()
+            if len(self._path_buffer) >= self.max_buffer_size and time.monotonic() >= self._retry_at:
+                self.flush_requested.set()
+
+        return latest
+
+    def _trim_buffer(self):
+        """Drop the oldest path points past max_buffer_size. Call with the lock held."""
+        while len(self._path_buffer) > self.max_buffer_size:
+            self._path_buffer.popleft()
+            self._stats["dropped"] += 1
+
+    def _store_latest(self, partner_key: str, latest: dict):
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                key = self._latest_key(partner_key)
+                pipe = redis_client.pipeline()
+                pipe.hset(key, mapping=latest)
+                pipe.expire(key, self.latest_ttl_seconds)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Failed to store latest location in Redis: {e}")
+        self._latest[partner_key] = latest
+
+    def get_latest(self, partner_id: UUID) -> Optional[dict]:
+        """
+        Get a partner's latest reported position.
+
+        Returns:
+            Dict with latitude, longitude, order_id and recorded_at, or None
+        """
+        partner_key = str(partner_id)
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                latest = redis_client.hgetall(self._latest_key(partner_key))
+                if latest:
+                    latest["latitude"] = float(latest["latitude"])
+                    latest["longitude"] = float(latest["longitude"])
+                    return latest
+            except Exception as e:
+                logger.warning(f"Failed to read latest location from Redis: {e}")
+        return self._latest.get(partner_key)
+
+    def sync_order(self, order_id: UUID, partner_id: Optional[UUID], order_status: OrderStatus):
+        """
+        Drop per-order dedupe state after an order change that ends its pings.
+
+        Args:
+            order_id: The changed order
+            partner_id: The order's delivery partner after the change, if any
+            order_status: The order's status after the change
+        """
+        order_key = str(order_id)
+        with self._lock:
+            previous = self._last_point.get(order_key)
+            if previous is None:
+                return
+            if order_status in FINISHED_ORDER_STATUSES or previous[0] != (str(partner_id) if partner_id else None):
+                del self._last_point[order_key]
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Write buffered path points and partner positions to Postgres.
+
+        Args:
+            force: Flush even while backing off after a failed flush (e.g. on shutdown)
+
+        Returns:
+            Number of path points written
+        """
+        with self._lock:
+            if not force and time.monotonic() < self._retry_at:
+                self.flush_requested.clear()
+                return 0
+            path_points, self._path_buffer = list(self._path_buffer), deque()
+            partner_positions, self._partner_buffer = list(self._partner_buffer.values()), {}
+            self.flush_requested.clear()
+
+        if not path_points and not partner_positions:
+            return 0
+
+        db = SessionLocal()
+        try:
+            if path_points:
+                db.execute(insert(OrderTracking), path_points)
+            if partner_positions:
+                partners = DeliveryPartner.__table__
+                db.execute(
+                    update(partners)
+                    .where(partners.c.user_id == bindparam("b_user_id"))
+                    .values(current_latitude=bindparam("b_latitude"), current_longitude=bindparam("b_longitude")),
+                    partner_positions
+                )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Put the points back so the next flush retries them, after a backoff
+            with self._lock:
+                self._path_buffer.extendleft(reversed(path_points))
+                self._trim_buffer()
+                for position in partner_positions:
+                    self._partner_buffer.setdefault(str(position["b_user_id"]), position)
+                self._failed_flushes += 1
+                self._stats["failed_flushes"] += 1
+                backoff = min(2 ** (self._failed_flushes - 1), self.max_retry_backoff_seconds)
+                self._retry_at = time.monotonic() + backoff
+            logger.error(f"Failed to flush {len(path_points)} location points, retrying in {backoff}s: {e}")
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            self._failed_flushes = 0
+            self._retry_at = 0.0
+            self._stats["flushes"] += 1
+            self._stats["flushed_points"] += len(path_points)
+        logger.debug(f"Flushed {len(path_points)} location points for {len(partner_positions)} partners")
+
+        if path_points:
+            order_ids = {point["order_id"] for point in path_points}
+            for listener in self._flush_listeners:
+                try:
+                    listener(order_ids)
+                except Exception as e:
+                    logger.warning(f"Location flush listener failed: {e}")
+        return len(path_points)
+
+    def add_flush_listener(self, listener: Callable[[Set[UUID]], None]):
+        """
+        Call listener with the ids of the orders whose path points were just
+        written, after every successful flush.
+        """
+        self._flush_listeners.append(listener)
+
+    def get_status(self) -> dict:
+        """Get buffer and throughput statistics"""
+        with self._lock:
+            return {
+                "buffered_points": len(self._path_buffer),
+                "buffered_partners": len(self._partner_buffer),
+                "latest_backend": "redis" if self._get_redis() is not None else "memory",
+                **self._stats
+            }
+
+
+# Global instance for the application
+location_ingest_service = LocationIngestService(
+    max_buffer_size=LOCATION_INGEST_CONFIG["max_buffer_size"],
+    min_distance_m=LOCATION_INGEST_CONFIG["min_distance_m"],
+    latest_ttl_seconds=LOCATION_INGEST_CONFIG["latest_ttl_seconds"],
+    max_retry_backoff_seconds=LOCATION_INGEST_CONFIG["max_retry_backoff_seconds"]
+)
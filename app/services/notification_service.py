@@ -6,13 +6,16 @@ marking as read, deletion, and broadcasting notifications to users.
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc
-from typing import Optional, List
+from sqlalchemy import and_, or_, func, desc, delete, insert, literal, null, select, tuple_, update
+from typing import Callable, Optional, List
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
 from app.infra.db.postgres.models.notification import Notification
 from app.infra.db.postgres.models.user import User
+from app.services.push_outbox_service import push_outbox_service
+from app.services.unread_counter_service import unread_counter_service
 from app.utils.enums import NotificationType, UserRole
+from app.utils.pagination import encode_cursor, decode_cursor
 from app.config.logger import get_logger
 
 logger = get_logger(__name__)
@@ -55,15 +58,28 @@ class NotificationService:
             )
             
             db.add(notification)
+            db.flush()
+            
+            # Queue the push in the same transaction so it is sent if and only if the notification exists
+            push_data = {
+                "notification_id": str(notification.notification_id),
+                "type": notification_type.value
+            }
+            if data_json:
+                push_data.update(data_json)
+            push_outbox_service.enqueue_for_user(db, user_id, title, message, push_data, commit=False)
+            
             db.commit()
             db.refresh(notification)
+            push_outbox_service.wake()
+            unread_counter_service.adjust(user_id, 1)
             
             logger.info(f"Created notification {notification.notification_id} for user {user_id}")
             
             # Send via WebSocket if user is connected
             websocket_sent = False
             try:
-                from app.api.routes.websocket import manager
+                from app.services.websocket_manager import manager
                 import asyncio
                 
                 notification_dict = {
@@ -77,64 +93,26 @@ class NotificationService:
                     "data_json": notification.data_json
                 }
                 
-                # Check if user is connected
-                if manager.is_user_connected(str(user_id)):
-                    # Send notification via WebSocket (synchronous in async context)
+                # send_notification checks whether the user is connected anywhere
+                try:
+                    # Get or create event loop
                     try:
-                        # Get or create event loop
-                        try:
-                            loop = asyncio.get_event_loop()
-                        except RuntimeError:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                        
-                        # Run the async send_notification in the loop
-                        loop.create_task(manager.send_notification(str(user_id), notification_dict))
-                        logger.info(f"📬 Queued WebSocket notification for user {user_id}")
-                        websocket_sent = True
-                    except Exception as send_error:
-                        logger.warning(f"Failed to queue WebSocket notification: {send_error}")
-                else:
-                    logger.debug(f"User {user_id} not connected to WebSocket, skipping real-time send")
+                        loop = asyncio.get_event_loop()
+                    except RuntimeError:
+                        loop = asyncio.new_event_loop()
+                        asyncio.set_event_loop(loop)
+                    
+                    # Run the async send_notification in the loop
+                    loop.create_task(manager.send_notification(str(user_id), notification_dict))
+                    logger.info(f"📬 Queued WebSocket notification for user {user_id}")
+                    websocket_sent = True
+                except Exception as send_error:
+                    logger.warning(f"Failed to queue WebSocket notification: {send_error}")
                 
             except Exception as ws_error:
                 # Log WebSocket error but don't fail notification creation
                 logger.warning(f"Failed to send WebSocket notification: {ws_error}")
             
-            # Send push notification if WebSocket wasn't sent or as backup
-            try:
-                from app.services.push_notification_service import push_service
-                import asyncio
-                
-                # Get or create event loop
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                # Send push notification asynchronously
-                push_data = {
-                    "notification_id": str(notification.notification_id),
-                    "type": notification_type.value
-                }
-                if data_json:
-                    push_data.update(data_json)
-                
-                loop.create_task(
-                    push_service.send_to_user(
-                        db=db,
-                        user_id=str(user_id),
-                        title=title,
-                        message=message,
-                        data=push_data
-                    )
-                )
-                logger.info(f"📱 Queued push notification for user {user_id}")
-                
-            except Exception as push_error:
-                logger.warning(f"Failed to send push notification: {push_error}")
-            
             return notification
             
         except Exception as e:
@@ -149,21 +127,31 @@ class NotificationService:
         page: int = 1,
         page_size: int = 20,
         unread_only: bool = False,
-        notification_type: Optional[NotificationType] = None
-    ) -> tuple[List[Notification], int]:
+        notification_type: Optional[NotificationType] = None,
+        cursor: Optional[str] = None
+    ) -> tuple[List[Notification], Optional[int], Optional[str]]:
         """
-        Get paginated notifications for a user.
+        Get a page of a user's notifications, newest first.
+        
+        With a cursor (from a previous page's next_cursor) the page is read
+        by keyset on (created_at, notification_id), which costs the same at
+        any depth, and no total is computed. Without one, page/offset
+        pagination with a total count is used.
         
         Args:
             db: Database session
             user_id: User ID
-            page: Page number (1-indexed)
+            page: Page number (1-indexed), ignored when a cursor is given
             page_size: Items per page
             unread_only: If True, only return unread notifications
             notification_type: Filter by notification type
+            cursor: Keyset cursor to continue after
             
         Returns:
-            Tuple of (notifications list, total count)
+            Tuple of (notifications list, total count or None, next cursor or None)
+            
+        Raises:
+            ValueError: If the cursor is malformed
         """
         try:
             query = db.query(Notification).filter(Notification.user_id == user_id)
@@ -175,16 +163,28 @@ class NotificationService:
             if notification_type:
                 query = query.filter(Notification.notification_type == notification_type)
             
-            # Get total count
-            total = query.count()
+            total = None
+            if cursor:
+                created_at, notification_id = decode_cursor(cursor)
+                query = query.filter(
+                    tuple_(Notification.created_at, Notification.notification_id) < (created_at, notification_id)
+                )
+            else:
+                total = query.count()
+                query = query.offset((page - 1) * page_size)
             
-            # Apply pagination and ordering
-            notifications = query.order_by(desc(Notification.created_at))\
-                .offset((page - 1) * page_size)\
-                .limit(page_size)\
+            # One extra row tells whether there is a next page
+            notifications = query.order_by(desc(Notification.created_at), desc(Notification.notification_id))\
+                .limit(page_size + 1)\
                 .all()
             
-            return notifications, total
+            next_cursor = None
+            if len(notifications) > page_size:
+                notifications = notifications[:page_size]
+                last = notifications[-1]
+                next_cursor = encode_cursor(last.created_at, last.notification_id)
+            
+            return notifications, total, next_cursor
             
         except Exception as e:
             logger.error(f"Error fetching notifications for user {user_id}: {e}")
@@ -203,14 +203,7 @@ class NotificationService:
             Count of unread notifications
         """
         try:
-            count = db.query(Notification)\
-                .filter(and_(
-                    Notification.user_id == user_id,
-                    Notification.is_read == False
-                ))\
-                .count()
-            
-            return count
+            return unread_counter_service.get(db, user_id)
             
         except Exception as e:
             logger.error(f"Error getting unread count for user {user_id}: {e}")
@@ -234,19 +227,33 @@ class NotificationService:
             Updated Notification object or None if not found
         """
         try:
-            notification = db.query(Notification)\
-                .filter(and_(
+            # Common case in one round trip: flip an unread notification
+            notification = db.execute(
+                update(Notification)
+                .where(and_(
                     Notification.notification_id == notification_id,
-                    Notification.user_id == user_id
-                ))\
-                .first()
-            
-            if not notification:
-                return None
-            
-            notification.is_read = True
+                    Notification.user_id == user_id,
+                    Notification.is_read == False
+                ))
+                .values(is_read=True)
+                .returning(Notification),
+                execution_options={"synchronize_session": False}
+            ).scalars().first()
+            
+            if notification is None:
+                # Already read, or not this user's notification
+                notification = db.query(Notification)\
+                    .filter(and_(
+                        Notification.notification_id == notification_id,
+                        Notification.user_id == user_id
+                    ))\
+                    .first()
+                return notification
+            
+            # Keep the loaded row usable after commit without reloading it
+            db.expunge(notification)
             db.commit()
-            db.refresh(notification)
+            unread_counter_service.adjust(user_id, -1)
             
             logger.info(f"Marked notification {notification_id} as read")
             return notification
@@ -277,6 +284,7 @@ class NotificationService:
                 .update({"is_read": True})
             
             db.commit()
+            unread_counter_service.reset(user_id)
             
             logger.info(f"Marked {count} notifications as read for user {user_id}")
             return count
@@ -304,18 +312,23 @@ class NotificationService:
             True if deleted, False if not found
         """
         try:
-            notification = db.query(Notification)\
-                .filter(and_(
+            deleted = db.execute(
+                delete(Notification)
+                .where(and_(
                     Notification.notification_id == notification_id,
                     Notification.user_id == user_id
-                ))\
-                .first()
+                ))
+                .returning(Notification.is_read),
+                execution_options={"synchronize_session": False}
+            ).first()
             
-            if not notification:
+            if deleted is None:
+                db.rollback()
                 return False
             
-            db.delete(notification)
             db.commit()
+            if deleted.is_read is False:
+                unread_counter_service.adjust(user_id, -1)
             
             logger.info(f"Deleted notification {notification_id}")
             return True
@@ -333,11 +346,18 @@ class NotificationService:
         notification_type: NotificationType,
         user_ids: Optional[List[UUID]] = None,
         role_filter: Optional[str] = None,
-        data_json: Optional[dict] = None
-    ) -> tuple[int, List[UUID]]:
+        data_json: Optional[dict] = None,
+        chunk_size: int = 5000,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> int:
         """
         Broadcast notification to multiple users (admin only).
-        
+
+        Rows are written with INSERT ... SELECT from the users table, so target
+        user IDs never travel to the application. Users are walked in user_id
+        order in chunks, one transaction per chunk, which keeps each
+        transaction short and lets a caller report progress.
+
         Args:
             db: Database session
             title: Notification title
@@ -346,49 +366,61 @@ class NotificationService:
             user_ids: Specific user IDs (if None, send to all or filtered by role)
             role_filter: Filter by user role
             data_json: Additional data as JSON
-            
+            chunk_size: Users written per transaction
+            on_progress: Called with the running total after each chunk
+
         Returns:
-            Tuple of (count of notifications sent, list of user IDs)
+            Count of notifications sent
         """
+        notifications = Notification.__table__
+        columns = ["notification_id", "user_id", "title", "message", "notification_type", "is_read", "data_json"]
+        sent = 0
+        last_user_id = None
+
         try:
-            # Determine target users
-            if user_ids:
-                target_user_ids = user_ids
-            else:
-                # Get all users or filter by role
-                query = db.query(User.user_id)
-                
+            while True:
+                targets = select(User.user_id).order_by(User.user_id).limit(chunk_size)
+                if user_ids:
+                    targets = targets.where(User.user_id.in_(user_ids))
                 if role_filter:
-                    query = query.filter(User.role == role_filter)
-                
-                target_user_ids = [user.user_id for user in query.all()]
-            
-            # Create notifications for all target users
-            notifications = []
-            for user_id in target_user_ids:
-                notification = Notification(
-                    user_id=user_id,
-                    title=title,
-                    message=message,
-                    notification_type=notification_type,
-                    data_json=data_json,
-                    is_read=False
+                    targets = targets.where(User.role == role_filter)
+                if last_user_id is not None:
+                    targets = targets.where(User.user_id > last_user_id)
+                targets = targets.subquery()
+
+                rows = select(
+                    func.gen_random_uuid(),
+                    targets.c.user_id,
+                    literal(title, notifications.c.title.type),
+                    literal(message, notifications.c.message.type),
+                    literal(notification_type, notifications.c.notification_type.type),
+                    literal(False),
+                    literal(data_json, notifications.c.data_json.type) if data_json is not None else null()
                 )
-                notifications.append(notification)
-            
-            db.bulk_save_objects(notifications)
-            db.commit()
-            
-            count = len(notifications)
-            logger.info(f"Broadcast {count} notifications")
-            
-            return count, target_user_ids
-            
+                inserted = db.execute(
+                    insert(notifications).from_select(columns, rows).returning(notifications.c.user_id)
+                ).scalars().all()
+                db.commit()
+
+                if not inserted:
+                    break
+                # Recount affected users' badges rather than adjusting each counter
+                unread_counter_service.bump_epoch()
+                sent += len(inserted)
+                last_user_id = max(inserted)
+                if on_progress:
+                    on_progress(sent)
+                if len(inserted) < chunk_size:
+                    break
+
+            logger.info(f"Broadcast {sent} notifications")
+            return sent
+
         except Exception as e:
             db.rollback()
-            logger.error(f"Error broadcasting notifications: {e}")
+            logger.error(f"Error broadcasting notifications after {sent} sent: {e}")
             raise
-    
+
     @staticmethod
     def get_notification_stats(db: Session) -> dict:
         """
@@ -401,37 +433,37 @@ class NotificationService:
             Dictionary with notification statistics
         """
         try:
-            # Total notifications
-            total_notifications = db.query(Notification).count()
-            
-            # Notifications sent today
             today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-            total_sent_today = db.query(Notification)\
-                .filter(Notification.created_at >= today_start)\
-                .count()
             
-            # Read/unread counts
-            total_read = db.query(Notification).filter(Notification.is_read == True).count()
-            total_unread = db.query(Notification).filter(Notification.is_read == False).count()
+            # One pass over the table: every figure is a filtered count
+            counts = [
+                func.count().label("total"),
+                func.count().filter(Notification.created_at >= today_start).label("today"),
+                func.count().filter(Notification.is_read == True).label("read"),
+                func.count().filter(Notification.is_read == False).label("unread"),
+            ] + [
+                func.count().filter(Notification.notification_type == notification_type).label(notification_type.value)
+                for notification_type in NotificationType
+            ]
+            row = db.query(*counts).select_from(Notification).one()._mapping
+            
+            total_notifications = row["total"]
+            total_read = row["read"]
             
             # Read rate
             read_rate = (total_read / total_notifications * 100) if total_notifications > 0 else 0
             
-            # Notifications by type
-            notifications_by_type = {}
-            type_counts = db.query(
-                Notification.notification_type,
-                func.count(Notification.notification_id)
-            ).group_by(Notification.notification_type).all()
-            
-            for notification_type, count in type_counts:
-                notifications_by_type[notification_type.value] = count
+            notifications_by_type = {
+                notification_type.value: row[notification_type.value]
+                for notification_type in NotificationType
+                if row[notification_type.value]
+            }
             
             return {
                 "total_notifications": total_notifications,
-                "total_sent_today": total_sent_today,
+                "total_sent_today": row["today"],
                 "total_read": total_read,
-                "total_unread": total_unread,
+                "total_unread": row["unread"],
                 "read_rate": round(read_rate, 2),
                 "notifications_by_type": notifications_by_type
             }
@@ -0,0 +1,140 @@
+"""
+Order Events
+
+Single place where order changes fan out to the rest of the system. Call
+order_created after committing a new order, order_changed after committing a
+change to an order (status, assignment, cancellation) and
+rider_location_updated after a location ping. Keeps the ready-order index,
+tracking snapshot cache and location dedupe state in step with Postgres,
+pushes the change to WebSocket clients following the order and appends it to
+the restaurant's order feed.
+
+Called from async route handlers, the restaurant feed append (a Redis script
+call) and its push run on a single background thread instead of the event
+loop; a single thread keeps each restaurant's events in sequence order.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.models.order import Order
+from app.services.ready_order_index import ready_order_index
+from app.services.order_tracking_service import order_tracking_service
+from app.services.location_ingest_service import location_ingest_service
+from app.services.restaurant_feed_service import restaurant_feed_service
+from app.utils.enums import OrderStatus
+from app.services.websocket_manager import manager
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Restaurant feed writes handed off from the event loop, in order
+_feed_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-feed")
+
+
+def order_topic(order_id: UUID) -> str:
+    """WebSocket topic for a single order's live updates"""
+    return f"order:{order_id}"
+
+
+def restaurant_topic(restaurant_id: UUID) -> str:
+    """WebSocket topic for a restaurant's live order feed"""
+    return f"restaurant:{restaurant_id}"
+
+
+def _status_value(order_status) -> str:
+    return order_status.value if hasattr(order_status, "value") else order_status
+
+
+def _restaurant_event(event_type: str, order: Order, notes: Optional[str]) -> dict:
+    """Order summary sent on the restaurant feed, enough to render an order card"""
+    return {
+        "type": event_type,
+        "order_id": str(order.order_id),
+        "order_number": order.order_number,
+        "order_status": _status_value(order.order_status),
+        "total_amount": float(order.total_amount) if order.total_amount is not None else None,
+        "special_instructions": order.special_instructions,
+        "estimated_delivery_time": order.estimated_delivery_time.isoformat() if order.estimated_delivery_time else None,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "notes": notes
+    }
+
+
+def _append_and_publish(restaurant_id: UUID, event: dict):
+    """Append to the restaurant's feed, then push to its connected tablets"""
+    try:
+        seq = restaurant_feed_service.append(restaurant_id, event)
+        manager.publish_nowait(restaurant_topic(restaurant_id), {**event, "seq": seq})
+    except Exception as e:
+        logger.warning(f"Failed to publish {event['type']} for order {event['order_id']}: {e}")
+
+
+def _publish_to_restaurant(order: Order, event: dict):
+    """Append an event to the restaurant's feed, off the event loop when called on it"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _append_and_publish(order.restaurant_id, event)
+        return
+    _feed_executor.submit(_append_and_publish, order.restaurant_id, event)
+
+
+def order_created(db: Session, order: Order):
+    """
+    Announce a newly placed order to its restaurant. Never raises.
+
+    Args:
+        db: Database session the order was committed with
+        order: The new order
+    """
+    try:
+        _publish_to_restaurant(order, _restaurant_event("order_created", order, None))
+    except Exception as e:
+        logger.warning(f"Failed to publish new order {order.order_id}: {e}")
+
+
+def order_changed(db: Session, order: Order, notes: Optional[str] = None):
+    """
+    Propagate a committed order change. Never raises.
+
+    Args:
+        db: Database session the order was committed with
+        order: The changed order
+        notes: Optional human readable note sent to subscribers
+    """
+    ready_order_index.sync_order(db, order)
+    try:
+        location_ingest_service.sync_order(order.order_id, order.delivery_partner_id, order.order_status)
+        order_tracking_service.invalidate(order.order_id)
+        manager.publish_nowait(order_topic(order.order_id), {
+            "type": "order_status",
+            "order_id": str(order.order_id),
+            "order_status": _status_value(order.order_status),
+            "delivery_partner_id": str(order.delivery_partner_id) if order.delivery_partner_id else None,
+            "estimated_delivery_time": order.estimated_delivery_time.isoformat() if order.estimated_delivery_time else None,
+            "notes": notes
+        })
+        event_type = "order_cancelled" if order.order_status == OrderStatus.CANCELLED else "order_status"
+        _publish_to_restaurant(order, _restaurant_event(event_type, order, notes))
+    except Exception as e:
+        logger.warning(f"Failed to publish change for order {order.order_id}: {e}")
+
+
+def rider_location_updated(order_id: UUID, latest: dict):
+    """
+    Push a rider position to clients following the order.
+
+    Args:
+        order_id: Order being delivered
+        latest: Latest-position entry from the location ingest service
+    """
+    manager.publish_nowait(order_topic(order_id), {
+        "type": "rider_location",
+        "order_id": str(order_id),
+        "latitude": latest["latitude"],
+        "longitude": latest["longitude"],
+        "recorded_at": latest.get("recorded_at")
+    })
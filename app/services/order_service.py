@@ -32,6 +32,7 @@ from app.utils.order_utils import (
 )
 from app.services.pricing_service import PricingService
 from app.services.cart_service import CartService
+from app.services import order_events
 from app.utils.enums import OrderStatus, PaymentStatus, CouponType, FoodStatus
 from fastapi import HTTPException, status
 
@@ -388,6 +389,7 @@ class OrderService:
             
             db.commit()
             db.refresh(order)
+            order_events.order_created(db, order)
             
             logger.info(f"Order created successfully: {order_number}")
             
@@ -467,6 +469,7 @@ class OrderService:
         
         db.commit()
         db.refresh(order)
+        order_events.order_changed(db, order, notes=cancellation_reason)
         
         logger.info(f"Order cancelled: {order.order_number}")
         
@@ -528,6 +531,7 @@ class OrderService:
         
         db.commit()
         db.refresh(order)
+        order_events.order_changed(db, order, notes=notes)
         
         logger.info(f"Order status updated: {order.order_number} -> {new_status.value}")
         
@@ -0,0 +1,225 @@
+"""
+Order Tracking Service
+
+Builds and caches order tracking snapshots. A snapshot (order, restaurant,
+address, partner and tracking history) is built once and cached in process
+and in Redis until the order changes or new path points are flushed; the
+rider's current location is laid over it from the live location store on
+every read. Live updates are pushed to WebSocket subscribers by the order
+events module, so clients only need the snapshot when they (re)connect.
+"""
+
+import json
+from typing import Iterable, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.models.order import Order
+from app.infra.db.postgres.models.order_tracking import OrderTracking
+from app.infra.db.postgres.models.restaurant import Restaurant
+from app.infra.db.postgres.models.address import Address
+from app.infra.db.postgres.models.user import User
+from app.infra.db.postgres.models.delivery_partner import DeliveryPartner
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.api.schemas.order_schemas import (
+    OrderTrackingDetailResponse,
+    OrderTrackingResponse,
+    RestaurantBasicResponse,
+    AddressResponse,
+    DeliveryPartnerResponse
+)
+from app.services.location_ingest_service import location_ingest_service
+from app.utils.cache import TTLCache
+from app.utils.enums import UserRole
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OrderTrackingService:
+    """Cached order tracking snapshots"""
+
+    def __init__(self, snapshot_ttl_seconds: int = 30, local_ttl_seconds: float = 2, use_redis: bool = True):
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self.use_redis = use_redis
+        # Short local TTL: other workers only invalidate the Redis copy
+        self._local = TTLCache(maxsize=5000, ttl=local_ttl_seconds)
+
+    @staticmethod
+    def _key(order_id: UUID) -> str:
+        return redis_key("tracking", "snapshot", order_id)
+
+    @staticmethod
+    def build_snapshot(db: Session, order_id: UUID) -> Optional[dict]:
+        """
+        Build a tracking snapshot from Postgres.
+
+        Returns:
+            Dict with "access" (ids used for authorization) and "tracking"
+            (OrderTrackingDetailResponse as JSON), or None if not found
+        """
+        row = db.query(Order, Restaurant, Address).join(
+            Restaurant, Restaurant.restaurant_id == Order.restaurant_id
+        ).join(
+            Address, Address.address_id == Order.delivery_address_id
+        ).filter(Order.order_id == order_id).first()
+
+        if not row:
+            return None
+        order, restaurant, address = row
+
+        tracking_history = db.query(OrderTracking).filter(
+            OrderTracking.order_id == order_id
+        ).order_by(OrderTracking.created_at).all()
+
+        delivery_partner_response = None
+        current_location = None
+        if order.delivery_partner_id:
+            partner_row = db.query(User, DeliveryPartner).join(
+                DeliveryPartner, DeliveryPartner.user_id == User.user_id
+            ).filter(User.user_id == order.delivery_partner_id).first()
+
+            if partner_row:
+                delivery_partner_user, delivery_partner = partner_row
+                delivery_partner_response = DeliveryPartnerResponse(
+                    user_id=delivery_partner_user.user_id,
+                    first_name=delivery_partner_user.first_name,
+                    last_name=delivery_partner_user.last_name,
+                    phone=delivery_partner_user.phone,
+                    profile_image=delivery_partner_user.profile_image,
+                    vehicle_type=delivery_partner.vehicle_type.value if delivery_partner.vehicle_type else None,
+                    vehicle_number=delivery_partner.vehicle_number,
+                    rating=delivery_partner.rating
+                )
+                if delivery_partner.current_latitude and delivery_partner.current_longitude:
+                    current_location = {
+                        "latitude": float(delivery_partner.current_latitude),
+                        "longitude": float(delivery_partner.current_longitude)
+                    }
+
+        tracking_detail = OrderTrackingDetailResponse(
+            order_id=order.order_id,
+            order_number=order.order_number,
+            order_status=order.order_status,
+            estimated_delivery_time=order.estimated_delivery_time,
+            restaurant=RestaurantBasicResponse(
+                restaurant_id=restaurant.restaurant_id,
+                name=restaurant.name,
+                phone=restaurant.phone,
+                image=restaurant.image,
+                address_line1=restaurant.address_line1,
+                city=restaurant.city
+            ),
+            delivery_address=AddressResponse(
+                address_id=address.address_id,
+                title=address.title,
+                address_line1=address.address_line1,
+                address_line2=address.address_line2,
+                city=address.city,
+                state=address.state,
+                postal_code=address.postal_code,
+                latitude=address.latitude,
+                longitude=address.longitude
+            ),
+            delivery_partner=delivery_partner_response,
+            current_location=current_location,
+            tracking_history=[
+                OrderTrackingResponse(
+                    order_tracking_id=t.order_tracking_id,
+                    status=t.status,
+                    latitude=t.latitude,
+                    longitude=t.longitude,
+                    notes=t.notes,
+                    created_at=t.created_at
+                ) for t in tracking_history
+            ]
+        )
+
+        return {
+            "access": {
+                "customer_id": str(order.customer_id),
+                "delivery_partner_id": str(order.delivery_partner_id) if order.delivery_partner_id else None,
+                "restaurant_owner_id": str(restaurant.owner_id) if restaurant.owner_id else None
+            },
+            "tracking": tracking_detail.model_dump(mode="json")
+        }
+
+    def get_snapshot(self, db: Session, order_id: UUID) -> Optional[dict]:
+        """
+        Get a tracking snapshot, from cache when possible.
+
+        The rider's live position replaces the cached current_location.
+        """
+        snapshot = self._local.get(order_id)
+
+        if snapshot is None:
+            redis_client = get_redis_client() if self.use_redis else None
+            if redis_client is not None:
+                try:
+                    cached = redis_client.get(self._key(order_id))
+                    if cached:
+                        snapshot = json.loads(cached)
+                except Exception as e:
+                    logger.warning(f"Failed to read tracking snapshot from Redis: {e}")
+
+            if snapshot is None:
+                snapshot = self.build_snapshot(db, order_id)
+                if snapshot is None:
+                    return None
+                if redis_client is not None:
+                    try:
+                        redis_client.set(self._key(order_id), json.dumps(snapshot), ex=self.snapshot_ttl_seconds)
+                    except Exception as e:
+                        logger.warning(f"Failed to cache tracking snapshot in Redis: {e}")
+
+            self._local.set(order_id, snapshot)
+
+        partner_id = snapshot["access"]["delivery_partner_id"]
+        if partner_id:
+            latest = location_ingest_service.get_latest(partner_id)
+            if latest and latest.get("order_id") == str(order_id):
+                snapshot = {
+                    **snapshot,
+                    "tracking": {
+                        **snapshot["tracking"],
+                        "current_location": {"latitude": latest["latitude"], "longitude": latest["longitude"]}
+                    }
+                }
+        return snapshot
+
+    def invalidate(self, order_id: UUID):
+        """Drop cached snapshots after the order changed"""
+        self.invalidate_many([order_id])
+
+    def invalidate_many(self, order_ids: Iterable[UUID]):
+        """Drop cached snapshots of several orders in one Redis call"""
+        keys = []
+        for order_id in order_ids:
+            self._local.delete(order_id)
+            keys.append(self._key(order_id))
+        redis_client = get_redis_client() if self.use_redis and keys else None
+        if redis_client is not None:
+            try:
+                redis_client.delete(*keys)
+            except Exception as e:
+                logger.warning(f"Failed to invalidate tracking snapshot: {e}")
+
+    @staticmethod
+    def can_view(snapshot: dict, user: User) -> bool:
+        """
+        Customer, assigned partner, restaurant owner and admins may follow an order.
+
+        user may be a User or any object with user_id and role (e.g. a WebSocket principal).
+        """
+        access = snapshot["access"]
+        user_id = str(user.user_id)
+        return (
+            user_id in (access["customer_id"], access["delivery_partner_id"], access["restaurant_owner_id"])
+            or user.role == UserRole.ADMIN
+        )
+
+
+# Global instance for the application
+order_tracking_service = OrderTrackingService()
+
+# Flushed path points change the snapshot's tracking history
+location_ingest_service.add_flush_listener(order_tracking_service.invalidate_many)
@@ -0,0 +1,180 @@
+"""
+OTP Limiter Service
+
+Counters behind OTP send limits, verification attempts and lockouts, kept
+in Redis so each check is one atomic round trip instead of counting or
+updating OTP rows in Postgres.
+
+A counter lives in a fixed window that starts with its first hit. Counting
+a hit and reading the result is a single MULTI (set-if-absent with the
+window TTL, INCR, TTL), so concurrent requests can't both slip under a
+limit. When a hit reaches the limit, an optional lockout restarts the TTL
+so the identifier stays blocked for the full lockout from that moment.
+
+Without Redis the counters are kept in process (development / single node).
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Expired in-process counters are swept once this many are held
+MEMORY_SWEEP_THRESHOLD = 10000
+
+
+class MemoryCounterStore:
+    """In-memory counters for development / single-node deployments"""
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[int, float]]:
+        entry = self._counters.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._counters[key]
+            return None
+        return entry
+
+    def hit(self, key: str, window_seconds: int) -> Tuple[int, int]:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._counters) >= MEMORY_SWEEP_THRESHOLD:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+            entry = self._live(key, now)
+            count, expires_at = entry if entry else (0, now + window_seconds)
+            self._counters[key] = (count + 1, expires_at)
+            return count + 1, max(1, int(expires_at - now))
+
+    def peek(self, key: str) -> Tuple[int, int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                return 0, 0
+            return entry[0], max(1, int(entry[1] - now))
+
+    def expire(self, key: str, seconds: int):
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is not None:
+                self._counters[key] = (entry[0], time.monotonic() + seconds)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class RedisCounterStore:
+    """Redis counters shared by all processes"""
+
+    def __init__(self, redis_client):
+        self._redis = redis_client
+
+    def hit(self, key: str, window_seconds: int) -> Tuple[int, int]:
+        pipe = self._redis.pipeline()
+        pipe.set(key, 0, ex=window_seconds, nx=True)
+        pipe.incr(key)
+        pipe.ttl(key)
+        _, count, ttl = pipe.execute()
+        return count, max(ttl, 1)
+
+    def peek(self, key: str) -> Tuple[int, int]:
+        pipe = self._redis.pipeline()
+        pipe.get(key)
+        pipe.ttl(key)
+        count, ttl = pipe.execute()
+        if count is None:
+            return 0, 0
+        return int(count), max(ttl, 1)
+
+    def expire(self, key: str, seconds: int):
+        self._redis.expire(key, seconds)
+
+    def reset(self, key: str):
+        self._redis.delete(key)
+
+
+class OTPLimiterService:
+    """Windowed counters with lockouts for OTP flows"""
+
+    def __init__(self, use_redis: bool = True):
+        """
+        Args:
+            use_redis: Whether to keep counters in Redis
+        """
+        self.use_redis = use_redis
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            redis_client = get_redis_client() if self.use_redis else None
+            if redis_client is not None:
+                self._store = RedisCounterStore(redis_client)
+                logger.info("OTP limiter using Redis storage")
+            else:
+                self._store = MemoryCounterStore()
+                logger.info("OTP limiter using in-memory storage")
+        return self._store
+
+    @staticmethod
+    def _key(scope: str, identifier: str) -> str:
+        return redis_key("otp", scope, identifier.strip().lower())
+
+    @staticmethod
+    def _result(count: int, limit: int, retry_after: int) -> Dict[str, int]:
+        return {
+            "count": count,
+            "limit": limit,
+            "remaining": max(0, limit - count),
+            "allowed": count <= limit,
+            "retry_after": retry_after
+        }
+
+    def hit(
+        self,
+        scope: str,
+        identifier: str,
+        limit: int,
+        window_seconds: int,
+        lockout_seconds: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Count one event against a limit.
+
+        Args:
+            scope: Kind of event, e.g. "send" or "verify"
+            identifier: Who it is counted for (email, phone, OTP id)
+            limit: Events allowed per window; the hit that exceeds it is not allowed
+            window_seconds: Window length, starting at the first event
+            lockout_seconds: Once the limit is reached, keep the counter (and so
+                the block) for this long from that moment
+
+        Returns:
+            {"count", "limit", "remaining", "allowed", "retry_after"}; retry_after
+            is the seconds until the counter resets
+        """
+        key = self._key(scope, identifier)
+        count, retry_after = self.store.hit(key, window_seconds)
+        if lockout_seconds and count == limit:
+            self.store.expire(key, lockout_seconds)
+            retry_after = lockout_seconds
+        return self._result(count, limit, retry_after)
+
+    def peek(self, scope: str, identifier: str, limit: int) -> Dict[str, int]:
+        """Current state of a counter without counting an event"""
+        count, retry_after = self.store.peek(self._key(scope, identifier))
+        return {**self._result(count, limit, retry_after), "allowed": count < limit}
+
+    def reset(self, scope: str, identifier: str):
+        """Clear a counter, e.g. after a successful verification"""
+        self.store.reset(self._key(scope, identifier))
+
+
+# Global instance for the application
+otp_limiter_service = OTPLimiterService()
@@ -0,0 +1,194 @@
+"""
+Partition Maintenance Service
+
+Keeps a table that is range-partitioned by month on a timestamp column in
+shape (see migrations/partition_notifications_by_month.sql):
+- creates the partitions for the next few months ahead of time, so inserts
+  never hit a missing partition
+- expires partitions older than the retention period, either dropping them
+  or detaching them into an archive schema for offline export
+
+Partitions are named "<table>_pYYYYMM"; partitions with other names are left
+alone. Dropping a whole month is a metadata operation, unlike a DELETE, so
+retention leaves no dead tuples or index bloat behind.
+
+Runs take a transaction-scoped advisory lock, so when every application
+worker schedules maintenance only one of them does the work at a time.
+"""
+
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.db.postgres.models.notification import Notification
+from app.config.config import NOTIFICATION_RETENTION_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after (or before) the given month"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class PartitionMaintenanceService:
+    """Monthly partition creation and retention for one table"""
+
+    def __init__(
+        self,
+        table: str,
+        premake_months: int = 3,
+        retention_months: int = 6,
+        expire_action: str = "drop",
+        archive_schema: str = "archive",
+        expire_enabled: bool = True
+    ):
+        """
+        Args:
+            table: Partitioned parent table
+            premake_months: Months of partitions to keep ready after the current one
+            retention_months: Full months kept before the current one
+            expire_action: "drop" or "archive"
+            archive_schema: Schema expired partitions are moved to when archiving
+            expire_enabled: Expire old partitions; upcoming ones are created either way
+        """
+        if expire_action not in ("drop", "archive"):
+            raise ValueError(f"Unknown partition expire action: {expire_action}")
+        self.table = table
+        self.premake_months = premake_months
+        self.retention_months = retention_months
+        self.expire_action = expire_action
+        self.archive_schema = archive_schema
+        self.expire_enabled = expire_enabled
+        self._name_pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+        self.last_run: Optional[dict] = None
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.table}_p{month.year:04d}{month.month:02d}"
+
+    def partition_month(self, name: str) -> Optional[date]:
+        """Month a partition covers, or None if the name is not one of ours"""
+        match = self._name_pattern.match(name)
+        return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+    def upcoming_months(self, today: date) -> List[date]:
+        """Months that must have a partition: the current one and the premade ones"""
+        current = today.replace(day=1)
+        return [add_months(current, offset) for offset in range(self.premake_months + 1)]
+
+    def expired_partitions(self, partitions: List[str], today: date) -> List[str]:
+        """Partitions whose whole month is older than the retention period"""
+        cutoff = add_months(today.replace(day=1), -self.retention_months)
+        return sorted(
+            name for name in partitions
+            if (month := self.partition_month(name)) is not None and month < cutoff
+        )
+
+    def is_partitioned(self, db: Session) -> bool:
+        return db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ),
+            {"table": self.table}
+        ).first() is not None
+
+    def list_partitions(self, db: Session) -> List[str]:
+        return list(db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent "
+                "JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)"
+            ),
+            {"table": self.table}
+        ).scalars())
+
+    def create_upcoming(self, db: Session, today: date) -> List[str]:
+        """Create missing partitions for the current and upcoming months"""
+        existing = set(self.list_partitions(db))
+        created = []
+        for month in self.upcoming_months(today):
+            name = self.partition_name(month)
+            if name in existing:
+                continue
+            db.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self.table}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        return created
+
+    def expire_old(self, db: Session, today: date) -> List[str]:
+        """Drop or archive partitions past the retention period"""
+        expired = self.expired_partitions(self.list_partitions(db), today)
+        if expired and self.expire_action == "archive":
+            db.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{self.archive_schema}"'))
+        for name in expired:
+            if self.expire_action == "archive":
+                db.execute(text(f'ALTER TABLE "{self.table}" DETACH PARTITION "{name}"'))
+                db.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{self.archive_schema}"'))
+            else:
+                db.execute(text(f'DROP TABLE "{name}"'))
+        return expired
+
+    def run(self, today: Optional[date] = None) -> Dict[str, object]:
+        """
+        Run one maintenance pass.
+
+        Returns:
+            Partitions created and expired, or why the pass was skipped
+        """
+        today = today or datetime.now(timezone.utc).date()
+        db = SessionLocal()
+        try:
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(hashtext(:lock))"),
+                {"lock": f"partition_maintenance:{self.table}"}
+            ).scalar()
+            if not locked:
+                result = {"skipped": "another worker is running maintenance"}
+            elif not self.is_partitioned(db):
+                logger.warning(f"{self.table} is not partitioned; apply the partitioning migration first")
+                result = {"skipped": "table is not partitioned"}
+            else:
+                created = self.create_upcoming(db, today)
+                expired = self.expire_old(db, today) if self.expire_enabled else []
+                result = {"created": created, "expired": expired, "expire_action": self.expire_action}
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if result.get("created") or result.get("expired"):
+            logger.info(f"Partition maintenance on {self.table}: {result}")
+        self.last_run = {"at": datetime.now(timezone.utc).isoformat(), **result}
+        return result
+
+    def get_status(self) -> dict:
+        return {
+            "table": self.table,
+            "premake_months": self.premake_months,
+            "retention_months": self.retention_months,
+            "expire_enabled": self.expire_enabled,
+            "expire_action": self.expire_action,
+            "last_run": self.last_run
+        }
+
+
+# Global instance for the notifications table
+notification_partition_service = PartitionMaintenanceService(
+    table=Notification.__tablename__,
+    premake_months=NOTIFICATION_RETENTION_CONFIG["premake_months"],
+    retention_months=NOTIFICATION_RETENTION_CONFIG["retention_months"],
+    expire_action=NOTIFICATION_RETENTION_CONFIG["expire_action"],
+    archive_schema=NOTIFICATION_RETENTION_CONFIG["archive_schema"],
+    expire_enabled=NOTIFICATION_RETENTION_CONFIG["enabled"]
+)
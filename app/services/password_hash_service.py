@@ -0,0 +1,145 @@
+"""
+Password Hash Service
+
+Runs bcrypt hashing and verification on a small dedicated thread pool so the
+event loop is never blocked for the tens to hundreds of milliseconds each
+call takes. bcrypt releases the GIL while it works, so threads give real
+parallelism up to the pool size.
+
+Admission is bounded: when max_pending calls are already queued or running,
+new ones are rejected with 503 and a Retry-After header instead of piling
+up behind a login burst, so unrelated requests keep being served.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+import bcrypt
+from fastapi import HTTPException, status
+from app.config.config import PASSWORD_HASH_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordHashService:
+    """Bounded off-loop bcrypt"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, retry_after_seconds: int = 1):
+        """
+        Args:
+            max_workers: bcrypt calls running at once
+            max_pending: Calls queued or running before new ones are rejected
+            retry_after_seconds: Retry-After sent with rejections
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after_seconds = retry_after_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _admit(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                rejected = self.rejected
+            else:
+                self.pending += 1
+                return
+        if rejected % 100 == 1:
+            logger.warning(f"Password hashing saturated ({self.max_pending} pending), rejected {rejected} so far")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": str(self.retry_after_seconds)}
+        )
+
+    def _run(self, fn: Callable, args: tuple, queued_at: float) -> Any:
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self.running += 1
+            self.started += 1
+            self._wait_total += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _done(self, _future):
+        # Also called for calls cancelled before they started
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def _submit(self, fn: Callable, *args) -> Any:
+        self._admit()
+        try:
+            future = self._executor.submit(self._run, fn, args, time.monotonic())
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password (or token) with bcrypt.
+
+        Raises:
+            HTTPException: 503 when too many hashes are already pending
+        """
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Check a password (or token) against a bcrypt hash.
+
+        Raises:
+            HTTPException: 503 when too many hashes are already pending
+        """
+        return await self._submit(_verify, password, hashed_password)
+
+    def shutdown(self):
+        """Stop the pool; calls already queued still finish"""
+        self._executor.shutdown(wait=False)
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._wait_total / self.started * 1000, 2) if self.started else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2)
+            }
+
+
+# Global instance for the application
+password_hash_service = PasswordHashService(
+    max_workers=PASSWORD_HASH_CONFIG["max_workers"],
+    max_pending=PASSWORD_HASH_CONFIG["max_pending"],
+    retry_after_seconds=PASSWORD_HASH_CONFIG["retry_after_seconds"]
+)
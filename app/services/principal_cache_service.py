@@ -0,0 +1,261 @@
+"""
+Principal Cache Service
+
+Caches what authentication needs to know about a user (role, status and a
+minimal profile) so resolving the caller of an API request or WebSocket does
+not query Postgres every time.
+
+- Two tiers: a short-lived in-process cache in front of a Redis entry with a
+  longer TTL. Without Redis only the in-process tier is used.
+- Anything that changes a cached field (status, role, profile updates) or
+  ends a session (logout, session revocation) invalidates the user's entry.
+  Invalidation clears Redis and this process; other processes keep their
+  in-process copy for at most local_ttl_seconds.
+- get_current_user hands out a Principal: the cached fields are read
+  directly, and the full User row is only loaded from the request's session
+  when a handler needs something else or modifies the user.
+"""
+
+import json
+from typing import Any, Dict, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.db.postgres.models.user import User
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.utils.cache import TTLCache
+from app.config.config import PRINCIPAL_CACHE_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# User columns kept in the cache
+PRINCIPAL_FIELDS = ("role", "status", "email", "phone", "first_name", "last_name")
+
+_PRINCIPAL_SLOTS = ("_data", "_db", "_user")
+
+
+def _parse_user_id(user_id: Any) -> Optional[UUID]:
+    if isinstance(user_id, UUID):
+        return user_id
+    try:
+        return UUID(str(user_id))
+    except ValueError:
+        return None
+
+
+class Principal:
+    """
+    The authenticated user, as returned by get_current_user.
+
+    user_id and the cached fields are read without touching the database.
+    Reading any other attribute, or assigning one, loads the User row from
+    the request's session once and delegates to it from then on, so handlers
+    can keep treating the principal like a User. Use `.user` where a mapped
+    instance is required (db.refresh, relationships).
+    """
+
+    __slots__ = _PRINCIPAL_SLOTS
+
+    def __init__(self, data: Dict[str, Any], db: Optional[Session] = None, user: Optional[User] = None):
+        object.__setattr__(self, "_data", data)
+        object.__setattr__(self, "_db", db)
+        object.__setattr__(self, "_user", user)
+
+    @property
+    def user(self) -> User:
+        """The User row, loaded from the request's session on first use"""
+        user = object.__getattribute__(self, "_user")
+        if user is None:
+            db = object.__getattribute__(self, "_db")
+            if db is None:
+                raise RuntimeError("Principal has no database session to load the user from")
+            user = db.get(User, self.user_id)
+            if user is None:
+                raise LookupError(f"User {self.user_id} no longer exists")
+            object.__setattr__(self, "_user", user)
+        return user
+
+    @property
+    def user_id(self) -> UUID:
+        return object.__getattribute__(self, "_data")["user_id"]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        user = object.__getattribute__(self, "_user")
+        if user is None:
+            data = object.__getattribute__(self, "_data")
+            if name in data:
+                return data[name]
+        return getattr(self.user, name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.user, name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        other_id = getattr(other, "user_id", None)
+        return other_id is not None and other_id == self.user_id
+
+    def __hash__(self) -> int:
+        return hash(self.user_id)
+
+    def __repr__(self) -> str:
+        return f"Principal(user_id={self.user_id}, role={self.role})"
+
+
+class PrincipalCacheService:
+    """Two-tier cache of user principals"""
+
+    def __init__(
+        self,
+        local_ttl_seconds: float = 10,
+        redis_ttl_seconds: int = 300,
+        max_entries: int = 50000,
+        enabled: bool = True,
+        use_redis: bool = True
+    ):
+        """
+        Args:
+            local_ttl_seconds: In-process entry lifetime; bounds staleness across processes
+            redis_ttl_seconds: Redis entry lifetime
+            max_entries: In-process entries kept (LRU)
+            enabled: When False every lookup loads from Postgres
+            use_redis: Whether to use the Redis tier
+        """
+        self.enabled = enabled
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.use_redis = use_redis
+        self._local = TTLCache(maxsize=max_entries, ttl=local_ttl_seconds)
+        self._redis = None
+        self._redis_checked = False
+        self.loads = 0
+
+    def _get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client() if self.use_redis else None
+            self._redis_checked = True
+        return self._redis
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return redis_key("auth", "principal", user_id)
+
+    @staticmethod
+    def _to_data(user: User) -> Dict[str, Any]:
+        data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        data["user_id"] = user.user_id
+        return data
+
+    def get_cached(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Principal data from the cache tiers, or None on a miss"""
+        if not self.enabled:
+            return None
+        user_id = str(user_id)
+        data = self._local.get(user_id)
+        if data is not None:
+            return data
+
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return None
+        try:
+            raw = redis_client.get(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to read cached principal for user {user_id}: {e}")
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        data["user_id"] = UUID(data["user_id"])
+        self._local.set(user_id, data)
+        return data
+
+    def store(self, user: User) -> Dict[str, Any]:
+        """Cache a user's principal data and return it"""
+        data = self._to_data(user)
+        if not self.enabled:
+            return data
+        user_id = str(user.user_id)
+        self._local.set(user_id, data)
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                redis_client.set(
+                    self._key(user_id),
+                    json.dumps({**data, "user_id": user_id}),
+                    ex=self.redis_ttl_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Failed to cache principal for user {user_id}: {e}")
+        return data
+
+    def resolve(self, db: Session, user_id: str) -> Optional[Principal]:
+        """
+        Resolve a user's principal, loading the user from Postgres on a cache miss.
+
+        Args:
+            db: Request session; also used later if the handler needs the full User
+            user_id: User ID from the access token
+
+        Returns:
+            The principal, or None if the user does not exist
+        """
+        user_uuid = _parse_user_id(user_id)
+        if user_uuid is None:
+            return None
+        data = self.get_cached(user_uuid)
+        if data is not None:
+            return Principal(data, db)
+
+        user = db.get(User, user_uuid)
+        self.loads += 1
+        if user is None:
+            return None
+        return Principal(self.store(user), db, user)
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Principal data for callers without a request session (WebSockets), cached"""
+        user_uuid = _parse_user_id(user_id)
+        if user_uuid is None:
+            return None
+        data = self.get_cached(user_uuid)
+        if data is not None:
+            return data
+        db = SessionLocal()
+        try:
+            user = db.get(User, user_uuid)
+            self.loads += 1
+            return self.store(user) if user is not None else None
+        finally:
+            db.close()
+
+    def invalidate(self, user_id: Any):
+        """Drop a user's cached principal after a change to it or their sessions"""
+        user_id = str(user_id)
+        self._local.delete(user_id)
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to drop cached principal for user {user_id}: {e}")
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "local_entries": len(self._local),
+            "local_hits": self._local.hits,
+            "local_misses": self._local.misses,
+            "database_loads": self.loads
+        }
+
+
+# Global instance for the application
+principal_cache_service = PrincipalCacheService(
+    local_ttl_seconds=PRINCIPAL_CACHE_CONFIG["local_ttl_seconds"],
+    redis_ttl_seconds=PRINCIPAL_CACHE_CONFIG["redis_ttl_seconds"],
+    max_entries=PRINCIPAL_CACHE_CONFIG["max_entries"],
+    enabled=PRINCIPAL_CACHE_CONFIG["enabled"]
+)
@@ -1,15 +1,209 @@
 """
 Push Notification Service for sending Expo push notifications
+
+Pushes for users are queued in the push outbox (see push_outbox_service) and
+sent by the push outbox worker. Messages are sent with a pooled async HTTP
+client in batches of at most 100 (Expo's per-request limit). Batches go out
+concurrently under a semaphore, every request has a timeout, and timeouts,
+connection errors, 429 and 5xx responses are retried with exponential
+backoff.
 """
+import asyncio
 import logging
+import random
+import weakref
 from typing import List, Dict, Any, Optional
-import requests
-from datetime import datetime
+import httpx
 from sqlalchemy.orm import Session
+from app.config.config import PUSH_CONFIG
 
 logger = logging.getLogger(__name__)
 
-EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_PUSH_URL = PUSH_CONFIG["expo_push_url"]
+EXPO_RECEIPTS_URL = PUSH_CONFIG["expo_receipts_url"]
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def build_push_message(push_token: str, title: str, message: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build an Expo push message for one device"""
+    return {
+        "to": push_token,
+        "sound": "default",
+        "title": title,
+        "body": message,
+        "data": data or {},
+        "priority": "high",
+        "channelId": "default",
+    }
+
+
+class ExpoPushClient:
+    """Batched, concurrent client for the Expo push API"""
+
+    def __init__(
+        self,
+        push_url: str = EXPO_PUSH_URL,
+        receipts_url: str = EXPO_RECEIPTS_URL,
+        access_token: str = "",
+        batch_size: int = 100,
+        max_concurrency: int = 6,
+        timeout_seconds: float = 10,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 0.5
+    ):
+        self.push_url = push_url
+        self.receipts_url = receipts_url
+        self.receipt_batch_size = 1000
+        self.access_token = access_token
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        # httpx clients and semaphores belong to one event loop; the app loop
+        # shares one pooled client, other loops (worker threads) get their own
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            headers = {
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+                "Content-Type": "application/json",
+            }
+            if self.access_token:
+                headers["Authorization"] = f"Bearer {self.access_token}"
+            client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            entry = (client, asyncio.Semaphore(self.max_concurrency))
+            self._clients[loop] = entry
+        return entry
+
+    async def send(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Send push messages.
+
+        Args:
+            messages: Expo push messages
+
+        Returns:
+            success (any batch accepted), sent_count, failed_count, tickets
+            (one per message, in order; failed batches get error tickets)
+            and errors (one entry per failed batch)
+        """
+        client, semaphore = self._get_client()
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        results = await asyncio.gather(*[self._send_batch(client, semaphore, batch) for batch in batches])
+
+        tickets: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        sent_count = 0
+        for batch, (batch_tickets, error) in zip(batches, results):
+            if error is None:
+                sent_count += len(batch)
+                tickets.extend(batch_tickets)
+            else:
+                errors.append(error)
+                tickets.extend({"status": "error", "message": error} for _ in batch)
+
+        return {
+            "success": sent_count > 0,
+            "sent_count": sent_count,
+            "failed_count": len(messages) - sent_count,
+            "tickets": tickets,
+            "errors": errors
+        }
+
+    async def _send_batch(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, batch: List[Dict[str, Any]]):
+        """Send one batch. Returns (tickets, error)."""
+        body, error = await self._post(client, semaphore, self.push_url, batch)
+        if error is not None:
+            return None, error
+        tickets = body.get("data", [])
+        if isinstance(tickets, dict):
+            # A single message is answered with a single ticket
+            tickets = [tickets]
+        return tickets, None
+
+    async def get_receipts(self, ticket_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch push receipts for tickets, in requests of up to 1000 ids.
+
+        Args:
+            ticket_ids: Ticket ids returned when the messages were sent
+
+        Returns:
+            Receipts by ticket id. Tickets without a receipt yet (or whose
+            request failed) are missing from the result.
+        """
+        client, semaphore = self._get_client()
+        chunks = [ticket_ids[i:i + self.receipt_batch_size] for i in range(0, len(ticket_ids), self.receipt_batch_size)]
+        results = await asyncio.gather(*[
+            self._post(client, semaphore, self.receipts_url, {"ids": chunk}) for chunk in chunks
+        ])
+
+        receipts: Dict[str, Dict[str, Any]] = {}
+        for body, error in results:
+            if error is not None:
+                logger.error(f"❌ Error fetching push receipts: {error}")
+                continue
+            receipts.update(body.get("data", {}))
+        return receipts
+
+    async def _post(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str, payload: Any):
+        """POST with retries. Returns (response body, error)."""
+        attempt = 0
+        while True:
+            retry_after = None
+            async with semaphore:
+                try:
+                    response = await client.post(url, json=payload)
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                        return response.json(), None
+                    error = f"Expo returned HTTP {response.status_code}"
+                    retry_after = response.headers.get("Retry-After")
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                except (httpx.HTTPStatusError, ValueError) as e:
+                    return None, str(e)
+
+            if attempt >= self.max_retries:
+                return None, error
+            delay = self.retry_backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            attempt += 1
+            logger.warning(f"Expo request to {url} failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """Close the client belonging to the running event loop"""
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+
+expo_push_client = ExpoPushClient(
+    push_url=PUSH_CONFIG["expo_push_url"],
+    receipts_url=PUSH_CONFIG["expo_receipts_url"],
+    access_token=PUSH_CONFIG["expo_access_token"],
+    batch_size=PUSH_CONFIG["batch_size"],
+    max_concurrency=PUSH_CONFIG["max_concurrency"],
+    timeout_seconds=PUSH_CONFIG["timeout_seconds"],
+    max_retries=PUSH_CONFIG["max_retries"],
+    retry_backoff_seconds=PUSH_CONFIG["retry_backoff_seconds"]
+)
+
 
 class PushNotificationService:
     """Service for sending push notifications via Expo"""
@@ -31,57 +225,24 @@ class PushNotificationService:
             data: Optional data payload
             
         Returns:
-            Response from Expo push service
+            Delivery summary with one Expo ticket per token (see ExpoPushClient.send)
         """
         if not push_tokens:
             logger.warning("No push tokens provided")
             return {"success": False, "error": "No tokens"}
         
-        # Prepare notification payload
-        messages = []
-        for token in push_tokens:
-            messages.append({
-                "to": token,
-                "sound": "default",
-                "title": title,
-                "body": message,
-                "data": data or {},
-                "priority": "high",
-                "channelId": "default",
-            })
-        
-        try:
-            # Send to Expo push service
-            response = requests.post(
-                EXPO_PUSH_URL,
-                json=messages,
-                headers={
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                }
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            logger.info(f"📱 Sent push notification to {len(push_tokens)} devices")
-            logger.debug(f"Expo response: {result}")
-            
-            return {
-                "success": True,
-                "data": result,
-                "sent_count": len(push_tokens)
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Error sending push notification: {e}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        messages = [build_push_message(token, title, message, data) for token in push_tokens]
+        result = await expo_push_client.send(messages)
+        if result["success"]:
+            logger.info(f"📱 Sent push notification to {result['sent_count']} of {len(push_tokens)} devices")
+        if result["errors"]:
+            logger.error(f"❌ Error sending push notification: {'; '.join(result['errors'])}")
+        if not result["success"]:
+            result["error"] = result["errors"][0] if result["errors"] else "Push failed"
+        return result
     
     @staticmethod
-    async def send_to_user(
+    def send_to_user(
         db: Session,
         user_id: str,
         title: str,
@@ -89,7 +250,10 @@ class PushNotificationService:
         data: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
-        Send push notification to all active devices of a user
+        Queue a push notification to all active devices of a user.
+
+        The push is written to the outbox and sent by the push outbox worker,
+        so this never waits on Expo.
         
         Args:
             db: Database session
@@ -99,39 +263,15 @@ class PushNotificationService:
             data: Optional data payload
             
         Returns:
-            Response from push service
+            Number of devices the push was queued for
         """
-        from app.infra.db.postgres.models.user_push_token import UserPushToken
-        
-        # Get all active push tokens for user
-        tokens = db.query(UserPushToken).filter(
-            UserPushToken.user_id == user_id,
-            UserPushToken.is_active == True
-        ).all()
-        
-        if not tokens:
+        from app.services.push_outbox_service import push_outbox_service
+
+        queued = push_outbox_service.enqueue_for_user(db, user_id, title, message, data)
+        if not queued:
             logger.debug(f"No active push tokens for user {user_id}")
             return {"success": False, "error": "No active tokens"}
-        
-        push_tokens = [token.push_token for token in tokens]
-        
-        # Send notification
-        result = await PushNotificationService.send_push_notification(
-            push_tokens=push_tokens,
-            title=title,
-            message=message,
-            data=data
-        )
-        
-        # Update last_used_at for all tokens
-        if result.get("success"):
-            db.query(UserPushToken).filter(
-                UserPushToken.user_id == user_id,
-                UserPushToken.is_active == True
-            ).update({"last_used_at": datetime.utcnow()})
-            db.commit()
-        
-        return result
+        return {"success": True, "queued_count": queued}
 
 
 # Global instance
@@ -0,0 +1,407 @@
+"""
+Push Outbox Service
+
+Durable queue of push notifications, one row per device token in the push
+outbox table. Request handlers enqueue with a single INSERT ... SELECT over
+the user's active tokens (in the caller's transaction when it wants the push
+to commit together with its own changes) and never wait on Expo.
+
+Consumers (see push_outbox_worker) claim due rows with FOR UPDATE SKIP
+LOCKED, so any number of consumers across workers share the queue, send them
+through the Expo client and record the outcome:
+- ticket ok: "sent", receipt checked after the receipt delay
+- retryable error: back to "pending" with exponential backoff until the
+  attempt limit, then "failed"
+- DeviceNotRegistered: "failed" and the token is deactivated
+A claimed row that is not finished within the claim lease (worker died) is
+claimed again. Receipts are fetched in batches and settle rows as
+"delivered" or "failed"; rows whose receipt never shows up become
+"unconfirmed" after a day, when Expo discards receipts.
+"""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import Interval, bindparam, delete, func, insert, literal, null, select, update
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.models.push_outbox import PushOutbox
+from app.infra.db.postgres.models.user_push_token import UserPushToken
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.services.push_notification_service import build_push_message, expo_push_client
+from app.utils.enums import PushOutboxStatus
+from app.config.config import PUSH_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Expo errors that will not go away by sending again
+PERMANENT_ERRORS = {"DeviceNotRegistered", "MessageTooBig", "InvalidCredentials", "MismatchSenderId"}
+
+# Expo keeps receipts for a day
+RECEIPT_RETENTION = timedelta(days=1)
+
+FINISHED_STATUSES = [PushOutboxStatus.DELIVERED.value, PushOutboxStatus.FAILED.value, PushOutboxStatus.UNCONFIRMED.value]
+
+
+class PushOutboxService:
+    """Enqueue, claim and settle outbox push notifications"""
+
+    def __init__(
+        self,
+        claim_batch_size: int = 500,
+        claim_lease_seconds: int = 300,
+        max_attempts: int = 5,
+        retry_base_seconds: int = 30,
+        receipt_delay_seconds: int = 900,
+        retention_days: int = 7
+    ):
+        self.claim_batch_size = claim_batch_size
+        self.claim_lease = timedelta(seconds=claim_lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.receipt_delay = timedelta(seconds=receipt_delay_seconds)
+        self.retention = timedelta(days=retention_days)
+        self._wake_handler: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "delivered": 0, "tokens_deactivated": 0}
+
+    # ------------------------------------------------------------------
+    # Enqueue
+    # ------------------------------------------------------------------
+
+    def set_wake_handler(self, handler: Optional[Callable[[], None]]):
+        """Register a thread-safe callback that wakes this worker's consumers"""
+        self._wake_handler = handler
+
+    def wake(self):
+        """Ask local consumers to poll now instead of at the next interval"""
+        if self._wake_handler is not None:
+            try:
+                self._wake_handler()
+            except Exception as e:
+                logger.debug(f"Failed to wake push outbox consumers: {e}")
+
+    def enqueue_for_user(
+        self,
+        db: Session,
+        user_id: UUID,
+        title: str,
+        message: str,
+        data: Optional[Dict[str, Any]] = None,
+        commit: bool = True
+    ) -> int:
+        """
+        Queue a push to every active device of a user.
+
+        Args:
+            db: Database session
+            user_id: User to notify
+            title: Notification title
+            message: Notification body
+            data: Optional data payload
+            commit: Commit and wake consumers; pass False to enqueue inside
+                the caller's transaction and call wake() after committing
+
+        Returns:
+            Number of devices queued
+        """
+        outbox = PushOutbox.__table__
+        tokens = UserPushToken.__table__
+        rows = select(
+            tokens.c.user_id,
+            tokens.c.push_token,
+            literal(title, outbox.c.title.type),
+            literal(message, outbox.c.body.type),
+            literal(data, outbox.c.data_json.type) if data is not None else null()
+        ).where(tokens.c.user_id == str(user_id), tokens.c.is_active == True)
+
+        result = db.execute(
+            insert(outbox).from_select(["user_id", "push_token", "title", "body", "data_json"], rows)
+        )
+        queued = result.rowcount or 0
+        if commit:
+            db.commit()
+            if queued:
+                self.wake()
+        with self._lock:
+            self._stats["enqueued"] += queued
+        return queued
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    def claim_due(self, db: Session) -> List[dict]:
+        """
+        Claim pushes that are due to be sent (or whose previous claim expired).
+
+        Returns:
+            Claimed rows with the attempt number of this send
+        """
+        outbox = PushOutbox.__table__
+        due = (
+            select(outbox.c.outbox_id)
+            .where(
+                outbox.c.status.in_([PushOutboxStatus.PENDING.value, PushOutboxStatus.SENDING.value]),
+                outbox.c.next_attempt_at <= func.now()
+            )
+            .order_by(outbox.c.next_attempt_at)
+            .limit(self.claim_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = db.execute(
+            update(outbox)
+            .where(outbox.c.outbox_id.in_(due.scalar_subquery()))
+            .values(
+                status=PushOutboxStatus.SENDING.value,
+                attempts=outbox.c.attempts + 1,
+                next_attempt_at=func.now() + self.claim_lease,
+                updated_at=func.now()
+            )
+            .returning(
+                outbox.c.outbox_id, outbox.c.push_token, outbox.c.title,
+                outbox.c.body, outbox.c.data_json, outbox.c.attempts
+            )
+        ).mappings().all()
+        db.commit()
+        return [dict(row) for row in claimed]
+
+    def _retry_or_fail(self, row: dict, error_code: Optional[str], error: str) -> dict:
+        """Outcome for a send that did not go through"""
+        if error_code in PERMANENT_ERRORS or row["attempts"] >= self.max_attempts:
+            return self._outcome(row, PushOutboxStatus.FAILED, error=error)
+        delay = timedelta(seconds=self.retry_base_seconds * 2 ** (row["attempts"] - 1))
+        return self._outcome(row, PushOutboxStatus.PENDING, delay=delay, error=error)
+
+    @staticmethod
+    def _outcome(
+        row: dict,
+        status: PushOutboxStatus,
+        delay: timedelta = timedelta(0),
+        ticket_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> dict:
+        return {
+            "b_outbox_id": row["outbox_id"],
+            "b_status": status.value,
+            "b_delay": delay,
+            "b_ticket_id": ticket_id,
+            "b_error": error
+        }
+
+    @staticmethod
+    def _error_code(ticket: dict) -> Optional[str]:
+        return (ticket.get("details") or {}).get("error")
+
+    def record_tickets(self, db: Session, claimed: List[dict], tickets: List[dict]) -> Dict[str, int]:
+        """
+        Settle claimed rows from the tickets Expo returned (one per row, in order).
+
+        Returns:
+            Counts of rows sent, retried and failed
+        """
+        outcomes = []
+        sent_tokens, dead_tokens = [], []
+        for row, ticket in zip(claimed, tickets):
+            if ticket.get("status") == "ok":
+                outcomes.append(self._outcome(row, PushOutboxStatus.SENT, delay=self.receipt_delay, ticket_id=ticket.get("id")))
+                sent_tokens.append(row["push_token"])
+                continue
+            code = self._error_code(ticket)
+            if code == "DeviceNotRegistered":
+                dead_tokens.append(row["push_token"])
+            outcomes.append(self._retry_or_fail(row, code, ticket.get("message") or code or "Push failed"))
+
+        self._apply(db, outcomes, sent_tokens, dead_tokens)
+        counts = self._count(outcomes)
+        with self._lock:
+            self._stats["sent"] += counts["sent"]
+            self._stats["retried"] += counts["pending"]
+            self._stats["failed"] += counts["failed"]
+        return {"sent": counts["sent"], "retried": counts["pending"], "failed": counts["failed"]}
+
+    # ------------------------------------------------------------------
+    # Receipts
+    # ------------------------------------------------------------------
+
+    def claim_receipts_due(self, db: Session, limit: int = 1000) -> List[dict]:
+        """Claim sent pushes whose receipts are due to be checked"""
+        outbox = PushOutbox.__table__
+        due = (
+            select(outbox.c.outbox_id)
+            .where(outbox.c.status == PushOutboxStatus.SENT.value, outbox.c.next_attempt_at <= func.now())
+            .order_by(outbox.c.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = db.execute(
+            update(outbox)
+            .where(outbox.c.outbox_id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=func.now() + self.claim_lease)
+            .returning(
+                outbox.c.outbox_id, outbox.c.push_token, outbox.c.ticket_id, outbox.c.attempts,
+                (outbox.c.created_at < func.now() - RECEIPT_RETENTION).label("receipt_expired")
+            )
+        ).mappings().all()
+        db.commit()
+        return [dict(row) for row in claimed]
+
+    def record_receipts(self, db: Session, rows: List[dict], receipts: Dict[str, dict]) -> Dict[str, int]:
+        """
+        Settle sent rows from their receipts.
+
+        Returns:
+            Counts of rows delivered, failed, retried and still waiting
+        """
+        outcomes = []
+        dead_tokens = []
+        waiting = 0
+        for row in rows:
+            receipt = receipts.get(row["ticket_id"])
+            if receipt is None:
+                if row["receipt_expired"]:
+                    outcomes.append(self._outcome(row, PushOutboxStatus.UNCONFIRMED, ticket_id=row["ticket_id"]))
+                else:
+                    waiting += 1
+                    outcomes.append(self._outcome(row, PushOutboxStatus.SENT, delay=self.receipt_delay, ticket_id=row["ticket_id"]))
+                continue
+            if receipt.get("status") == "ok":
+                outcomes.append(self._outcome(row, PushOutboxStatus.DELIVERED, ticket_id=row["ticket_id"]))
+                continue
+            code = self._error_code(receipt)
+            error = receipt.get("message") or code or "Push failed"
+            if code == "DeviceNotRegistered":
+                dead_tokens.append(row["push_token"])
+            if code == "MessageRateExceeded":
+                # Expo dropped the message; send it again later
+                outcomes.append(self._retry_or_fail(row, code, error))
+            else:
+                outcomes.append(self._outcome(row, PushOutboxStatus.FAILED, ticket_id=row["ticket_id"], error=error))
+
+        self._apply(db, outcomes, [], dead_tokens)
+        counts = self._count(outcomes)
+        with self._lock:
+            self._stats["delivered"] += counts["delivered"]
+            self._stats["failed"] += counts["failed"]
+            self._stats["retried"] += counts["pending"]
+        return {"delivered": counts["delivered"], "failed": counts["failed"], "retried": counts["pending"], "waiting": waiting}
+
+    # ------------------------------------------------------------------
+    # Shared
+    # ------------------------------------------------------------------
+
+    def _apply(self, db: Session, outcomes: List[dict], sent_tokens: List[str], dead_tokens: List[str]):
+        """Write outcomes and token changes in one transaction"""
+        outbox = PushOutbox.__table__
+        tokens = UserPushToken.__table__
+        try:
+            if outcomes:
+                db.execute(
+                    update(outbox)
+                    .where(outbox.c.outbox_id == bindparam("b_outbox_id"))
+                    .values(
+                        status=bindparam("b_status"),
+                        ticket_id=bindparam("b_ticket_id"),
+                        last_error=bindparam("b_error"),
+                        next_attempt_at=func.now() + bindparam("b_delay", type_=Interval),
+                        updated_at=func.now()
+                    ),
+                    outcomes
+                )
+            if sent_tokens:
+                db.execute(
+                    update(tokens)
+                    .where(tokens.c.push_token.in_(sent_tokens))
+                    .values(last_used_at=datetime.utcnow())
+                )
+            if dead_tokens:
+                db.execute(
+                    update(tokens)
+                    .where(tokens.c.push_token.in_(dead_tokens))
+                    .values(is_active=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if dead_tokens:
+            logger.info(f"📱 Deactivated {len(dead_tokens)} unregistered push tokens")
+            with self._lock:
+                self._stats["tokens_deactivated"] += len(dead_tokens)
+
+    @staticmethod
+    def _count(outcomes: List[dict]) -> Dict[str, int]:
+        counts = {status.value: 0 for status in PushOutboxStatus}
+        for outcome in outcomes:
+            counts[outcome["b_status"]] += 1
+        return counts
+
+    def purge_finished(self, db: Session) -> int:
+        """Delete settled rows older than the retention period"""
+        outbox = PushOutbox.__table__
+        result = db.execute(
+            delete(outbox).where(
+                outbox.c.status.in_(FINISHED_STATUSES),
+                outbox.c.updated_at < func.now() - self.retention
+            )
+        )
+        db.commit()
+        return result.rowcount or 0
+
+    @staticmethod
+    def _with_session(fn: Callable, *args):
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def process_once(self) -> Dict[str, int]:
+        """
+        Run one consumer round: send a claimed batch, then check a batch of
+        receipts. Database work runs in threads.
+
+        Returns:
+            Number of pushes sent and receipts checked this round
+        """
+        claimed = await asyncio.to_thread(self._with_session, self.claim_due)
+        if claimed:
+            messages = [
+                build_push_message(row["push_token"], row["title"], row["body"], row["data_json"])
+                for row in claimed
+            ]
+            result = await expo_push_client.send(messages)
+            await asyncio.to_thread(self._with_session, self.record_tickets, claimed, result["tickets"])
+
+        awaiting = await asyncio.to_thread(self._with_session, self.claim_receipts_due)
+        if awaiting:
+            receipts = await expo_push_client.get_receipts([row["ticket_id"] for row in awaiting])
+            await asyncio.to_thread(self._with_session, self.record_receipts, awaiting, receipts)
+
+        return {"sent": len(claimed), "receipts_checked": len(awaiting)}
+
+    async def purge_once(self) -> int:
+        """Delete old settled rows. Database work runs in a thread."""
+        return await asyncio.to_thread(self._with_session, self.purge_finished)
+
+    def get_status(self) -> dict:
+        """Get outbox counters for this worker"""
+        with self._lock:
+            return dict(self._stats)
+
+
+# Global instance for the application
+push_outbox_service = PushOutboxService(
+    claim_batch_size=PUSH_CONFIG["outbox_claim_batch_size"],
+    claim_lease_seconds=PUSH_CONFIG["outbox_claim_lease_seconds"],
+    max_attempts=PUSH_CONFIG["outbox_max_attempts"],
+    retry_base_seconds=PUSH_CONFIG["outbox_retry_base_seconds"],
+    receipt_delay_seconds=PUSH_CONFIG["receipt_delay_seconds"],
+    retention_days=PUSH_CONFIG["outbox_retention_days"]
+)
@@ -0,0 +1,203 @@
+"""
+Ready Order Index Service
+
+Keeps a spatial index of unassigned READY_FOR_PICKUP orders keyed by the
+restaurant location, so delivery partners can query nearby work without the
+whole ready-order table being loaded and filtered on every poll.
+
+The index is maintained on order status transitions and reconciled against
+Postgres periodically. Redis GEO is used when available (shared by all
+workers); otherwise an in-process grid index is used and the periodic
+reconciliation bounds how stale it can get. After a Redis error the
+in-process index stands in until Redis is probed again after a backoff.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.models.order import Order
+from app.infra.db.postgres.models.restaurant import Restaurant
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.utils.enums import OrderStatus
+from app.utils.geo_index import GeoIndex, RedisGeoIndex
+from app.config.config import DELIVERY_GEO_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ReadyOrderIndex:
+    """Spatial index of orders waiting for a delivery partner"""
+
+    def __init__(
+        self,
+        reconcile_seconds: int = 30,
+        cell_size_km: float = 2.0,
+        redis_retry_seconds: float = 30,
+        use_redis: bool = True
+    ):
+        self.reconcile_seconds = reconcile_seconds
+        self.cell_size_km = cell_size_km
+        self.redis_retry_seconds = redis_retry_seconds
+        self.use_redis = use_redis
+        self._index = None
+        self._redis_retry_at = 0.0
+        self._last_reconcile = 0.0
+        self._lock = threading.Lock()
+
+    def _get_index(self):
+        """Lazily select the Redis or in-memory backend, re-probing Redis after a backoff"""
+        if self._redis_retry_at and time.monotonic() >= self._redis_retry_at:
+            self._redis_retry_at = 0.0
+            redis_client = get_redis_client()
+            if redis_client is not None:
+                self._index = RedisGeoIndex(redis_client, redis_key("geo", "ready_orders"))
+                # Changes made while on the in-memory index never reached Redis
+                self._last_reconcile = 0.0
+                logger.info("Ready order index back on Redis GEO storage")
+            else:
+                self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+        if self._index is None:
+            redis_client = get_redis_client() if self.use_redis else None
+            if redis_client is not None:
+                self._index = RedisGeoIndex(redis_client, redis_key("geo", "ready_orders"))
+                logger.info("Ready order index using Redis GEO storage")
+            else:
+                self._index = GeoIndex(cell_size_km=self.cell_size_km)
+                if self.use_redis:
+                    self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+                logger.info("Ready order index using in-memory storage")
+        return self._index
+
+    def _fallback_to_memory(self, error: Exception):
+        """Use the in-memory backend until Redis is retried after redis_retry_seconds"""
+        logger.error(
+            f"Ready order index Redis error, using memory for {self.redis_retry_seconds}s: {error}"
+        )
+        self._index = GeoIndex(cell_size_km=self.cell_size_km)
+        self._redis_retry_at = time.monotonic() + self.redis_retry_seconds
+        self._last_reconcile = 0.0
+
+    def add_order(self, order_id: UUID, latitude: float, longitude: float):
+        """Index an order at its restaurant's location"""
+        try:
+            self._get_index().add(str(order_id), float(latitude), float(longitude))
+        except Exception as e:
+            self._fallback_to_memory(e)
+
+    def remove_order(self, order_id: UUID):
+        """Drop an order from the index (assigned, cancelled, ...)"""
+        try:
+            self._get_index().remove(str(order_id))
+        except Exception as e:
+            self._fallback_to_memory(e)
+
+    def sync_order(self, db: Session, order: Order):
+        """
+        Update the index after an order's status or assignment changed.
+
+        Never raises: the index is an optimization and the delivery feed
+        re-checks order state against Postgres anyway.
+        """
+        try:
+            if order.order_status == OrderStatus.READY_FOR_PICKUP and order.delivery_partner_id is None:
+                restaurant = db.query(Restaurant.latitude, Restaurant.longitude).filter(
+                    Restaurant.restaurant_id == order.restaurant_id
+                ).first()
+                if restaurant and restaurant.latitude is not None and restaurant.longitude is not None:
+                    self.add_order(order.order_id, restaurant.latitude, restaurant.longitude)
+            else:
+                self.remove_order(order.order_id)
+        except Exception as e:
+            logger.warning(f"Failed to sync order {order.order_id} with ready order index: {e}")
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Rebuild the index from Postgres.
+
+        Returns:
+            Number of indexed orders
+        """
+        rows = db.query(Order.order_id, Restaurant.latitude, Restaurant.longitude).join(
+            Restaurant, Restaurant.restaurant_id == Order.restaurant_id
+        ).filter(
+            Order.order_status == OrderStatus.READY_FOR_PICKUP,
+            Order.delivery_partner_id == None,
+            Restaurant.latitude != None,
+            Restaurant.longitude != None
+        ).all()
+
+        entries = {str(row.order_id): (float(row.latitude), float(row.longitude)) for row in rows}
+        try:
+            self._get_index().replace_all(entries)
+        except Exception as e:
+            self._fallback_to_memory(e)
+            self._index.replace_all(entries)
+
+        self._last_reconcile = time.monotonic()
+        logger.debug(f"Ready order index rebuilt with {len(entries)} orders")
+        return len(entries)
+
+    def _reconcile_if_stale(self, db: Session):
+        if time.monotonic() - self._last_reconcile < self.reconcile_seconds:
+            return
+        # Only one request per worker pays for the rebuild
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.rebuild(db)
+        finally:
+            self._lock.release()
+
+    def nearby(
+        self,
+        db: Session,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[UUID, float]]:
+        """
+        Find indexed orders whose restaurant is within radius_km.
+
+        Returns:
+            List of (order_id, distance_km) sorted by distance
+        """
+        self._reconcile_if_stale(db)
+        try:
+            results = self._get_index().search(latitude, longitude, radius_km, limit)
+        except Exception as e:
+            self._fallback_to_memory(e)
+            self.rebuild(db)
+            results = self._index.search(latitude, longitude, radius_km, limit)
+        return [(UUID(member), distance_km) for member, distance_km in results]
+
+    def positions(self, db: Session) -> Dict[UUID, Tuple[float, float]]:
+        """Get the restaurant position of every indexed order"""
+        self._reconcile_if_stale(db)
+        try:
+            entries = self._get_index().positions()
+        except Exception as e:
+            self._fallback_to_memory(e)
+            self.rebuild(db)
+            entries = self._index.positions()
+        return {UUID(member): position for member, position in entries.items()}
+
+    def get_status(self) -> dict:
+        """Get index backend and size"""
+        index = self._get_index()
+        return {
+            "backend": "redis" if isinstance(index, RedisGeoIndex) else "memory",
+            "indexed_orders": len(index),
+            "seconds_since_reconcile": round(time.monotonic() - self._last_reconcile, 1) if self._last_reconcile else None
+        }
+
+
+# Global instance for the application
+ready_order_index = ReadyOrderIndex(
+    reconcile_seconds=DELIVERY_GEO_CONFIG["reconcile_seconds"],
+    cell_size_km=DELIVERY_GEO_CONFIG["cell_size_km"],
+    redis_retry_seconds=DELIVERY_GEO_CONFIG["redis_retry_seconds"]
+)
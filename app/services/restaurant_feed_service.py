@@ -0,0 +1,153 @@
+"""
+Restaurant Feed Service
+
+Per-restaurant feed of order events (new orders, cancellations, status
+changes) for partner apps. Every event gets a per-restaurant sequence number
+and is kept in a bounded log, so a tablet that reconnects with the last
+sequence it saw receives exactly the events it missed instead of re-polling
+the pending/active order lists.
+
+The log is a Redis stream whose entry ids are the sequence numbers when
+Redis is available (shared by all workers), and a bounded deque per
+restaurant otherwise. Live delivery to connected tablets is done by the
+order events module on the "restaurant:<id>" WebSocket topic.
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Dict, List, Tuple
+from uuid import UUID
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.config.config import RESTAURANT_FEED_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Assign the next sequence number and append the event in one step, so
+# concurrent publishers on different workers cannot interleave out of order
+_APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], seq .. '-1', 'event', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
+
+
+class RestaurantFeedService:
+    """Sequenced, resumable order event feed per restaurant"""
+
+    def __init__(self, max_events: int = 500, ttl_seconds: int = 86400, use_redis: bool = True):
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._redis = None
+        self._append = None
+        self._redis_checked = False
+        self._lock = threading.Lock()
+        self._sequences: Dict[str, int] = {}
+        self._events: Dict[str, deque] = {}
+
+    def _get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client() if self.use_redis else None
+            if self._redis is not None:
+                self._append = self._redis.register_script(_APPEND_SCRIPT)
+            self._redis_checked = True
+        return self._redis
+
+    @staticmethod
+    def _keys(restaurant_id: str) -> Tuple[str, str]:
+        return redis_key("feed", "restaurant", restaurant_id, "seq"), redis_key("feed", "restaurant", restaurant_id)
+
+    def append(self, restaurant_id: UUID, event: dict) -> int:
+        """
+        Append an event to a restaurant's feed.
+
+        Args:
+            restaurant_id: Restaurant the event belongs to
+            event: JSON-serializable event payload
+
+        Returns:
+            The event's sequence number
+        """
+        restaurant_key = str(restaurant_id)
+        redis_client = self._get_redis()
+        seq = None
+        if redis_client is not None:
+            try:
+                seq = int(self._append(
+                    keys=list(self._keys(restaurant_key)),
+                    args=[json.dumps(event), self.max_events, self.ttl_seconds]
+                ))
+            except Exception as e:
+                logger.warning(f"Failed to append to restaurant feed in Redis: {e}")
+
+        if seq is None:
+            with self._lock:
+                seq = self._sequences.get(restaurant_key, 0) + 1
+                self._sequences[restaurant_key] = seq
+                self._events.setdefault(restaurant_key, deque(maxlen=self.max_events)).append({**event, "seq": seq})
+        return seq
+
+    def current_sequence(self, restaurant_id: UUID) -> int:
+        """Latest sequence number issued for a restaurant (0 if none)"""
+        restaurant_key = str(restaurant_id)
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                return int(redis_client.get(self._keys(restaurant_key)[0]) or 0)
+            except Exception as e:
+                logger.warning(f"Failed to read restaurant feed sequence from Redis: {e}")
+        with self._lock:
+            return self._sequences.get(restaurant_key, 0)
+
+    def events_since(self, restaurant_id: UUID, last_seq: int) -> Tuple[List[dict], bool]:
+        """
+        Get the events after a sequence number.
+
+        Returns:
+            (events, complete). complete is False when some of the requested
+            events are no longer retained (or the sequence is unknown); the
+            client should then reload its order lists before applying events.
+        """
+        restaurant_key = str(restaurant_id)
+        current = self.current_sequence(restaurant_id)
+        if last_seq >= current:
+            return [], last_seq == current
+
+        redis_client = self._get_redis()
+        events = None
+        if redis_client is not None:
+            try:
+                entries = redis_client.xrange(self._keys(restaurant_key)[1], min=f"{last_seq + 1}-0", max="+")
+                events = [
+                    {**json.loads(fields["event"]), "seq": int(entry_id.split("-")[0])}
+                    for entry_id, fields in entries
+                ]
+            except Exception as e:
+                logger.warning(f"Failed to read restaurant feed from Redis: {e}")
+
+        if events is None:
+            with self._lock:
+                events = [e for e in self._events.get(restaurant_key, ()) if e["seq"] > last_seq]
+
+        complete = bool(events) and events[0]["seq"] == last_seq + 1
+        return events, complete
+
+    def get_status(self) -> dict:
+        """Get feed backend information"""
+        with self._lock:
+            return {
+                "backend": "redis" if self._get_redis() is not None else "memory",
+                "local_restaurants": len(self._events),
+                "max_events": self.max_events
+            }
+
+
+# Global instance for the application
+restaurant_feed_service = RestaurantFeedService(
+    max_events=RESTAURANT_FEED_CONFIG["max_events"],
+    ttl_seconds=RESTAURANT_FEED_CONFIG["ttl_seconds"]
+)
@@ -0,0 +1,467 @@
+"""
+Session Store Service
+
+Owns login sessions and refresh tokens for the auth and user routes.
+
+- Refresh tokens are opaque random values. Only their SHA-256 is stored, so
+  a presented token is found with a single keyed lookup instead of checking
+  it against every stored hash.
+- With the "redis" backend, sessions and refresh tokens live in Redis and
+  expire through native TTLs, so no periodic cleanup is needed:
+    auth:refresh:{token_hash}   -> JSON {user_id, session_id, device_id}
+    auth:session:{session_id}   -> JSON session, incl. its current refresh_hash
+    auth:user_sessions:{user_id} -> hash of device_id -> session_id
+  Every change is also written to the Postgres tables in the background, which
+  then serve as an audit log of sessions and tokens.
+- With the "postgres" backend, or when Redis is unreachable, the Postgres
+  tables are the store and are written in the request.
+"""
+
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.infra.db.postgres.models.refresh_token import RefreshToken
+from app.infra.db.postgres.models.user_session import UserSession
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.utils.auth_utils import AuthUtils
+from app.config.config import SESSION_STORE_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Session fields returned to callers
+SESSION_FIELDS = ("session_id", "device_name", "device_type", "platform", "app_version", "last_activity", "is_active")
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token"
+    )
+
+
+def _revoke_device_rows(db: Session, user_id: Any, device_id: Optional[str], token_hash: Optional[str] = None) -> int:
+    """Revoke a device's refresh tokens and deactivate its session; returns rows changed"""
+    tokens = db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.is_revoked == False
+    )
+    if device_id is not None:
+        tokens = tokens.filter(RefreshToken.device_info["device_id"].astext == device_id)
+    else:
+        tokens = tokens.filter(RefreshToken.token_hash == token_hash)
+    count = tokens.update({RefreshToken.is_revoked: True}, synchronize_session=False)
+
+    if device_id is not None:
+        count += db.query(UserSession).filter(
+            UserSession.user_id == user_id,
+            UserSession.device_id == device_id,
+            UserSession.is_active == True
+        ).update(
+            {UserSession.is_active: False, UserSession.updated_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+    db.commit()
+    return count
+
+
+def _revoke_all_rows(db: Session, user_id: Any) -> int:
+    """Revoke all of a user's refresh tokens and deactivate their sessions; returns rows changed"""
+    count = db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.is_revoked == False
+    ).update({RefreshToken.is_revoked: True}, synchronize_session=False)
+    count += db.query(UserSession).filter(
+        UserSession.user_id == user_id,
+        UserSession.is_active == True
+    ).update(
+        {UserSession.is_active: False, UserSession.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.commit()
+    return count
+
+
+def _rotate_row(db: Session, token_hash: str, new_token_hash: str, expires_at: datetime) -> bool:
+    """Swap a live refresh token's hash for its successor's; False if it was already used or revoked"""
+    count = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == token_hash,
+        RefreshToken.is_revoked == False
+    ).update(
+        {RefreshToken.token_hash: new_token_hash, RefreshToken.expires_at: expires_at},
+        synchronize_session=False
+    )
+    db.commit()
+    return count > 0
+
+
+def _session_from_row(session: UserSession) -> Dict[str, Any]:
+    return {field: getattr(session, field) for field in SESSION_FIELDS}
+
+
+class SessionStoreService:
+    """Login sessions and refresh tokens in Redis or Postgres"""
+
+    def __init__(
+        self,
+        backend: str = "postgres",
+        refresh_token_ttl_days: int = 30,
+        audit: bool = True
+    ):
+        """
+        Args:
+            backend: "redis" or "postgres"
+            refresh_token_ttl_days: Lifetime of a refresh token and of an unused session
+            audit: Whether Redis mode writes the Postgres audit log
+        """
+        self.backend = backend
+        self.ttl = timedelta(days=refresh_token_ttl_days)
+        self.ttl_seconds = int(self.ttl.total_seconds())
+        self.audit = audit
+        self._executor = None
+        self._redis = None
+        self._redis_checked = False
+        self.audit_failures = 0
+
+    def _get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client() if self.backend == "redis" else None
+            if self.backend == "redis" and self._redis is None:
+                logger.warning("Redis unavailable, storing sessions in Postgres")
+            self._redis_checked = True
+        return self._redis
+
+    @staticmethod
+    def _refresh_key(token_hash: str) -> str:
+        return redis_key("auth", "refresh", token_hash)
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return redis_key("auth", "session", session_id)
+
+    @staticmethod
+    def _user_key(user_id: Any) -> str:
+        return redis_key("auth", "user_sessions", user_id)
+
+    @staticmethod
+    def _new_token() -> Tuple[str, str]:
+        token = AuthUtils.generate_refresh_token()
+        return token, AuthUtils.hash_refresh_token(token)
+
+    # Postgres audit log (Redis mode)
+
+    def _audit(self, fn: Callable, *args):
+        """Apply a change to the Postgres tables in the background"""
+        if not self.audit:
+            return
+        if self._executor is None:
+            # One thread: records must be applied in the order the changes happened
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-audit")
+        self._executor.submit(self._write_audit, fn, args)
+
+    def _write_audit(self, fn: Callable, args: tuple):
+        db = SessionLocal()
+        try:
+            fn(db, *args)
+        except Exception as e:
+            db.rollback()
+            self.audit_failures += 1
+            logger.error(f"Failed to write session audit record ({fn.__name__}): {e}")
+        finally:
+            db.close()
+
+    def _audit_create(self, db: Session, user_id: str, device_info: Dict[str, Any], ip_address, user_agent, token_hash: str):
+        AuthUtils.create_refresh_token(db, user_id, device_info, ip_address, user_agent, token_hash=token_hash, expires_in=self.ttl)
+        AuthUtils.create_user_session(db, user_id, device_info, ip_address, user_agent)
+
+    def shutdown(self):
+        """Finish pending audit writes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # Redis records
+
+    def _load_sessions(self, redis_client, user_id: Any) -> List[Dict[str, Any]]:
+        """A user's live sessions; forgets devices whose session has expired"""
+        user_key = self._user_key(user_id)
+        devices = redis_client.hgetall(user_key)
+        if not devices:
+            return []
+        raws = redis_client.mget([self._session_key(session_id) for session_id in devices.values()])
+        sessions, expired = [], []
+        for device_id, raw in zip(devices, raws):
+            if raw is None:
+                expired.append(device_id)
+            else:
+                sessions.append(json.loads(raw))
+        if expired:
+            redis_client.hdel(user_key, *expired)
+        return sessions
+
+    def _delete_sessions(self, redis_client, user_id: Any, sessions: List[Dict[str, Any]]):
+        pipe = redis_client.pipeline()
+        for session in sessions:
+            pipe.delete(self._session_key(session["session_id"]), self._refresh_key(session["refresh_hash"]))
+            pipe.hdel(self._user_key(user_id), session["device_id"])
+        pipe.execute()
+
+    @staticmethod
+    def _public(session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **{field: session.get(field) for field in SESSION_FIELDS},
+            "session_id": uuid.UUID(session["session_id"]),
+            "last_activity": datetime.fromisoformat(session["last_activity"]),
+            "is_active": True
+        }
+
+    # API
+
+    def create_session(
+        self,
+        db: Session,
+        user_id: Any,
+        device_info: Dict[str, Any],
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> str:
+        """
+        Start (or renew) the session for a user's device and issue its refresh token.
+
+        A device has one session; logging in again on it replaces the session's
+        refresh token in Redis mode.
+
+        Returns:
+            The refresh token to hand to the client
+        """
+        token, token_hash = self._new_token()
+        user_id = str(user_id)
+        redis_client = self._get_redis()
+        if redis_client is None:
+            AuthUtils.create_refresh_token(db, user_id, device_info, ip_address, user_agent, token_hash=token_hash, expires_in=self.ttl)
+            AuthUtils.create_user_session(db, user_id, device_info, ip_address, user_agent)
+            return token
+
+        device_id = device_info.get("device_id", "unknown")
+        now = datetime.utcnow().isoformat()
+        session_id = redis_client.hget(self._user_key(user_id), device_id)
+        raw = redis_client.get(self._session_key(session_id)) if session_id else None
+        previous = json.loads(raw) if raw else None
+        session = {
+            "session_id": previous["session_id"] if previous else str(uuid.uuid4()),
+            "user_id": user_id,
+            "device_id": device_id,
+            "device_name": device_info.get("device_name", "Unknown Device"),
+            "device_type": device_info.get("device_type", "unknown"),
+            "platform": device_info.get("platform", "unknown"),
+            "app_version": device_info.get("app_version", "1.0.0"),
+            "ip_address": ip_address,
+            "created_at": previous["created_at"] if previous else now,
+            "last_activity": now,
+            "refresh_hash": token_hash
+        }
+        record = {"user_id": user_id, "session_id": session["session_id"], "device_id": device_id}
+
+        pipe = redis_client.pipeline()
+        if previous:
+            pipe.delete(self._refresh_key(previous["refresh_hash"]))
+        pipe.set(self._refresh_key(token_hash), json.dumps(record), ex=self.ttl_seconds)
+        pipe.set(self._session_key(session["session_id"]), json.dumps(session), ex=self.ttl_seconds)
+        pipe.hset(self._user_key(user_id), device_id, session["session_id"])
+        pipe.expire(self._user_key(user_id), self.ttl_seconds)
+        pipe.execute()
+
+        if previous:
+            self._audit(_revoke_device_rows, uuid.UUID(user_id), device_id)
+        self._audit(self._audit_create, user_id, device_info, ip_address, user_agent, token_hash)
+        return token
+
+    def get_refresh_token(self, db: Session, token: str) -> Dict[str, Any]:
+        """
+        Look up a presented refresh token.
+
+        Returns:
+            {"user_id", "device_id"} of the token's session
+
+        Raises:
+            HTTPException: 401 if the token is unknown, revoked or expired
+        """
+        token_hash = AuthUtils.hash_refresh_token(token)
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            raw = redis_client.get(self._refresh_key(token_hash))
+            if raw is None:
+                raise _invalid_refresh_token()
+            return json.loads(raw)
+
+        refresh_token = db.query(RefreshToken).filter(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.is_revoked == False
+        ).first()
+        if not refresh_token:
+            raise _invalid_refresh_token()
+        if refresh_token.expires_at < datetime.utcnow():
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token expired"
+            )
+        return {
+            "user_id": str(refresh_token.user_id),
+            "device_id": (refresh_token.device_info or {}).get("device_id")
+        }
+
+    def rotate_refresh_token(self, db: Session, token: str) -> str:
+        """
+        Replace a refresh token with a new one with the full lifetime.
+
+        Each token can be rotated once; a concurrent or repeated use of the
+        same token is rejected.
+
+        Returns:
+            The new refresh token
+
+        Raises:
+            HTTPException: 401 if the token was already used, revoked or has expired
+        """
+        token_hash = AuthUtils.hash_refresh_token(token)
+        new_token, new_token_hash = self._new_token()
+        expires_at = datetime.utcnow() + self.ttl
+        redis_client = self._get_redis()
+        if redis_client is None:
+            if not _rotate_row(db, token_hash, new_token_hash, expires_at):
+                raise _invalid_refresh_token()
+            return new_token
+
+        raw = redis_client.getdel(self._refresh_key(token_hash))
+        if raw is None:
+            raise _invalid_refresh_token()
+        record = json.loads(raw)
+        session_key = self._session_key(record["session_id"])
+        raw_session = redis_client.get(session_key)
+        if raw_session is None:
+            raise _invalid_refresh_token()
+        session = json.loads(raw_session)
+        session["refresh_hash"] = new_token_hash
+        session["last_activity"] = datetime.utcnow().isoformat()
+
+        pipe = redis_client.pipeline()
+        pipe.set(self._refresh_key(new_token_hash), json.dumps(record), ex=self.ttl_seconds)
+        pipe.set(session_key, json.dumps(session), ex=self.ttl_seconds)
+        pipe.expire(self._user_key(record["user_id"]), self.ttl_seconds)
+        pipe.execute()
+
+        self._audit(_rotate_row, token_hash, new_token_hash, expires_at)
+        return new_token
+
+    def revoke_refresh_token(self, db: Session, user_id: Any, token: str) -> int:
+        """
+        Log out the device a refresh token belongs to.
+
+        Returns:
+            Number of tokens and sessions revoked (0 if the token is not the user's)
+        """
+        token_hash = AuthUtils.hash_refresh_token(token)
+        redis_client = self._get_redis()
+        if redis_client is None:
+            refresh_token = db.query(RefreshToken).filter(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.user_id == user_id,
+                RefreshToken.is_revoked == False
+            ).first()
+            if not refresh_token:
+                return 0
+            device_id = (refresh_token.device_info or {}).get("device_id")
+            return _revoke_device_rows(db, user_id, device_id, token_hash)
+
+        raw = redis_client.get(self._refresh_key(token_hash))
+        record = json.loads(raw) if raw else None
+        if record is None or record["user_id"] != str(user_id):
+            return 0
+        raw_session = redis_client.get(self._session_key(record["session_id"]))
+        session = json.loads(raw_session) if raw_session else {**record, "refresh_hash": token_hash}
+        self._delete_sessions(redis_client, user_id, [session])
+        self._audit(_revoke_device_rows, user_id, record["device_id"])
+        return 2 if raw_session else 1
+
+    def revoke_all(self, db: Session, user_id: Any) -> int:
+        """
+        Log out all of a user's devices.
+
+        Returns:
+            Number of tokens and sessions revoked
+        """
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return _revoke_all_rows(db, user_id)
+
+        sessions = self._load_sessions(redis_client, user_id)
+        self._delete_sessions(redis_client, user_id, sessions)
+        redis_client.delete(self._user_key(user_id))
+        self._audit(_revoke_all_rows, user_id)
+        return 2 * len(sessions)
+
+    def list_sessions(self, db: Session, user_id: Any, active_only: bool = True) -> List[Dict[str, Any]]:
+        """
+        A user's sessions, most recently used first.
+
+        Args:
+            active_only: Leave out ended sessions (Redis only keeps active ones)
+
+        Returns:
+            Session dicts with SESSION_FIELDS
+        """
+        redis_client = self._get_redis()
+        if redis_client is None:
+            query = db.query(UserSession).filter(UserSession.user_id == user_id)
+            if active_only:
+                query = query.filter(UserSession.is_active == True)
+            return [_session_from_row(session) for session in query.order_by(UserSession.last_activity.desc())]
+
+        sessions = [self._public(session) for session in self._load_sessions(redis_client, user_id)]
+        sessions.sort(key=lambda session: session["last_activity"], reverse=True)
+        return sessions
+
+    def revoke_session(self, db: Session, user_id: Any, session_id: Any) -> bool:
+        """
+        End one of a user's sessions and revoke its refresh token.
+
+        Returns:
+            False if the session does not exist or is not the user's
+        """
+        redis_client = self._get_redis()
+        if redis_client is None:
+            session = db.query(UserSession).filter(
+                UserSession.session_id == session_id,
+                UserSession.user_id == user_id
+            ).first()
+            if not session:
+                return False
+            _revoke_device_rows(db, user_id, session.device_id)
+            return True
+
+        raw = redis_client.get(self._session_key(session_id))
+        session = json.loads(raw) if raw else None
+        if session is None or session["user_id"] != str(user_id):
+            return False
+        self._delete_sessions(redis_client, user_id, [session])
+        self._audit(_revoke_device_rows, user_id, session["device_id"])
+        return True
+
+    def get_status(self) -> dict:
+        return {
+            "backend": "redis" if self._get_redis() is not None else "postgres",
+            "refresh_token_ttl_days": self.ttl.days,
+            "audit_failures": self.audit_failures
+        }
+
+
+# Global instance for the application
+session_store_service = SessionStoreService(
+    backend=SESSION_STORE_CONFIG["backend"],
+    refresh_token_ttl_days=SESSION_STORE_CONFIG["refresh_token_ttl_days"]
+)
@@ -0,0 +1,185 @@
+"""
+SMTP Connection Pool
+
+Keeps a few authenticated SMTP connections open so sending an email does not
+pay for TCP + STARTTLS + AUTH every time.
+
+- Connections are reused most-recently-used first; one that sat idle longer
+  than max_idle_seconds is checked with NOOP before reuse, since servers
+  drop idle clients.
+- A connection is retired after max_messages, which some providers cap.
+- A send that fails on a dropped connection is retried once on a fresh one.
+"""
+
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.message import Message
+from typing import Optional
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether an error means the connection is unusable rather than the message being rejected"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, so check it is a socket-level error
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class _PooledConnection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """Bounded pool of persistent SMTP connections"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        security: str = "starttls",
+        size: int = 2,
+        timeout_seconds: float = 10,
+        max_idle_seconds: float = 60,
+        max_messages: int = 100
+    ):
+        """
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+            username: Login user; no AUTH when empty
+            password: Login password
+            security: "starttls", "ssl" (implicit TLS) or "none" (local relays)
+            size: Maximum open connections
+            timeout_seconds: Socket timeout for connect and commands
+            max_idle_seconds: Idle time after which a connection is checked before reuse
+            max_messages: Messages sent on a connection before it is replaced
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        if security not in ("starttls", "ssl", "none"):
+            raise ValueError(f"Unknown SMTP security mode: {security}")
+        self.security = security
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self.max_messages = max_messages
+
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> _PooledConnection:
+        if self.security == "ssl":
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout_seconds)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout_seconds)
+            if self.security == "starttls":
+                server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return _PooledConnection(server)
+
+    @staticmethod
+    def _close(conn: _PooledConnection):
+        try:
+            conn.server.quit()
+        except Exception:
+            try:
+                conn.server.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, conn: _PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.max_idle_seconds:
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self) -> _PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._is_alive(conn):
+                return conn
+            self._close(conn)
+
+    def _release(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages:
+            self._close(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; it is discarded if the block raises a connection error"""
+        with self._slots:
+            conn = self._acquire()
+            try:
+                yield conn
+            except Exception as e:
+                if is_connection_error(e):
+                    self._close(conn)
+                    raise
+                # The message was rejected; the connection itself is fine, but
+                # reset the transaction so the next message starts cleanly
+                try:
+                    conn.server.rset()
+                    self._release(conn)
+                except Exception:
+                    self._close(conn)
+                raise
+            self._release(conn)
+
+    def send(self, message: Message, from_addr: Optional[str] = None):
+        """
+        Send a message, retrying once on a fresh connection if the pooled one was dropped.
+
+        Raises:
+            smtplib.SMTPException: The server rejected the message
+            OSError: The server could not be reached
+        """
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    conn.server.send_message(message, from_addr=from_addr)
+                    conn.sent += 1
+                return
+            except Exception as e:
+                if attempt or not is_connection_error(e):
+                    raise
+                logger.info(f"SMTP connection dropped, reconnecting: {e}")
+
+    def close(self):
+        """Close idle connections"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._close(conn)
+
+    def get_status(self) -> dict:
+        return {
+            "size": self.size,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.connections_opened
+        }
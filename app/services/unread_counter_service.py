@@ -0,0 +1,174 @@
+"""
+Unread Counter Service
+
+Per-user unread notification counters in Redis, so the badge endpoint is a
+single O(1) read instead of a COUNT over the user's notifications.
+
+- A counter is a hash {count, epoch}. A missing counter is recounted from
+  Postgres on the next read.
+- Creates, reads and deletes adjust an existing counter atomically; they
+  never create one, so a counter is always either absent or seeded from a
+  full count.
+- Broadcasts insert rows for many users at once. Instead of touching every
+  counter they bump a global epoch, and counters from an older epoch are
+  treated as missing.
+- Counters expire after the reconcile interval, which bounds any drift
+  (e.g. a notification created while its counter was being recounted).
+
+Without Redis every read falls back to counting in Postgres.
+"""
+
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from app.infra.db.postgres.models.notification import Notification
+from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+from app.config.config import UNREAD_COUNTER_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Adjust a counter only if it exists and belongs to the current epoch; never below zero
+_ADJUST_SCRIPT = """
+local epoch = redis.call('GET', KEYS[2]) or '0'
+if redis.call('HGET', KEYS[1], 'epoch') ~= epoch then
+    return nil
+end
+local count = redis.call('HINCRBY', KEYS[1], 'count', ARGV[1])
+if count < 0 then
+    redis.call('HSET', KEYS[1], 'count', 0)
+    count = 0
+end
+return count
+"""
+
+
+class UnreadCounterService:
+    """Redis-cached unread notification counts"""
+
+    def __init__(self, reconcile_seconds: int = 900, use_redis: bool = True):
+        self.reconcile_seconds = reconcile_seconds
+        self.use_redis = use_redis
+        self._redis = None
+        self._adjust = None
+        self._redis_checked = False
+        self._epoch_key = redis_key("notifications", "unread", "epoch")
+
+    def _get_redis(self):
+        if not self._redis_checked:
+            self._redis = get_redis_client() if self.use_redis else None
+            if self._redis is not None:
+                self._adjust = self._redis.register_script(_ADJUST_SCRIPT)
+            self._redis_checked = True
+        return self._redis
+
+    @staticmethod
+    def _key(user_id: UUID) -> str:
+        return redis_key("notifications", "unread", user_id)
+
+    @staticmethod
+    def count_unread(db: Session, user_id: UUID) -> int:
+        """Count a user's unread notifications in Postgres"""
+        return db.query(func.count(Notification.notification_id))\
+            .filter(and_(
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            ))\
+            .scalar()
+
+    def get(self, db: Session, user_id: UUID) -> int:
+        """
+        Get a user's unread count.
+
+        Args:
+            db: Database session, used only when the counter must be recounted
+            user_id: User ID
+
+        Returns:
+            Number of unread notifications
+        """
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return self.count_unread(db, user_id)
+
+        key = self._key(user_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self._epoch_key)
+            pipe.hmget(key, "count", "epoch")
+            epoch, (count, counter_epoch) = pipe.execute()
+            epoch = epoch or "0"
+            if count is not None and counter_epoch == epoch:
+                return int(count)
+        except Exception as e:
+            logger.warning(f"Failed to read unread counter for user {user_id}: {e}")
+            return self.count_unread(db, user_id)
+
+        # Seed with the epoch read before counting: a broadcast committed
+        # meanwhile makes this counter stale rather than silently low
+        count = self.count_unread(db, user_id)
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={"count": count, "epoch": epoch})
+            pipe.expire(key, self.reconcile_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store unread counter for user {user_id}: {e}")
+        return count
+
+    def adjust(self, user_id: UUID, delta: int) -> Optional[int]:
+        """
+        Add delta to a user's counter if it is cached.
+
+        Returns:
+            The new count, or None if the counter was not cached
+        """
+        if not delta or self._get_redis() is None:
+            return None
+        try:
+            result = self._adjust(keys=[self._key(user_id), self._epoch_key], args=[delta])
+            return int(result) if result is not None else None
+        except Exception as e:
+            logger.warning(f"Failed to adjust unread counter for user {user_id}, dropping it: {e}")
+            self.invalidate(user_id)
+            return None
+
+    def reset(self, user_id: UUID):
+        """Set a user's counter to zero (everything was just marked read)"""
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            epoch = redis_client.get(self._epoch_key) or "0"
+            pipe = redis_client.pipeline()
+            pipe.hset(self._key(user_id), mapping={"count": 0, "epoch": epoch})
+            pipe.expire(self._key(user_id), self.reconcile_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to reset unread counter for user {user_id}: {e}")
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id: UUID):
+        """Drop a user's counter so the next read recounts it"""
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to drop unread counter for user {user_id}: {e}")
+
+    def bump_epoch(self):
+        """Mark every cached counter stale (after notifications were inserted in bulk)"""
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.incr(self._epoch_key)
+        except Exception as e:
+            logger.error(f"Failed to bump unread counter epoch: {e}")
+
+
+# Global instance for the application
+unread_counter_service = UnreadCounterService(reconcile_seconds=UNREAD_COUNTER_CONFIG["reconcile_seconds"])
@@ -0,0 +1,347 @@
+"""
+WebSocket Backplane
+
+Carries WebSocket messages between application workers. Each Uvicorn worker
+holds only its own sockets, so a message for a user, a topic (order,
+restaurant) or everyone is published to the backplane and every worker
+delivers it to the sockets it holds.
+
+- RedisBackplane: Redis pub/sub between workers, plus presence (which users
+  are connected and which topics are followed on which worker, per-worker
+  connection counts) kept in Redis so any worker can answer "is this user
+  online", skip topics nobody follows, and report cluster totals
+- LocalBackplane: single-process stand-in used when Redis is unavailable;
+  messages are handed straight back to this worker's manager
+
+Channels are "<namespace>:ws:<kind>:<key>" where kind is "user", "topic" or
+"broadcast". Messages are serialized once when published and handed to the
+delivery handler as JSON text. All Redis calls use the asyncio client, so
+none of them blocks the event loop. Publishing does not wait on Redis at all:
+messages are queued and a background task sends them in order, pipelined in
+batches.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+from app.infra.redis.repositories.redis_repositories import create_async_redis_client, redis_key
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Delivers a message to this worker's sockets: handler(kind, key, payload_json)
+DeliveryHandler = Callable[[str, str, str], Awaitable[int]]
+
+# Publishes to a topic channel only while some worker has subscribers for it
+_PUBLISH_TOPIC_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+return redis.call('PUBLISH', ARGV[1], ARGV[2])
+"""
+
+# Messages sent per pipeline round trip
+PUBLISH_BATCH_SIZE = 100
+
+
+class LocalBackplane:
+    """In-process stand-in for a single worker"""
+
+    name = "local"
+    distributed = False
+
+    def __init__(self, handler: DeliveryHandler):
+        self._handler = handler
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, local_stats: Callable[[], dict]):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        pass
+
+    def publish(self, kind: str, key: str, message: dict):
+        """
+        Schedule local delivery. Safe to call from the event loop and, once
+        started, from worker threads.
+        """
+        payload = json.dumps(message, default=str)
+        try:
+            asyncio.get_running_loop().create_task(self._handler(kind, key, payload))
+        except RuntimeError:
+            if self._loop is not None and self._loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._handler(kind, key, payload), self._loop)
+
+    async def register_user(self, user_id: str):
+        pass
+
+    async def unregister_user(self, user_id: str):
+        pass
+
+    async def register_topic(self, topic: str):
+        pass
+
+    async def unregister_topic(self, topic: str):
+        pass
+
+    async def is_user_online(self, user_id: str) -> bool:
+        # Only this worker exists; the manager's local check is authoritative
+        return False
+
+    async def cluster_stats(self) -> Optional[dict]:
+        return None
+
+    def get_status(self) -> dict:
+        return {}
+
+
+class RedisBackplane:
+    """Redis pub/sub backplane with cluster-wide presence"""
+
+    name = "redis"
+    distributed = True
+
+    def __init__(self, handler: DeliveryHandler, presence_interval_seconds: float = 15):
+        """
+        Args:
+            handler: Coroutine delivering a message to this worker's sockets
+            presence_interval_seconds: Seconds between presence heartbeats
+        """
+        self._handler = handler
+        self.presence_interval_seconds = presence_interval_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._prefix = redis_key("ws") + ":"
+        self._workers_key = redis_key("ws", "workers")
+        self._local_users: Dict[str, int] = {}
+        self._local_topics: Set[str] = set()
+        self._local_stats: Optional[Callable[[], dict]] = None
+        self._tasks = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_redis = None
+        self._publish_topic = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._stats = {"published": 0, "received": 0, "publish_errors": 0, "skipped_topics": 0}
+
+    def _online_key(self, user_id: str) -> str:
+        return redis_key("ws", "online", user_id)
+
+    def _topic_key(self, topic: str) -> str:
+        return redis_key("ws", "subscribers", topic)
+
+    def _presence_ttl(self) -> int:
+        return int(3 * self.presence_interval_seconds) + 1
+
+    def _stale_before(self) -> float:
+        return time.time() - 3 * self.presence_interval_seconds
+
+    async def start(self, local_stats: Callable[[], dict]):
+        """Start the subscriber, publisher and presence heartbeat tasks"""
+        self._local_stats = local_stats
+        self._loop = asyncio.get_running_loop()
+        self._async_redis = create_async_redis_client()
+        self._publish_topic = self._async_redis.register_script(_PUBLISH_TOPIC_SCRIPT)
+        self._outbox = asyncio.Queue()
+        self._tasks = [
+            self._loop.create_task(self._listen()),
+            self._loop.create_task(self._publisher()),
+            self._loop.create_task(self._heartbeat())
+        ]
+        logger.info(f"WebSocket backplane started on Redis as worker {self.worker_id}")
+
+    async def stop(self):
+        """Stop background tasks and withdraw this worker's presence"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._async_redis is None:
+            return
+        try:
+            pipe = self._async_redis.pipeline(transaction=False)
+            pipe.hdel(self._workers_key, self.worker_id)
+            for user_id in self._local_users:
+                pipe.hdel(self._online_key(user_id), self.worker_id)
+            for topic in self._local_topics:
+                pipe.hdel(self._topic_key(topic), self.worker_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to clear WebSocket presence: {e}")
+        await self._async_redis.close()
+        self._async_redis = None
+
+    def publish(self, kind: str, key: str, message: dict):
+        """
+        Queue a message for every worker (including this one). Returns
+        immediately; safe to call from the event loop and from worker threads.
+        """
+        if self._outbox is None:
+            return
+        item = (kind, key, json.dumps(message, default=str))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._outbox.put_nowait(item)
+        elif self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._outbox.put_nowait, item)
+
+    async def _publisher(self):
+        """Send queued messages in order, one pipeline per batch"""
+        while True:
+            batch = [await self._outbox.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE and not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            try:
+                pipe = self._async_redis.pipeline(transaction=False)
+                for kind, key, payload in batch:
+                    channel = f"{self._prefix}{kind}:{key}"
+                    if kind == "topic":
+                        await self._publish_topic(keys=[self._topic_key(key)], args=[channel, payload], client=pipe)
+                    else:
+                        await pipe.publish(channel, payload)
+                results = await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["publish_errors"] += len(batch)
+                logger.error(f"Failed to publish {len(batch)} WebSocket messages: {e}")
+                continue
+            skipped = sum(1 for result in results if result == -1)
+            self._stats["skipped_topics"] += skipped
+            self._stats["published"] += len(batch) - skipped
+
+    async def _listen(self):
+        """Receive messages from all workers and deliver them locally"""
+        while True:
+            client = create_async_redis_client(socket_timeout=None)
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(f"{self._prefix}user:*", f"{self._prefix}topic:*", f"{self._prefix}broadcast:*")
+                async for item in pubsub.listen():
+                    if item.get("type") != "pmessage":
+                        continue
+                    kind, _, key = item["channel"][len(self._prefix):].partition(":")
+                    self._stats["received"] += 1
+                    try:
+                        await self._handler(kind, key, item["data"])
+                    except Exception as e:
+                        logger.error(f"Error delivering WebSocket message for {kind}:{key}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket backplane subscriber error, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await client.close()
+
+    async def _heartbeat(self):
+        """Refresh this worker's presence entries"""
+        while True:
+            try:
+                await self._write_presence()
+            except Exception as e:
+                logger.warning(f"Failed to refresh WebSocket presence: {e}")
+            await asyncio.sleep(self.presence_interval_seconds)
+
+    async def _write_presence(self):
+        now = time.time()
+        ttl = self._presence_ttl()
+        stats = self._local_stats() if self._local_stats else {}
+        pipe = self._async_redis.pipeline(transaction=False)
+        pipe.hset(self._workers_key, self.worker_id, json.dumps({**stats, "heartbeat": now}))
+        for user_id in list(self._local_users):
+            pipe.hset(self._online_key(user_id), self.worker_id, now)
+            pipe.expire(self._online_key(user_id), ttl)
+        for topic in list(self._local_topics):
+            pipe.hset(self._topic_key(topic), self.worker_id, now)
+            pipe.expire(self._topic_key(topic), ttl)
+        await pipe.execute()
+
+    async def _mark_present(self, key: str):
+        pipe = self._async_redis.pipeline(transaction=False)
+        pipe.hset(key, self.worker_id, time.time())
+        pipe.expire(key, self._presence_ttl())
+        await pipe.execute()
+
+    async def register_user(self, user_id: str):
+        """Record that a user has a socket on this worker"""
+        self._local_users[user_id] = self._local_users.get(user_id, 0) + 1
+        try:
+            await self._mark_present(self._online_key(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to record WebSocket presence for {user_id}: {e}")
+
+    async def unregister_user(self, user_id: str):
+        """Record that one of a user's sockets on this worker closed"""
+        remaining = self._local_users.get(user_id, 0) - 1
+        if remaining > 0:
+            self._local_users[user_id] = remaining
+            return
+        self._local_users.pop(user_id, None)
+        try:
+            await self._async_redis.hdel(self._online_key(user_id), self.worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to clear WebSocket presence for {user_id}: {e}")
+
+    async def register_topic(self, topic: str):
+        """Record that this worker has subscribers for a topic"""
+        self._local_topics.add(topic)
+        try:
+            await self._mark_present(self._topic_key(topic))
+        except Exception as e:
+            logger.warning(f"Failed to record WebSocket subscribers for {topic}: {e}")
+
+    async def unregister_topic(self, topic: str):
+        """Record that this worker's last subscriber for a topic left"""
+        self._local_topics.discard(topic)
+        try:
+            await self._async_redis.hdel(self._topic_key(topic), self.worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to clear WebSocket subscribers for {topic}: {e}")
+
+    async def is_user_online(self, user_id: str) -> bool:
+        """Whether any live worker holds a socket for the user"""
+        try:
+            entries = await self._async_redis.hgetall(self._online_key(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to read WebSocket presence for {user_id}: {e}")
+            return False
+        stale_before = self._stale_before()
+        return any(float(seen) >= stale_before for seen in entries.values())
+
+    async def cluster_stats(self) -> Optional[dict]:
+        """Connection totals across all live workers"""
+        try:
+            workers = await self._async_redis.hgetall(self._workers_key)
+        except Exception as e:
+            logger.warning(f"Failed to read WebSocket worker stats: {e}")
+            return None
+
+        stale_before = self._stale_before()
+        totals = {"workers": 0, "active_connections": 0, "connected_users": 0, "topics": 0}
+        stale = []
+        for worker_id, raw in workers.items():
+            stats = json.loads(raw)
+            if worker_id == self.worker_id and self._local_stats:
+                # This worker's own numbers are known exactly, not as of the last heartbeat
+                stats = {**self._local_stats(), "heartbeat": time.time()}
+            if stats.get("heartbeat", 0) < stale_before:
+                stale.append(worker_id)
+                continue
+            totals["workers"] += 1
+            for field in ("active_connections", "connected_users", "topics"):
+                totals[field] += stats.get(field, 0)
+        if stale:
+            try:
+                await self._async_redis.hdel(self._workers_key, *stale)
+            except Exception:
+                pass
+        return totals
+
+    def get_status(self) -> dict:
+        return {"worker_id": self.worker_id, **self._stats}
@@ -0,0 +1,150 @@
+"""
+WebSocket Connection
+
+Wraps an accepted WebSocket with a bounded outbound queue drained by its own
+writer task. Fan-out code only enqueues already-serialized text, so one slow
+client never holds up delivery to the others and a broadcast costs one
+serialization plus one non-blocking enqueue per socket.
+
+When a client cannot keep up (its queue is full, or a single send takes
+longer than the send timeout) the slow-consumer policy applies:
+- "disconnect": close the socket; the client reconnects and resyncs
+- "drop": discard the oldest queued message and keep the connection
+"""
+
+import asyncio
+import json
+import time
+from typing import Optional
+from fastapi import WebSocket, status
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SendMetrics:
+    """Delivery counters shared by all connections of a worker"""
+
+    def __init__(self):
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        self.total_send_seconds = 0.0
+        self.max_send_seconds = 0.0
+
+    def record_send(self, seconds: float):
+        self.sent += 1
+        self.total_send_seconds += seconds
+        if seconds > self.max_send_seconds:
+            self.max_send_seconds = seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors,
+            "avg_send_ms": round(self.total_send_seconds / self.sent * 1000, 3) if self.sent else 0.0,
+            "max_send_ms": round(self.max_send_seconds * 1000, 3)
+        }
+
+
+class WebSocketConnection:
+    """An accepted WebSocket with a bounded send queue and writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        metrics: SendMetrics,
+        max_queue: int = 100,
+        send_timeout_seconds: float = 10,
+        slow_consumer_policy: str = "disconnect"
+    ):
+        self.websocket = websocket
+        self.metrics = metrics
+        self.send_timeout_seconds = send_timeout_seconds
+        self.slow_consumer_policy = slow_consumer_policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the writer task. Must be called on the event loop."""
+        self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def send_text(self, text: str) -> bool:
+        """
+        Queue an already-serialized message without waiting.
+
+        Returns:
+            False if the connection is closed or the message was not queued
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == "drop":
+            try:
+                self.queue.get_nowait()
+                self.metrics.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            self.queue.put_nowait(text)
+            return True
+
+        self.metrics.slow_disconnects += 1
+        logger.warning("Closing slow WebSocket consumer: send queue full")
+        self._close_soon(status.WS_1008_POLICY_VIOLATION, "Client too slow")
+        return False
+
+    def send_json(self, message: dict) -> bool:
+        """Serialize and queue a message"""
+        return self.send_text(json.dumps(message, default=str))
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout_seconds)
+                except asyncio.TimeoutError:
+                    self.metrics.slow_disconnects += 1
+                    logger.warning("Closing slow WebSocket consumer: send timed out")
+                    await self._close_socket(status.WS_1008_POLICY_VIOLATION, "Client too slow")
+                    return
+                except Exception as e:
+                    self.metrics.send_errors += 1
+                    logger.debug(f"WebSocket send failed: {e}")
+                    await self._close_socket(status.WS_1011_INTERNAL_ERROR, "Send failed")
+                    return
+                self.metrics.record_send(time.monotonic() - started)
+        except asyncio.CancelledError:
+            pass
+
+    def _close_soon(self, code: int, reason: str):
+        self.closed = True
+        asyncio.get_running_loop().create_task(self.close(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        self.closed = True
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE, reason: str = ""):
+        """Stop the writer and close the socket. Safe to call more than once."""
+        self.closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        await self._close_socket(code, reason)
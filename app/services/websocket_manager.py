@@ -0,0 +1,220 @@
+"""
+WebSocket Connection Manager
+
+Holds the WebSocket connections accepted by this worker and routes messages
+to them through the backplane. Used by the WebSocket routes to register
+sockets, and by services and workers to push notifications and topic events.
+"""
+
+from typing import Dict, Set
+from fastapi import WebSocket
+from app.services.websocket_backplane import LocalBackplane, RedisBackplane
+from app.services.websocket_connection import SendMetrics, WebSocketConnection
+from app.infra.redis.repositories.redis_repositories import get_redis_client
+from app.config.config import WEBSOCKET_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConnectionManager:
+    """
+    Manages WebSocket connections for users
+    
+    Sockets live on the worker that accepted them. Messages for a user, a
+    topic or everyone go through the backplane so they reach the worker
+    holding the socket, whichever worker sent them. Each socket is wrapped in
+    a WebSocketConnection whose writer task does the actual sending, so
+    delivery here only enqueues the serialized payload.
+    """
+    
+    def __init__(self):
+        # user_id -> that user's open connections on this worker (one per device/session)
+        self.user_connections: Dict[str, Set[WebSocketConnection]] = {}
+        self._connection_count = 0
+        # Topic subscriptions, e.g. "order:<order_id>" -> connections following that order
+        self.topic_subscribers: Dict[str, Set[WebSocketConnection]] = {}
+        self.send_metrics = SendMetrics()
+        self.backplane = LocalBackplane(self.deliver_local)
+    
+    async def start_backplane(self):
+        """Switch to the Redis backplane when Redis is reachable. Call on startup."""
+        if get_redis_client() is not None:
+            self.backplane = RedisBackplane(
+                self.deliver_local,
+                presence_interval_seconds=WEBSOCKET_CONFIG["presence_interval_seconds"]
+            )
+        else:
+            logger.warning("Redis unavailable, WebSocket messages only reach this worker's connections")
+        await self.backplane.start(self.get_local_stats)
+    
+    async def stop_backplane(self):
+        """Stop the backplane on shutdown"""
+        await self.backplane.stop()
+    
+    def open(self, websocket: WebSocket) -> WebSocketConnection:
+        """Wrap an accepted socket and start its writer task"""
+        connection = WebSocketConnection(
+            websocket,
+            self.send_metrics,
+            max_queue=WEBSOCKET_CONFIG["send_queue_size"],
+            send_timeout_seconds=WEBSOCKET_CONFIG["send_timeout_seconds"],
+            slow_consumer_policy=WEBSOCKET_CONFIG["slow_consumer_policy"]
+        )
+        connection.start()
+        return connection
+    
+    async def connect(self, user_id: str, websocket: WebSocket) -> WebSocketConnection:
+        """Accept and store WebSocket connection"""
+        await websocket.accept()
+        connection = self.open(websocket)
+        await self.add_connection(user_id, connection)
+        return connection
+    
+    async def add_connection(self, user_id: str, connection: WebSocketConnection):
+        """Store an open connection alongside the user's other sessions"""
+        connections = self.user_connections.setdefault(user_id, set())
+        if connection in connections:
+            return
+        connections.add(connection)
+        self._connection_count += 1
+        await self.backplane.register_user(user_id)
+        logger.info(f"✅ User {user_id} connected to WebSocket ({len(connections)} sessions). Total connections: {self._connection_count}")
+    
+    async def disconnect(self, user_id: str, connection: WebSocketConnection):
+        """Remove one of a user's connections"""
+        connections = self.user_connections.get(user_id)
+        if not connections or connection not in connections:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.user_connections[user_id]
+        self._connection_count -= 1
+        await self.backplane.unregister_user(user_id)
+        logger.info(f"❌ User {user_id} disconnected from WebSocket. Total connections: {self._connection_count}")
+    
+    async def send_notification(self, user_id: str, notification: dict) -> bool:
+        """
+        Send notification to a user connected on any worker.
+        
+        Returns:
+            True if the user is connected somewhere and the message was sent
+            on, False if they are offline
+        """
+        if not await self.is_user_connected(user_id):
+            logger.debug(f"User {user_id} not connected to WebSocket")
+            return False
+        self.backplane.publish("user", user_id, notification)
+        return True
+    
+    async def broadcast(self, message: dict, exclude_user: str = None):
+        """Broadcast message to all connected users"""
+        self.backplane.publish("broadcast", exclude_user or "", message)
+    
+    async def subscribe(self, topic: str, connection: WebSocketConnection):
+        """Subscribe a connection to a topic"""
+        subscribers = self.topic_subscribers.get(topic)
+        if subscribers is None:
+            self.topic_subscribers[topic] = {connection}
+            await self.backplane.register_topic(topic)
+        else:
+            subscribers.add(connection)
+    
+    async def unsubscribe(self, topic: str, connection: WebSocketConnection):
+        """Remove a connection from a topic"""
+        subscribers = self.topic_subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topic_subscribers[topic]
+                await self.backplane.unregister_topic(topic)
+    
+    def publish_nowait(self, topic: str, message: dict):
+        """
+        Publish a message to a topic's subscribers on every worker.
+        
+        Callable from synchronous code, including worker threads. Never waits
+        on Redis; topics no worker is following are skipped by the backplane.
+        """
+        if not self.backplane.distributed and topic not in self.topic_subscribers:
+            return
+        self.backplane.publish("topic", topic, message)
+    
+    async def deliver_local(self, kind: str, key: str, payload: str) -> int:
+        """
+        Queue a backplane message on the connections held by this worker.
+        
+        Args:
+            kind: "user", "topic" or "broadcast"
+            key: User id, topic name, or the user excluded from a broadcast
+            payload: Message serialized as JSON
+        
+        Returns:
+            Number of connections the message was queued on
+        """
+        if kind == "user":
+            # Every device the user has connected to this worker
+            connections = self.user_connections.get(key, ())
+        elif kind == "topic":
+            connections = self.topic_subscribers.get(key, ())
+        elif kind == "broadcast":
+            connections = [
+                connection
+                for user_id, user_connections in self.user_connections.items()
+                if not (key and user_id == key)
+                for connection in user_connections
+            ]
+        else:
+            logger.warning(f"Unknown WebSocket message kind: {kind}")
+            return 0
+        
+        delivered = 0
+        for connection in list(connections):
+            if connection.send_text(payload):
+                delivered += 1
+        return delivered
+    
+    def get_connection_count(self) -> int:
+        """Get number of connections held by this worker"""
+        return self._connection_count
+    
+    async def is_user_connected(self, user_id: str) -> bool:
+        """Check if user is connected on this or any other worker"""
+        return user_id in self.user_connections or await self.backplane.is_user_online(user_id)
+    
+    def get_local_stats(self) -> dict:
+        """Connection counts for this worker"""
+        return {
+            "active_connections": self._connection_count,
+            "connected_users": len(self.user_connections),
+            "topics": len(self.topic_subscribers)
+        }
+    
+    def get_queue_stats(self) -> dict:
+        """Outbound queue depth and send latency for this worker"""
+        connections = set()
+        for user_connections in self.user_connections.values():
+            connections.update(user_connections)
+        for subscribers in self.topic_subscribers.values():
+            connections.update(subscribers)
+        depths = [connection.depth for connection in connections]
+        return {
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            **self.send_metrics.to_dict()
+        }
+    
+    async def get_stats(self) -> dict:
+        """Cluster-wide connection counts when available, else this worker's"""
+        local = self.get_local_stats()
+        cluster = await self.backplane.cluster_stats()
+        return {
+            **(cluster or {**local, "workers": 1}),
+            "worker": {**local, "delivery": self.get_queue_stats()},
+            "backplane": self.backplane.name,
+            **self.backplane.get_status()
+        }
+
+
+# Global connection manager instance
+manager = ConnectionManager()
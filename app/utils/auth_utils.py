@@ -1,5 +1,6 @@
 from jose import jwt
 import bcrypt
+import hashlib
 import secrets
 import string
 from datetime import datetime, timedelta
@@ -11,7 +12,6 @@ from app.infra.db.postgres.models.refresh_token import RefreshToken
 from app.infra.db.postgres.models.oauth_provider import OAuthProvider
 from app.infra.db.postgres.models.user_session import UserSession
 from app.utils.enums import UserRole, UserStatus
-import httpx
 import json
 
 class AuthUtils:
@@ -67,40 +67,25 @@ class AuthUtils:
     
     @staticmethod
     async def verify_google_token(id_token: str) -> Optional[Dict[str, Any]]:
-        """Verify Google ID token and return user info"""
+        """Verify Google ID token and return user info (locally, against Google's cached signing keys)"""
+        from app.services.google_token_verifier import google_token_verifier
+        
         try:
-            from app.config.config import GOOGLE_OAUTH_CONFIG
-            
-            # Verify the token with Google
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://oauth2.googleapis.com/tokeninfo?id_token={id_token}"
-                )
-                
-                if response.status_code == 200:
-                    token_info = response.json()
-                    
-                    # Verify the token is for our app
-                    if token_info.get("aud") == GOOGLE_OAUTH_CONFIG["client_id"]:
-                        return {
-                            "google_id": token_info.get("sub"),
-                            "email": token_info.get("email"),
-                            "name": token_info.get("name"),
-                            "given_name": token_info.get("given_name"),
-                            "family_name": token_info.get("family_name"),
-                            "picture": token_info.get("picture"),
-                            "email_verified": token_info.get("email_verified", False)
-                        }
-            
-            return None
+            return await google_token_verifier.verify(id_token)
         except Exception as e:
             print(f"Error verifying Google token: {e}")
             return None
     
     @staticmethod
     def hash_refresh_token(token: str) -> str:
-        """Hash a refresh token for database storage"""
-        return bcrypt.hashpw(token.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """
+        Hash a refresh token for storage.
+
+        Refresh tokens are 256-bit random values, so a fast unsalted SHA-256 is
+        enough to keep them unusable if the store leaks, and unlike bcrypt it
+        lets a presented token be looked up directly by its hash.
+        """
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
     
     @staticmethod
     def create_user_session(
@@ -205,15 +190,17 @@ class AuthUtils:
         user_id: str,
         device_info: Dict[str, Any],
         ip_address: Optional[str] = None,
-        user_agent: Optional[str] = None
+        user_agent: Optional[str] = None,
+        token_hash: Optional[str] = None,
+        expires_in: timedelta = timedelta(days=30)
     ) -> RefreshToken:
-        """Create a new refresh token"""
+        """Create a new refresh token record (token_hash: hash_refresh_token of the token handed to the client)"""
         from uuid import UUID as UUIDType
         user_uuid = UUIDType(user_id) if isinstance(user_id, str) else user_id
         
-        token = AuthUtils.generate_refresh_token()
-        token_hash = AuthUtils.hash_password(token)
-        expires_at = datetime.utcnow() + timedelta(days=30)  # 30 days
+        if token_hash is None:
+            token_hash = AuthUtils.hash_refresh_token(AuthUtils.generate_refresh_token())
+        expires_at = datetime.utcnow() + expires_in
         
         refresh_token = RefreshToken(
             user_id=user_uuid,
@@ -254,10 +241,11 @@ class AuthUtils:
         email: str,
         phone: str,
         password: str,
-        role: str = UserRole.CUSTOMER.value
+        role: str = UserRole.CUSTOMER.value,
+        password_hash: Optional[str] = None
     ) -> User:
-        """Create a new user"""
-        hashed_password = AuthUtils.hash_password(password)
+        """Create a new user (password_hash: precomputed off the event loop by async callers)"""
+        hashed_password = password_hash or AuthUtils.hash_password(password)
         
         user = User(
             first_name=first_name,
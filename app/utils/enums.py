@@ -192,4 +192,14 @@ class BusinessType(str, Enum):
     """Restaurant business types."""
     CLOUD_KITCHEN = "cloud_kitchen"
     DINE_IN = "dine_in"
-    BOTH = "both"
\ No newline at end of file
+    BOTH = "both"
+
+
+class PushOutboxStatus(str, Enum):
+    """Delivery state of a queued push notification."""
+    PENDING = "pending"          # waiting to be sent (or retried)
+    SENDING = "sending"          # claimed by a worker
+    SENT = "sent"                # accepted by Expo, waiting for the receipt
+    DELIVERED = "delivered"      # receipt ok
+    FAILED = "failed"            # permanent error or out of retries
+    UNCONFIRMED = "unconfirmed"  # no receipt before Expo discarded it
@@ -0,0 +1,207 @@
+"""
+Geo Index Utility for OneQlick Backend
+
+Spatial indexes used for radius queries on the delivery side (ready orders,
+partner positions). Two interchangeable backends are provided:
+- GeoIndex: in-process grid index, used in development or when Redis is down
+- RedisGeoIndex: Redis GEO set shared by every worker (GEOADD / GEOSEARCH)
+
+Both return search results as (member, distance_km) tuples sorted by distance.
+"""
+
+import math
+from typing import Dict, List, Optional, Set, Tuple
+from app.config.logger import get_logger
+from app.utils.order_utils import calculate_distance
+
+logger = get_logger(__name__)
+
+# Kilometres per degree of latitude (and of longitude at the equator)
+KM_PER_DEGREE = 111.32
+
+
+class GeoIndex:
+    """
+    In-memory spatial index bucketing members into fixed-size lat/lon cells.
+
+    A radius search only visits the cells overlapping the search circle's
+    bounding box, so its cost depends on the number of nearby members rather
+    than on the size of the index.
+    """
+
+    def __init__(self, cell_size_km: float = 2.0):
+        self.cell_deg = cell_size_km / KM_PER_DEGREE
+        self._positions: Dict[str, Tuple[float, float]] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    def add(self, member: str, latitude: float, longitude: float):
+        """Add a member or move it to a new position"""
+        self.remove(member)
+        self._positions[member] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), set()).add(member)
+
+    def remove(self, member: str) -> bool:
+        """Remove a member, returning True if it was present"""
+        position = self._positions.pop(member, None)
+        if position is None:
+            return False
+
+        cell = self._cell(*position)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(member)
+            if not bucket:
+                del self._cells[cell]
+        return True
+
+    def position(self, member: str) -> Optional[Tuple[float, float]]:
+        """Get (latitude, longitude) for a member"""
+        return self._positions.get(member)
+
+    def members(self) -> List[str]:
+        """Get all indexed members"""
+        return list(self._positions.keys())
+
+    def positions(self) -> Dict[str, Tuple[float, float]]:
+        """Get (latitude, longitude) for every indexed member"""
+        return dict(self._positions)
+
+    def replace_all(self, entries: Dict[str, Tuple[float, float]]):
+        """Replace the whole index content with the given member positions"""
+        self._positions = {}
+        self._cells = {}
+        for member, (latitude, longitude) in entries.items():
+            self.add(member, latitude, longitude)
+
+    def search(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find members within radius_km of a point.
+
+        Returns:
+            List of (member, distance_km) sorted by distance
+        """
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+        lon_span = radius_km / (KM_PER_DEGREE * cos_lat)
+
+        min_cell = self._cell(latitude - lat_span, longitude - lon_span)
+        max_cell = self._cell(latitude + lat_span, longitude + lon_span)
+
+        results = []
+        for cell_lat in range(min_cell[0], max_cell[0] + 1):
+            for cell_lon in range(min_cell[1], max_cell[1] + 1):
+                for member in self._cells.get((cell_lat, cell_lon), ()):
+                    member_lat, member_lon = self._positions[member]
+                    distance_km = calculate_distance(latitude, longitude, member_lat, member_lon)
+                    if distance_km <= radius_km:
+                        results.append((member, distance_km))
+
+        results.sort(key=lambda item: item[1])
+        return results[:limit] if limit else results
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, member: str) -> bool:
+        return member in self._positions
+
+
+class RedisGeoIndex:
+    """Redis GEO set backend with the same interface as GeoIndex"""
+
+    def __init__(self, redis_client, key: str):
+        self._redis = redis_client
+        self.key = key
+
+    def add(self, member: str, latitude: float, longitude: float):
+        """Add a member or move it to a new position"""
+        self._redis.geoadd(self.key, [longitude, latitude, member])
+
+    def remove(self, member: str) -> bool:
+        """Remove a member, returning True if it was present"""
+        return bool(self._redis.zrem(self.key, member))
+
+    def position(self, member: str) -> Optional[Tuple[float, float]]:
+        """Get (latitude, longitude) for a member"""
+        positions = self._redis.geopos(self.key, member)
+        if not positions or positions[0] is None:
+            return None
+        longitude, latitude = positions[0]
+        return float(latitude), float(longitude)
+
+    def members(self) -> List[str]:
+        """Get all indexed members"""
+        return list(self._redis.zrange(self.key, 0, -1))
+
+    def positions(self) -> Dict[str, Tuple[float, float]]:
+        """Get (latitude, longitude) for every indexed member in two round trips"""
+        members = self.members()
+        if not members:
+            return {}
+        result = {}
+        for member, position in zip(members, self._redis.geopos(self.key, *members)):
+            if position is not None:
+                result[member] = (float(position[1]), float(position[0]))
+        return result
+
+    def replace_all(self, entries: Dict[str, Tuple[float, float]]):
+        """
+        Replace the whole index content atomically.
+
+        The new set is built under a temporary key and renamed over the live
+        one, so readers never observe a partially rebuilt index.
+        """
+        if not entries:
+            self._redis.delete(self.key)
+            return
+
+        temp_key = f"{self.key}:rebuild"
+        values = []
+        for member, (latitude, longitude) in entries.items():
+            values.extend([longitude, latitude, member])
+
+        pipe = self._redis.pipeline()
+        pipe.delete(temp_key)
+        pipe.geoadd(temp_key, values)
+        pipe.rename(temp_key, self.key)
+        pipe.execute()
+
+    def search(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find members within radius_km of a point.
+
+        Returns:
+            List of (member, distance_km) sorted by distance
+        """
+        results = self._redis.geosearch(
+            self.key,
+            longitude=longitude,
+            latitude=latitude,
+            radius=radius_km,
+            unit="km",
+            sort="ASC",
+            count=limit,
+            withdist=True
+        )
+        return [(member, round(float(distance_km), 2)) for member, distance_km in results]
+
+    def __len__(self) -> int:
+        return int(self._redis.zcard(self.key))
+
+    def __contains__(self, member: str) -> bool:
+        return self._redis.zscore(self.key, member) is not None
@@ -142,7 +142,23 @@ def calculate_order_totals(
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
-    Calculate distance between two points using Haversine formula.
+    Calculate distance between two points, rounded to 10 m.
+    
+    Args:
+        lat1: Latitude of point 1
+        lon1: Longitude of point 1
+        lat2: Latitude of point 2
+        lon2: Longitude of point 2
+    
+    Returns:
+        Distance in kilometers
+    """
+    return round(haversine_distance(lat1, lon1, lat2, lon2), 2)
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Calculate the unrounded distance between two points using Haversine formula.
     
     Args:
         lat1: Latitude of point 1
@@ -170,7 +186,7 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     
     distance = R * c
-    return round(distance, 2)
+    return distance
 
 
 # ============================================
@@ -1,3 +1,5 @@
+import hashlib
+import hmac
 import secrets
 import string
 from datetime import datetime, timedelta, timezone
@@ -6,7 +8,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from app.infra.db.postgres.models.otp_verification import OTPVerification
 from app.infra.db.postgres.models.user import User
+from app.services.otp_limiter_service import otp_limiter_service
 from app.utils.enums import UserRole, UserStatus
+from app.config.config import SECRET_KEY
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +23,7 @@ class OTPUtils:
     OTP_EXPIRY_MINUTES = 10
     MAX_ATTEMPTS = 3
     MAX_SEND_ATTEMPTS = 3  # Maximum number of OTP sending attempts
+    SEND_WINDOW_HOURS = 24  # Window MAX_SEND_ATTEMPTS applies to
     OTP_CHARS = string.digits  # Only numeric OTPs
     
     @staticmethod
@@ -26,6 +31,16 @@ class OTPUtils:
         """Generate a random OTP code"""
         return ''.join(secrets.choice(OTPUtils.OTP_CHARS) for _ in range(OTPUtils.OTP_LENGTH))
     
+    @staticmethod
+    def hash_otp(otp_code: str) -> str:
+        """
+        Hash an OTP code for storage.
+
+        Keyed with the app secret: a plain hash of a 6-digit code could be
+        reversed by trying all million codes.
+        """
+        return hmac.new(SECRET_KEY.encode('utf-8'), otp_code.encode('utf-8'), hashlib.sha256).hexdigest()
+    
     @staticmethod
     def get_otp_expiry() -> datetime:
         """Get OTP expiry timestamp"""
@@ -55,17 +70,25 @@ class OTPUtils:
         phone: Optional[str] = None,
         otp_type: str = "email_verification",
         is_pending_user: bool = False
-    ) -> Optional[OTPVerification]:
-        """Create a new OTP record"""
+    ) -> Optional[str]:
+        """
+        Create a new OTP record, replacing the user's unused ones of the same type.
+
+        Only the hash of the code is stored.
+
+        Returns:
+            The OTP code to send, or None if the record could not be created
+        """
         try:
             # Invalidate any existing OTPs for this user and type
-            OTPUtils.invalidate_existing_otps(db, user_id, otp_type, email, phone, is_pending_user)
+            OTPUtils.invalidate_existing_otps(db, user_id, otp_type, email, phone, is_pending_user, commit=False)
             
             # Generate new OTP
             otp_code = OTPUtils.generate_otp()
+            otp_hash = OTPUtils.hash_otp(otp_code)
             expires_at = OTPUtils.get_otp_expiry()
             
-            logger.info(f"Creating new OTP {otp_code} for user {user_id}, type: {otp_type}, is_pending: {is_pending_user}")
+            logger.info(f"Creating new OTP for user {user_id}, type: {otp_type}, is_pending: {is_pending_user}")
             
             # Create OTP record with appropriate user reference
             if is_pending_user:
@@ -73,7 +96,7 @@ class OTPUtils:
                     pending_user_id=user_id,  # Use pending_user_id for pending users
                     email=email,
                     phone=phone,
-                    otp_code=otp_code,
+                    otp_code=otp_hash,
                     otp_type=otp_type,
                     expires_at=expires_at,
                     is_verified=False,
@@ -85,7 +108,7 @@ class OTPUtils:
                     user_id=user_id,  # Use user_id for regular users
                     email=email,
                     phone=phone,
-                    otp_code=otp_code,
+                    otp_code=otp_hash,
                     otp_type=otp_type,
                     expires_at=expires_at,
                     is_verified=False,
@@ -95,10 +118,9 @@ class OTPUtils:
             
             db.add(otp_record)
             db.commit()
-            db.refresh(otp_record)
             
             logger.info(f"OTP record created for {'pending' if is_pending_user else 'regular'} user {user_id}, type: {otp_type}")
-            return otp_record
+            return otp_code
             
         except Exception as e:
             logger.error(f"Failed to create OTP record: {e}")
@@ -112,9 +134,10 @@ class OTPUtils:
         otp_type: str,
         email: Optional[str] = None,
         phone: Optional[str] = None,
-        is_pending_user: bool = False
+        is_pending_user: bool = False,
+        commit: bool = True
     ) -> None:
-        """Invalidate existing OTPs for the same user and type"""
+        """Invalidate existing OTPs for the same user and type (commit=False: leave it to the caller)"""
         try:
             # Build query conditions based on user type
             if is_pending_user:
@@ -136,18 +159,18 @@ class OTPUtils:
             if phone:
                 conditions.append(OTPVerification.phone == phone)
             
-            # Find and invalidate existing OTPs
-            existing_otps = db.query(OTPVerification).filter(and_(*conditions)).all()
-            
-            logger.info(f"Found {len(existing_otps)} existing OTPs to invalidate for user {user_id}, type: {otp_type}, is_pending: {is_pending_user}")
+            # Invalidate existing OTPs: mark as used/invalid and exhausted
+            count = db.query(OTPVerification).filter(and_(*conditions)).update(
+                {
+                    OTPVerification.is_verified: True,
+                    OTPVerification.attempts: OTPVerification.max_attempts
+                },
+                synchronize_session=False
+            )
             
-            for otp in existing_otps:
-                logger.info(f"Invalidating OTP {otp.otp_id} with code {otp.otp_code}")
-                otp.is_verified = True  # Mark as used/invalid
-                otp.attempts = otp.max_attempts  # Mark as exhausted
-            
-            db.commit()
-            logger.info(f"Invalidated {len(existing_otps)} existing OTPs for user {user_id}")
+            if commit:
+                db.commit()
+            logger.info(f"Invalidated {count} existing OTPs for user {user_id}, type: {otp_type}, is_pending: {is_pending_user}")
             
         except Exception as e:
             logger.error(f"Failed to invalidate existing OTPs: {e}")
@@ -161,11 +184,23 @@ class OTPUtils:
         phone: Optional[str] = None,
         otp_type: str = "email_verification"
     ) -> Dict[str, Any]:
-        """Verify OTP code"""
+        """
+        Verify OTP code.
+
+        Every attempt, right or wrong, counts against the OTP's max_attempts;
+        the count is an atomic counter that lives as long as the OTP.
+        """
+        # Without an identifier the query would match any user's latest OTP
+        if not email and not phone:
+            return {
+                "success": False,
+                "message": "Invalid OTP code",
+                "error_code": "INVALID_OTP"
+            }
+
         try:
             # Build query conditions
             conditions = [
-                OTPVerification.otp_code == otp_code,
                 OTPVerification.otp_type == otp_type,
                 OTPVerification.is_verified == False
             ]
@@ -176,8 +211,10 @@ class OTPUtils:
             if phone:
                 conditions.append(OTPVerification.phone == phone)
             
-            # Find OTP record
-            otp_record = db.query(OTPVerification).filter(and_(*conditions)).first()
+            # Find the current OTP (sending a new one invalidates older ones)
+            otp_record = db.query(OTPVerification).filter(and_(*conditions)).order_by(
+                OTPVerification.created_at.desc()
+            ).first()
             
             if not otp_record:
                 return {
@@ -194,18 +231,41 @@ class OTPUtils:
                     "error_code": "OTP_EXPIRED"
                 }
             
-            # Check if max attempts exceeded
-            if otp_record.attempts >= otp_record.max_attempts:
+            # Count the attempt; check if max attempts exceeded
+            attempts = otp_limiter_service.hit(
+                "verify", str(otp_record.otp_id), otp_record.max_attempts,
+                window_seconds=OTPUtils.OTP_EXPIRY_MINUTES * 60
+            )
+            if not attempts["allowed"]:
                 return {
                     "success": False,
                     "message": "Maximum attempts exceeded",
                     "error_code": "MAX_ATTEMPTS_EXCEEDED"
                 }
             
-            # Verify OTP
-            otp_record.is_verified = True
-            otp_record.attempts += 1
+            if not hmac.compare_digest(OTPUtils.hash_otp(otp_code), otp_record.otp_code):
+                return {
+                    "success": False,
+                    "message": "Invalid OTP code",
+                    "error_code": "INVALID_OTP",
+                    "remaining_attempts": attempts["remaining"]
+                }
+            
+            # Verify OTP; the guard on is_verified makes a code single-use under concurrency
+            verified = db.query(OTPVerification).filter(
+                OTPVerification.otp_id == otp_record.otp_id,
+                OTPVerification.is_verified == False
+            ).update(
+                {OTPVerification.is_verified: True, OTPVerification.attempts: attempts["count"]},
+                synchronize_session=False
+            )
             db.commit()
+            if not verified:
+                return {
+                    "success": False,
+                    "message": "Invalid OTP code",
+                    "error_code": "INVALID_OTP"
+                }
             
             # Determine which user_id to return
             actual_user_id = otp_record.user_id if otp_record.user_id else otp_record.pending_user_id
@@ -230,44 +290,6 @@ class OTPUtils:
                 "error_code": "VERIFICATION_ERROR"
             }
     
-    @staticmethod
-    def increment_otp_attempts(
-        db: Session,
-        otp_code: str,
-        email: Optional[str] = None,
-        phone: Optional[str] = None,
-        otp_type: str = "email_verification"
-    ) -> bool:
-        """Increment OTP attempts counter"""
-        try:
-            # Build query conditions
-            conditions = [
-                OTPVerification.otp_code == otp_code,
-                OTPVerification.otp_type == otp_type,
-                OTPVerification.is_verified == False
-            ]
-            
-            if email:
-                conditions.append(OTPVerification.email == email)
-            if phone:
-                conditions.append(OTPVerification.phone == phone)
-            
-            # Find OTP record
-            otp_record = db.query(OTPVerification).filter(and_(*conditions)).first()
-            
-            if otp_record and not OTPUtils.is_otp_expired(otp_record.expires_at):
-                otp_record.attempts += 1
-                db.commit()
-                logger.info(f"Incremented OTP attempts for user {otp_record.user_id}")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"Failed to increment OTP attempts: {e}")
-            db.rollback()
-            return False
-    
     @staticmethod
     def get_user_by_otp_identifier(
         db: Session,
@@ -308,40 +330,30 @@ class OTPUtils:
     
     @staticmethod
     def check_send_rate_limit(
-        db: Session,
         email: Optional[str] = None,
         phone: Optional[str] = None,
-        otp_type: str = "email_verification",
-        is_pending_user: bool = False
+        otp_type: str = "email_verification"
     ) -> Dict[str, Any]:
-        """Check if user has exceeded OTP sending rate limit"""
+        """
+        Count an OTP send against the per-identifier limit and report whether it may go out.
+
+        Checking and counting are one atomic step, so concurrent requests
+        can't exceed MAX_SEND_ATTEMPTS per SEND_WINDOW_HOURS.
+        """
         try:
-            # Build query conditions based on user type and identifier
-            conditions = [
-                OTPVerification.otp_type == otp_type,
-                OTPVerification.created_at >= datetime.now(timezone.utc) - timedelta(hours=24)  # Last 24 hours
-            ]
-            
-            if email:
-                conditions.append(OTPVerification.email == email)
-            if phone:
-                conditions.append(OTPVerification.phone == phone)
-            
-            # Count OTP sending attempts in last 24 hours
-            recent_otps = db.query(OTPVerification).filter(and_(*conditions)).count()
-            
-            # Check if we can send one more OTP (remaining attempts after this one)
-            remaining_attempts = max(0, OTPUtils.MAX_SEND_ATTEMPTS - recent_otps)
-            can_send = recent_otps < OTPUtils.MAX_SEND_ATTEMPTS
+            limit = otp_limiter_service.hit(
+                f"send:{otp_type}", email or phone, OTPUtils.MAX_SEND_ATTEMPTS,
+                window_seconds=OTPUtils.SEND_WINDOW_HOURS * 3600
+            )
             
-            logger.info(f"OTP send rate limit check: {recent_otps}/{OTPUtils.MAX_SEND_ATTEMPTS} attempts used, {remaining_attempts} remaining")
+            logger.info(f"OTP send rate limit check: {limit['count']}/{OTPUtils.MAX_SEND_ATTEMPTS} attempts used, {limit['remaining']} remaining")
             
             return {
-                "can_send": can_send,
-                "remaining_attempts": remaining_attempts,
-                "total_attempts": recent_otps,
+                "can_send": limit["allowed"],
+                "remaining_attempts": limit["remaining"],
+                "total_attempts": min(limit["count"], OTPUtils.MAX_SEND_ATTEMPTS),
                 "max_attempts": OTPUtils.MAX_SEND_ATTEMPTS,
-                "reset_time": datetime.now(timezone.utc) + timedelta(hours=24)
+                "reset_time": datetime.now(timezone.utc) + timedelta(seconds=limit["retry_after"])
             }
             
         except Exception as e:
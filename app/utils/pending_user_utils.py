@@ -5,11 +5,15 @@ from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from app.infra.db.postgres.models.pending_user import PendingUser
 from app.infra.db.postgres.models.user import User
+from app.services.otp_limiter_service import otp_limiter_service
 from app.utils.enums import UserRole, UserStatus
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Limiter scope of pending users' OTP requests
+OTP_SEND_SCOPE = "pending_send"
+
 
 class PendingUserUtils:
     """Utilities for managing pending user registrations."""
@@ -248,74 +252,53 @@ class PendingUserUtils:
         return False
     
     @staticmethod
-    def check_otp_lockout_status(pending_user: PendingUser) -> Dict[str, Any]:
-        """Check if a pending user is currently locked out from OTP requests."""
-        now = datetime.now(timezone.utc)
-        
-        # Check if user is currently locked out
-        if pending_user.otp_locked_until and now < pending_user.otp_locked_until:
-            remaining_lockout_seconds = int((pending_user.otp_locked_until - now).total_seconds())
-            return {
-                "is_locked": True,
-                "remaining_seconds": remaining_lockout_seconds,
-                "locked_until": pending_user.otp_locked_until,
-                "attempts_used": pending_user.otp_attempts,
-                "max_attempts": pending_user.max_otp_attempts
-            }
-        
-        # Check if user has exceeded attempts but lockout has expired
-        if pending_user.otp_attempts >= pending_user.max_otp_attempts:
-            # Reset attempts if lockout has expired
-            pending_user.otp_attempts = 0
-            pending_user.otp_locked_until = None
-            db.commit()
-        
+    def _lockout_result(pending_user: PendingUser, counter: Dict[str, int], is_locked: bool) -> Dict[str, Any]:
         return {
-            "is_locked": False,
-            "remaining_seconds": 0,
-            "locked_until": None,
-            "attempts_used": pending_user.otp_attempts,
+            "is_locked": is_locked,
+            "remaining_seconds": counter["retry_after"] if is_locked else 0,
+            "locked_until": datetime.now(timezone.utc) + timedelta(seconds=counter["retry_after"]) if is_locked else None,
+            "attempts_used": min(counter["count"], pending_user.max_otp_attempts),
             "max_attempts": pending_user.max_otp_attempts
         }
     
     @staticmethod
-    def increment_otp_attempts(db: Session, pending_user: PendingUser) -> Dict[str, Any]:
-        """Increment OTP attempts for a pending user and check if lockout is needed."""
-        pending_user.otp_attempts += 1
-        
-        # Check if user should be locked out
-        if pending_user.otp_attempts >= pending_user.max_otp_attempts:
-            # Lock the user for the specified duration
-            lockout_duration = timedelta(minutes=pending_user.lockout_duration_minutes)
-            pending_user.otp_locked_until = datetime.now(timezone.utc) + lockout_duration
-            
+    def check_otp_lockout_status(pending_user: PendingUser) -> Dict[str, Any]:
+        """Check if a pending user is currently locked out from OTP requests."""
+        counter = otp_limiter_service.peek(OTP_SEND_SCOPE, pending_user.email, pending_user.max_otp_attempts)
+        return PendingUserUtils._lockout_result(pending_user, counter, not counter["allowed"])
+    
+    @staticmethod
+    def increment_otp_attempts(pending_user: PendingUser) -> Dict[str, Any]:
+        """
+        Count an OTP request for a pending user; reaching max_otp_attempts locks
+        them out for lockout_duration_minutes.
+
+        The request that reaches the limit is still allowed; "is_locked" is set
+        for it and for every request rejected while the lockout lasts.
+        """
+        lockout_seconds = pending_user.lockout_duration_minutes * 60
+        counter = otp_limiter_service.hit(
+            OTP_SEND_SCOPE, pending_user.email, pending_user.max_otp_attempts,
+            window_seconds=lockout_seconds, lockout_seconds=lockout_seconds
+        )
+        is_locked = counter["count"] >= pending_user.max_otp_attempts
+        if counter["count"] == pending_user.max_otp_attempts:
             logger.info(f"User {pending_user.email} locked out for {pending_user.lockout_duration_minutes} minutes due to OTP limit")
-        
-        db.commit()
-        
-        return {
-            "attempts_used": pending_user.otp_attempts,
-            "max_attempts": pending_user.max_otp_attempts,
-            "is_locked": pending_user.otp_attempts >= pending_user.max_otp_attempts,
-            "locked_until": pending_user.otp_locked_until
-        }
+        return {**PendingUserUtils._lockout_result(pending_user, counter, is_locked), "allowed": counter["allowed"]}
     
     @staticmethod
-    def reset_otp_attempts(db: Session, pending_user: PendingUser) -> None:
+    def reset_otp_attempts(pending_user: PendingUser) -> None:
         """Reset OTP attempts for a pending user (called on successful verification)."""
-        pending_user.otp_attempts = 0
-        pending_user.otp_locked_until = None
-        db.commit()
+        otp_limiter_service.reset(OTP_SEND_SCOPE, pending_user.email)
         logger.info(f"OTP attempts reset for user {pending_user.email}")
     
     @staticmethod
     def update_pending_user_otp_status(
-        db: Session, 
         pending_user: PendingUser, 
         increment_attempts: bool = True
     ) -> Dict[str, Any]:
         """Update pending user OTP status and return current lockout information."""
         if increment_attempts:
-            return PendingUserUtils.increment_otp_attempts(db, pending_user)
+            return PendingUserUtils.increment_otp_attempts(pending_user)
         else:
             return PendingUserUtils.check_otp_lockout_status(pending_user)
@@ -3,168 +3,484 @@ Rate Limiting Utility for OneQlick Backend
 
 This module provides comprehensive rate limiting functionality with support for:
 - Multiple storage backends (Redis for production, in-memory for development)
-- Sliding window algorithm for accurate rate limiting
+- Non-blocking Redis checks with a time budget and a fail-open/fail-closed policy
+- GCRA (generic cell rate algorithm), a smooth sliding-window limit
+- All limits of a request (global, route, user) checked in one Redis round trip
+- A local tier that admits requests from leased quota without any I/O
 - IP-based and user-based rate limiting
 - Custom rate limit decorators
 - Rate limit headers in responses
+
+GCRA keeps a single timestamp per key, the theoretical arrival time (TAT)
+of the next request. Each request moves it forward by window / limit; a
+request is rejected when that would put the TAT more than one window
+ahead of now. This allows a burst of `limit` requests and then refills
+steadily, without the double-quota burst at fixed window boundaries.
+
+With Redis, each worker can also lease part of a key's quota: when a
+request is checked in Redis, the same script call books this worker's share
+(one of local_workers) of the quota remaining beyond a reserve. The leased
+requests are admitted in process without any I/O. Since they were counted in
+Redis when leased, all workers together never admit more than the limit.
+Once a key's lease is used up the next request goes to Redis, which also
+leases again; near the limit only the reserve is left, nothing is leased and
+every request is checked exactly. Leases of keys that go idle are returned
+to Redis every few hundred milliseconds so they don't hold quota back.
 """
 
+import asyncio
+import heapq
+import math
 import time
 import hashlib
-from typing import Optional, Tuple, Dict
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, List
 from functools import wraps
-from fastapi import Request, HTTPException, status
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
+from starlette.routing import Match
 from app.config.logger import get_logger
-from app.config.config import RATE_LIMIT_CONFIG, REDIS_CONFIG
+from app.config.config import RATE_LIMIT_CONFIG
+from app.infra.redis.repositories.redis_repositories import create_async_redis_client, redis_key
 
 logger = get_logger(__name__)
 
+# Window of the global per-IP limit
+GLOBAL_WINDOW_SECONDS = 3600
+
+# Resolved route limits are cached per (method, path)
+ROUTE_CACHE_SIZE = 1024
+
+# GCRA over every limit of a request. First a worker's adjustment (pending:
+# negative to return unused leased quota) is applied unconditionally, then the
+# request itself (cost 1, or 0 for a plain return) is checked. Its quota is
+# only consumed when all limits admit it, so a request rejected by a route
+# limit doesn't use up global quota. An admitted request also leases
+# floor((remaining - reserve) / share) more of each limit to the worker
+# (nothing when share is 0).
+# KEYS[i]: key of limit i
+# ARGV[1]: now (ms); ARGV[2]: cost
+# ARGV[5i-2] .. ARGV[5i+2]: emission interval (ms), burst (ms), pending, lease reserve and lease share of limit i
+# Returns {allowed, remaining, retry_after_ms, reset_after_ms, leased} per limit, flattened
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local results = {}
+local tats = {}
+local new_tats = {}
+local intervals = {}
+local leases = {}
+local admitted = true
+for i, key in ipairs(KEYS) do
+    local base = 5 * i - 2
+    local interval = tonumber(ARGV[base])
+    local burst = tonumber(ARGV[base + 1])
+    local pending = tonumber(ARGV[base + 2])
+    local share = tonumber(ARGV[base + 4])
+    local tat = math.max(math.max(tonumber(redis.call('GET', key) or now), now) + pending * interval, now)
+    local new_tat = tat + cost * interval
+    local allow_at = new_tat - burst
+    local lease = 0
+    if now < allow_at then
+        admitted = false
+        table.insert(results, 0)
+        table.insert(results, 0)
+        table.insert(results, allow_at - now)
+        table.insert(results, tat - now)
+    else
+        local remaining = math.floor((now - allow_at) / interval)
+        if share > 0 then
+            lease = math.floor(math.max(0, remaining - tonumber(ARGV[base + 3])) / share)
+        end
+        table.insert(results, 1)
+        table.insert(results, remaining)
+        table.insert(results, 0)
+        table.insert(results, new_tat - now)
+    end
+    table.insert(results, 0)
+    tats[i] = tat
+    new_tats[i] = new_tat
+    intervals[i] = interval
+    leases[i] = lease
+end
+for i, key in ipairs(KEYS) do
+    local tat = tats[i]
+    if admitted then
+        tat = new_tats[i] + leases[i] * intervals[i]
+        results[5 * i - 3] = results[5 * i - 3] - leases[i]
+        results[5 * i - 1] = tat - now
+        results[5 * i] = leases[i]
+    end
+    if tat > now then
+        redis.call('SET', key, tat, 'PX', tat - now)
+    else
+        redis.call('DEL', key)
+    end
+end
+return results
+"""
+
+
+def gcra(
+    tat: int,
+    now: int,
+    interval: int,
+    burst: int,
+    pending: int = 0,
+    cost: int = 1,
+    lease_reserve: int = 0,
+    lease_share: int = 0
+) -> Tuple[bool, int, int, int, int, int, int]:
+    """
+    One GCRA step, mirroring _GCRA_SCRIPT.
+
+    Args:
+        tat: Stored theoretical arrival time (ms), or now if there is none
+        now: Current time (ms)
+        interval: Emission interval, window / limit (ms)
+        burst: Burst tolerance, limit * interval (ms)
+        pending: Requests added unconditionally; negative returns unused leased quota
+        cost: Requests to check and consume now (0 only applies pending)
+        lease_reserve: Remaining quota never leased
+        lease_share: Lease 1/lease_share of the rest if admitted; 0 leases nothing
+
+    Returns:
+        Tuple of (allowed, remaining, retry_after_ms, reset_after_ms, lease,
+        tat to store if admitted, tat to store if not). remaining and
+        reset_after_ms do not yet account for the lease, which only applies
+        when every limit of the request admits it.
+    """
+    tat = max(max(tat, now) + pending * interval, now)
+    new_tat = tat + cost * interval
+    allow_at = new_tat - burst
+    if now < allow_at:
+        return False, 0, allow_at - now, tat - now, 0, new_tat, tat
+    remaining = (now - allow_at) // interval
+    lease = max(0, remaining - lease_reserve) // lease_share if lease_share > 0 else 0
+    return True, remaining, 0, new_tat - now, lease, new_tat + lease * interval, tat
+
+
+class RateLimitStorageError(Exception):
+    """Raised when the storage backend could not answer in time"""
+
 
 class RateLimitStorage:
     """Abstract base class for rate limit storage backends"""
-    
-    def increment(self, key: str, window: int) -> int:
-        """Increment counter for key and return current count"""
-        raise NotImplementedError
-    
-    def get(self, key: str) -> int:
-        """Get current count for key"""
+
+    async def acquire(
+        self,
+        limits: List[Tuple[str, int, int, int]],
+        now: int,
+        cost: int = 1,
+        leases: Optional[List[Tuple[int, int]]] = None
+    ) -> List[Tuple[bool, int, int, int, int]]:
+        """
+        Check and consume one request against several limits at once.
+
+        Args:
+            limits: (key, interval_ms, burst_ms, pending) per limit; pending is
+                added unconditionally, negative to return unused leased quota
+            now: Current time (ms)
+            cost: 1 to check a request, 0 to only apply pending
+            leases: (reserve, share) per limit: if the request is admitted, also
+                lease 1/share of the quota remaining beyond reserve
+
+        Returns:
+            (allowed, remaining, retry_after_ms, reset_after_ms, leased) per limit,
+            remaining and reset after the lease
+        """
         raise NotImplementedError
-    
-    def reset(self, key: str):
-        """Reset counter for key"""
+
+    async def reset(self, key: str):
+        """Reset the limit state for key"""
         raise NotImplementedError
 
+    async def close(self):
+        """Release connections on shutdown"""
+
+    def get_status(self) -> dict:
+        return {}
+
 
 class MemoryStorage(RateLimitStorage):
-    """In-memory storage backend for development"""
-    
-    def __init__(self):
-        self._storage: Dict[str, Tuple[int, float]] = {}
+    """
+    In-memory storage backend for development and single-node deployments.
+
+    An entry expires once its quota has fully refilled (its TAT has passed).
+    Expiry times sit in a min-heap, so each call only pops what has expired
+    instead of scanning every key. Updating a key pushes a new heap entry and
+    leaves the old one stale; stale entries are skipped when popped, and the
+    heap is rebuilt when they outnumber the live keys. Beyond max_keys the
+    least recently used keys are evicted, so many distinct clients (e.g. a
+    scan) can't grow the store without bound.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_CONFIG["memory_max_keys"]):
+        """
+        Args:
+            max_keys: Keys held at most; the least recently used are evicted beyond this
+        """
+        self.max_keys = max_keys
+        # key -> theoretical arrival time (ms), least recently used first
+        self._storage: OrderedDict = OrderedDict()
+        # (tat, key), possibly stale
+        self._expiry: List[Tuple[int, str]] = []
+        self._evicted = 0
         logger.info("Rate limiting using in-memory storage (development mode)")
-    
-    def increment(self, key: str, window: int) -> int:
-        """Increment counter for key and return current count"""
-        current_time = time.time()
-        
+
+    async def acquire(
+        self,
+        limits: List[Tuple[str, int, int, int]],
+        now: int,
+        cost: int = 1,
+        leases: Optional[List[Tuple[int, int]]] = None
+    ) -> List[Tuple[bool, int, int, int, int]]:
+        """Check and consume one request against several limits at once"""
         # Clean up expired entries
-        self._cleanup()
-        
-        if key in self._storage:
-            count, timestamp = self._storage[key]
-            # Check if window has expired
-            if current_time - timestamp > window:
-                # Reset counter
-                self._storage[key] = (1, current_time)
-                return 1
+        self._expire(now)
+
+        leases = leases or [(0, 0)] * len(limits)
+        steps = [
+            gcra(self._storage.get(key, now), now, interval, burst, pending, cost, reserve, share)
+            for (key, interval, burst, pending), (reserve, share) in zip(limits, leases)
+        ]
+        admitted = all(step[0] for step in steps)
+        results = []
+        for (key, interval, _, _), step in zip(limits, steps):
+            allowed, remaining, retry_after, reset_after, lease, admitted_tat, tat = step
+            if admitted:
+                tat = admitted_tat
+                remaining, reset_after = remaining - lease, reset_after + lease * interval
             else:
-                # Increment counter
-                self._storage[key] = (count + 1, timestamp)
-                return count + 1
-        else:
-            # First request
-            self._storage[key] = (1, current_time)
-            return 1
-    
-    def get(self, key: str) -> int:
-        """Get current count for key"""
-        if key in self._storage:
-            count, timestamp = self._storage[key]
-            return count
-        return 0
-    
-    def reset(self, key: str):
-        """Reset counter for key"""
-        if key in self._storage:
-            del self._storage[key]
-    
-    def _cleanup(self):
-        """Remove expired entries"""
-        current_time = time.time()
-        expired_keys = []
-        
-        for key, (count, timestamp) in self._storage.items():
-            # Remove entries older than 1 hour
-            if current_time - timestamp > 3600:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self._storage[key]
+                lease = 0
+            if tat > now:
+                self._set(key, tat)
+            else:
+                self._storage.pop(key, None)
+            results.append((allowed, remaining, retry_after, reset_after, lease))
+        return results
+
+    async def reset(self, key: str):
+        """Reset the limit state for key"""
+        # Its heap entry goes stale and is skipped
+        self._storage.pop(key, None)
+
+    def _set(self, key: str, tat: int):
+        if self._storage.get(key) != tat:
+            heapq.heappush(self._expiry, (tat, key))
+        self._storage[key] = tat
+        self._storage.move_to_end(key)
+
+        if len(self._storage) > self.max_keys:
+            self._storage.popitem(last=False)
+            self._evicted += 1
+        if len(self._expiry) > 2 * len(self._storage) + 64:
+            self._expiry = [(tat, key) for key, tat in self._storage.items()]
+            heapq.heapify(self._expiry)
+
+    def _expire(self, now: int):
+        """Remove entries whose quota has fully refilled"""
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            tat, key = heapq.heappop(expiry)
+            if self._storage.get(key) == tat:
+                del self._storage[key]
+
+    def get_status(self) -> dict:
+        return {
+            "memory_keys": len(self._storage),
+            "memory_max_keys": self.max_keys,
+            "memory_evicted": self._evicted
+        }
 
 
 class RedisStorage(RateLimitStorage):
-    """Redis storage backend for production"""
-    
-    def __init__(self):
-        try:
-            import redis
-            self._redis = redis.Redis(
-                host=REDIS_CONFIG["host"],
-                port=REDIS_CONFIG["port"],
-                password=REDIS_CONFIG["password"] if REDIS_CONFIG["password"] else None,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5
+    """
+    Redis storage backend for production.
+
+    Uses the asyncio Redis client so a check never blocks the event loop.
+    Every check gets a hard time budget covering the wait for a pooled
+    connection, connecting and the command itself; a check that runs over
+    raises RateLimitStorageError and the limiter applies its failure mode.
+    After several failures in a row Redis is skipped for a while, so during
+    an outage requests fail fast instead of each waiting out the budget.
+    """
+
+    def __init__(
+        self,
+        timeout_ms: int = RATE_LIMIT_CONFIG["redis_timeout_ms"],
+        max_connections: int = RATE_LIMIT_CONFIG["redis_max_connections"],
+        failure_threshold: int = RATE_LIMIT_CONFIG["redis_failure_threshold"],
+        retry_seconds: float = RATE_LIMIT_CONFIG["redis_retry_seconds"],
+        **client_options
+    ):
+        """
+        Args:
+            timeout_ms: Budget for one check
+            max_connections: Checks in flight at once; bounds the connection pool
+            failure_threshold: Failed checks in a row before Redis is skipped
+            retry_seconds: How long Redis is skipped before it is tried again
+            client_options: Overrides of the application's Redis connection settings
+        """
+        self.timeout_seconds = timeout_ms / 1000
+        self.max_connections = max_connections
+        self.failure_threshold = failure_threshold
+        self.retry_seconds = retry_seconds
+        self._client_options = client_options
+        self._client = None
+        self._gcra = None
+        self._slots = asyncio.Semaphore(max_connections)
+        self._consecutive_failures = 0
+        self._skip_until = 0.0
+        self._stats = {"checks": 0, "failures": 0, "skipped": 0}
+        logger.info(f"Rate limiting using Redis storage (timeout={timeout_ms}ms, max_connections={max_connections})")
+
+    @property
+    def client(self):
+        # Created on first use so it binds to the running event loop
+        if self._client is None:
+            self._client = create_async_redis_client(
+                socket_timeout=self.timeout_seconds,
+                socket_connect_timeout=self.timeout_seconds,
+                retry_on_timeout=False,
+                max_connections=self.max_connections,
+                **self._client_options
             )
-            # Test connection
-            self._redis.ping()
-            logger.info(f"Rate limiting using Redis storage at {REDIS_CONFIG['host']}:{REDIS_CONFIG['port']}")
-        except Exception as e:
-            logger.warning(f"Failed to connect to Redis for rate limiting: {e}")
-            logger.warning("Falling back to in-memory storage")
-            raise
-    
-    def increment(self, key: str, window: int) -> int:
-        """Increment counter for key using Redis INCR with expiration"""
-        try:
-            # Use pipeline for atomic operations
-            pipe = self._redis.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, window)
-            results = pipe.execute()
-            return results[0]  # Return the incremented value
-        except Exception as e:
-            logger.error(f"Redis rate limit increment error: {e}")
-            # Return 0 to allow request if Redis fails
-            return 0
-    
-    def get(self, key: str) -> int:
-        """Get current count for key"""
-        try:
-            value = self._redis.get(key)
-            return int(value) if value else 0
-        except Exception as e:
-            logger.error(f"Redis rate limit get error: {e}")
-            return 0
-    
-    def reset(self, key: str):
-        """Reset counter for key"""
+            # Runs with EVALSHA, loading the script on first use
+            self._gcra = self._client.register_script(_GCRA_SCRIPT)
+        return self._client
+
+    async def _run(self, command):
+        async with self._slots:
+            return await command(self.client)
+
+    async def _execute(self, command):
+        """Run a command within the time budget, or raise RateLimitStorageError"""
+        if time.monotonic() < self._skip_until:
+            self._stats["skipped"] += 1
+            raise RateLimitStorageError("Redis is marked unavailable")
+
+        self._stats["checks"] += 1
         try:
-            self._redis.delete(key)
+            result = await asyncio.wait_for(self._run(command), self.timeout_seconds)
         except Exception as e:
-            logger.error(f"Redis rate limit reset error: {e}")
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._skip_until = time.monotonic() + self.retry_seconds
+                self._consecutive_failures = 0
+                logger.error(f"Redis rate limit storage failing ({e!r}), skipping it for {self.retry_seconds}s")
+            raise RateLimitStorageError(repr(e)) from e
+
+        self._consecutive_failures = 0
+        return result
+
+    async def acquire(
+        self,
+        limits: List[Tuple[str, int, int, int]],
+        now: int,
+        cost: int = 1,
+        leases: Optional[List[Tuple[int, int]]] = None
+    ) -> List[Tuple[bool, int, int, int, int]]:
+        """Check and consume one request against several limits in one script call"""
+        keys = [key for key, _, _, _ in limits]
+        args = [now, cost]
+        for (_, interval, burst, pending), (reserve, share) in zip(limits, leases or [(0, 0)] * len(limits)):
+            args += [interval, burst, pending, reserve, share]
+
+        flat = await self._execute(lambda client: self._gcra(keys=keys, args=args))
+        return [
+            (bool(flat[i]), flat[i + 1], flat[i + 2], flat[i + 3], flat[i + 4])
+            for i in range(0, len(flat), 5)
+        ]
+
+    async def reset(self, key: str):
+        """Reset the limit state for key"""
+        await self._execute(lambda client: client.delete(key))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def get_status(self) -> dict:
+        return {
+            "redis_checks": self._stats["checks"],
+            "redis_failures": self._stats["failures"],
+            "redis_skipped": self._stats["skipped"],
+            "redis_available": time.monotonic() >= self._skip_until
+        }
+
+
+class LocalQuota:
+    """A worker's leased quota for one key"""
+
+    __slots__ = ("allowance", "remaining", "interval", "burst", "reserve", "used")
+
+    def __init__(self, interval: int, burst: int, reserve: int):
+        # Leased requests not yet admitted; already counted in the storage
+        self.allowance = 0
+        # Quota the storage reported as left beyond the lease
+        self.remaining = 0
+        self.interval = interval
+        self.burst = burst
+        self.reserve = reserve
+        self.used = True
 
 
 class RateLimiter:
     """Main rate limiter class"""
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        storage: Optional[RateLimitStorage] = None,
+        failure_mode: str = RATE_LIMIT_CONFIG["failure_mode"],
+        global_limit: Optional[int] = RATE_LIMIT_CONFIG["global_per_hour"],
+        local_tier: Optional[bool] = None,
+        local_sync_ms: int = RATE_LIMIT_CONFIG["local_sync_ms"],
+        local_reserve_ratio: float = RATE_LIMIT_CONFIG["local_reserve_ratio"],
+        local_workers: int = RATE_LIMIT_CONFIG["local_workers"]
+    ):
+        """
+        Args:
+            storage: Storage backend; chosen from RATE_LIMIT_CONFIG if not given
+            failure_mode: "open" admits requests when the storage fails, "closed" rejects them
+            global_limit: Requests per hour per IP across all endpoints; None disables it
+            local_tier: Admit requests from leased quota locally; by default
+                enabled (per RATE_LIMIT_CONFIG) when the storage is Redis
+            local_sync_ms: How often leases of idle keys are returned to the storage
+            local_reserve_ratio: Share of each limit never leased, only admitted through the storage
+            local_workers: Worker processes sharing the storage; each leases at most
+                1/local_workers of the quota remaining beyond the reserve
+        """
         self.enabled = RATE_LIMIT_CONFIG["enabled"]
         self.whitelist = RATE_LIMIT_CONFIG["whitelist"]
-        
+        self.fail_closed = failure_mode == "closed"
+        self.global_limit = global_limit
+        self._route_cache: OrderedDict = OrderedDict()
+
         # Initialize storage backend
-        if RATE_LIMIT_CONFIG["storage"] == "redis":
-            try:
-                self.storage = RedisStorage()
-            except Exception:
-                # Fallback to memory storage if Redis fails
-                self.storage = MemoryStorage()
+        if storage is not None:
+            self.storage = storage
+        elif RATE_LIMIT_CONFIG["storage"] == "redis":
+            self.storage = RedisStorage()
         else:
             self.storage = MemoryStorage()
-        
-        logger.info(f"Rate limiter initialized (enabled={self.enabled})")
-    
+
+        if local_tier is None:
+            local_tier = RATE_LIMIT_CONFIG["local_enabled"] and isinstance(self.storage, RedisStorage)
+        self.local_sync_seconds = local_sync_ms / 1000
+        self.local_reserve_ratio = local_reserve_ratio
+        self.local_workers = max(1, local_workers)
+        self._local: Optional[Dict[str, LocalQuota]] = {} if local_tier else None
+        self._syncer = None
+        self._stats = {"local": 0, "storage": 0}
+
+        logger.info(
+            f"Rate limiter initialized (enabled={self.enabled}, failure_mode={failure_mode}, "
+            f"local_tier={local_tier})"
+        )
+
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP address from request"""
         # Check for X-Forwarded-For header (proxy/load balancer)
@@ -172,90 +488,300 @@ class RateLimiter:
         if forwarded:
             # Take the first IP in the chain
             return forwarded.split(",")[0].strip()
-        
+
         # Check for X-Real-IP header
         real_ip = request.headers.get("X-Real-IP")
         if real_ip:
             return real_ip
-        
+
         # Fallback to direct client IP
         return request.client.host if request.client else "unknown"
-    
+
     def _is_whitelisted(self, ip: str) -> bool:
         """Check if IP is whitelisted"""
         return ip in self.whitelist
-    
-    def _generate_key(self, identifier: str, endpoint: str) -> str:
+
+    def _generate_key(self, identifier: str, scope: str) -> str:
         """Generate a unique key for rate limiting"""
         # Use hash to keep keys short
-        combined = f"{identifier}:{endpoint}"
-        return f"ratelimit:{hashlib.md5(combined.encode()).hexdigest()}"
-    
-    def check_rate_limit(
+        combined = f"{identifier}:{scope}"
+        return redis_key("ratelimit", hashlib.md5(combined.encode()).hexdigest())
+
+    def route_limits(self, request: Request) -> Tuple[str, List[Tuple[int, int, bool]]]:
+        """
+        Find the route a request will be dispatched to and its @rate_limit limits.
+
+        Matches routes in order, as the router does, so the middleware can
+        check route limits together with the global limit before dispatch.
+
+        Returns:
+            Tuple of (route path template, [(limit, window, use_user_id), ...])
+        """
+        cache_key = (request.method, request.url.path)
+        cached = self._route_cache.get(cache_key)
+        if cached is not None:
+            self._route_cache.move_to_end(cache_key)
+            return cached
+
+        resolved = (request.url.path, [])
+        for route in request.app.router.routes:
+            match, child_scope = route.matches(request.scope)
+            if match == Match.FULL:
+                endpoint = child_scope.get("endpoint")
+                resolved = (getattr(route, "path", request.url.path), getattr(endpoint, "rate_limits", []))
+                break
+
+        self._route_cache[cache_key] = resolved
+        if len(self._route_cache) > ROUTE_CACHE_SIZE:
+            self._route_cache.popitem(last=False)
+        return resolved
+
+    async def check_rate_limit(
         self,
         request: Request,
-        limit: int,
-        window: int,
-        identifier: Optional[str] = None
-    ) -> Tuple[bool, int, int, int]:
+        route_limits: List[Tuple[int, int, bool]] = (),
+        scope: Optional[str] = None,
+        include_global: bool = True
+    ) -> Optional[Dict[str, object]]:
         """
-        Check if request exceeds rate limit
-        
+        Check if a request exceeds any of its rate limits, in one storage call
+
         Args:
             request: FastAPI request object
-            limit: Maximum number of requests allowed
-            window: Time window in seconds
-            identifier: Optional custom identifier (e.g., user_id). If None, uses IP address
-        
+            route_limits: (limit, window, use_user_id) of the route's limits; use_user_id
+                counts per user_id from request state instead of per IP
+            scope: Name the route limits are counted under; defaults to the request path
+            include_global: Whether to also apply the global per-IP limit
+
         Returns:
-            Tuple of (allowed, current_count, limit, reset_time)
+            The binding limit: {"allowed", "limit", "window", "remaining", "reset_time",
+            "retry_after", "scope"}; the rejecting limit if any, else the one with
+            the least remaining quota. None if no limit applies.
         """
         # Skip if rate limiting is disabled
         if not self.enabled:
-            return True, 0, limit, 0
-        
-        # Get identifier (IP or custom)
-        if identifier is None:
-            identifier = self._get_client_ip(request)
-        
+            return None
+
+        ip = self._get_client_ip(request)
+        scope = scope or request.url.path
+        user_id = getattr(request.state, "user_id", None)
+
+        # (scope, identifier, limit, window) of every applicable limit
+        applicable = []
+        if include_global and self.global_limit:
+            applicable.append(("global", ip, self.global_limit, GLOBAL_WINDOW_SECONDS))
+        for limit, window, use_user_id in route_limits:
+            identifier = str(user_id) if use_user_id and user_id else ip
+            applicable.append((scope, identifier, limit, window))
+
         # Check whitelist
-        if self._is_whitelisted(identifier):
-            return True, 0, limit, 0
-        
-        # Generate key
-        endpoint = request.url.path
-        key = self._generate_key(identifier, endpoint)
-        
-        # Increment counter
-        current_count = self.storage.increment(key, window)
-        
-        # Calculate reset time
-        reset_time = int(time.time()) + window
-        
-        # Check if limit exceeded
-        allowed = current_count <= limit
-        
+        applicable = [entry for entry in applicable if not self._is_whitelisted(entry[1])]
+        if not applicable:
+            return None
+
+        now_ms = int(time.time() * 1000)
+        limits = []
+        for limit_scope, identifier, limit, window in applicable:
+            interval = max(1, window * 1000 // limit)
+            limits.append((self._generate_key(identifier, limit_scope), interval, interval * limit))
+
+        try:
+            results = await self._acquire(limits, now_ms)
+        except RateLimitStorageError:
+            limit_scope, _, limit, window = applicable[0]
+            return {
+                "allowed": not self.fail_closed,
+                "limit": limit,
+                "window": window,
+                "remaining": 0 if self.fail_closed else limit,
+                "reset_time": int(time.time()) + window,
+                "retry_after": window if self.fail_closed else 0,
+                "scope": limit_scope
+            }
+
+        # The binding limit: the first that rejected, else the one closest to its limit
+        rejected = [i for i, result in enumerate(results) if not result[0]]
+        binding = rejected[0] if rejected else min(range(len(results)), key=lambda i: results[i][1])
+        allowed, remaining, retry_after_ms, reset_after_ms = results[binding]
+        limit_scope, identifier, limit, window = applicable[binding]
+
         if not allowed:
-            logger.warning(
-                f"Rate limit exceeded for {identifier} on {endpoint}: "
-                f"{current_count}/{limit} in {window}s window"
+            logger.warning(f"Rate limit exceeded for {identifier} on {limit_scope}: {limit} per {window}s")
+
+        return {
+            "allowed": allowed,
+            "limit": limit,
+            "window": window,
+            "remaining": remaining,
+            "reset_time": (now_ms + reset_after_ms + 999) // 1000,
+            "retry_after": (retry_after_ms + 999) // 1000,
+            "scope": limit_scope
+        }
+
+    async def _acquire(self, limits: List[Tuple[str, int, int]], now: int) -> List[Tuple[bool, int, int, int]]:
+        """
+        Admit a request locally if every limit has leased quota left, else
+        check it against the storage and lease again.
+
+        Args:
+            limits: (key, interval_ms, burst_ms) per limit
+            now: Current time (ms)
+
+        Returns:
+            (allowed, remaining, retry_after_ms, reset_after_ms) per limit
+        """
+        local = self._local
+        if local is None:
+            self._stats["storage"] += 1
+            results = await self.storage.acquire([(key, interval, burst, 0) for key, interval, burst in limits], now)
+            return [result[:4] for result in results]
+
+        quotas = [local.get(key) for key, _, _ in limits]
+        if all(quota is not None and quota.allowance > 0 for quota in quotas):
+            self._stats["local"] += 1
+            results = []
+            for quota in quotas:
+                quota.allowance -= 1
+                quota.used = True
+                remaining = quota.allowance + quota.remaining
+                limit = quota.burst // quota.interval
+                results.append((True, remaining, 0, (limit - remaining) * quota.interval))
+            return results
+
+        # Out of leased quota on some limit (or first seen): check against the
+        # storage. What is left of the other leases is returned, and the
+        # request leases afresh if it is admitted.
+        for (key, interval, burst), quota in zip(limits, quotas):
+            if quota is None:
+                local[key] = LocalQuota(interval, burst, math.ceil(burst // interval * self.local_reserve_ratio))
+        quotas = [local[key] for key, _, _ in limits]
+        returned = [quota.allowance for quota in quotas]
+        for quota in quotas:
+            quota.allowance = 0
+            quota.used = True
+
+        self._stats["storage"] += 1
+        try:
+            results = await self.storage.acquire(
+                [(key, interval, burst, -count) for (key, interval, burst), count in zip(limits, returned)],
+                now,
+                leases=[(quota.reserve, self.local_workers) for quota in quotas]
             )
-        
-        return allowed, current_count, limit, reset_time
-    
-    def get_rate_limit_headers(
-        self,
-        current_count: int,
-        limit: int,
-        reset_time: int
-    ) -> Dict[str, str]:
+        except RateLimitStorageError:
+            for quota, count in zip(quotas, returned):
+                quota.allowance += count
+            raise
+
+        reported = []
+        for quota, (allowed, remaining, retry_after, reset_after, leased) in zip(quotas, results):
+            quota.allowance = leased
+            quota.remaining = remaining
+            # To the client, quota leased by this worker is still remaining
+            reported.append((allowed, remaining + leased, retry_after, reset_after - leased * quota.interval))
+        return reported
+
+    async def sync(self):
+        """
+        Return the unused leased quota of keys not used since the last sync
+        to the storage in one batch, and drop those keys.
+        """
+        if not self._local:
+            return
+
+        idle = []
+        for key, quota in list(self._local.items()):
+            if not quota.used:
+                del self._local[key]
+                if quota.allowance:
+                    idle.append((key, quota))
+            quota.used = False
+        if idle:
+            await self._return_leases(idle)
+
+    async def _return_leases(self, quotas: List[Tuple[str, LocalQuota]]):
+        try:
+            await self.storage.acquire(
+                [(key, quota.interval, quota.burst, -quota.allowance) for key, quota in quotas],
+                int(time.time() * 1000),
+                cost=0
+            )
+        except RateLimitStorageError as e:
+            # The leased quota stays booked until it refills
+            logger.warning(f"Failed to return {len(quotas)} leased rate limit quotas: {e}")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.local_sync_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Error returning leased rate limit quota: {e}")
+
+    async def start(self):
+        """Start syncing the local tier in the background. Call on startup."""
+        if self._local is not None and self._syncer is None:
+            self._syncer = asyncio.create_task(self._sync_loop())
+
+    def get_rate_limit_headers(self, result: Dict[str, object]) -> Dict[str, str]:
         """Generate rate limit headers for response"""
-        remaining = max(0, limit - current_count)
-        
+        headers = {
+            "X-RateLimit-Limit": str(result["limit"]),
+            "X-RateLimit-Remaining": str(result["remaining"]),
+            "X-RateLimit-Reset": str(result["reset_time"]),
+        }
+        if not result["allowed"]:
+            headers["Retry-After"] = str(result["retry_after"])
+        return headers
+
+    def exceeded_response(self, result: Dict[str, object]) -> JSONResponse:
+        """429 response for a rejected request"""
+        if result["scope"] == "global":
+            message = "Global rate limit exceeded. Please try again later."
+            message_id = "GLOBAL_RATE_LIMIT_EXCEEDED"
+        else:
+            message = f"Rate limit exceeded. Try again in {result['retry_after']} seconds."
+            message_id = "RATE_LIMIT_EXCEEDED"
+
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={
+                "code": 429,
+                "message": message,
+                "message_id": message_id,
+                "data": {
+                    "limit": result["limit"],
+                    "window": result["window"],
+                    "reset_time": result["reset_time"]
+                }
+            },
+            headers=self.get_rate_limit_headers(result)
+        )
+
+    async def close(self):
+        """Stop the local sync, return leased quota and close the storage connections on shutdown"""
+        if self._syncer is not None:
+            self._syncer.cancel()
+            try:
+                await self._syncer
+            except asyncio.CancelledError:
+                pass
+            self._syncer = None
+        if self._local:
+            leased = [(key, quota) for key, quota in self._local.items() if quota.allowance]
+            self._local.clear()
+            if leased:
+                await self._return_leases(leased)
+        await self.storage.close()
+
+    def get_status(self) -> dict:
         return {
-            "X-RateLimit-Limit": str(limit),
-            "X-RateLimit-Remaining": str(remaining),
-            "X-RateLimit-Reset": str(reset_time),
+            "storage": type(self.storage).__name__,
+            "failure_mode": "closed" if self.fail_closed else "open",
+            "local_tier": self._local is not None,
+            "local_keys": len(self._local or {}),
+            "admitted_locally": self._stats["local"],
+            "checked_in_storage": self._stats["storage"],
+            **self.storage.get_status()
         }
 
 
@@ -266,12 +792,16 @@ rate_limiter = RateLimiter()
 def rate_limit(limit: int, window: int = 60, use_user_id: bool = False):
     """
     Decorator for rate limiting endpoints
-    
+
+    The limit is attached to the endpoint, and the rate limit middleware
+    checks it together with the global limit in one storage call. The
+    wrapper only checks it itself when the middleware did not.
+
     Args:
         limit: Maximum number of requests allowed
         window: Time window in seconds (default: 60)
         use_user_id: If True, use user_id from request state instead of IP
-    
+
     Example:
         @rate_limit(limit=10, window=60)
         async def login(request: Request):
@@ -283,94 +813,62 @@ def rate_limit(limit: int, window: int = 60, use_user_id: bool = False):
             # Find FastAPI Request object in args or kwargs
             # We need to be careful to distinguish it from Pydantic request models
             request_obj = None
-            
-            # Debug: Log what we're receiving
-            logger.debug(f"Rate limiter wrapper called with {len(args)} args and {len(kwargs)} kwargs")
-            
+
             # First, check args for FastAPI Request
             # FastAPI Request will have 'headers', 'client', 'url', and 'method' attributes
             # Pydantic models won't have all of these
-            for i, arg in enumerate(args):
-                arg_type = type(arg).__name__
-                logger.debug(f"Arg {i}: type={arg_type}, has_headers={hasattr(arg, 'headers')}, has_client={hasattr(arg, 'client')}, has_url={hasattr(arg, 'url')}")
-                
+            for arg in args:
                 # Check if it's a Starlette/FastAPI Request
                 # Must have headers, client, url, and method attributes
-                if (hasattr(arg, 'headers') and 
-                    hasattr(arg, 'client') and 
-                    hasattr(arg, 'url') and 
+                if (hasattr(arg, 'headers') and
+                    hasattr(arg, 'client') and
+                    hasattr(arg, 'url') and
                     hasattr(arg, 'method') and
-                    not arg_type.endswith('Request')):  # Exclude Pydantic models ending with 'Request'
+                    not type(arg).__name__.endswith('Request')):  # Exclude Pydantic models ending with 'Request'
                     request_obj = arg
-                    logger.debug(f"Found FastAPI Request object at arg position {i}")
                     break
-            
+
             # If not found in args, check kwargs
             if request_obj is None:
                 for param_name in ["http_request", "request", "req"]:
                     if param_name in kwargs:
                         obj = kwargs[param_name]
-                        obj_type = type(obj).__name__
-                        logger.debug(f"Checking kwarg '{param_name}': type={obj_type}")
-                        
-                        if (hasattr(obj, 'headers') and 
-                            hasattr(obj, 'client') and 
-                            hasattr(obj, 'url') and 
+                        if (hasattr(obj, 'headers') and
+                            hasattr(obj, 'client') and
+                            hasattr(obj, 'url') and
                             hasattr(obj, 'method') and
-                            not obj_type.endswith('Request')):
+                            not type(obj).__name__.endswith('Request')):
                             request_obj = obj
-                            logger.debug(f"Found FastAPI Request object in kwargs['{param_name}']")
                             break
-            
+
             if request_obj is None:
                 logger.warning("Rate limit decorator: FastAPI Request object not found in args or kwargs")
-                logger.warning(f"Available arg types: {[type(arg).__name__ for arg in args]}")
-                logger.warning(f"Available kwarg keys: {list(kwargs.keys())}")
                 return await func(*args, **kwargs)
-            
-            # Get identifier
-            identifier = None
-            if use_user_id:
-                # Try to get user_id from request state (set by auth middleware)
-                identifier = getattr(request_obj.state, "user_id", None)
-                if identifier:
-                    identifier = str(identifier)
-            
+
+            if getattr(request_obj.state, "rate_limit_checked", False):
+                return await func(*args, **kwargs)
+
             # Check rate limit
-            allowed, current_count, limit_value, reset_time = rate_limiter.check_rate_limit(
-                request_obj, limit, window, identifier
+            route = request_obj.scope.get("route")
+            result = await rate_limiter.check_rate_limit(
+                request_obj, [(limit, window, use_user_id)], scope=getattr(route, "path", None), include_global=False
             )
-            
-            # Add rate limit headers to response
-            headers = rate_limiter.get_rate_limit_headers(current_count, limit_value, reset_time)
-            
-            if not allowed:
+
+            if result is not None and not result["allowed"]:
                 # Rate limit exceeded
-                return JSONResponse(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content={
-                        "code": 429,
-                        "message": f"Rate limit exceeded. Try again in {reset_time - int(time.time())} seconds.",
-                        "message_id": "RATE_LIMIT_EXCEEDED",
-                        "data": {
-                            "limit": limit_value,
-                            "window": window,
-                            "reset_time": reset_time
-                        }
-                    },
-                    headers=headers
-                )
-            
+                return rate_limiter.exceeded_response(result)
+
             # Execute the endpoint
             response = await func(*args, **kwargs)
-            
+
             # Add headers to successful response
-            if hasattr(response, "headers"):
-                for key, value in headers.items():
+            if result is not None and hasattr(response, "headers"):
+                for key, value in rate_limiter.get_rate_limit_headers(result).items():
                     response.headers[key] = value
-            
+
             return response
-        
+
+        wrapper.rate_limits = getattr(func, "rate_limits", []) + [(limit, window, use_user_id)]
         return wrapper
     return decorator
 
@@ -0,0 +1,158 @@
+"""
+Dispatch Worker
+
+Runs the dispatch service's matching rounds every few seconds on the event
+loop and pushes the resulting offers to partners over the notification
+WebSocket, falling back to a queued push notification when the partner is not
+connected. Database work is done in a thread so the loop is never blocked.
+"""
+
+import asyncio
+import time
+from app.services.dispatch_service import dispatch_service
+from app.infra.db.postgres.postgres_config import SessionLocal
+from app.config.config import DISPATCH_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DispatchWorker:
+    """Worker class to run dispatch rounds on the application event loop."""
+
+    def __init__(self, interval_seconds: float = 5):
+        """
+        Initialize the dispatch worker.
+
+        Args:
+            interval_seconds (float): Seconds between matching rounds.
+        """
+        self.interval_seconds = interval_seconds
+        self.task = None
+        self.running = False
+        self.is_leader = False
+        self.last_error = None
+
+    def start(self):
+        """Start the dispatch loop. Must be called from the running event loop."""
+        if self.running:
+            logger.warning("Dispatch worker is already running")
+            return
+
+        self.running = True
+        self.task = asyncio.get_running_loop().create_task(self._run_worker())
+        logger.info(f"Dispatch worker started with {self.interval_seconds}s interval")
+
+    def stop(self):
+        """Stop the dispatch loop."""
+        if not self.running:
+            logger.warning("Dispatch worker is not running")
+            return
+
+        self.running = False
+        if self.task:
+            self.task.cancel()
+        dispatch_service.release_leadership()
+        self.is_leader = False
+        logger.info("Dispatch worker stopped")
+
+    async def _run_worker(self):
+        """Main worker loop."""
+        while self.running:
+            started = time.monotonic()
+            try:
+                await self.run_once()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error in dispatch round: {str(e)}")
+
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(self.interval_seconds - elapsed, 0.1))
+
+    async def run_once(self) -> int:
+        """
+        Run a single dispatch round if this process holds leadership.
+
+        Returns:
+            int: Number of offers sent
+        """
+        self.is_leader = await asyncio.to_thread(
+            dispatch_service.acquire_leadership, self.interval_seconds * 3
+        )
+        if not self.is_leader:
+            return 0
+
+        offers = await asyncio.to_thread(self._run_cycle)
+        for offer in offers:
+            await self._deliver_offer(offer)
+        return len(offers)
+
+    @staticmethod
+    def _run_cycle() -> list:
+        db = SessionLocal()
+        try:
+            return dispatch_service.run_dispatch_cycle(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    async def _deliver_offer(offer: dict):
+        """Send an offer to its partner over WebSocket, or as a push notification."""
+        from app.services.websocket_manager import manager
+
+        partner_id = offer["partner_id"]
+        payload = {"type": "delivery_offer", "title": "New delivery request", **offer}
+        if await manager.send_notification(partner_id, payload):
+            return
+
+        from app.services.push_notification_service import push_service
+
+        def send_push():
+            db = SessionLocal()
+            try:
+                return push_service.send_to_user(
+                    db=db,
+                    user_id=partner_id,
+                    title="New delivery request",
+                    message=f"{offer['restaurant_name']} - {offer['distance_km']} km away",
+                    data={"type": "delivery_offer", "order_id": offer["order_id"]}
+                )
+            finally:
+                db.close()
+
+        try:
+            await asyncio.to_thread(send_push)
+        except Exception as e:
+            logger.warning(f"Failed to push delivery offer to partner {partner_id}: {e}")
+
+    def get_status(self) -> dict:
+        """Get the status of the dispatch worker."""
+        return {
+            "worker_running": self.running,
+            "is_leader": self.is_leader,
+            "interval_seconds": self.interval_seconds,
+            "last_error": self.last_error,
+            "dispatch": dispatch_service.get_status()
+        }
+
+
+# Global worker instance
+dispatch_worker = DispatchWorker(interval_seconds=DISPATCH_CONFIG["interval_seconds"])
+
+
+def start_dispatch_worker():
+    """Start the dispatch worker."""
+    dispatch_worker.start()
+
+
+def stop_dispatch_worker():
+    """Stop the dispatch worker."""
+    dispatch_worker.stop()
+
+
+def get_dispatch_worker_status():
+    """Get the worker status."""
+    return dispatch_worker.get_status()
@@ -0,0 +1,113 @@
+"""
+Email Worker
+
+Drains the email service's queue on a few threads, one per pooled SMTP
+connection, so OTP and welcome emails are sent outside the request path.
+On shutdown the threads finish what is already queued (up to a deadline)
+and the pooled connections are closed.
+"""
+
+import threading
+import time
+from app.services.email_service import email_service
+from app.config.config import EMAIL_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+POLL_TIMEOUT_SECONDS = 1
+SHUTDOWN_DRAIN_SECONDS = 10
+
+
+class EmailWorker:
+    """Worker class to send queued emails."""
+
+    def __init__(self, threads: int = 2):
+        """
+        Initialize the email worker.
+
+        Args:
+            threads (int): Sender threads; matches the SMTP pool size.
+        """
+        self.threads = threads
+        self.worker_threads = []
+        self.running = False
+        self._drain_deadline = None
+
+    def start(self):
+        """Start the email worker."""
+        if self.running:
+            logger.warning("Email worker is already running")
+            return
+
+        self.running = True
+        self._drain_deadline = None
+        self.worker_threads = [
+            threading.Thread(target=self._run_worker, name=f"email-worker-{index}", daemon=True)
+            for index in range(self.threads)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+        logger.info(f"Email worker started with {self.threads} threads")
+
+    def stop(self):
+        """Stop the worker after sending what is already queued."""
+        if not self.running:
+            logger.warning("Email worker is not running")
+            return
+
+        self._drain_deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+        self.running = False
+        for thread in self.worker_threads:
+            thread.join(timeout=SHUTDOWN_DRAIN_SECONDS + 5)
+        self.worker_threads = []
+        email_service.close()
+
+        left = email_service.get_status()["queued"]
+        if left:
+            logger.warning(f"Email worker stopped with {left} emails still queued")
+        logger.info("Email worker stopped")
+
+    def _run_worker(self):
+        """Main worker loop."""
+        while True:
+            if not self.running and (
+                self._drain_deadline is None or time.monotonic() >= self._drain_deadline
+            ):
+                return
+            email = email_service.dequeue(timeout=POLL_TIMEOUT_SECONDS)
+            if email is None:
+                if not self.running:
+                    return
+                continue
+            try:
+                email_service.deliver(email)
+            except Exception as e:
+                logger.error(f"Error sending email to {email.get('to_email')}: {str(e)}")
+
+    def get_status(self) -> dict:
+        """Get the status of the email worker."""
+        return {
+            "worker_running": self.running,
+            "threads": self.threads,
+            "email": email_service.get_status()
+        }
+
+
+# Global worker instance
+email_worker = EmailWorker(threads=EMAIL_CONFIG["pool_size"])
+
+
+def start_email_worker():
+    """Start the email worker."""
+    email_worker.start()
+
+
+def stop_email_worker():
+    """Stop the email worker."""
+    email_worker.stop()
+
+
+def get_email_worker_status():
+    """Get the worker status."""
+    return email_worker.get_status()
@@ -0,0 +1,99 @@
+"""
+Location Flush Worker
+
+Periodically writes the location ingestion service's buffered path points
+and partner positions to Postgres in bulk. Flushes early when the buffer
+fills up, and once more on shutdown so buffered points are not lost.
+"""
+
+import threading
+from app.services.location_ingest_service import location_ingest_service
+from app.config.config import LOCATION_INGEST_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LocationFlushWorker:
+    """Worker class to flush buffered delivery locations."""
+
+    def __init__(self, interval_seconds: float = 5):
+        """
+        Initialize the location flush worker.
+
+        Args:
+            interval_seconds (float): Seconds between flushes.
+        """
+        self.interval_seconds = interval_seconds
+        self.worker_thread = None
+        self.running = False
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start the location flush worker."""
+        if self.running:
+            logger.warning("Location flush worker is already running")
+            return
+
+        self.running = True
+        self._stop_event.clear()
+        self.worker_thread = threading.Thread(target=self._run_worker, daemon=True)
+        self.worker_thread.start()
+        logger.info(f"Location flush worker started with {self.interval_seconds}s interval")
+
+    def stop(self):
+        """Stop the worker after a final flush."""
+        if not self.running:
+            logger.warning("Location flush worker is not running")
+            return
+
+        self.running = False
+        self._stop_event.set()
+        location_ingest_service.flush_requested.set()
+
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+
+        logger.info("Location flush worker stopped")
+
+    def _run_worker(self):
+        """Main worker loop."""
+        while not self._stop_event.is_set():
+            # Wake up on the interval or as soon as the buffer is full
+            location_ingest_service.flush_requested.wait(timeout=self.interval_seconds)
+            self._flush()
+        self._flush(force=True)
+
+    @staticmethod
+    def _flush(force: bool = False):
+        try:
+            location_ingest_service.flush(force=force)
+        except Exception as e:
+            logger.error(f"Error flushing delivery locations: {str(e)}")
+
+    def get_status(self) -> dict:
+        """Get the status of the location flush worker."""
+        return {
+            "worker_running": self.running,
+            "interval_seconds": self.interval_seconds,
+            "ingestion": location_ingest_service.get_status()
+        }
+
+
+# Global worker instance
+location_flush_worker = LocationFlushWorker(interval_seconds=LOCATION_INGEST_CONFIG["flush_interval_seconds"])
+
+
+def start_location_flush_worker():
+    """Start the location flush worker."""
+    location_flush_worker.start()
+
+
+def stop_location_flush_worker():
+    """Stop the location flush worker."""
+    location_flush_worker.stop()
+
+
+def get_location_flush_status():
+    """Get the worker status."""
+    return location_flush_worker.get_status()
@@ -0,0 +1,109 @@
+"""
+Partition Maintenance Worker
+
+Runs partition maintenance for the notifications table on startup and then
+every few hours: creates upcoming monthly partitions and expires old ones
+(see partition_maintenance_service). Every application worker runs this
+loop; an advisory lock makes sure only one of them does the work per pass.
+It runs even with retention disabled, since the partitioned notifications
+table has no default partition and inserts need the upcoming months.
+"""
+
+import threading
+from app.services.partition_maintenance_service import notification_partition_service
+from app.services.unread_counter_service import unread_counter_service
+from app.config.config import NOTIFICATION_RETENTION_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PartitionMaintenanceWorker:
+    """Worker class to keep the notifications partitions in shape."""
+
+    def __init__(self, interval_hours: float = 24):
+        """
+        Initialize the partition maintenance worker.
+
+        Args:
+            interval_hours (float): Hours between maintenance passes.
+        """
+        self.interval_seconds = interval_hours * 3600
+        self.worker_thread = None
+        self.running = False
+        self.last_error = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start the partition maintenance worker."""
+        if self.running:
+            logger.warning("Partition maintenance worker is already running")
+            return
+
+        self.running = True
+        self._stop_event.clear()
+        self.worker_thread = threading.Thread(target=self._run_worker, daemon=True)
+        self.worker_thread.start()
+        logger.info(f"Partition maintenance worker started with {self.interval_seconds / 3600:g}h interval")
+
+    def stop(self):
+        """Stop the partition maintenance worker."""
+        if not self.running:
+            logger.warning("Partition maintenance worker is not running")
+            return
+
+        self.running = False
+        self._stop_event.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Partition maintenance worker stopped")
+
+    def _run_worker(self):
+        """Main worker loop."""
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(timeout=self.interval_seconds)
+
+    def run_once(self) -> dict:
+        """Run one maintenance pass. Never raises."""
+        try:
+            result = notification_partition_service.run()
+            if result.get("expired"):
+                # Unread counts of users with notifications in the dropped months changed
+                unread_counter_service.bump_epoch()
+            self.last_error = None
+            return result
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error during partition maintenance: {str(e)}")
+            return {"error": str(e)}
+
+    def get_status(self) -> dict:
+        """Get the status of the partition maintenance worker."""
+        return {
+            "worker_running": self.running,
+            "interval_hours": self.interval_seconds / 3600,
+            "last_error": self.last_error,
+            "maintenance": notification_partition_service.get_status()
+        }
+
+
+# Global worker instance
+partition_maintenance_worker = PartitionMaintenanceWorker(
+    interval_hours=NOTIFICATION_RETENTION_CONFIG["interval_hours"]
+)
+
+
+def start_partition_maintenance_worker():
+    """Start the partition maintenance worker."""
+    partition_maintenance_worker.start()
+
+
+def stop_partition_maintenance_worker():
+    """Stop the partition maintenance worker."""
+    partition_maintenance_worker.stop()
+
+
+def get_partition_maintenance_status():
+    """Get the worker status."""
+    return partition_maintenance_worker.get_status()
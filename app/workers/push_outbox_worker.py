@@ -0,0 +1,125 @@
+"""
+Push Outbox Worker
+
+Runs a small pool of consumers on the event loop that drain the push outbox:
+each round claims due pushes, sends them through the Expo client and checks
+a batch of receipts (see push_outbox_service). Consumers poll on an interval
+and are woken immediately when this worker enqueues a push. Other
+application workers run their own consumers against the same table.
+"""
+
+import asyncio
+import time
+from app.services.push_outbox_service import push_outbox_service
+from app.config.config import PUSH_CONFIG
+from app.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class PushOutboxWorker:
+    """Worker class to send queued push notifications."""
+
+    def __init__(self, consumers: int = 2, poll_interval_seconds: float = 2):
+        """
+        Initialize the push outbox worker.
+
+        Args:
+            consumers (int): Concurrent consumer tasks.
+            poll_interval_seconds (float): Seconds between polls when idle.
+        """
+        self.consumers = consumers
+        self.poll_interval_seconds = poll_interval_seconds
+        self.tasks = []
+        self.running = False
+        self.last_error = None
+        self._wakeup = None
+        self._next_purge = 0.0
+
+    def start(self):
+        """Start the consumers. Must be called from the running event loop."""
+        if self.running:
+            logger.warning("Push outbox worker is already running")
+            return
+
+        loop = asyncio.get_running_loop()
+        self.running = True
+        self._wakeup = asyncio.Event()
+        push_outbox_service.set_wake_handler(lambda: loop.call_soon_threadsafe(self._wakeup.set))
+        self.tasks = [loop.create_task(self._consume(index)) for index in range(self.consumers)]
+        logger.info(f"Push outbox worker started with {self.consumers} consumers")
+
+    def stop(self):
+        """Stop the consumers. Claimed pushes are picked up again after their lease."""
+        if not self.running:
+            logger.warning("Push outbox worker is not running")
+            return
+
+        self.running = False
+        push_outbox_service.set_wake_handler(None)
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        logger.info("Push outbox worker stopped")
+
+    async def _consume(self, index: int):
+        """Consumer loop."""
+        while self.running:
+            busy = False
+            try:
+                result = await push_outbox_service.process_once()
+                busy = result["sent"] >= push_outbox_service.claim_batch_size
+                if index == 0 and time.monotonic() >= self._next_purge:
+                    self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                    purged = await push_outbox_service.purge_once()
+                    if purged:
+                        logger.info(f"Purged {purged} settled push outbox rows")
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error in push outbox round: {str(e)}")
+
+            if busy:
+                # A full batch means more is probably waiting
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def get_status(self) -> dict:
+        """Get the status of the push outbox worker."""
+        return {
+            "worker_running": self.running,
+            "consumers": self.consumers,
+            "poll_interval_seconds": self.poll_interval_seconds,
+            "last_error": self.last_error,
+            "outbox": push_outbox_service.get_status()
+        }
+
+
+# Global worker instance
+push_outbox_worker = PushOutboxWorker(
+    consumers=PUSH_CONFIG["outbox_consumers"],
+    poll_interval_seconds=PUSH_CONFIG["outbox_poll_interval_seconds"]
+)
+
+
+def start_push_outbox_worker():
+    """Start the push outbox worker."""
+    push_outbox_worker.start()
+
+
+def stop_push_outbox_worker():
+    """Stop the push outbox worker."""
+    push_outbox_worker.stop()
+
+
+def get_push_outbox_status():
+    """Get the worker status."""
+    return push_outbox_worker.get_status()
@@ -0,0 +1,13 @@
+-- Migration: Add composite index for the notification inbox
+-- Date: 2026-10-19
+-- Description: Supports keyset pagination of a user's notifications ordered by
+-- (created_at, notification_id) newest first (scanned backwards).
+-- CONCURRENTLY avoids blocking writes; run this outside a transaction block.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notifications_user_created
+ON core_mstr_one_qlick_notifications_tbl(user_id, created_at, notification_id);
+
+-- Verify the changes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'core_mstr_one_qlick_notifications_tbl';
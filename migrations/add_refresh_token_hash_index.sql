@@ -0,0 +1,18 @@
+-- Migration: Index refresh tokens by hash
+-- Date: 2026-10-19
+-- Description: Refresh tokens are now stored as their SHA-256 and looked up by
+-- it directly. Tokens issued before this change were stored as bcrypt hashes
+-- and can no longer be matched, so they are revoked (users sign in again).
+-- CONCURRENTLY avoids blocking writes; run this outside a transaction block.
+
+UPDATE core_mstr_one_qlick_refresh_tokens_tbl
+SET is_revoked = TRUE
+WHERE token_hash LIKE '$2%';
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_refresh_tokens_token_hash
+ON core_mstr_one_qlick_refresh_tokens_tbl(token_hash);
+
+-- Verify the changes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'core_mstr_one_qlick_refresh_tokens_tbl';
@@ -0,0 +1,30 @@
+-- Migration: Create push notification outbox table
+-- Date: 2026-10-19
+-- Description: Durable queue of push notifications (one row per device token)
+-- consumed by the push outbox worker, which also tracks Expo tickets/receipts
+
+CREATE TABLE IF NOT EXISTS core_mstr_one_qlick_push_outbox_tbl (
+    outbox_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NULL REFERENCES core_mstr_one_qlick_users_tbl(user_id) ON DELETE CASCADE,
+    push_token VARCHAR NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    body VARCHAR NOT NULL,
+    data_json JSONB NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),
+    ticket_id VARCHAR NULL,
+    last_error VARCHAR NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Workers poll for due rows by status
+CREATE INDEX IF NOT EXISTS idx_push_outbox_due
+ON core_mstr_one_qlick_push_outbox_tbl(status, next_attempt_at);
+
+-- Verify the changes
+SELECT column_name, data_type, is_nullable, column_default
+FROM information_schema.columns
+WHERE table_name = 'core_mstr_one_qlick_push_outbox_tbl'
+ORDER BY ordinal_position;
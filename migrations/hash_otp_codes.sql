@@ -0,0 +1,28 @@
+-- Migration: Store OTP codes hashed
+-- Date: 2026-10-19
+-- Description: otp_code now holds the HMAC-SHA256 of the code (64 hex chars)
+-- instead of the code itself. Outstanding plaintext codes can no longer be
+-- verified and are invalidated; users request a new code.
+-- Send limits, attempt counts and lockouts moved to Redis counters, so
+-- pending users' otp_attempts / otp_locked_until are no longer written.
+
+ALTER TABLE core_mstr_one_qlick_otp_verifications_tbl
+ALTER COLUMN otp_code TYPE VARCHAR(64);
+
+UPDATE core_mstr_one_qlick_otp_verifications_tbl
+SET is_verified = TRUE, attempts = max_attempts
+WHERE is_verified = FALSE AND length(otp_code) < 64;
+
+-- Verification looks up the current code by identifier and type
+CREATE INDEX IF NOT EXISTS idx_otp_verifications_email_type
+ON core_mstr_one_qlick_otp_verifications_tbl(email, otp_type, created_at)
+WHERE is_verified = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_otp_verifications_phone_type
+ON core_mstr_one_qlick_otp_verifications_tbl(phone, otp_type, created_at)
+WHERE is_verified = FALSE;
+
+-- Verify the changes
+SELECT column_name, data_type, character_maximum_length
+FROM information_schema.columns
+WHERE table_name = 'core_mstr_one_qlick_otp_verifications_tbl' AND column_name = 'otp_code';
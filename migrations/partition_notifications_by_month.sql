@@ -0,0 +1,77 @@
+-- Migration: Range-partition the notifications table by month
+-- Date: 2026-10-19
+-- Description: Rebuilds core_mstr_one_qlick_notifications_tbl as a table
+-- partitioned by created_at, one partition per month named
+-- core_mstr_one_qlick_notifications_tbl_pYYYYMM. Retention then drops (or
+-- archives) whole months instead of DELETEing rows. The partition maintenance
+-- worker keeps the next months' partitions created and expires old ones
+-- (NOTIFICATION_RETENTION_CONFIG).
+-- There is deliberately no DEFAULT partition: a default partition holding
+-- rows for a month would block creating that month's partition. Instead the
+-- maintenance worker always runs and creates upcoming partitions even when
+-- NOTIFICATION_RETENTION_ENABLED=false, which only turns off expiry.
+-- The partition key must be part of the primary key, so the key becomes
+-- (notification_id, created_at).
+-- Copies every row, so run it in a maintenance window; writes to the
+-- notifications table are blocked until it commits.
+
+BEGIN;
+
+ALTER TABLE core_mstr_one_qlick_notifications_tbl
+    RENAME TO core_mstr_one_qlick_notifications_legacy_tbl;
+ALTER TABLE core_mstr_one_qlick_notifications_legacy_tbl
+    RENAME CONSTRAINT core_mstr_one_qlick_notifications_tbl_pkey
+    TO core_mstr_one_qlick_notifications_legacy_tbl_pkey;
+ALTER INDEX IF EXISTS idx_notifications_user_created
+    RENAME TO idx_notifications_legacy_user_created;
+
+CREATE TABLE core_mstr_one_qlick_notifications_tbl (
+    LIKE core_mstr_one_qlick_notifications_legacy_tbl
+    INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE core_mstr_one_qlick_notifications_tbl
+    ADD PRIMARY KEY (notification_id, created_at);
+ALTER TABLE core_mstr_one_qlick_notifications_tbl
+    ADD FOREIGN KEY (user_id) REFERENCES core_mstr_one_qlick_users_tbl(user_id);
+
+-- One partition per month from the oldest notification to three months ahead
+DO $$
+DECLARE
+    month DATE := date_trunc('month', COALESCE(
+        (SELECT min(created_at) FROM core_mstr_one_qlick_notifications_legacy_tbl), now()
+    ))::date;
+    last_month DATE := (date_trunc('month', now()) + interval '3 months')::date;
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF core_mstr_one_qlick_notifications_tbl FOR VALUES FROM (%L) TO (%L)',
+            'core_mstr_one_qlick_notifications_tbl_p' || to_char(month, 'YYYYMM'),
+            month,
+            (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO core_mstr_one_qlick_notifications_tbl
+SELECT * FROM core_mstr_one_qlick_notifications_legacy_tbl;
+
+-- Created on the parent, so every partition gets its own copy
+CREATE INDEX idx_notifications_user_created
+ON core_mstr_one_qlick_notifications_tbl(user_id, created_at, notification_id);
+
+COMMIT;
+
+ANALYZE core_mstr_one_qlick_notifications_tbl;
+
+-- Once the new table has been verified:
+-- DROP TABLE core_mstr_one_qlick_notifications_legacy_tbl;
+
+-- Verify the changes
+SELECT child.relname AS partition, pg_get_expr(child.relpartbound, child.oid) AS bounds
+FROM pg_inherits i
+JOIN pg_class parent ON parent.oid = i.inhparent
+JOIN pg_class child ON child.oid = i.inhrelid
+WHERE parent.relname = 'core_mstr_one_qlick_notifications_tbl'
+ORDER BY child.relname;
@@ -0,0 +1,72 @@
+"""
+Tests for background notification broadcast jobs.
+"""
+import uuid
+
+from app.services import broadcast_job_service as broadcast_module
+from app.services.broadcast_job_service import BroadcastJobService
+from app.utils.enums import NotificationType
+
+
+def run_job(service, **broadcast):
+    job = service.submit(
+        created_by=uuid.uuid4(),
+        title="Weekend offer",
+        message="20% off",
+        notification_type=NotificationType.SYSTEM_ANNOUNCEMENT,
+        **broadcast
+    )
+    # Wait for the job to finish
+    service._executor.shutdown(wait=True)
+    return job
+
+
+class TestBroadcastJobs:
+    """Test job submission, progress tracking and failure reporting (in-memory backend)."""
+
+    def test_job_reports_progress_and_completion(self, monkeypatch):
+        progress = []
+
+        def fake_broadcast(db, on_progress, chunk_size, **kwargs):
+            for sent in (chunk_size, 2 * chunk_size, 2 * chunk_size + 1):
+                on_progress(sent)
+                progress.append(service.recent_jobs(limit=1)[0]["notifications_sent"])
+            return 2 * chunk_size + 1
+
+        monkeypatch.setattr(broadcast_module.NotificationService, "broadcast_notification", staticmethod(fake_broadcast))
+        service = BroadcastJobService(chunk_size=2, use_redis=False)
+        queued = run_job(service, role_filter="customer")
+
+        assert queued["status"] == "queued"
+        assert progress == [2, 4, 5]
+        finished = service.get_job(queued["job_id"])
+        assert finished["status"] == "completed"
+        assert finished["notifications_sent"] == 5
+        assert finished["started_at"] and finished["finished_at"]
+
+    def test_failed_job_keeps_error(self, monkeypatch):
+        def failing_broadcast(db, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(broadcast_module.NotificationService, "broadcast_notification", staticmethod(failing_broadcast))
+        service = BroadcastJobService(use_redis=False)
+        job = run_job(service, user_ids=[uuid.uuid4()])
+
+        failed = service.get_job(job["job_id"])
+        assert failed["status"] == "failed"
+        assert failed["error"] == "database unavailable"
+        assert failed["target_user_count"] == 1
+
+    def test_recent_jobs_newest_first(self, monkeypatch):
+        monkeypatch.setattr(
+            broadcast_module.NotificationService, "broadcast_notification", staticmethod(lambda db, **kwargs: 0)
+        )
+        service = BroadcastJobService(use_redis=False, max_local_jobs=2)
+        first = service.submit(uuid.uuid4(), "a", "a", NotificationType.SYSTEM_ANNOUNCEMENT)
+        second = service.submit(uuid.uuid4(), "b", "b", NotificationType.SYSTEM_ANNOUNCEMENT)
+        third = service.submit(uuid.uuid4(), "c", "c", NotificationType.SYSTEM_ANNOUNCEMENT)
+        service._executor.shutdown(wait=True)
+
+        recent = [job["job_id"] for job in service.recent_jobs()]
+        assert recent == [third["job_id"], second["job_id"]]
+        assert service.get_job(first["job_id"]) is None
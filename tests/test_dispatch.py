@@ -0,0 +1,144 @@
+"""
+Tests for the delivery dispatch service:
+- greedy batched assignment of ready orders to partners
+- offer reservation / decline bookkeeping (in-memory backend)
+- the Redis leader lease and its Postgres advisory lock fallback
+"""
+import uuid
+
+import pytest
+
+from app.services import dispatch_service as dispatch_module
+from app.services.dispatch_service import DispatchService
+
+
+class FakeLockServer:
+    """Stands in for the engine: one session-level advisory lock shared by all connections."""
+
+    def __init__(self):
+        self.holder = None
+
+    def connect(self):
+        return FakeLockConnection(self)
+
+
+class FakeLockConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def execute(self, statement, params=None):
+        if "pg_try_advisory_lock" in str(statement):
+            if self.server.holder is None:
+                self.server.holder = self
+            return FakeResult(self.server.holder is self)
+        return FakeResult(1)
+
+    def commit(self):
+        pass
+
+    def invalidate(self):
+        # Discarding the session releases its locks
+        if self.server.holder is self:
+            self.server.holder = None
+
+    def close(self):
+        pass
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class TestDispatchMatching:
+    """Test the batched nearest assignment."""
+
+    def test_each_order_and_partner_matched_once(self):
+        candidates = {
+            "order-1": [("rider-a", 1.0), ("rider-b", 2.0)],
+            "order-2": [("rider-a", 0.5), ("rider-b", 3.0)],
+        }
+        assignments = DispatchService.match(candidates)
+        assert sorted(assignments) == [("order-1", "rider-b", 2.0), ("order-2", "rider-a", 0.5)]
+
+    def test_unmatched_order_when_partners_run_out(self):
+        candidates = {
+            "order-1": [("rider-a", 1.0)],
+            "order-2": [("rider-a", 2.0)],
+        }
+        assert DispatchService.match(candidates) == [("order-1", "rider-a", 1.0)]
+
+    def test_empty_candidates(self):
+        assert DispatchService.match({}) == []
+
+
+class TestDispatchOffers:
+    """Test offer reservation with the in-memory store."""
+
+    def setup_method(self):
+        self.service = DispatchService(offer_ttl_seconds=30, use_redis=False)
+        self.order_id = uuid.uuid4()
+        self.partner_id = uuid.uuid4()
+
+    def test_offer_reserves_order_for_partner(self):
+        self.service.offers.create(str(self.order_id), str(self.partner_id), 30)
+        assert self.service.get_offer(self.order_id) == str(self.partner_id)
+        assert self.service.get_partner_offer(self.partner_id) == str(self.order_id)
+
+        self.service.clear_offer(self.order_id)
+        assert self.service.get_offer(self.order_id) is None
+        assert self.service.get_partner_offer(self.partner_id) is None
+
+    def test_expired_offer_is_ignored(self):
+        self.service.offers.create(str(self.order_id), str(self.partner_id), 0)
+        assert self.service.get_offer(self.order_id) is None
+
+    def test_decline_requires_holding_the_offer(self):
+        self.service.offers.create(str(self.order_id), str(self.partner_id), 30)
+        assert self.service.decline_offer(self.order_id, uuid.uuid4()) is False
+        assert self.service.decline_offer(self.order_id, self.partner_id) is True
+        assert self.service.get_offer(self.order_id) is None
+        assert self.service.offers.get_declined(str(self.order_id)) == {str(self.partner_id)}
+
+    def test_partner_location_only_tracked_when_available(self):
+        self.service.update_partner_location(self.partner_id, 18.52, 73.85)
+        assert len(self.service.partner_index) == 0
+
+        self.service.partner_index.add(str(self.partner_id), 18.0, 73.0)
+        self.service.update_partner_location(self.partner_id, 18.52, 73.85)
+        assert self.service.partner_index.position(str(self.partner_id)) == (18.52, 73.85)
+
+
+class TestDispatchLeadership:
+    """Test leader election (the Redis lease is skipped without Redis)."""
+
+    def test_only_the_leaseholder_renews(self):
+        from app.infra.redis.repositories.redis_repositories import get_redis_client, redis_key
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            pytest.skip("Redis not reachable — skipping dispatch leadership test")
+        redis_client.delete(redis_key("dispatch", "leader"))
+        leader, follower = DispatchService(), DispatchService()
+        try:
+            assert leader.acquire_leadership(5)
+            assert not follower.acquire_leadership(5)
+            assert leader.acquire_leadership(5)
+        finally:
+            redis_client.delete(redis_key("dispatch", "leader"))
+
+    def test_postgres_lock_elects_one_leader_without_redis(self, monkeypatch):
+        monkeypatch.setattr(dispatch_module, "engine", FakeLockServer())
+        leader, follower = DispatchService(use_redis=False), DispatchService(use_redis=False)
+
+        assert leader.acquire_leadership(5)
+        assert not follower.acquire_leadership(5)
+        assert leader.acquire_leadership(5)
+
+        # Stopping the leader hands the lock to the next worker to ask
+        leader.release_leadership()
+        assert follower.acquire_leadership(5)
+        assert not leader.acquire_leadership(5)
@@ -0,0 +1,227 @@
+"""
+Tests for email templates and queued delivery over pooled SMTP connections,
+against a local SMTP sink.
+"""
+import asyncio
+import email
+import socketserver
+import threading
+
+from app.config.config import EMAIL_CONFIG
+from app.services.email_service import EmailService
+from app.services.email_templates import email_templates
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+class SMTPSink:
+    """Minimal SMTP server that records messages and counts connections."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.sockets = []
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                    sink.sockets.append(self.request)
+                self._reply("220 sink ready")
+                mail = None
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self._reply("250 sink")
+                    elif command.startswith("MAIL FROM"):
+                        mail = {"rcpt": [], "data": b""}
+                        self._reply("250 OK")
+                    elif command.startswith("RCPT TO"):
+                        if "BLOCKED@" in command:
+                            self._reply("550 No such user")
+                        else:
+                            mail["rcpt"].append(command)
+                            self._reply("250 OK")
+                    elif command == "DATA":
+                        self._reply("354 End data with <CR><LF>.<CR><LF>")
+                        data = []
+                        while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                            data.append(chunk)
+                        mail["data"] = b"".join(data)
+                        with sink._lock:
+                            sink.messages.append(mail)
+                        self._reply("250 Queued")
+                    elif command in ("NOOP", "RSET"):
+                        self._reply("250 OK")
+                    elif command == "QUIT":
+                        self._reply("221 Bye")
+                        return
+                    else:
+                        self._reply("502 Not implemented")
+
+            def _reply(self, text):
+                self.wfile.write(f"{text}\r\n".encode())
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def drop_connections(self):
+        """Close every client connection, like a server timing out idle clients."""
+        with self._lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.drop_connections()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_service(port, **overrides):
+    config = dict(
+        EMAIL_CONFIG,
+        smtp_host="127.0.0.1",
+        smtp_port=port,
+        smtp_username="",
+        smtp_password="",
+        smtp_security="none",
+        from_address="noreply@oneqlick.test",
+        send_attempts=2,
+        **overrides
+    )
+    return EmailService(config=config)
+
+
+def drain(service):
+    results = []
+    while (email := service.dequeue(timeout=0)) is not None:
+        results.append(service.deliver(email))
+    return results
+
+
+class TestEmailQueue:
+    """Test non-blocking email sends and pooled delivery."""
+
+    def test_send_only_queues(self):
+        # Nothing listens on this port: queueing must not touch SMTP
+        service = make_service(1)
+
+        queued = asyncio.run(service.send_otp_email("user@example.com", "123456", "Test User"))
+
+        assert queued is True
+        assert service.get_status()["queued"] == 1
+
+    def test_full_queue_rejects_send(self):
+        service = make_service(1, queue_max_size=1, send_welcome_emails=True)
+
+        assert asyncio.run(service.send_welcome_email("a@example.com", "A", "A")) is True
+        assert asyncio.run(service.send_welcome_email("b@example.com", "B", "B")) is False
+
+    def test_welcome_email_is_logged_only_by_default(self):
+        service = make_service(1, send_welcome_emails=False)
+
+        assert asyncio.run(service.send_welcome_email("a@example.com", "A", "A")) is True
+        assert service.get_status()["queued"] == 0
+
+    def test_connection_is_reused_across_emails(self):
+        with SMTPSink() as sink:
+            service = make_service(sink.port)
+            for index in range(5):
+                asyncio.run(service.send_otp_email(f"user{index}@example.com", "123456", "Test User"))
+
+            assert drain(service) == [True] * 5
+            service.close()
+
+        assert len(sink.messages) == 5
+        assert sink.connections == 1
+        assert sink.messages[0]["rcpt"] == ["RCPT TO:<USER0@EXAMPLE.COM>"]
+
+    def test_reconnects_after_server_drops_connection(self):
+        with SMTPSink() as sink:
+            service = make_service(sink.port)
+            asyncio.run(service.send_otp_email("first@example.com", "111111"))
+            assert drain(service) == [True]
+
+            sink.drop_connections()
+            asyncio.run(service.send_otp_email("second@example.com", "222222"))
+            assert drain(service) == [True]
+            service.close()
+
+        assert len(sink.messages) == 2
+        assert sink.connections == 2
+
+    def test_refused_recipient_fails_without_dropping_connection(self):
+        with SMTPSink() as sink:
+            service = make_service(sink.port)
+            asyncio.run(service.send_otp_email("blocked@example.com", "123456"))
+            asyncio.run(service.send_otp_email("user@example.com", "123456"))
+
+            assert drain(service) == [False, True]
+            assert service.get_status()["failed"] == 1
+            service.close()
+
+        assert sink.connections == 1
+
+    def test_connection_retired_after_max_messages(self):
+        with SMTPSink() as sink:
+            pool = SMTPConnectionPool("127.0.0.1", sink.port, security="none", max_messages=2)
+            service = make_service(sink.port)
+            service.pool = pool
+            for index in range(4):
+                asyncio.run(service.send_otp_email(f"user{index}@example.com", "123456"))
+
+            assert drain(service) == [True] * 4
+            pool.close()
+
+        assert sink.connections == 2
+
+
+class TestEmailTemplates:
+    """Test precompiled email rendering."""
+
+    def test_otp_email_per_type(self):
+        subject, html_content, text_content = email_templates.render_otp("123456", "Test User", "password_reset")
+
+        assert subject == "Reset Your Password - oneQlick"
+        assert '<div class="otp-number">123456</div>' in html_content
+        assert "Verification Code: 123456" in text_content
+        assert "to reset your password:" in text_content
+
+    def test_unknown_otp_type_uses_generic_wording(self):
+        subject, _, text_content = email_templates.render_otp("123456", "Test User", "something_else")
+
+        assert subject == "Your Verification Code - oneQlick"
+        assert "complete your verification" in text_content
+
+    def test_names_are_escaped_in_html_only(self):
+        _, html_content, text_content = email_templates.render_welcome("<b>Al</b>", "Al B")
+
+        assert "&lt;b&gt;Al&lt;/b&gt;" in html_content
+        assert "<b>Al</b>" not in html_content
+        assert "Hello <b>Al</b>," in text_content
+
+    def test_sent_message_has_text_and_html_parts(self):
+        with SMTPSink() as sink:
+            service = make_service(sink.port)
+            asyncio.run(service.send_otp_email("user@example.com", "654321", "Test User"))
+            assert drain(service) == [True]
+            service.close()
+
+        message = email.message_from_bytes(sink.messages[0]["data"])
+        parts = {part.get_content_type(): part.get_payload(decode=True).decode() for part in message.get_payload()}
+        assert list(parts) == ["text/plain", "text/html"]
+        assert "Verification Code: 654321" in parts["text/plain"]
+        assert '<div class="otp-number">654321</div>' in parts["text/html"]
@@ -0,0 +1,101 @@
+"""
+Tests for the in-memory geo index and the ready order index used by
+GET /api/v1/orders/delivery/available.
+"""
+import uuid
+
+from app.utils.geo_index import GeoIndex, RedisGeoIndex
+from app.utils.order_utils import calculate_distance
+from app.services import ready_order_index as ready_order_module
+from app.services.ready_order_index import ReadyOrderIndex
+
+
+# Pune city centre and nearby points
+PUNE = (18.5204, 73.8567)
+KOTHRUD = (18.5074, 73.8077)     # ~5 km west
+HINJEWADI = (18.5913, 73.7389)   # ~15 km north-west
+MUMBAI = (19.0760, 72.8777)      # ~120 km
+
+
+class TestGeoIndex:
+    """Test the grid-based spatial index."""
+
+    def test_search_returns_members_within_radius_sorted(self):
+        index = GeoIndex(cell_size_km=2.0)
+        index.add("kothrud", *KOTHRUD)
+        index.add("hinjewadi", *HINJEWADI)
+        index.add("mumbai", *MUMBAI)
+
+        results = index.search(*PUNE, radius_km=20)
+        assert [member for member, _ in results] == ["kothrud", "hinjewadi"]
+        assert results[0][1] == calculate_distance(*PUNE, *KOTHRUD)
+
+    def test_search_matches_brute_force(self):
+        index = GeoIndex(cell_size_km=1.0)
+        points = {}
+        for i in range(200):
+            lat = PUNE[0] + ((i * 37) % 100 - 50) / 500
+            lon = PUNE[1] + ((i * 53) % 100 - 50) / 500
+            points[f"m{i}"] = (lat, lon)
+            index.add(f"m{i}", lat, lon)
+
+        expected = sorted(
+            member for member, (lat, lon) in points.items()
+            if calculate_distance(*PUNE, lat, lon) <= 7
+        )
+        assert sorted(member for member, _ in index.search(*PUNE, radius_km=7)) == expected
+
+    def test_add_moves_and_remove_deletes(self):
+        index = GeoIndex()
+        index.add("rider", *MUMBAI)
+        index.add("rider", *KOTHRUD)
+        assert len(index) == 1
+        assert index.position("rider") == KOTHRUD
+        assert index.search(*MUMBAI, radius_km=5) == []
+
+        assert index.remove("rider") is True
+        assert index.remove("rider") is False
+        assert "rider" not in index
+
+    def test_search_limit(self):
+        index = GeoIndex()
+        index.add("a", *PUNE)
+        index.add("b", *KOTHRUD)
+        assert [member for member, _ in index.search(*PUNE, radius_km=20, limit=1)] == ["a"]
+
+
+class TestReadyOrderIndex:
+    """Test the ready order index with the in-memory backend."""
+
+    def test_nearby_returns_order_ids(self):
+        ready_index = ReadyOrderIndex(reconcile_seconds=3600, use_redis=False)
+        # Pretend a reconcile just happened so no DB session is needed
+        ready_index._last_reconcile = float("inf")
+
+        near_id, far_id = uuid.uuid4(), uuid.uuid4()
+        ready_index.add_order(near_id, *KOTHRUD)
+        ready_index.add_order(far_id, *MUMBAI)
+
+        assert ready_index.nearby(None, *PUNE, radius_km=10) == [
+            (near_id, calculate_distance(*PUNE, *KOTHRUD))
+        ]
+
+        ready_index.remove_order(near_id)
+        assert ready_index.nearby(None, *PUNE, radius_km=10) == []
+
+    def test_redis_is_retried_after_an_error(self, monkeypatch):
+        class BrokenIndex:
+            def add(self, member, latitude, longitude):
+                raise ConnectionError("Redis went away")
+
+        ready_index = ReadyOrderIndex(redis_retry_seconds=3600)
+        ready_index._index = BrokenIndex()
+
+        ready_index.add_order(uuid.uuid4(), *KOTHRUD)
+        assert isinstance(ready_index._get_index(), GeoIndex)
+
+        # Once the backoff has passed, the next call probes Redis again
+        monkeypatch.setattr(ready_order_module, "get_redis_client", lambda: object())
+        ready_index._redis_retry_at = 1.0
+        assert isinstance(ready_index._get_index(), RedisGeoIndex)
+        assert ready_index._last_reconcile == 0.0
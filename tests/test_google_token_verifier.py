@@ -0,0 +1,200 @@
+"""
+Tests for local Google ID token verification, against a locally generated
+keypair served by a stand-in JWKS endpoint.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.services.google_token_verifier import GoogleTokenVerifier, parse_max_age
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "use": "sig"}
+    return private_pem, public_jwk
+
+
+KEY_1 = make_key("key-1")
+KEY_2 = make_key("key-2")
+
+
+def make_token(key, **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+        "email": "user@example.com", "email_verified": True, "given_name": "Test",
+        "family_name": "User", "name": "Test User", "iat": now, "exp": now + 3600,
+        "at_hash": "ignored"
+    }
+    claims.update(overrides)
+    private_pem, public_jwk = key
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": public_jwk["kid"]})
+
+
+class StandInGoogle:
+    """Serves a JWKS and a tokeninfo endpoint, and counts requests."""
+
+    def __init__(self, keys, cache_control="public, max-age=600, must-revalidate"):
+        self.keys = keys
+        self.cache_control = cache_control
+        self.requests = {"/certs": 0, "/tokeninfo": 0}
+        google = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                google.requests[path] = google.requests.get(path, 0) + 1
+                if path == "/certs":
+                    body = {"keys": [public_jwk for _, public_jwk in google.keys]}
+                    self._send(200, body, {"Cache-Control": google.cache_control})
+                elif path == "/tokeninfo":
+                    token = query.split("id_token=", 1)[1]
+                    claims = jwt.get_unverified_claims(token)
+                    self._send(200, {**{k: str(v) for k, v in claims.items()}, "email_verified": "true"})
+                else:
+                    self._send(404, {})
+
+            def _send(self, code, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_verifier(google, **overrides):
+    return GoogleTokenVerifier(
+        client_id=CLIENT_ID,
+        jwks_uri=f"{google.base_url}/certs",
+        tokeninfo_uri=f"{google.base_url}/tokeninfo",
+        issuers=["accounts.google.com", "https://accounts.google.com"],
+        **{"min_refresh_seconds": 0, **overrides}
+    )
+
+
+class TestGoogleTokenVerifier:
+    """Test local verification and the remote fallback."""
+
+    def test_valid_token_verified_locally_with_one_key_fetch(self):
+        with StandInGoogle([KEY_1]) as google:
+            verifier = make_verifier(google)
+
+            async def run():
+                return [await verifier.verify(make_token(KEY_1)) for _ in range(3)]
+
+            results = asyncio.run(run())
+
+        assert results[0] == {
+            "google_id": "1234567890", "email": "user@example.com", "name": "Test User",
+            "given_name": "Test", "family_name": "User", "picture": None, "email_verified": True
+        }
+        assert google.requests == {"/certs": 1, "/tokeninfo": 0}
+        assert verifier.get_status()["local_verifications"] == 3
+        assert 590 <= verifier.get_status()["keys_expire_in_seconds"] <= 600
+
+    @pytest.mark.parametrize("overrides", [
+        {"aud": "someone-else.apps.googleusercontent.com"},
+        {"iss": "https://evil.example.com"},
+        {"exp": int(time.time()) - 600},
+    ])
+    def test_invalid_claims_rejected(self, overrides):
+        with StandInGoogle([KEY_1]) as google:
+            verifier = make_verifier(google)
+            assert asyncio.run(verifier.verify(make_token(KEY_1, **overrides))) is None
+
+        assert google.requests["/tokeninfo"] == 0
+
+    def test_forged_signature_rejected(self):
+        # Signed with key-2's private key but claiming key-1
+        forged = jwt.encode(jwt.get_unverified_claims(make_token(KEY_1)), KEY_2[0], algorithm="RS256", headers={"kid": "key-1"})
+        with StandInGoogle([KEY_1]) as google:
+            assert asyncio.run(make_verifier(google).verify(forged)) is None
+
+    def test_malformed_token_rejected(self):
+        with StandInGoogle([KEY_1]) as google:
+            assert asyncio.run(make_verifier(google).verify("not-a-jwt")) is None
+
+        assert google.requests == {"/certs": 0, "/tokeninfo": 0}
+
+    def test_unknown_kid_falls_back_to_remote_and_refreshes_keys(self):
+        with StandInGoogle([KEY_1]) as google:
+            verifier = make_verifier(google)
+
+            async def run():
+                await verifier.verify(make_token(KEY_1))
+                google.keys = [KEY_1, KEY_2]  # Google rotates keys
+                first = await verifier.verify(make_token(KEY_2))
+                await verifier._pending_refresh
+                second = await verifier.verify(make_token(KEY_2))
+                return first, second
+
+            first, second = asyncio.run(run())
+
+        assert first["email"] == second["email"] == "user@example.com"
+        assert google.requests == {"/certs": 2, "/tokeninfo": 1}
+        assert verifier.get_status()["remote_verifications"] == 1
+
+    def test_failed_refresh_keeps_cached_keys(self):
+        with StandInGoogle([KEY_1]) as google:
+            verifier = make_verifier(google)
+            asyncio.run(verifier.refresh_keys())
+        # Server is gone
+        assert asyncio.run(verifier.refresh_keys()) is False
+        assert verifier.get_status()["cached_keys"] == 1
+
+    def test_background_refresh_follows_max_age(self):
+        with StandInGoogle([KEY_1], cache_control="public, max-age=1") as google:
+            verifier = make_verifier(google, min_refresh_seconds=0.2)
+
+            async def run():
+                await verifier.start()
+                await asyncio.sleep(1.5)
+                await verifier.stop()
+
+            asyncio.run(run())
+
+        assert google.requests["/certs"] >= 2
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("public, max-age=19845, must-revalidate, no-transform", 19845),
+    ("max-age=60", 60),
+    ("no-cache", 0),
+    ("public", 3600),
+    (None, 3600),
+])
+def test_parse_max_age(header, expected):
+    assert parse_max_age(header, 3600) == expected
@@ -0,0 +1,82 @@
+"""
+Tests for buffered delivery location ingestion (in-memory backend).
+"""
+import uuid
+
+import pytest
+
+from app.services.location_ingest_service import LocationIngestService
+from app.utils.enums import OrderStatus
+
+
+class TestLocationIngest:
+    """Test latest-position tracking and path buffering."""
+
+    def setup_method(self):
+        self.service = LocationIngestService(max_buffer_size=3, min_distance_m=10, use_redis=False)
+        self.partner_id = uuid.uuid4()
+        self.order_id = uuid.uuid4()
+
+    def test_latest_position_is_available_immediately(self):
+        self.service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.52, 73.85)
+        latest = self.service.get_latest(self.partner_id)
+        assert (latest["latitude"], latest["longitude"]) == (18.52, 73.85)
+        assert latest["order_id"] == str(self.order_id)
+
+    def test_stationary_pings_do_not_grow_the_path(self):
+        for _ in range(3):
+            self.service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.52, 73.85)
+        self.service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.53, 73.85)
+
+        status = self.service.get_status()
+        assert status["received"] == 4
+        assert status["skipped"] == 2
+        assert status["buffered_points"] == 2
+        assert status["buffered_partners"] == 1
+
+    def test_full_buffer_requests_a_flush(self):
+        for i in range(3):
+            self.service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.50 + i / 100, 73.85)
+        assert self.service.flush_requested.is_set()
+
+    def test_small_moves_use_unrounded_distance(self):
+        service = LocationIngestService(max_buffer_size=10, min_distance_m=3, use_redis=False)
+        service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.52, 73.85)
+        # About 4.4 m north; rounded to 10 m this used to count as 0 m
+        service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.52004, 73.85)
+
+        assert service.get_status()["buffered_points"] == 2
+
+    def test_failed_flush_keeps_newest_points_and_backs_off(self):
+        # Random order ids can't be written (no database, or no such orders)
+        for i in range(5):
+            self.service.record(self.partner_id, uuid.uuid4(), OrderStatus.PICKED_UP, 18.50 + i / 100, 73.85)
+        with pytest.raises(Exception):
+            self.service.flush()
+
+        status = self.service.get_status()
+        assert status["buffered_points"] == 3
+        assert status["dropped"] == 2
+        assert status["failed_flushes"] == 1
+        # During the backoff full buffers don't request flushes and flushes are skipped
+        self.service.record(self.partner_id, uuid.uuid4(), OrderStatus.PICKED_UP, 18.60, 73.85)
+        assert not self.service.flush_requested.is_set()
+        assert self.service.flush() == 0
+        assert self.service.get_status()["buffered_points"] == 3
+
+    def test_dedupe_state_is_dropped_when_the_order_ends_or_changes_partner(self):
+        other_order = uuid.uuid4()
+        self.service.record(self.partner_id, self.order_id, OrderStatus.PICKED_UP, 18.52, 73.85)
+        self.service.record(self.partner_id, other_order, OrderStatus.PICKED_UP, 18.52, 73.85)
+
+        self.service.sync_order(self.order_id, self.partner_id, OrderStatus.OUT_FOR_DELIVERY)
+        assert str(self.order_id) in self.service._last_point
+
+        self.service.sync_order(self.order_id, self.partner_id, OrderStatus.CANCELLED)
+        self.service.sync_order(other_order, uuid.uuid4(), OrderStatus.PICKED_UP)
+        assert self.service._last_point == {}
+
+    def test_dedupe_state_is_bounded(self):
+        for i in range(5):
+            self.service.record(self.partner_id, uuid.uuid4(), OrderStatus.PICKED_UP, 18.52, 73.85)
+        assert len(self.service._last_point) == 3
@@ -0,0 +1,353 @@
+"""
+Tests for WebSocket fan-out of order events and notifications.
+"""
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.services.websocket_manager import ConnectionManager
+from app.services import order_events
+from app.services.restaurant_feed_service import RestaurantFeedService
+from app.services.websocket_connection import SendMetrics, WebSocketConnection
+from app.utils.cache import TTLCache
+
+
+class FakeWebSocket:
+    """Records messages sent to it; optionally blocks every send."""
+
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed_with = None
+        self._unblocked = asyncio.Event()
+        if not blocked:
+            self._unblocked.set()
+
+    async def send_text(self, text):
+        await self._unblocked.wait()
+        self.sent.append(json.loads(text) if text.startswith("{") else text)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+async def settle():
+    """Let writer tasks drain their queues."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class TestTopicPublish:
+    """Test topic and user delivery on the connection manager."""
+
+    def test_publish_reaches_only_topic_subscribers(self):
+        async def scenario():
+            manager = ConnectionManager()
+            follower, other = FakeWebSocket(), FakeWebSocket()
+            await manager.subscribe("order:1", manager.open(follower))
+            await manager.subscribe("order:2", manager.open(other))
+            delivered = await manager.deliver_local("topic", "order:1", json.dumps({"type": "order_status"}))
+            await settle()
+            return delivered, follower.sent, other.sent
+
+        assert asyncio.run(scenario()) == (1, [{"type": "order_status"}], [])
+
+    def test_notification_reaches_connected_user_through_backplane(self):
+        async def scenario():
+            manager = ConnectionManager()
+            socket = FakeWebSocket()
+            await manager.add_connection("user-1", manager.open(socket))
+            sent = await manager.send_notification("user-1", {"title": "Hi"})
+            offline = await manager.send_notification("user-2", {"title": "Hi"})
+            await settle()
+            return sent, offline, socket.sent
+
+        assert asyncio.run(scenario()) == (True, False, [{"title": "Hi"}])
+
+    def test_notification_reaches_every_session_of_a_user(self):
+        async def scenario():
+            manager = ConnectionManager()
+            phone, tablet = FakeWebSocket(), FakeWebSocket()
+            phone_connection = manager.open(phone)
+            await manager.add_connection("user-1", phone_connection)
+            await manager.add_connection("user-1", manager.open(tablet))
+            delivered = await manager.deliver_local("user", "user-1", json.dumps({"title": "Hi"}))
+
+            await manager.disconnect("user-1", phone_connection)
+            still_connected = await manager.is_user_connected("user-1")
+            await settle()
+            return delivered, phone.sent, tablet.sent, still_connected, manager.get_local_stats()
+
+        delivered, phone_sent, tablet_sent, still_connected, stats = asyncio.run(scenario())
+        assert delivered == 2
+        assert phone_sent == tablet_sent == [{"title": "Hi"}]
+        assert still_connected
+        assert stats["active_connections"] == 1 and stats["connected_users"] == 1
+
+    def test_broadcast_skips_excluded_user(self):
+        async def scenario():
+            manager = ConnectionManager()
+            sender, receiver = FakeWebSocket(), FakeWebSocket()
+            await manager.add_connection("sender", manager.open(sender))
+            await manager.add_connection("receiver", manager.open(receiver))
+            delivered = await manager.deliver_local("broadcast", "sender", json.dumps({"type": "announcement"}))
+            await settle()
+            return delivered, sender.sent
+
+        assert asyncio.run(scenario()) == (1, [])
+
+    def test_unsubscribe_drops_empty_topics(self):
+        async def scenario():
+            manager = ConnectionManager()
+            connection = manager.open(FakeWebSocket())
+            await manager.subscribe("order:1", connection)
+            await manager.unsubscribe("order:1", connection)
+            return manager.topic_subscribers
+
+        assert "order:1" not in asyncio.run(scenario())
+
+    def test_rider_location_is_pushed_to_order_followers(self, monkeypatch):
+        manager = ConnectionManager()
+        monkeypatch.setattr(order_events, "manager", manager)
+        order_id = uuid.uuid4()
+        socket = FakeWebSocket()
+
+        async def scenario():
+            await manager.subscribe(order_events.order_topic(order_id), manager.open(socket))
+            order_events.rider_location_updated(order_id, {"latitude": 18.5, "longitude": 73.8})
+            await settle()
+
+        asyncio.run(scenario())
+        assert socket.sent[0]["type"] == "rider_location"
+        assert socket.sent[0]["latitude"] == 18.5
+
+
+    def test_feed_append_runs_off_the_event_loop(self, monkeypatch):
+        import threading
+        from app.infra.db.postgres.models.order import Order
+
+        manager = ConnectionManager()
+        feed = RestaurantFeedService(use_redis=False)
+        append_threads = []
+        original_append = feed.append
+
+        def append(restaurant_id, event):
+            append_threads.append(threading.current_thread())
+            return original_append(restaurant_id, event)
+
+        monkeypatch.setattr(feed, "append", append)
+        monkeypatch.setattr(order_events, "manager", manager)
+        monkeypatch.setattr(order_events, "restaurant_feed_service", feed)
+        order = Order(order_id=uuid.uuid4(), restaurant_id=uuid.uuid4(), order_number="ORD-1", order_status="pending")
+        socket = FakeWebSocket()
+
+        async def scenario():
+            await manager.backplane.start(manager.get_local_stats)
+            await manager.subscribe(order_events.restaurant_topic(order.restaurant_id), manager.open(socket))
+            order_events.order_created(None, order)
+            await asyncio.wrap_future(order_events._feed_executor.submit(lambda: None))
+            await settle()
+
+        asyncio.run(scenario())
+        assert append_threads and append_threads[0] is not threading.main_thread()
+        assert socket.sent[0]["type"] == "order_created"
+        assert socket.sent[0]["seq"] == 1
+
+
+class TestRedisBackplane:
+    """Test topic publishing across workers (skipped without Redis)."""
+
+    def test_topics_without_subscribers_are_not_published(self):
+        from app.infra.redis.repositories.redis_repositories import get_redis_client
+        from app.services.websocket_backplane import RedisBackplane
+
+        if get_redis_client() is None:
+            pytest.skip("Redis not reachable — skipping WebSocket backplane test")
+
+        async def scenario():
+            received = []
+
+            async def handler(kind, key, payload):
+                received.append((kind, key))
+                return 1
+
+            backplane = RedisBackplane(handler)
+            await backplane.start(lambda: {})
+            topic = f"order:{uuid.uuid4()}"
+            try:
+                await asyncio.sleep(0.2)
+                backplane.publish("topic", topic, {"n": 1})
+                await asyncio.sleep(0.2)
+                await backplane.register_topic(topic)
+                backplane.publish("topic", topic, {"n": 2})
+                user_online = await backplane.is_user_online("nobody")
+                await asyncio.sleep(0.2)
+            finally:
+                await backplane.unregister_topic(topic)
+                await backplane.stop()
+            return topic, received, backplane.get_status()["skipped_topics"], user_online
+
+        topic, received, skipped, user_online = asyncio.run(scenario())
+        assert received == [("topic", topic)]
+        assert skipped == 1
+        assert user_online is False
+
+
+class TestSlowConsumers:
+    """Test per-connection send queues and the slow-consumer policies."""
+
+    def test_slow_client_does_not_delay_others(self):
+        async def scenario():
+            manager = ConnectionManager()
+            slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+            await manager.subscribe("restaurant:1", manager.open(slow))
+            await manager.subscribe("restaurant:1", manager.open(fast))
+            await manager.deliver_local("topic", "restaurant:1", json.dumps({"seq": 1}))
+            await settle()
+            return slow.sent, fast.sent
+
+        assert asyncio.run(scenario()) == ([], [{"seq": 1}])
+
+    def test_full_queue_disconnects_by_default(self):
+        async def scenario():
+            socket = FakeWebSocket(blocked=True)
+            connection = WebSocketConnection(socket, SendMetrics(), max_queue=2)
+            connection.start()
+            await settle()
+            # The writer takes the first message and blocks sending it
+            results = [connection.send_text("m")]
+            await settle()
+            results += [connection.send_text("m") for _ in range(3)]
+            await settle()
+            return results, connection.closed, socket.closed_with, connection.metrics.slow_disconnects
+
+        results, closed, code, slow_disconnects = asyncio.run(scenario())
+        assert results[:3] == [True, True, True]
+        assert results[3] is False
+        assert closed and code == 1008 and slow_disconnects == 1
+
+    def test_drop_policy_keeps_newest_messages(self):
+        async def scenario():
+            socket = FakeWebSocket(blocked=True)
+            connection = WebSocketConnection(socket, SendMetrics(), max_queue=2, slow_consumer_policy="drop")
+            connection.start()
+            await settle()
+            connection.send_text("0")
+            await settle()
+            for i in range(1, 5):
+                connection.send_text(str(i))
+            socket._unblocked.set()
+            await settle()
+            return socket.sent, connection.metrics.dropped
+
+        sent, dropped = asyncio.run(scenario())
+        # The writer already holds "0"; the queue keeps the two newest
+        assert sent == ["0", "3", "4"]
+        assert dropped == 2
+
+
+class TestTTLCache:
+    """Test the in-process TTL cache."""
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1, ttl=0)
+        assert cache.get("a") is None
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+
+
+class TestRestaurantFeed:
+    """Test sequencing and resume of the restaurant order feed (in-memory backend)."""
+
+    def setup_method(self):
+        self.feed = RestaurantFeedService(max_events=3, use_redis=False)
+        self.restaurant_id = uuid.uuid4()
+
+    def test_sequences_are_per_restaurant(self):
+        assert self.feed.append(self.restaurant_id, {"type": "order_created"}) == 1
+        assert self.feed.append(self.restaurant_id, {"type": "order_status"}) == 2
+        assert self.feed.append(uuid.uuid4(), {"type": "order_created"}) == 1
+        assert self.feed.current_sequence(self.restaurant_id) == 2
+
+    def test_resume_returns_missed_events(self):
+        for i in range(3):
+            self.feed.append(self.restaurant_id, {"type": "order_status", "n": i})
+
+        events, complete = self.feed.events_since(self.restaurant_id, 1)
+        assert complete
+        assert [e["seq"] for e in events] == [2, 3]
+
+        assert self.feed.events_since(self.restaurant_id, 3) == ([], True)
+
+    def test_resume_past_retention_is_incomplete(self):
+        for i in range(5):
+            self.feed.append(self.restaurant_id, {"type": "order_status", "n": i})
+
+        events, complete = self.feed.events_since(self.restaurant_id, 0)
+        assert not complete
+        assert [e["seq"] for e in events] == [3, 4, 5]
+
+    def test_unknown_future_sequence_is_incomplete(self):
+        self.feed.append(self.restaurant_id, {"type": "order_created"})
+        assert self.feed.events_since(self.restaurant_id, 7) == ([], False)
+
+
+def seed_principal(user_id, user_status):
+    from app.infra.db.postgres.models.user import User
+    from app.services.principal_cache_service import principal_cache_service
+
+    principal_cache_service.store(User(
+        user_id=uuid.UUID(user_id), role="customer", status=user_status,
+        email=f"{user_id}@example.com", phone="0000000000", first_name="Test", last_name="User"
+    ))
+
+
+class TestNotificationSocket:
+    """Test the notification WebSocket endpoint with several sessions per user."""
+
+    def test_user_can_connect_from_two_devices(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.services.websocket_manager import manager as websocket_manager
+        from app.utils.auth_utils import AuthUtils
+
+        user_id = str(uuid.uuid4())
+        # Pre-seed the principal cache so no database is needed
+        seed_principal(user_id, "active")
+        token = AuthUtils.generate_jwt_token(user_id, "customer")
+        client = TestClient(app)
+
+        url = f"/api/v1/ws/notifications?token={token}"
+        with client.websocket_connect(url) as phone, client.websocket_connect(url) as tablet:
+            assert phone.receive_json()["type"] == "connection"
+            assert tablet.receive_json()["type"] == "connection"
+            assert len(websocket_manager.user_connections[user_id]) == 2
+
+            phone.send_text("ping")
+            assert phone.receive_text() == "pong"
+
+        assert user_id not in websocket_manager.user_connections
+
+    def test_inactive_user_is_rejected(self):
+        from fastapi.testclient import TestClient
+        from starlette.websockets import WebSocketDisconnect
+        from app.main import app
+        from app.utils.auth_utils import AuthUtils
+
+        user_id = str(uuid.uuid4())
+        seed_principal(user_id, "suspended")
+        token = AuthUtils.generate_jwt_token(user_id, "customer")
+
+        with TestClient(app).websocket_connect(f"/api/v1/ws/notifications?token={token}") as ws:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert closed.value.code == 1008
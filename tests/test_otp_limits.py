@@ -0,0 +1,106 @@
+"""
+Tests for OTP send limits, verification attempt counters and lockouts.
+"""
+import uuid
+
+import pytest
+
+from app.infra.db.postgres.models.pending_user import PendingUser
+from app.services.otp_limiter_service import OTPLimiterService
+from app.utils import otp_utils, pending_user_utils
+from app.utils.otp_utils import OTPUtils
+from app.utils.pending_user_utils import PendingUserUtils
+
+
+@pytest.fixture()
+def limiter(monkeypatch):
+    limiter = OTPLimiterService(use_redis=False)
+    monkeypatch.setattr(otp_utils, "otp_limiter_service", limiter)
+    monkeypatch.setattr(pending_user_utils, "otp_limiter_service", limiter)
+    return limiter
+
+
+class TestOTPLimiter:
+    """Test windowed counters."""
+
+    def test_hits_beyond_limit_are_rejected(self, limiter):
+        results = [limiter.hit("send", "user@example.com", 3, window_seconds=60) for _ in range(4)]
+
+        assert [r["allowed"] for r in results] == [True, True, True, False]
+        assert [r["remaining"] for r in results] == [2, 1, 0, 0]
+        assert 0 < results[-1]["retry_after"] <= 60
+
+    def test_identifiers_are_normalised(self, limiter):
+        limiter.hit("send", "User@Example.com", 1, window_seconds=60)
+
+        assert limiter.hit("send", " user@example.com", 1, window_seconds=60)["allowed"] is False
+
+    def test_lockout_restarts_window_at_limit(self, limiter):
+        limiter.hit("send", "a@example.com", 2, window_seconds=5)
+        result = limiter.hit("send", "a@example.com", 2, window_seconds=5, lockout_seconds=600)
+
+        assert result["retry_after"] == 600
+        assert limiter.peek("send", "a@example.com", 2)["retry_after"] > 5
+
+    def test_peek_and_reset(self, limiter):
+        limiter.hit("verify", "otp-1", 1, window_seconds=60)
+
+        assert limiter.peek("verify", "otp-1", 1)["allowed"] is False
+        limiter.reset("verify", "otp-1")
+        assert limiter.peek("verify", "otp-1", 1) == {
+            "count": 0, "limit": 1, "remaining": 1, "allowed": True, "retry_after": 0
+        }
+
+
+class TestOTPUtilsLimits:
+    """Test OTP send limits and code hashing."""
+
+    def test_send_limit_per_identifier_and_type(self, limiter):
+        sends = [OTPUtils.check_send_rate_limit(email="u@example.com") for _ in range(OTPUtils.MAX_SEND_ATTEMPTS + 1)]
+
+        assert [s["can_send"] for s in sends][-2:] == [True, False]
+        assert sends[-1]["total_attempts"] == OTPUtils.MAX_SEND_ATTEMPTS
+        assert OTPUtils.check_send_rate_limit(email="u@example.com", otp_type="password_reset")["can_send"] is True
+
+    def test_verify_without_email_or_phone_is_rejected(self, limiter):
+        # Rejected before any query runs, so no database session is needed
+        result = OTPUtils.verify_otp(None, "123456")
+
+        assert result["error_code"] == "INVALID_OTP"
+
+    def test_otp_hash_is_keyed_and_stable(self):
+        code = OTPUtils.generate_otp()
+
+        assert OTPUtils.hash_otp(code) == OTPUtils.hash_otp(code)
+        assert len(OTPUtils.hash_otp(code)) == 64
+        assert code not in OTPUtils.hash_otp(code)
+
+
+class TestPendingUserLockout:
+    """Test the pending user OTP request lockout."""
+
+    def make_pending_user(self):
+        return PendingUser(
+            pending_user_id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com",
+            max_otp_attempts=3, lockout_duration_minutes=10
+        )
+
+    def test_locked_after_max_requests(self, limiter):
+        pending_user = self.make_pending_user()
+
+        statuses = [PendingUserUtils.increment_otp_attempts(pending_user) for _ in range(4)]
+
+        assert [s["allowed"] for s in statuses] == [True, True, True, False]
+        assert [s["is_locked"] for s in statuses] == [False, False, True, True]
+        lockout = PendingUserUtils.check_otp_lockout_status(pending_user)
+        assert lockout["is_locked"] is True
+        assert 540 < lockout["remaining_seconds"] <= 600
+
+    def test_reset_clears_lockout(self, limiter):
+        pending_user = self.make_pending_user()
+        for _ in range(3):
+            PendingUserUtils.increment_otp_attempts(pending_user)
+
+        PendingUserUtils.reset_otp_attempts(pending_user)
+
+        assert PendingUserUtils.check_otp_lockout_status(pending_user)["is_locked"] is False
@@ -0,0 +1,26 @@
+"""
+Tests for keyset pagination cursors.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+class TestCursor:
+    """Test cursor encoding used by the notification inbox."""
+
+    def test_round_trip(self):
+        created_at = datetime(2026, 10, 19, 8, 30, 15, 123456)
+        row_id = uuid.uuid4()
+        cursor = encode_cursor(created_at, row_id)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (created_at, row_id)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2026, 1, 1), uuid.uuid4())[:-4]])
+    def test_malformed_cursor_is_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
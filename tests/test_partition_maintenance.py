@@ -0,0 +1,40 @@
+"""
+Tests for monthly partition planning used by notification retention.
+"""
+from datetime import date
+
+import pytest
+
+from app.services.partition_maintenance_service import PartitionMaintenanceService, add_months
+
+TABLE = "core_mstr_one_qlick_notifications_tbl"
+
+
+class TestPartitionPlanning:
+    """Test which partitions are created and expired."""
+
+    def test_add_months_crosses_years(self):
+        assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert add_months(date(2026, 2, 1), -6) == date(2025, 8, 1)
+
+    def test_upcoming_months_include_current_month(self):
+        service = PartitionMaintenanceService(TABLE, premake_months=3)
+
+        months = service.upcoming_months(date(2026, 10, 19))
+
+        assert [service.partition_name(m) for m in months] == [
+            f"{TABLE}_p202610", f"{TABLE}_p202611", f"{TABLE}_p202612", f"{TABLE}_p202701",
+        ]
+
+    def test_expired_partitions_keep_retention_window(self):
+        service = PartitionMaintenanceService(TABLE, retention_months=6)
+        partitions = [f"{TABLE}_p2026{m:02d}" for m in range(1, 13)] + [f"{TABLE}_default", f"{TABLE}_p2025_old"]
+
+        expired = service.expired_partitions(partitions, date(2026, 10, 19))
+
+        # April 2026 onwards is kept; unrecognised partitions are never touched
+        assert expired == [f"{TABLE}_p2026{m:02d}" for m in range(1, 4)]
+
+    def test_unknown_expire_action_is_rejected(self):
+        with pytest.raises(ValueError):
+            PartitionMaintenanceService(TABLE, expire_action="truncate")
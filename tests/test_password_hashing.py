@@ -0,0 +1,73 @@
+"""
+Tests for the bounded bcrypt pool used by login, signup and password changes.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.password_hash_service import PasswordHashService
+
+
+class TestPasswordHashService:
+    """Test off-loop hashing and admission control."""
+
+    def test_hash_and_verify(self):
+        service = PasswordHashService(max_workers=1, max_pending=4)
+
+        async def run():
+            hashed = await service.hash("s3cret-pass")
+            return hashed, await service.verify("s3cret-pass", hashed), await service.verify("wrong", hashed)
+
+        hashed, good, bad = asyncio.run(run())
+
+        assert hashed.startswith("$2")
+        assert (good, bad) == (True, False)
+        assert service.get_status()["completed"] == 3
+        service.shutdown()
+
+    def test_event_loop_stays_responsive(self):
+        service = PasswordHashService(max_workers=1, max_pending=4)
+        ticks = []
+
+        async def ticker(stop):
+            while not stop.is_set():
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+
+        async def run():
+            stop = asyncio.Event()
+            task = asyncio.create_task(ticker(stop))
+            await service.hash("s3cret-pass")
+            stop.set()
+            await task
+
+        asyncio.run(run())
+
+        # bcrypt takes well over 5ms; the loop kept ticking meanwhile
+        assert len(ticks) > 1
+        service.shutdown()
+
+    def test_rejects_when_saturated(self):
+        service = PasswordHashService(max_workers=1, max_pending=2, retry_after_seconds=3)
+        release = threading.Event()
+
+        async def run():
+            blocked = [asyncio.ensure_future(service._submit(release.wait)) for _ in range(2)]
+            while service.get_status()["running"] < 1:
+                await asyncio.sleep(0.001)
+            with pytest.raises(HTTPException) as rejected:
+                await service.hash("s3cret-pass")
+            status = service.get_status()
+            release.set()
+            await asyncio.gather(*blocked)
+            return rejected.value, status
+
+        error, status = asyncio.run(run())
+
+        assert error.status_code == 503
+        assert error.headers["Retry-After"] == "3"
+        assert (status["running"], status["queued"], status["rejected"]) == (1, 1, 1)
+        assert service.get_status()["queued"] == 0
+        service.shutdown()
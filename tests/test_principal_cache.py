@@ -0,0 +1,77 @@
+"""
+Tests for the principal cache used by API and WebSocket authentication.
+"""
+import uuid
+
+import pytest
+
+from app.infra.db.postgres.models.user import User
+from app.services.principal_cache_service import Principal, PrincipalCacheService
+
+
+def make_user(**overrides):
+    fields = dict(
+        user_id=uuid.uuid4(), role="customer", status="active", email="user@example.com",
+        phone="9999999999", first_name="Test", last_name="User", loyalty_points=40
+    )
+    fields.update(overrides)
+    return User(**fields)
+
+
+class TestPrincipalCache:
+    """Test caching and invalidation of principals."""
+
+    def setup_method(self):
+        self.cache = PrincipalCacheService(use_redis=False)
+
+    def test_cached_principal_is_served_without_database(self):
+        user = make_user()
+        self.cache.store(user)
+
+        # No session: any database access would raise
+        principal = self.cache.resolve(None, str(user.user_id))
+
+        assert principal.user_id == user.user_id
+        assert (principal.role, principal.status, principal.email) == ("customer", "active", "user@example.com")
+        assert self.cache.loads == 0
+
+    def test_invalidate_drops_entry(self):
+        user = make_user()
+        self.cache.store(user)
+
+        self.cache.invalidate(user.user_id)
+
+        assert self.cache.get_cached(str(user.user_id)) is None
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = PrincipalCacheService(enabled=False, use_redis=False)
+        user = make_user()
+        cache.store(user)
+
+        assert cache.get_cached(str(user.user_id)) is None
+
+    @pytest.mark.parametrize("user_id", [None, "", "not-a-uuid"])
+    def test_malformed_user_id_resolves_to_none(self, user_id):
+        assert self.cache.resolve(None, user_id) is None
+
+
+class TestPrincipal:
+    """Test the principal's fallback to the full User row."""
+
+    def test_uncached_attribute_needs_the_user_row(self):
+        principal = Principal({"user_id": uuid.uuid4(), "role": "customer"})
+
+        assert principal.role == "customer"
+        with pytest.raises(RuntimeError):
+            principal.loyalty_points
+
+    def test_loaded_user_takes_over_reads_and_writes(self):
+        user = make_user()
+        principal = Principal(PrincipalCacheService._to_data(user), user=user)
+
+        principal.first_name = "Changed"
+
+        assert user.first_name == "Changed"
+        assert principal.first_name == "Changed"
+        assert principal.loyalty_points == 40
+        assert principal == user
@@ -0,0 +1,212 @@
+"""
+Tests for the Expo push client against a local fake push server.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.push_notification_service import ExpoPushClient, PushNotificationService
+from app.services.push_outbox_service import PushOutboxService
+from app.utils.enums import PushOutboxStatus
+
+
+class FakeExpoServer:
+    """Answers Expo push requests with one ticket per message."""
+
+    def __init__(self, failures=0, failure_status=500, delay=0.0):
+        self.failures = failures
+        self.failure_status = failure_status
+        self.delay = delay
+        self.batches = []
+        self.receipts = {}
+        self.receipt_requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path.endswith("/getReceipts"):
+                    fake.receipt_requests.append(body["ids"])
+                    return self._reply({"data": {i: fake.receipts[i] for i in body["ids"] if i in fake.receipts}})
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    failing = fake.failures > 0
+                    if failing:
+                        fake.failures -= 1
+                    else:
+                        fake.batches.append(body)
+                time.sleep(fake.delay)
+                with fake._lock:
+                    fake.in_flight -= 1
+
+                if failing:
+                    self.send_response(fake.failure_status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._reply({"data": [{"status": "ok", "id": m["to"]} for m in body]})
+
+            def _reply(self, body):
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/push/send"
+        self.receipts_url = f"http://127.0.0.1:{self.server.server_port}/push/getReceipts"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def messages(count):
+    return [{"to": f"ExponentPushToken[{i}]", "title": "Hi", "body": "Hello"} for i in range(count)]
+
+
+def send(client, count):
+    async def scenario():
+        try:
+            return await client.send(messages(count))
+        finally:
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+class TestExpoPushClient:
+    """Test batching, concurrency, retries and timeouts."""
+
+    def test_messages_are_sent_in_batches_of_100(self):
+        with FakeExpoServer(delay=0.05) as server:
+            client = ExpoPushClient(push_url=server.url, max_concurrency=2)
+            result = send(client, 250)
+
+        assert sorted(len(batch) for batch in server.batches) == [50, 100, 100]
+        assert server.max_in_flight == 2
+        assert result["success"] and result["sent_count"] == 250 and result["failed_count"] == 0
+        # Tickets line up with the messages they answer
+        assert [ticket["id"] for ticket in result["tickets"]] == [m["to"] for m in messages(250)]
+
+    def test_server_errors_are_retried(self):
+        with FakeExpoServer(failures=2, failure_status=503) as server:
+            client = ExpoPushClient(push_url=server.url, max_retries=3, retry_backoff_seconds=0.01)
+            result = send(client, 3)
+
+        assert result["success"] and result["sent_count"] == 3
+        assert len(server.batches) == 1
+
+    def test_client_errors_are_not_retried(self):
+        with FakeExpoServer(failures=5, failure_status=400) as server:
+            client = ExpoPushClient(push_url=server.url, max_retries=3, retry_backoff_seconds=0.01)
+            result = send(client, 2)
+
+        assert server.failures == 4
+        assert not result["success"] and result["failed_count"] == 2
+        assert [ticket["status"] for ticket in result["tickets"]] == ["error", "error"]
+
+    def test_slow_server_times_out(self):
+        with FakeExpoServer(delay=0.5) as server:
+            client = ExpoPushClient(push_url=server.url, timeout_seconds=0.1, max_retries=1, retry_backoff_seconds=0.01)
+            started = time.monotonic()
+            result = send(client, 1)
+
+        assert time.monotonic() - started < 1.0
+        assert not result["success"]
+        assert "Timeout" in result["errors"][0]
+
+    def test_no_tokens_sends_nothing(self):
+        result = asyncio.run(PushNotificationService.send_push_notification([], "Hi", "Hello"))
+        assert result == {"success": False, "error": "No tokens"}
+
+    def test_receipts_are_fetched_in_batches_of_1000(self):
+        with FakeExpoServer() as server:
+            server.receipts = {f"ticket-{i}": {"status": "ok"} for i in range(1500)}
+            client = ExpoPushClient(push_url=server.url, receipts_url=server.receipts_url)
+
+            async def scenario():
+                try:
+                    return await client.get_receipts([f"ticket-{i}" for i in range(1600)])
+                finally:
+                    await client.close()
+
+            receipts = asyncio.run(scenario())
+
+        assert sorted(len(ids) for ids in server.receipt_requests) == [600, 1000]
+        assert len(receipts) == 1500
+
+
+class TestPushOutboxOutcomes:
+    """Test how tickets and receipts settle outbox rows (database writes captured)."""
+
+    def setup_method(self):
+        self.service = PushOutboxService(max_attempts=3, retry_base_seconds=10)
+        self.applied = []
+        self.service._apply = lambda db, outcomes, sent, dead: self.applied.append((outcomes, sent, dead))
+
+    @staticmethod
+    def row(token, attempts=1, **extra):
+        return {"outbox_id": token, "push_token": token, "attempts": attempts, **extra}
+
+    def test_tickets_settle_rows(self):
+        claimed = [self.row("ok"), self.row("gone"), self.row("busy", attempts=2), self.row("busy-last", attempts=3)]
+        tickets = [
+            {"status": "ok", "id": "ticket-1"},
+            {"status": "error", "message": "not registered", "details": {"error": "DeviceNotRegistered"}},
+            {"status": "error", "message": "slow down", "details": {"error": "MessageRateExceeded"}},
+            {"status": "error", "message": "slow down", "details": {"error": "MessageRateExceeded"}},
+        ]
+
+        counts = self.service.record_tickets(None, claimed, tickets)
+
+        outcomes, sent_tokens, dead_tokens = self.applied[0]
+        by_token = {outcome["b_outbox_id"]: outcome for outcome in outcomes}
+        assert by_token["ok"]["b_status"] == PushOutboxStatus.SENT.value
+        assert by_token["ok"]["b_ticket_id"] == "ticket-1"
+        assert by_token["gone"]["b_status"] == PushOutboxStatus.FAILED.value
+        assert by_token["busy"]["b_status"] == PushOutboxStatus.PENDING.value
+        assert by_token["busy"]["b_delay"].total_seconds() == 20
+        assert by_token["busy-last"]["b_status"] == PushOutboxStatus.FAILED.value
+        assert sent_tokens == ["ok"] and dead_tokens == ["gone"]
+        assert counts == {"sent": 1, "retried": 1, "failed": 2}
+
+    def test_receipts_settle_rows(self):
+        rows = [
+            self.row("delivered", ticket_id="t1", receipt_expired=False),
+            self.row("gone", ticket_id="t2", receipt_expired=False),
+            self.row("waiting", ticket_id="t3", receipt_expired=False),
+            self.row("expired", ticket_id="t4", receipt_expired=True),
+        ]
+        receipts = {
+            "t1": {"status": "ok"},
+            "t2": {"status": "error", "message": "not registered", "details": {"error": "DeviceNotRegistered"}},
+        }
+
+        counts = self.service.record_receipts(None, rows, receipts)
+
+        outcomes, _, dead_tokens = self.applied[0]
+        statuses = {outcome["b_outbox_id"]: outcome["b_status"] for outcome in outcomes}
+        assert statuses == {
+            "delivered": PushOutboxStatus.DELIVERED.value,
+            "gone": PushOutboxStatus.FAILED.value,
+            "waiting": PushOutboxStatus.SENT.value,
+            "expired": PushOutboxStatus.UNCONFIRMED.value,
+        }
+        assert dead_tokens == ["gone"]
+        assert counts == {"delivered": 1, "failed": 1, "retried": 0, "waiting": 1}
@@ -0,0 +1,422 @@
+"""
+Tests for the rate limiter: GCRA limits, route limit resolution, the Redis
+script when a Redis server is reachable, and the failure policy when Redis
+is unreachable or does not answer.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi import FastAPI, Request
+
+from app.infra.redis.repositories.redis_repositories import get_redis_client
+from app.utils.rate_limiter import MemoryStorage, RateLimiter, RedisStorage, rate_limit
+
+
+def make_request(path="/api/v1/restaurants", ip="10.0.0.1", app=None):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "root_path": "", "query_string": b"",
+        "headers": [], "client": (ip, 50000), "server": ("testserver", 80), "scheme": "http", "app": app
+    })
+
+
+class SilentRedis:
+    """Accepts connections and never answers, like a Redis stuck under load."""
+
+    def __init__(self):
+        self.connections = 0
+        self._writers = []
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        await reader.read()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        for writer in self._writers:
+            writer.close()
+        self.server.close()
+
+
+def silent_redis_storage(port, **overrides):
+    return RedisStorage(**{"timeout_ms": 100, "failure_threshold": 3, "retry_seconds": 60, **overrides},
+                        host="127.0.0.1", port=port, password=None, ssl=False)
+
+
+class TestRateLimiter:
+    """Test GCRA limits with the in-memory backend."""
+
+    def test_burst_of_limit_then_rejected(self):
+        limiter = RateLimiter(storage=MemoryStorage(), global_limit=None)
+
+        async def run():
+            return [await limiter.check_rate_limit(make_request(), [(3, 60, False)]) for _ in range(4)]
+
+        results = asyncio.run(run())
+
+        assert [r["allowed"] for r in results] == [True, True, True, False]
+        assert [r["remaining"] for r in results] == [2, 1, 0, 0]
+        # One request's worth of quota (60s / 3) refills before the next is admitted
+        assert 19 <= results[-1]["retry_after"] <= 20
+        assert limiter.get_rate_limit_headers(results[-1])["Retry-After"] == str(results[-1]["retry_after"])
+
+    def test_quota_refills_smoothly(self):
+        storage = MemoryStorage()
+        # 2 per second: interval 500ms, burst 1000ms
+        limits = [("key", 500, 1000, 0)]
+
+        async def run(now):
+            return (await storage.acquire(limits, now))[0]
+
+        assert [asyncio.run(run(0))[0] for _ in range(3)] == [True, True, False]
+        # Half a second later exactly one more request fits
+        assert asyncio.run(run(500))[0] is True
+        assert asyncio.run(run(500))[0] is False
+
+    def test_rejection_by_one_limit_consumes_no_quota(self):
+        storage = MemoryStorage()
+        tight, loose = ("tight", 60000, 60000, 0), ("loose", 1000, 100000, 0)
+
+        async def run():
+            first = await storage.acquire([tight, loose], 0)
+            second = await storage.acquire([tight, loose], 0)
+            return first, second, await storage.acquire([loose], 0)
+
+        first, second, loose_only = asyncio.run(run())
+
+        assert [r[0] for r in first] == [True, True]
+        assert [r[0] for r in second] == [False, True]
+        # The rejected request did not count against the loose limit
+        assert loose_only[0][1] == first[1][1] - 1
+
+    def test_global_and_route_limits_checked_together(self):
+        limiter = RateLimiter(storage=MemoryStorage(), global_limit=2)
+
+        async def run():
+            results = [
+                await limiter.check_rate_limit(make_request(path=f"/api/v1/{i}"), [(10, 60, False)])
+                for i in range(3)
+            ]
+            return results
+
+        results = asyncio.run(run())
+
+        # The global limit is per IP across paths; route limits are per path
+        assert [r["allowed"] for r in results] == [True, True, False]
+        assert results[-1]["scope"] == "global"
+        assert limiter.exceeded_response(results[-1]).status_code == 429
+
+    def test_whitelisted_ip_not_limited(self):
+        limiter = RateLimiter(storage=MemoryStorage())
+
+        result = asyncio.run(limiter.check_rate_limit(make_request(ip="127.0.0.1"), [(1, 60, False)]))
+
+        assert result is None
+
+
+class TestMemoryStorage:
+    """Test expiry and the key cap of the in-memory backend."""
+
+    def test_entries_expire_once_refilled(self):
+        storage = MemoryStorage()
+
+        async def run():
+            await storage.acquire([("a", 1000, 2000, 0)], 0)
+            await storage.acquire([("b", 1000, 2000, 0), ("c", 5000, 10000, 0)], 0)
+            await storage.acquire([], 1000)
+            after_1s = set(storage._storage)
+            await storage.acquire([], 5000)
+            return after_1s, set(storage._storage)
+
+        after_1s, after_5s = asyncio.run(run())
+
+        assert after_1s == {"c"}
+        assert after_5s == set()
+
+    def test_least_recently_used_evicted_beyond_cap(self):
+        storage = MemoryStorage(max_keys=3)
+
+        async def run():
+            for key in ["a", "b", "c"]:
+                await storage.acquire([(key, 1000, 60000, 0)], 0)
+            await storage.acquire([("a", 1000, 60000, 0)], 1)
+            await storage.acquire([("d", 1000, 60000, 0)], 2)
+
+        asyncio.run(run())
+
+        assert list(storage._storage) == ["c", "a", "d"]
+        assert storage.get_status()["memory_evicted"] == 1
+
+    def test_store_stays_bounded_under_many_clients(self):
+        storage = MemoryStorage(max_keys=1000)
+        limits = [("hot", 10, 1000000, 0)]
+
+        async def run():
+            for i in range(20000):
+                await storage.acquire([(f"scan-{i}", 1000, 60000, 0)] + limits, i)
+
+        asyncio.run(run())
+
+        assert len(storage._storage) == 1000
+        assert len(storage._expiry) <= 2 * 1000 + 64
+        # The hot key is used on every call and never evicted
+        assert "hot" in storage._storage
+
+
+class TestLocalTier:
+    """Test admitting requests locally and syncing them to the storage."""
+
+    def make_limiter(self, storage):
+        return RateLimiter(
+            storage=storage, global_limit=None, local_tier=True, local_reserve_ratio=0.5, local_workers=1
+        )
+
+    def test_requests_under_reserve_admitted_locally(self):
+        storage = MemoryStorage()
+        limiter = self.make_limiter(storage)
+
+        async def run():
+            return [await limiter.check_rate_limit(make_request(), [(100, 60, False)]) for _ in range(60)]
+
+        results = asyncio.run(run())
+        status = limiter.get_status()
+
+        assert all(r["allowed"] for r in results)
+        # The first request leases 99 - 50 reserve = 49, admitted locally.
+        # From there on only the reserve is left, so every request is checked
+        # in the storage.
+        assert status["admitted_locally"] == 49
+        assert status["checked_in_storage"] == 11
+        assert [r["remaining"] for r in results[:3]] == [99, 98, 97]
+        assert results[50]["remaining"] == 49
+
+    def test_leased_quota_is_counted_and_returned_when_idle(self):
+        storage = MemoryStorage()
+        limiter = self.make_limiter(storage)
+        limits = [(100, 60, False)]
+
+        async def remaining_seen_by_other_worker():
+            key = next(iter(storage._storage))
+            return (await storage.acquire([(key, 600, 60000, 0)], int(time.time() * 1000), cost=0))[0][1]
+
+        async def run():
+            for _ in range(11):
+                await limiter.check_rate_limit(make_request(), limits)
+            leased = await remaining_seen_by_other_worker()
+            # The first sync marks the key idle, the second returns its lease
+            await limiter.sync()
+            await limiter.sync()
+            return leased, await remaining_seen_by_other_worker()
+
+        leased, returned = asyncio.run(run())
+
+        # 1 request plus the 49 leased are booked up front
+        assert leased == 50
+        # Only the 11 admitted requests remain counted
+        assert returned == 89
+        assert limiter.get_status()["local_keys"] == 0
+
+    def test_workers_sharing_storage_stay_within_limit(self):
+        storage = MemoryStorage()
+        workers = [
+            RateLimiter(storage=storage, global_limit=None, local_tier=True, local_reserve_ratio=0.2, local_workers=2)
+            for _ in range(2)
+        ]
+        limits = [(100, 60, False)]
+
+        async def admit(limiter):
+            return (await limiter.check_rate_limit(make_request(), limits))["allowed"]
+
+        async def run():
+            admitted = [await admit(limiter) for limiter in workers]
+            # Each worker spends its whole lease before the other is checked again
+            for limiter in workers:
+                while next(iter(limiter._local.values())).allowance:
+                    admitted.append(await admit(limiter))
+            for i in range(200):
+                admitted.append(await admit(workers[i % 2]))
+            return admitted
+
+        admitted = asyncio.run(run())
+
+        assert sum(admitted) == 100
+        assert all(limiter.get_status()["admitted_locally"] > 0 for limiter in workers)
+
+    def test_unused_keys_dropped_on_sync(self):
+        limiter = self.make_limiter(MemoryStorage())
+
+        async def run():
+            await limiter.check_rate_limit(make_request(), [(100, 60, False)])
+            await limiter.sync()
+            keys_after_use = limiter.get_status()["local_keys"]
+            await limiter.sync()
+            return keys_after_use, limiter.get_status()["local_keys"]
+
+        assert asyncio.run(run()) == (1, 0)
+
+    def test_small_limits_always_checked_in_storage(self):
+        limiter = self.make_limiter(MemoryStorage())
+
+        async def run():
+            return [await limiter.check_rate_limit(make_request(), [(3, 60, False)]) for _ in range(4)]
+
+        results = asyncio.run(run())
+
+        assert [r["allowed"] for r in results] == [True, True, True, False]
+        assert limiter.get_status()["admitted_locally"] == 0
+
+
+class TestRouteLimits:
+    """Test resolving the @rate_limit limits of the route a request goes to."""
+
+    def make_app(self):
+        app = FastAPI()
+
+        @app.get("/items/featured")
+        async def featured():
+            return {}
+
+        @app.get("/items/{item_id}")
+        @rate_limit(limit=5, window=60)
+        async def get_item(request: Request, item_id: str):
+            return {}
+
+        return app
+
+    def test_limits_of_matched_route(self):
+        app = self.make_app()
+        limiter = RateLimiter(storage=MemoryStorage())
+
+        assert limiter.route_limits(make_request(path="/items/42", app=app)) == ("/items/{item_id}", [(5, 60, False)])
+        # Routes are matched in order, so this one is not the rate limited route
+        assert limiter.route_limits(make_request(path="/items/featured", app=app)) == ("/items/featured", [])
+        assert limiter.route_limits(make_request(path="/missing", app=app)) == ("/missing", [])
+
+
+class TestRedisFailurePolicy:
+    """Test that a slow or missing Redis never stalls the event loop."""
+
+    def test_unresponsive_redis_fails_open_within_budget(self):
+        async def run():
+            async with SilentRedis() as redis_server:
+                limiter = RateLimiter(storage=silent_redis_storage(redis_server.port), failure_mode="open")
+                ticks = 0
+
+                async def ticker():
+                    nonlocal ticks
+                    while True:
+                        ticks += 1
+                        await asyncio.sleep(0.01)
+
+                ticking = asyncio.create_task(ticker())
+                started = time.monotonic()
+                result = await limiter.check_rate_limit(make_request(), [(10, 60, False)])
+                elapsed = time.monotonic() - started
+                ticking.cancel()
+                await limiter.close()
+                return result, elapsed, ticks
+
+        result, elapsed, ticks = asyncio.run(run())
+
+        assert result["allowed"] is True
+        assert elapsed < 0.5
+        # The loop kept running other tasks while the check waited on Redis
+        assert ticks >= 5
+
+    def test_unresponsive_redis_fails_closed(self):
+        async def run():
+            async with SilentRedis() as redis_server:
+                limiter = RateLimiter(storage=silent_redis_storage(redis_server.port), failure_mode="closed")
+                result = await limiter.check_rate_limit(make_request(), [(10, 60, False)])
+                await limiter.close()
+                return result
+
+        result = asyncio.run(run())
+
+        assert result["allowed"] is False and result["remaining"] == 0
+
+    def test_redis_skipped_after_repeated_failures(self):
+        async def run():
+            async with SilentRedis() as redis_server:
+                storage = silent_redis_storage(redis_server.port, failure_threshold=2)
+                limiter = RateLimiter(storage=storage, failure_mode="open")
+                for _ in range(2):
+                    await limiter.check_rate_limit(make_request(), [(10, 60, False)])
+                started = time.monotonic()
+                for _ in range(20):
+                    await limiter.check_rate_limit(make_request(), [(10, 60, False)])
+                elapsed = time.monotonic() - started
+                await limiter.close()
+                return storage.get_status(), elapsed
+
+        status, elapsed = asyncio.run(run())
+
+        assert status["redis_failures"] == 2
+        assert status["redis_skipped"] == 20
+        assert status["redis_available"] is False
+        assert elapsed < 0.1
+
+    def test_connection_refused_fails_open(self):
+        async def run():
+            # Bind and close a server to get a port nothing listens on
+            server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            server.close()
+            await server.wait_closed()
+            limiter = RateLimiter(storage=silent_redis_storage(port), failure_mode="open")
+            result = await limiter.check_rate_limit(make_request(), [(10, 60, False)])
+            await limiter.close()
+            return result
+
+        assert asyncio.run(run())["allowed"] is True
+
+
+class TestRedisGCRAScript:
+    """Test that the Lua script and the in-memory backend agree."""
+
+    def test_script_matches_memory_backend(self):
+        if get_redis_client() is None:
+            pytest.skip("Redis not reachable — skipping rate limit script test")
+        prefix = f"test:{uuid.uuid4().hex}"
+        limits = [(f"{prefix}:global", 1000, 5000, 0), (f"{prefix}:route", 500, 1500, 0)]
+        now = int(time.time() * 1000)
+
+        async def run(storage):
+            results = [await storage.acquire(limits, now + step * 100) for step in range(8)]
+            await storage.close()
+            return results
+
+        redis_results = asyncio.run(run(RedisStorage()))
+        prefix = f"test:{uuid.uuid4().hex}"
+        limits = [(f"{prefix}:global", 1000, 5000, 0), (f"{prefix}:route", 500, 1500, 0)]
+        memory_results = asyncio.run(run(MemoryStorage()))
+
+        assert redis_results == memory_results
+        assert [r[0][0] for r in redis_results].count(False) > 0
+
+    def test_script_matches_memory_backend_with_leases(self):
+        if get_redis_client() is None:
+            pytest.skip("Redis not reachable — skipping rate limit script test")
+        now = int(time.time() * 1000)
+
+        async def run(storage):
+            prefix = f"test:{uuid.uuid4().hex}"
+            keys = [f"{prefix}:global", f"{prefix}:route"]
+            limits = [(keys[0], 100, 10000, 0), (keys[1], 500, 5000, 0)]
+            results = [await storage.acquire(limits, now + step * 100, leases=[(20, 2), (2, 1)]) for step in range(4)]
+            # Give back part of a lease
+            results.append(await storage.acquire([(keys[0], 100, 10000, -30)], now + 500, cost=0))
+            await storage.close()
+            return results
+
+        redis_results = asyncio.run(run(RedisStorage()))
+        memory_results = asyncio.run(run(MemoryStorage()))
+
+        assert redis_results == memory_results
+        assert redis_results[0][0][4] > 0
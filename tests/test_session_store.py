@@ -0,0 +1,100 @@
+"""
+Tests for the session store: refresh token hashing, and the Redis backend
+when a Redis server is reachable.
+"""
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.infra.redis.repositories.redis_repositories import get_redis_client
+from app.services.session_store_service import SessionStoreService
+from app.utils.auth_utils import AuthUtils
+
+DEVICE = {"device_id": "device-1", "device_name": "Pixel", "device_type": "mobile", "platform": "android", "app_version": "2.0.0"}
+
+
+class TestRefreshTokenHash:
+    """Test the hash refresh tokens are stored and looked up by."""
+
+    def test_hash_is_deterministic_sha256(self):
+        token = AuthUtils.generate_refresh_token()
+
+        token_hash = AuthUtils.hash_refresh_token(token)
+
+        assert token_hash == AuthUtils.hash_refresh_token(token)
+        assert len(token_hash) == 64
+        assert token not in token_hash
+
+    def test_new_tokens_get_new_hashes(self):
+        hashes = {AuthUtils.hash_refresh_token(AuthUtils.generate_refresh_token()) for _ in range(20)}
+
+        assert len(hashes) == 20
+
+
+@pytest.fixture()
+def store():
+    if get_redis_client() is None:
+        pytest.skip("Redis not reachable — skipping Redis session store test")
+    return SessionStoreService(backend="redis", audit=False)
+
+
+class TestRedisSessionStore:
+    """Test sessions and refresh tokens kept in Redis (no database involved)."""
+
+    def test_refresh_token_rotates_once(self, store):
+        user_id = uuid.uuid4()
+        token = store.create_session(None, user_id, DEVICE)
+
+        assert store.get_refresh_token(None, token)["user_id"] == str(user_id)
+        new_token = store.rotate_refresh_token(None, token)
+
+        with pytest.raises(HTTPException) as exc:
+            store.rotate_refresh_token(None, token)
+        assert exc.value.status_code == 401
+        assert store.get_refresh_token(None, new_token)["device_id"] == "device-1"
+
+    def test_login_again_on_device_replaces_session_token(self, store):
+        user_id = uuid.uuid4()
+        first = store.create_session(None, user_id, DEVICE)
+        second = store.create_session(None, user_id, DEVICE)
+
+        sessions = store.list_sessions(None, user_id)
+
+        assert len(sessions) == 1
+        assert sessions[0]["device_name"] == "Pixel"
+        with pytest.raises(HTTPException):
+            store.get_refresh_token(None, first)
+        assert store.get_refresh_token(None, second)
+
+    def test_revoke_session_revokes_its_token(self, store):
+        user_id = uuid.uuid4()
+        token = store.create_session(None, user_id, DEVICE)
+        store.create_session(None, user_id, {**DEVICE, "device_id": "device-2"})
+        session_id = next(s["session_id"] for s in store.list_sessions(None, user_id) if s["device_name"] == "Pixel")
+
+        assert store.revoke_session(None, uuid.uuid4(), session_id) is False
+        assert store.revoke_session(None, user_id, session_id) is True
+
+        assert len(store.list_sessions(None, user_id)) == 1
+        with pytest.raises(HTTPException):
+            store.get_refresh_token(None, token)
+
+    def test_logout_only_accepts_own_token(self, store):
+        user_id = uuid.uuid4()
+        token = store.create_session(None, user_id, DEVICE)
+
+        assert store.revoke_refresh_token(None, uuid.uuid4(), token) == 0
+        assert store.revoke_refresh_token(None, user_id, token) == 2
+        assert store.list_sessions(None, user_id) == []
+
+    def test_revoke_all(self, store):
+        user_id = uuid.uuid4()
+        tokens = [store.create_session(None, user_id, {**DEVICE, "device_id": f"device-{i}"}) for i in range(3)]
+
+        assert store.revoke_all(None, user_id) == 6
+
+        assert store.list_sessions(None, user_id) == []
+        for token in tokens:
+            with pytest.raises(HTTPException):
+                store.get_refresh_token(None, token)
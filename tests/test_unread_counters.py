@@ -0,0 +1,89 @@
+"""
+Tests for the Redis-cached unread notification counters.
+"""
+import uuid
+
+import pytest
+
+from app.infra.redis.repositories.redis_repositories import get_redis_client
+from app.services.unread_counter_service import UnreadCounterService
+
+
+class CountingCounterService(UnreadCounterService):
+    """Counter service whose Postgres recount returns a set number (no database)."""
+
+    def __init__(self, unread: int, **kwargs):
+        super().__init__(**kwargs)
+        self.unread = unread
+        self.recounts = 0
+
+    def count_unread(self, db, user_id):
+        self.recounts += 1
+        return self.unread
+
+
+class TestUnreadCounterWithoutRedis:
+    """Test the Postgres fallback."""
+
+    def test_every_read_recounts(self):
+        counter = CountingCounterService(3, use_redis=False)
+
+        assert counter.get(None, uuid.uuid4()) == 3
+        assert counter.adjust(uuid.uuid4(), 1) is None
+        assert counter.recounts == 1
+
+
+@pytest.fixture()
+def counter():
+    if get_redis_client() is None:
+        pytest.skip("Redis not reachable — skipping Redis unread counter test")
+    return CountingCounterService(2, reconcile_seconds=60)
+
+
+class TestRedisUnreadCounter:
+    """Test counters kept in Redis."""
+
+    def test_adjust_on_missing_counter_is_a_noop(self, counter):
+        user_id = uuid.uuid4()
+
+        assert counter.adjust(user_id, 1) is None
+        # The adjust did not create a counter, so the read still recounts
+        assert counter.get(None, user_id) == 2
+        assert counter.recounts == 1
+
+    def test_cached_counter_is_adjusted(self, counter):
+        user_id = uuid.uuid4()
+        counter.get(None, user_id)
+
+        # A new notification, then deleting an unread one
+        assert counter.adjust(user_id, 1) == 3
+        assert counter.adjust(user_id, -1) == 2
+        assert counter.get(None, user_id) == 2
+        assert counter.recounts == 1
+
+    def test_counter_never_drops_below_zero(self, counter):
+        counter.unread = 0
+        user_id = uuid.uuid4()
+        counter.get(None, user_id)
+
+        assert counter.adjust(user_id, -1) == 0
+        assert counter.get(None, user_id) == 0
+
+    def test_reset_after_read_all(self, counter):
+        user_id = uuid.uuid4()
+        counter.get(None, user_id)
+
+        counter.reset(user_id)
+        assert counter.get(None, user_id) == 0
+        assert counter.recounts == 1
+
+    def test_bump_epoch_forces_recount(self, counter):
+        user_id = uuid.uuid4()
+        counter.get(None, user_id)
+
+        counter.bump_epoch()
+        counter.unread = 5
+        # Counters from the old epoch are ignored by adjust and by reads
+        assert counter.adjust(user_id, 1) is None
+        assert counter.get(None, user_id) == 5
+        assert counter.recounts == 2